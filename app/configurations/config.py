@@ -15,6 +15,8 @@ RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
 RAPIDAPI_HOST = os.getenv("RAPIDAPI_HOST")
 
 S3_UPLOAD_API = os.getenv("S3_UPLOAD_API")
+# Optional: endpoint that returns {"upload_url", "s3_url"} so binary uploads go straight to S3 with a PUT
+S3_PRESIGN_API = os.getenv("S3_PRESIGN_API")
 
 AGENT_IMAGE_VARIATIONS = "agent_image_variations"
 SCRAPER_AGENT = "scraper_agent"
@@ -121,3 +123,134 @@ FAL_AI_API_KEY: str = os.getenv("FAL_AI_API_KEY")
 
 MERCADOLIBRE_CLIENT_ID: str = os.getenv("MERCADO_LIBRE_CLIENT_ID")
 MERCADOLIBRE_CLIENT_SECRET: str = os.getenv("MERCADO_LIBRE_CLIENT_SECRET")
+
+# Pooled HTTP clients (app/externals/http_clients.py). One long-lived client per upstream.
+HTTP_POOL_MAX_CONNECTIONS: int = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# Agent-config lookup cache (app/externals/agent_config/agent_config_cache.py).
+AGENT_CONFIG_CACHE_TTL_SECONDS: float = float(os.getenv("AGENT_CONFIG_CACHE_TTL_SECONDS", "60"))
+AGENT_CONFIG_CACHE_STALE_SECONDS: float = float(os.getenv("AGENT_CONFIG_CACHE_STALE_SECONDS", "300"))
+AGENT_CONFIG_CACHE_MAX_ENTRIES: int = int(os.getenv("AGENT_CONFIG_CACHE_MAX_ENTRIES", "512"))
+
+# Startup warm-up of AI prompts with a registered fallback (PromptConfigService.warm_up).
+PROMPT_WARMUP_TIMEOUT_SECONDS: float = float(os.getenv("PROMPT_WARMUP_TIMEOUT_SECONDS", "10"))
+
+# Worker threads for the blocking google-genai stream iterator (gemini_text_v2).
+GEMINI_STREAM_MAX_THREADS: int = int(os.getenv("GEMINI_STREAM_MAX_THREADS", "32"))
+
+# Process pool for compress_image_to_target (app/helpers/image_compression_pool.py).
+# 0 = one worker per CPU.
+IMAGE_COMPRESSION_WORKERS: int = int(os.getenv("IMAGE_COMPRESSION_WORKERS", "0"))
+
+# Reference images sent inline to Gemini (app/externals/images/reference_image_cache.py).
+# IMAGE_REF_CACHE_DIR enables the on-disk tier; empty = memory only.
+IMAGE_REF_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_REF_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+IMAGE_REF_CACHE_TTL_SECONDS: float = float(os.getenv("IMAGE_REF_CACHE_TTL_SECONDS", "600"))
+IMAGE_REF_CACHE_DIR: str = os.getenv("IMAGE_REF_CACHE_DIR", "")
+IMAGE_REF_CACHE_DISK_MAX_BYTES: int = int(os.getenv("IMAGE_REF_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Conversation history kept by ConversationManager (app/managers/history_store.py).
+# Backend "memory" (per process) or "sqlite" (local file shared by workers, survives restarts).
+HISTORY_STORE_BACKEND: str = os.getenv("HISTORY_STORE_BACKEND", "memory").lower()
+HISTORY_STORE_MAX_ENTRIES: int = int(os.getenv("HISTORY_STORE_MAX_ENTRIES", "10000"))
+HISTORY_STORE_MAX_BYTES: int = int(os.getenv("HISTORY_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_STORE_TTL_SECONDS: float = float(os.getenv("HISTORY_STORE_TTL_SECONDS", str(6 * 3600)))
+HISTORY_STORE_SQLITE_PATH: str = os.getenv("HISTORY_STORE_SQLITE_PATH", "/tmp/conversation-engine/history.sqlite3")
+
+# History sent to the LLM (app/managers/history_window.py): the store keeps up to HISTORY_MAX_MESSAGES,
+# the prompt gets the newest turns that fit in HISTORY_TOKEN_BUDGET (overridable per agent with
+# metadata.history_config). HISTORY_TOKENIZER "estimate" (chars per token) or "tiktoken" (exact for
+# OpenAI/DeepSeek; needs the BPE files in TIKTOKEN_CACHE_DIR, falls back to the estimate otherwise).
+HISTORY_MAX_MESSAGES: int = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))
+HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_TOKENIZER: str = os.getenv("HISTORY_TOKENIZER", "estimate").lower()
+# Turns that fall out of the window are compacted into a summary in the background.
+HISTORY_SUMMARY_ENABLED: bool = os.getenv("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"
+HISTORY_SUMMARY_PROVIDER: str = os.getenv("HISTORY_SUMMARY_PROVIDER", "gemini")
+HISTORY_SUMMARY_MODEL: str = os.getenv("HISTORY_SUMMARY_MODEL", "gemini-flash-latest")
+HISTORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "512"))
+
+# Chat model instances cached by AIProviderFactory.get_llm, keyed by (provider, model, sampling params).
+LLM_CLIENT_CACHE_SIZE: int = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "64"))
+
+# Compiled agents (app/processors/agent_cache.py) and pooled MCP clients (app/processors/mcp_client_pool.py).
+AGENT_CACHE_MAX_ENTRIES: int = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "128"))
+MCP_POOL_IDLE_SECONDS: float = float(os.getenv("MCP_POOL_IDLE_SECONDS", "300"))
+MCP_POOL_HEALTH_CHECK_SECONDS: float = float(os.getenv("MCP_POOL_HEALTH_CHECK_SECONDS", "30"))
+MCP_POOL_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("MCP_POOL_CONNECT_TIMEOUT_SECONDS", "30"))
+
+# HTTP tools generated from agent config (app/tools/tool_generator.py, app/requestors/base_requestor.py).
+# A tool config may override timeout_seconds and max_retries.
+TOOL_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("TOOL_HTTP_TIMEOUT_SECONDS", "15"))
+TOOL_HTTP_MAX_RETRIES: int = int(os.getenv("TOOL_HTTP_MAX_RETRIES", "1"))
+TOOL_HTTP_RETRY_BUDGET_RATIO: float = float(os.getenv("TOOL_HTTP_RETRY_BUDGET_RATIO", "0.2"))
+TOOL_HTTP_MAX_CONCURRENCY: int = int(os.getenv("TOOL_HTTP_MAX_CONCURRENCY", "8"))
+
+# Circuit breakers per (provider, model) shared by LLM and image paths (app/helpers/circuit_breaker.py).
+# Opens on CIRCUIT_ERROR_RATE over at least CIRCUIT_MIN_CALLS calls, or CIRCUIT_RATE_LIMIT_THRESHOLD 429s,
+# within CIRCUIT_WINDOW_SECONDS; after CIRCUIT_OPEN_SECONDS lets CIRCUIT_HALF_OPEN_PROBES probe calls through.
+CIRCUIT_WINDOW_SECONDS: float = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_ERROR_RATE: float = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_RATE_LIMIT_THRESHOLD: int = int(os.getenv("CIRCUIT_RATE_LIMIT_THRESHOLD", "5"))
+CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+# Exact-match response cache for deterministic agents (app/services/response_cache.py). Opt-in per agent with
+# metadata.response_cache in agent-config, or listing the agent_id in RESPONSE_CACHE_AGENT_IDS (comma separated).
+# Backend "memory" (per process) or "sqlite" (local file shared by workers).
+RESPONSE_CACHE_AGENT_IDS: frozenset = frozenset(
+    agent_id.strip() for agent_id in os.getenv("RESPONSE_CACHE_AGENT_IDS", "").split(",") if agent_id.strip()
+)
+RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_SQLITE_PATH: str = os.getenv("RESPONSE_CACHE_SQLITE_PATH", "/tmp/conversation-engine/responses.sqlite3")
+
+# Gemini explicit context caching of large system prompts (app/externals/ai_direct/gemini_context_cache.py).
+# Prompts of at least GEMINI_CONTEXT_CACHE_MIN_CHARS are uploaded once as cachedContents (remote TTL
+# GEMINI_CONTEXT_CACHE_TTL_SECONDS, extended when less than GEMINI_CONTEXT_CACHE_REFRESH_SECONDS remain).
+GEMINI_CONTEXT_CACHE_ENABLED: bool = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+GEMINI_CONTEXT_CACHE_MIN_CHARS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_CHARS", "16000"))
+GEMINI_CONTEXT_CACHE_TTL_SECONDS: float = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+GEMINI_CONTEXT_CACHE_REFRESH_SECONDS: float = float(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_SECONDS", "300"))
+GEMINI_CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS: float = float(
+    os.getenv("GEMINI_CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS", "600")
+)
+GEMINI_CONTEXT_CACHE_MAX_ENTRIES: int = int(os.getenv("GEMINI_CONTEXT_CACHE_MAX_ENTRIES", "64"))
+
+# Adaptive (AIMD) concurrency limit per (provider, model) for image generation (app/helpers/concurrency.py).
+# Ceiling MAX_CONCURRENT_IMAGE_REQUESTS; IMAGE_LIMITER_INITIAL 0 = start at the ceiling.
+IMAGE_LIMITER_INITIAL: int = int(os.getenv("IMAGE_LIMITER_INITIAL", "0"))
+IMAGE_LIMITER_MIN: int = int(os.getenv("IMAGE_LIMITER_MIN", "2"))
+IMAGE_LIMITER_BACKOFF: float = float(os.getenv("IMAGE_LIMITER_BACKOFF", "0.5"))
+IMAGE_LIMITER_DECREASE_INTERVAL_SECONDS: float = float(os.getenv("IMAGE_LIMITER_DECREASE_INTERVAL_SECONDS", "5"))
+
+# Per-request deadline seen by the retry loops (app/helpers/retry.py). A caller may send its own
+# budget in the X-Request-Timeout header (seconds); 0 = no default deadline.
+REQUEST_DEADLINE_DEFAULT_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_DEFAULT_SECONDS", "0"))
+
+# Durable job queue of the async generation endpoints (app/services/job_queue.py). SQLite file shared by the
+# workers of the host: mount JOB_QUEUE_SQLITE_PATH on a persistent volume so queued jobs survive a redeploy.
+# A job whose worker died is picked up again when its lease expires (at most JOB_QUEUE_MAX_ATTEMPTS runs).
+# Webhooks go through an outbox: retried with backoff from CALLBACK_OUTBOX_BACKOFF_SECONDS, doubling.
+JOB_QUEUE_SQLITE_PATH: str = os.getenv("JOB_QUEUE_SQLITE_PATH", "/tmp/conversation-engine/jobs.sqlite3")
+JOB_QUEUE_WORKERS: int = int(os.getenv("JOB_QUEUE_WORKERS", "8"))
+JOB_QUEUE_LEASE_SECONDS: float = float(os.getenv("JOB_QUEUE_LEASE_SECONDS", "300"))
+JOB_QUEUE_MAX_ATTEMPTS: int = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+JOB_QUEUE_POLL_SECONDS: float = float(os.getenv("JOB_QUEUE_POLL_SECONDS", "2"))
+JOB_QUEUE_RETENTION_SECONDS: float = float(os.getenv("JOB_QUEUE_RETENTION_SECONDS", str(7 * 24 * 3600)))
+CALLBACK_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("CALLBACK_OUTBOX_MAX_ATTEMPTS", "8"))
+CALLBACK_OUTBOX_BACKOFF_SECONDS: float = float(os.getenv("CALLBACK_OUTBOX_BACKOFF_SECONDS", "5"))
+CALLBACK_OUTBOX_MAX_BACKOFF_SECONDS: float = float(os.getenv("CALLBACK_OUTBOX_MAX_BACKOFF_SECONDS", "600"))
+
+# Dedup of retried generation requests (app/helpers/request_dedup.py): identical concurrent requests share one
+# execution, and an identical request within REQUEST_DEDUP_WINDOW_SECONDS of a success gets the same result
+# (0 = only coalesce in-flight duplicates).
+REQUEST_DEDUP_ENABLED: bool = os.getenv("REQUEST_DEDUP_ENABLED", "true").lower() == "true"
+REQUEST_DEDUP_WINDOW_SECONDS: float = float(os.getenv("REQUEST_DEDUP_WINDOW_SECONDS", "120"))
+REQUEST_DEDUP_MAX_ENTRIES: int = int(os.getenv("REQUEST_DEDUP_MAX_ENTRIES", "256"))
@@ -1,12 +1,13 @@
 import asyncio
 import base64
-import uuid
 
 import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 
 from app.db.audit_logger import log_prompt
+from app.helpers.sse_helper import sse_response
+from app.managers.conversation_manager_interface import ConversationManagerInterface
 from app.middlewares.auth_middleware import require_api_key, require_auth
 from app.requests.analyze_funnel_request import AnalyzeFunnelRequest
 from app.requests.brand_context_resolver_request import BrandContextResolverRequest
@@ -72,6 +73,12 @@ async def handle_message(request: MessageRequest, message_service: MessageServic
     return response
 
 
+@router.post("/handle-message/stream")
+async def handle_message_stream(request: MessageRequest, message_service: MessageServiceInterface = Depends()):
+    """Same as /handle-message but streams the answer as SSE (delta* → done|error)."""
+    return sse_response(message_service.handle_message_stream(request))
+
+
 @router.post("/handle-message-json")
 async def handle_message(request: MessageRequest, message_service: MessageServiceInterface = Depends()):
     response = await message_service.handle_message_json(request)
@@ -109,11 +116,18 @@ async def generate_variation_images(
     return response
 
 
-@router.post("/generate-images-from")
+@router.post("/generate-variation-images/stream")
 @require_auth
-async def generate_images_from(
-    request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
+async def generate_variation_images_stream(
+    request: Request, variation_request: VariationImageRequest, service: ImageServiceInterface = Depends()
 ):
+    """Same as /generate-variation-images but streams each variation as SSE the moment it's uploaded
+    (start → image|image_error* → done|error)."""
+    user_info = request.state.user_info
+    return sse_response(service.stream_variation_images(variation_request, user_info.get("data", {}).get("id")))
+
+
+async def _load_request_file(generate_image_request: GenerateImageRequest) -> None:
     if not generate_image_request.file and generate_image_request.file_url:
         async with httpx.AsyncClient() as client:
             try:
@@ -123,6 +137,14 @@ async def generate_images_from(
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Error for get file: {str(e)}")
 
+
+@router.post("/generate-images-from")
+@require_auth
+async def generate_images_from(
+    request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
+):
+    await _load_request_file(generate_image_request)
+
     user_info = request.state.user_info
     response = await service.generate_images_from(generate_image_request, user_info.get("data", {}).get("id"))
     return response
@@ -133,31 +155,39 @@ async def generate_images_from(
 async def generate_images_from_api_key(
     request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
 ):
-    if not generate_image_request.file and generate_image_request.file_url:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(generate_image_request.file_url)
-                response.raise_for_status()
-                generate_image_request.file = base64.b64encode(response.content).decode()
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error for get file: {str(e)}")
+    await _load_request_file(generate_image_request)
     response = await service.generate_images_from(generate_image_request, generate_image_request.owner_id)
     return response
 
 
+@router.post("/generate-images-from/stream")
+@require_auth
+async def generate_images_from_stream(
+    request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
+):
+    """Same as /generate-images-from but streams each variation as SSE the moment it's uploaded
+    (start → image|image_error* → done|error)."""
+    await _load_request_file(generate_image_request)
+    user_info = request.state.user_info
+    return sse_response(service.stream_images_from(generate_image_request, user_info.get("data", {}).get("id")))
+
+
+@router.post("/generate-images-from/stream/api-key")
+@require_api_key
+async def generate_images_from_stream_api_key(
+    request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
+):
+    """Same as /generate-images-from/api-key but streams each variation as SSE (see /generate-images-from/stream)."""
+    await _load_request_file(generate_image_request)
+    return sse_response(service.stream_images_from(generate_image_request, generate_image_request.owner_id))
+
+
 @router.post("/generate-images-from-agent/api-key")
 @require_api_key
 async def generate_images_from_agent_api_key(
     request: Request, generate_image_request: GenerateImageRequest, service: ImageServiceInterface = Depends()
 ):
-    if not generate_image_request.file and generate_image_request.file_url:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(generate_image_request.file_url)
-                response.raise_for_status()
-                generate_image_request.file = base64.b64encode(response.content).decode()
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error for get file: {str(e)}")
+    await _load_request_file(generate_image_request)
     response = await service.generate_images_from_agent(generate_image_request, generate_image_request.owner_id)
     return response
 
@@ -251,11 +281,17 @@ async def generate_section_image(
     request: Request,
     section_request: SectionImageRequest,
 ):
+    from app.helpers.request_dedup import RequestDedup
     from app.services.section_image_service import SectionImageService
 
     service = SectionImageService()
-    response = await service.generate_section_image(section_request)
-    return response
+    # Los reintentos del builder (timeout del proxy) se suman a la generación en curso.
+    return await RequestDedup.run(
+        "section_image",
+        section_request,
+        lambda: service.generate_section_image(section_request),
+        owner_id=section_request.owner_id,
+    )
 
 
 @router.post("/generate-section-image/async/api-key")
@@ -264,26 +300,25 @@ async def generate_section_image_async(
     request: Request,
     section_request: SectionImageRequest,
 ):
-    from app.services.section_image_service import SectionImageService
+    from app.services.job_queue import JobQueue
+    from app.services.section_image_service import SECTION_IMAGE_JOB
 
     if not section_request.callback_url:
         raise HTTPException(status_code=400, detail="callback_url is required for async generation")
 
-    request_id = str(uuid.uuid4())
-    service = SectionImageService()
-
-    asyncio.create_task(
-        service.generate_and_callback(
-            request=section_request,
-            request_id=request_id,
-            callback_url=section_request.callback_url,
-            callback_metadata=section_request.callback_metadata,
-        )
+    # Persistido en la cola de jobs: sobrevive a un restart y el webhook sale por el outbox.
+    # Un reintento del cliente con el mismo Idempotency-Key devuelve el job ya encolado.
+    job, _ = await JobQueue.submit(
+        SECTION_IMAGE_JOB,
+        section_request.model_dump(mode="json"),
+        callback_url=section_request.callback_url,
+        owner_id=section_request.owner_id,
+        idempotency_key=request.headers.get("idempotency-key"),
     )
 
     return JSONResponse(
         status_code=202,
-        content={"request_id": request_id, "status": "accepted"},
+        content={"request_id": job["id"], "job_id": job["id"], "status": "accepted"},
     )
 
 
@@ -341,12 +376,14 @@ async def video_studio_draft_async(
     request: Request,
     draft_request: VideoStudioDraftRequest,
 ):
-    """Async endpoint: lanza el director en background y responde 202 inmediatamente.
+    """Async endpoint: encola el director y responde 202 inmediatamente.
 
     Cuando el director termina (éxito o fallo), POSTea el resultado al
     `callback_url` provisto en el request. Esta es la forma normal en producción.
+    El estado del job se consulta en `GET /jobs/{job_id}`.
     """
-    from app.services.video_studio_service import VideoStudioService
+    from app.services.job_queue import JobQueue
+    from app.services.video_studio_service import VIDEO_STUDIO_DRAFT_JOB
 
     if not draft_request.callback_url:
         raise HTTPException(
@@ -354,19 +391,37 @@ async def video_studio_draft_async(
             detail="callback_url is required for async video studio draft generation",
         )
 
-    service = VideoStudioService()
-    asyncio.create_task(service.run_and_callback(draft_request))
+    job, _ = await JobQueue.submit(
+        VIDEO_STUDIO_DRAFT_JOB,
+        draft_request.model_dump(mode="json"),
+        callback_url=draft_request.callback_url,
+        owner_id=draft_request.owner_id,
+        idempotency_key=request.headers.get("idempotency-key"),
+    )
 
     return JSONResponse(
         status_code=202,
         content={
             "reference_id": draft_request.reference_id,
+            "job_id": job["id"],
             "status": "directing",
             "message": "Director Creative pipeline started.",
         },
     )
 
 
+@router.get("/jobs/{job_id}")
+@require_api_key
+async def get_job(request: Request, job_id: str):
+    """Status of an async job (queued, running, succeeded, failed), its result and webhook delivery."""
+    from app.services.job_queue import JobQueue
+
+    job = await JobQueue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
 # ------------------------------------------------------------------
 # Section HTML (code-based sections) — no LangChain
 # ------------------------------------------------------------------
@@ -379,11 +434,29 @@ async def generate_section_html(
     section_request: SectionHtmlRequest,
 ):
     """Generate an HTML section from a template + product data. Server-to-server."""
+    from app.helpers.request_dedup import RequestDedup
     from app.services.section_html_service import SectionHtmlService
 
     service = SectionHtmlService()
-    response = await service.generate_section_html(section_request)
-    return response
+    return await RequestDedup.run(
+        "section_html",
+        section_request,
+        lambda: service.generate_section_html(section_request),
+        owner_id=section_request.owner_id,
+    )
+
+
+@router.post("/generate-section-html/stream/api-key")
+@require_api_key
+async def generate_section_html_stream(
+    request: Request,
+    section_request: SectionHtmlRequest,
+):
+    """Same as /generate-section-html/api-key but streams the HTML as SSE (delta* → done|error)."""
+    from app.services.section_html_service import SectionHtmlService
+
+    service = SectionHtmlService()
+    return sse_response(service.stream_generate_section_html(section_request))
 
 
 @router.post("/preview-section-prompt/api-key")
@@ -420,6 +493,20 @@ async def edit_section_html(
     return response
 
 
+@router.post("/edit-section-html/stream")
+@require_auth
+async def edit_section_html_stream(
+    request: Request,
+    edit_request: EditSectionHtmlRequest,
+):
+    """Same as /edit-section-html but streams the HTML as SSE (delta* → status → done|error)."""
+    from app.services.section_html_service import SectionHtmlService
+
+    edit_request.owner_id = request.state.user_info.get("data", {}).get("id", edit_request.owner_id)
+    service = SectionHtmlService()
+    return sse_response(service.stream_edit_section_html(edit_request))
+
+
 @router.post("/generate-template-html/api-key")
 @require_api_key
 async def generate_template_html(
@@ -441,6 +528,23 @@ async def generate_template_html(
     return response
 
 
+@router.post("/generate-template-html/stream/api-key")
+@require_api_key
+async def generate_template_html_stream(
+    request: Request,
+    body: TemplateGenerateRequest,
+):
+    """Same as /generate-template-html/api-key but streams the HTML as SSE."""
+    from app.services.section_html_service import SectionHtmlService
+
+    history = None
+    if body.conversation_history:
+        history = [{"role": m.role, "content": m.content} for m in body.conversation_history]
+
+    service = SectionHtmlService()
+    return sse_response(service.stream_template_html(instruction=body.instruction, conversation_history=history))
+
+
 @router.post("/orchestrate-section-images/api-key")
 @require_api_key
 async def orchestrate_section_images(
@@ -462,11 +566,16 @@ async def generate_sub_images(
     sub_request: GenerateSubImagesRequest,
 ):
     """Generate sub-element images for an HTML section. Server-to-server."""
+    from app.helpers.request_dedup import RequestDedup
     from app.services.sub_image_service import SubImageService
 
     service = SubImageService()
-    response = await service.generate_sub_images(sub_request)
-    return response
+    return await RequestDedup.run(
+        "sub_images",
+        sub_request,
+        lambda: service.generate_sub_images(sub_request),
+        owner_id=sub_request.owner_id,
+    )
 
 
 @router.post("/analyze-funnel", response_model=AnalyzeFunnelResponse)
@@ -486,6 +595,136 @@ async def analyze_funnel(
     return await service.analyze(funnel_request)
 
 
+@router.get("/metrics/http-pools")
+@require_api_key
+async def http_pool_metrics(request: Request, host: str = None):
+    """Per-host counters for the pooled outbound HTTP clients."""
+    from app.externals.http_clients import get_pool_metrics
+
+    return get_pool_metrics(host)
+
+
+@router.get("/metrics/audit-log")
+@require_api_key
+async def audit_log_metrics(request: Request):
+    """Queue depth and write counters of the batched prompt_logs writer."""
+    from app.db.audit_logger import get_audit_stats
+
+    return get_audit_stats()
+
+
+@router.get("/metrics/reference-images")
+@require_api_key
+async def reference_image_metrics(request: Request):
+    """Hit/miss counters and size of the inline reference-image cache."""
+    from app.externals.images.reference_image_cache import ReferenceImageCache
+
+    return ReferenceImageCache.stats()
+
+
+@router.get("/metrics/conversation-history")
+@require_api_key
+async def conversation_history_metrics(
+    request: Request, conversation_manager: ConversationManagerInterface = Depends()
+):
+    """Size, evictions and hit counters of the conversation history store."""
+    return conversation_manager.get_history_stats()
+
+
+@router.get("/metrics/llm-clients")
+@require_api_key
+async def llm_client_metrics(request: Request):
+    """Hit/miss counters of the chat model cache in AIProviderFactory, plus observed latency per model."""
+    from app.factories.ai_provider_factory import AIProviderFactory
+    from app.helpers.latency_tracker import LatencyTracker
+
+    return {**AIProviderFactory.stats(), "latency": LatencyTracker.stats()}
+
+
+@router.get("/metrics/agents")
+@require_api_key
+async def agent_metrics(request: Request):
+    """Compiled agent cache and pooled MCP clients."""
+    from app.processors.agent_cache import CompiledAgentCache
+    from app.processors.mcp_client_pool import MCPClientPool
+
+    return {"compiled_agents": CompiledAgentCache.stats(), "mcp_clients": MCPClientPool.stats()}
+
+
+@router.get("/metrics/circuit-breakers")
+@require_api_key
+async def circuit_breaker_metrics(request: Request):
+    """State (closed/open/half_open) and rolling error counts of each (provider, model) circuit breaker."""
+    from app.helpers.circuit_breaker import CircuitBreakerRegistry
+
+    return CircuitBreakerRegistry.stats()
+
+
+@router.get("/metrics/image-limiters")
+@require_api_key
+async def image_limiter_metrics(request: Request):
+    """Current concurrency limit, in-flight calls and queue depth per lane of each (provider, model) image limiter."""
+    from app.helpers.concurrency import ImageLimiterRegistry
+
+    return ImageLimiterRegistry.stats()
+
+
+@router.get("/metrics/response-cache")
+@require_api_key
+async def response_cache_metrics(request: Request):
+    """Hit/miss counters and size of the exact-match response cache."""
+    from app.services.response_cache import ResponseCache
+
+    return await ResponseCache.stats()
+
+
+@router.get("/metrics/gemini-context-cache")
+@require_api_key
+async def gemini_context_cache_metrics(request: Request):
+    """Cached system prompts (Gemini cachedContents) reused by the direct Gemini text calls."""
+    from app.externals.ai_direct.gemini_context_cache import GeminiContextCache
+
+    return GeminiContextCache.stats()
+
+
+@router.get("/metrics/jobs")
+@require_api_key
+async def job_queue_metrics(request: Request):
+    """Jobs per status, pending/dead webhooks and worker counters of the async job queue."""
+    from app.services.job_queue import JobQueue
+
+    return await JobQueue.stats()
+
+
+@router.get("/metrics/request-dedup")
+@require_api_key
+async def request_dedup_metrics(request: Request):
+    """Duplicate generation requests attached to an in-flight execution or answered from a recent result."""
+    from app.helpers.request_dedup import RequestDedup
+
+    return RequestDedup.stats()
+
+
+@router.post("/agent-config/cache/invalidate")
+@require_api_key
+async def invalidate_agent_config_cache(request: Request, agent_id: str = None):
+    """Drop cached agent configs (plus prompt configs, compiled agents and responses) so the next request refetches.
+
+    Called by agent-config after an agent is edited. Without `agent_id` the
+    whole cache is cleared.
+    """
+    from app.externals.agent_config.agent_config_cache import AgentConfigCache
+    from app.processors.agent_cache import CompiledAgentCache
+    from app.services.prompt_config_service import PromptConfigService
+    from app.services.response_cache import ResponseCache
+
+    removed = AgentConfigCache.invalidate(agent_id)
+    PromptConfigService.invalidate(agent_id)
+    CompiledAgentCache.invalidate(agent_id)
+    await ResponseCache.invalidate(agent_id)
+    return {"invalidated": removed, "agent_id": agent_id, "stats": AgentConfigCache.stats()}
+
+
 @router.get("/health")
 async def health_check():
     return {"status": "OK"}
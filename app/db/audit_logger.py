@@ -1,8 +1,38 @@
+import asyncio
 import json
 import os
 import uuid
+from collections import deque
+
+# prompt_logs se escribe en batches: log_prompt() encola la fila y un flusher
+# en background la inserta junto con otras (una ida a la DB por batch en vez de
+# una por fila). Se flushea al llegar a AUDIT_LOG_BATCH_SIZE filas o cada
+# AUDIT_LOG_FLUSH_INTERVAL segundos, lo que pase primero. Si la cola se llena
+# (DB lenta o caída) se descartan las filas más viejas y se cuentan en _stats.
+# Si un batch falla por la conexión, las filas vuelven a la cola para el próximo
+# flush; si falla por los datos, se reintentan de a una y solo se pierde la mala.
+BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "100"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1.0"))
+MAX_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_MAX_QUEUE", "10000"))
+
+_INSERT_SQL = """
+    INSERT INTO prompt_logs (
+        id, log_type, owner_id, website_id, agent_id,
+        model, provider, prompt, response_text, response_url,
+        brand_colors, status, error_message, attempt_number,
+        fallback_used, elapsed_ms, metadata
+    ) VALUES (
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
+        $11, $12, $13, $14, $15, $16, $17
+    )
+"""
 
 _pool = None
+_buffer: deque = deque()
+_wakeup: asyncio.Event = None
+_flusher_task: asyncio.Task = None
+_closing = False
+_stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "requeued": 0, "batches": 0}
 
 
 async def init_pool():
@@ -29,14 +59,132 @@ async def init_pool():
     except Exception as e:
         print(f"[AUDIT] Failed to connect to audit DB: {e}", flush=True)
         _pool = None
+        return
+    _start_flusher()
 
 
 async def close_pool():
-    """Close the connection pool."""
-    global _pool
+    """Flush pending audit rows, then close the connection pool."""
+    global _pool, _flusher_task, _closing
+    if _flusher_task is not None:
+        _closing = True
+        _wakeup.set()
+        try:
+            await _flusher_task
+        except Exception as e:
+            print(f"[AUDIT-ERROR] flusher stopped with error: {e}", flush=True)
+        _flusher_task = None
+    if _buffer:
+        await _flush_pending()
     if _pool:
         await _pool.close()
         _pool = None
+    _closing = False
+
+
+def get_audit_stats() -> dict:
+    """Counters of the batched writer (queue depth, rows written/dropped/failed)."""
+    return {**_stats, "queued": len(_buffer)}
+
+
+def _start_flusher():
+    global _wakeup, _flusher_task
+    if _flusher_task is not None and not _flusher_task.done():
+        return
+    _wakeup = asyncio.Event()
+    _flusher_task = asyncio.create_task(_flush_loop())
+
+
+async def _flush_loop():
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await _flush_pending()
+        if _closing:
+            return
+
+
+def _is_connection_error(e: Exception) -> bool:
+    """True when the DB couldn't be reached, as opposed to a row it rejected."""
+    if isinstance(e, (OSError, asyncio.TimeoutError)):
+        return True
+    try:
+        import asyncpg
+    except ImportError:
+        return False
+    if isinstance(e, asyncpg.DataError):
+        return False
+    return isinstance(
+        e,
+        (
+            asyncpg.PostgresConnectionError,
+            asyncpg.InterfaceError,
+            asyncpg.CannotConnectNowError,
+            asyncpg.TooManyConnectionsError,
+        ),
+    )
+
+
+def _requeue(rows: list):
+    """Put rows back at the head of the queue, in order, within MAX_QUEUE_SIZE."""
+    _buffer.extendleft(reversed(rows))
+    _stats["requeued"] += len(rows)
+    while len(_buffer) > MAX_QUEUE_SIZE:
+        _buffer.popleft()
+        _stats["dropped"] += 1
+
+
+async def _flush_pending():
+    """Write everything queued, in batches of BATCH_SIZE. Never raises.
+
+    Stops at the first connection error, leaving the rows queued for the next flush.
+    """
+    while _buffer and _pool:
+        batch = [_buffer.popleft() for _ in range(min(BATCH_SIZE, len(_buffer)))]
+        try:
+            async with _pool.acquire() as conn:
+                await conn.executemany(_INSERT_SQL, batch)
+            _stats["written"] += len(batch)
+            _stats["batches"] += 1
+        except Exception as e:
+            if _is_connection_error(e):
+                _requeue(batch)
+                print(f"[AUDIT-ERROR] audit DB unreachable, {len(batch)} rows requeued: {e}", flush=True)
+                return
+            print(f"[AUDIT-ERROR] batch of {len(batch)} rows failed, retrying row by row: {e}", flush=True)
+            if not await _write_rows(batch):
+                return
+
+
+async def _write_rows(rows: list) -> bool:
+    """Insert rows one at a time so a bad row doesn't take the batch with it. False if the
+    connection failed midway (the unwritten rows are requeued)."""
+    done = 0
+    try:
+        async with _pool.acquire() as conn:
+            for row in rows:
+                try:
+                    await conn.execute(_INSERT_SQL, *row)
+                    _stats["written"] += 1
+                except Exception as e:
+                    if _is_connection_error(e):
+                        raise
+                    _stats["failed"] += 1
+                    print(f"[AUDIT-ERROR] row {row[0]} ({row[1]}) rejected: {e}", flush=True)
+                done += 1
+    except Exception as e:
+        pending = rows[done:]
+        if not _is_connection_error(e):
+            _stats["failed"] += len(pending)
+            print(f"[AUDIT-ERROR] {len(pending)} rows failed: {e}", flush=True)
+            return True
+        _requeue(pending)
+        print(f"[AUDIT-ERROR] audit DB unreachable, {len(pending)} rows requeued: {e}", flush=True)
+        return False
+    return True
 
 
 async def log_prompt(
@@ -57,40 +205,45 @@ async def log_prompt(
     elapsed_ms: int = None,
     metadata: dict = None,
 ):
-    """Fire-and-forget prompt audit log. Never raises, never blocks."""
+    """Fire-and-forget prompt audit log. Never raises, never blocks.
+
+    Only enqueues the row; the background flusher writes it in a batch.
+    """
     if not _pool:
         return
     try:
-        async with _pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO prompt_logs (
-                    id, log_type, owner_id, website_id, agent_id,
-                    model, provider, prompt, response_text, response_url,
-                    brand_colors, status, error_message, attempt_number,
-                    fallback_used, elapsed_ms, metadata
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
-                    $11, $12, $13, $14, $15, $16, $17
-                )
-                """,
-                str(uuid.uuid4()),
-                log_type,
-                owner_id,
-                website_id,
-                agent_id,
-                model,
-                provider,
-                prompt,
-                response_text[:100000] if response_text else None,
-                response_url,
-                json.dumps(brand_colors) if brand_colors else None,
-                status,
-                error_message[:1000] if error_message else None,
-                attempt_number,
-                fallback_used,
-                elapsed_ms,
-                json.dumps(metadata) if metadata else None,
-            )
+        row = (
+            str(uuid.uuid4()),
+            log_type,
+            owner_id,
+            website_id,
+            agent_id,
+            model,
+            provider,
+            prompt,
+            response_text[:100000] if response_text else None,
+            response_url,
+            json.dumps(brand_colors) if brand_colors else None,
+            status,
+            error_message[:1000] if error_message else None,
+            attempt_number,
+            fallback_used,
+            elapsed_ms,
+            json.dumps(metadata) if metadata else None,
+        )
     except Exception as e:
         print(f"[AUDIT-ERROR] {e}", flush=True)
+        return
+
+    if len(_buffer) >= MAX_QUEUE_SIZE:
+        _buffer.popleft()
+        _stats["dropped"] += 1
+    _buffer.append(row)
+    _stats["enqueued"] += 1
+
+    if _closing:
+        return
+    if _flusher_task is None or _flusher_task.done():
+        _start_flusher()
+    if len(_buffer) >= BATCH_SIZE:
+        _wakeup.set()
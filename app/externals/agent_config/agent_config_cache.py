@@ -0,0 +1,155 @@
+"""
+Process-local cache in front of `agent_config_client.get_agent`.
+
+`MessageService.handle_message` (and everything that fans out through it:
+copies, funnel resolution, images-from-agent) plus `VideoStudioService`
+resolve an agent config on every request. The config changes rarely, so the
+round-trip to agent-config is pure latency before any LLM work starts.
+
+Same idea as `PromptConfigService`, generalized to full `AgentConfigResponse`
+objects:
+- Key: (agent_id, metadata_filter, hash of parameter_prompt). `query` is not
+  part of the key; lookups without `agent_id` (search by query) bypass the cache.
+- Fresh for `TTL_SECONDS`. Between TTL and `STALE_SECONDS` the cached value is
+  served immediately and a background refresh is scheduled
+  (stale-while-revalidate). Past `STALE_SECONDS` the caller waits for a fetch.
+- Single-flight: concurrent misses for the same key share one fetch.
+- Bounded LRU (`MAX_ENTRIES`).
+- Fetch errors are never cached; a failed background refresh keeps serving
+  the stale value until it expires.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.configurations.config import (
+    AGENT_CONFIG_CACHE_MAX_ENTRIES,
+    AGENT_CONFIG_CACHE_STALE_SECONDS,
+    AGENT_CONFIG_CACHE_TTL_SECONDS,
+)
+from app.externals.agent_config import agent_config_client
+from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class AgentConfigCache:
+    TTL_SECONDS: float = AGENT_CONFIG_CACHE_TTL_SECONDS
+    STALE_SECONDS: float = AGENT_CONFIG_CACHE_STALE_SECONDS
+    MAX_ENTRIES: int = AGENT_CONFIG_CACHE_MAX_ENTRIES
+
+    _cache: "OrderedDict[CacheKey, Tuple[AgentConfigResponse, float]]" = OrderedDict()
+    _inflight: Dict[CacheKey, "asyncio.Task[AgentConfigResponse]"] = {}
+    _generation: int = 0
+    _stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refresh_errors": 0}
+
+    @staticmethod
+    def _key(data: AgentConfigRequest) -> CacheKey:
+        metadata_filter = json.dumps(
+            [f.model_dump() for f in data.metadata_filter or []], sort_keys=True, separators=(",", ":")
+        )
+        parameter_prompt = json.dumps(data.parameter_prompt or {}, sort_keys=True, default=str)
+        return data.agent_id, metadata_filter, hashlib.sha256(parameter_prompt.encode()).hexdigest()
+
+    @classmethod
+    async def get(cls, data: AgentConfigRequest) -> AgentConfigResponse:
+        if not data.agent_id:
+            return await agent_config_client.get_agent(data)
+
+        key = cls._key(data)
+        cached = cls._cache.get(key)
+        if cached:
+            value, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if age < cls.TTL_SECONDS:
+                cls._stats["hits"] += 1
+                cls._cache.move_to_end(key)
+                return value.model_copy(deep=True)
+            if age < cls.STALE_SECONDS:
+                cls._stats["stale_hits"] += 1
+                cls._cache.move_to_end(key)
+                cls._refresh_in_background(key, data)
+                return value.model_copy(deep=True)
+
+        cls._stats["misses"] += 1
+        value = await cls._fetch(key, data)
+        return value.model_copy(deep=True)
+
+    @classmethod
+    async def _fetch(cls, key: CacheKey, data: AgentConfigRequest) -> AgentConfigResponse:
+        task = cls._inflight.get(key)
+        if task is not None:
+            cls._stats["coalesced"] += 1
+        else:
+            # Task propia (no el coroutine del caller) para que cancelar un
+            # request no cancele el fetch que otros están esperando.
+            task = asyncio.create_task(agent_config_client.get_agent(data))
+            cls._inflight[key] = task
+            generation = cls._generation
+            task.add_done_callback(lambda t: cls._on_fetch_done(key, t, generation))
+        return await asyncio.shield(task)
+
+    @classmethod
+    def _on_fetch_done(cls, key: CacheKey, task: "asyncio.Task[AgentConfigResponse]", generation: int) -> None:
+        if cls._inflight.get(key) is task:
+            cls._inflight.pop(key)
+        if task.cancelled() or task.exception() is not None:
+            return
+        # Un invalidate() durante el fetch gana: no guardar un valor que puede ser viejo.
+        if generation == cls._generation:
+            cls._store(key, task.result())
+
+    @classmethod
+    def _refresh_in_background(cls, key: CacheKey, data: AgentConfigRequest) -> None:
+        if key in cls._inflight:
+            return
+
+        async def _refresh():
+            try:
+                await cls._fetch(key, data)
+            except Exception as e:
+                cls._stats["refresh_errors"] += 1
+                logger.warning(
+                    f"agent-config background refresh failed for agent_id={data.agent_id}: {type(e).__name__}: {e}"
+                )
+
+        asyncio.create_task(_refresh())
+
+    @classmethod
+    def _store(cls, key: CacheKey, value: AgentConfigResponse) -> None:
+        cls._cache[key] = (value, time.monotonic())
+        cls._cache.move_to_end(key)
+        while len(cls._cache) > cls.MAX_ENTRIES:
+            cls._cache.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, agent_id: Optional[str] = None) -> int:
+        """Drop cached entries for `agent_id` (every variant), or everything. Returns how many."""
+        cls._generation += 1
+        for key in [key for key in cls._inflight if agent_id is None or key[0] == agent_id]:
+            cls._inflight.pop(key, None)
+        if agent_id is None:
+            removed = len(cls._cache)
+            cls._cache.clear()
+            return removed
+        keys = [key for key in cls._cache if key[0] == agent_id]
+        for key in keys:
+            cls._cache.pop(key, None)
+        return len(keys)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {**cls._stats, "entries": len(cls._cache), "inflight": len(cls._inflight)}
+
+
+async def get_agent(data: AgentConfigRequest) -> AgentConfigResponse:
+    """Cached drop-in replacement for `agent_config_client.get_agent`."""
+    return await AgentConfigCache.get(data)
@@ -1,8 +1,7 @@
-import httpx
-
 from app.configurations.config import HOST_AGENT_CONFIG
 from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
 from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
+from app.externals.http_clients import get_http_client
 
 
 async def get_agent(data: AgentConfigRequest) -> AgentConfigResponse:
@@ -10,9 +9,8 @@ async def get_agent(data: AgentConfigRequest) -> AgentConfigResponse:
     url = f"{HOST_AGENT_CONFIG}{endpoint}"
     headers = {"Content-Type": "application/json"}
 
-    timeout = httpx.Timeout(timeout=60.0, connect=30.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(url, json=data.model_dump(), headers=headers)
-        response.raise_for_status()
+    client = get_http_client("agent_config")
+    response = await client.post(url, json=data.model_dump(), headers=headers)
+    response.raise_for_status()
 
-        return AgentConfigResponse(**response.json())
+    return AgentConfigResponse(**response.json())
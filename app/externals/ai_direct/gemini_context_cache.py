@@ -0,0 +1,286 @@
+"""
+Gemini explicit context caching for large, static system prompts.
+
+The video director prompt (rendered with the whole `creative_patterns_json`),
+the section HTML system prompts and the funnel analysis prompt are tens of
+thousands of characters that `call_gemini_structured` / `call_gemini_freeform`
+resent on every call, so Gemini re-processed them every time.
+
+This module uploads those prompts once as a `cachedContents` resource and the
+callers send `cachedContent: <name>` instead of `systemInstruction`:
+- Only prompts of at least `MIN_CHARS` characters (Gemini rejects caches below
+  a per-model minimum of tokens, and small prompts don't pay off).
+- Key: (model, sha256 of the prompt). A prompt edited in PromptConfigService
+  hashes differently, so it never serves a stale cache; the old resource just
+  expires server-side.
+- Remote TTL `TTL_SECONDS`. When less than `REFRESH_SECONDS` remain the current
+  name is served and the TTL is extended in the background (PATCH); if that
+  fails the entry is dropped and the next call recreates it.
+- Single-flight: concurrent misses for the same key share one creation.
+- A failed creation (prompt under the model minimum, model without caching,
+  network) is remembered for `FAILURE_COOLDOWN_SECONDS`: those calls go inline
+  without paying an extra round-trip each time.
+- Bounded LRU (`MAX_ENTRIES`); evicted and invalidated resources are deleted
+  remotely, best effort, so storage isn't billed until their TTL runs out.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.configurations.config import (
+    GEMINI_CONTEXT_CACHE_ENABLED,
+    GEMINI_CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS,
+    GEMINI_CONTEXT_CACHE_MAX_ENTRIES,
+    GEMINI_CONTEXT_CACHE_MIN_CHARS,
+    GEMINI_CONTEXT_CACHE_REFRESH_SECONDS,
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+    GOOGLE_GEMINI_API_KEY,
+)
+from app.externals.http_clients import get_aiohttp_session
+
+logger = logging.getLogger(__name__)
+
+_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+# Misma sesión que gemini_text (el registry la comparte por nombre).
+_SESSION_NAME = "gemini_text"
+
+CacheKey = Tuple[str, str]
+
+
+class GeminiContextCacheError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+async def _request(method: str, path: str, **kwargs) -> Dict[str, Any]:
+    session = get_aiohttp_session(_SESSION_NAME, total_timeout=600, limit=10)
+    async with session.request(
+        method, f"{_BASE_URL}/{path}", params={"key": GOOGLE_GEMINI_API_KEY, **kwargs.pop("params", {})}, **kwargs
+    ) as response:
+        body = await response.text()
+        if response.status != 200:
+            raise GeminiContextCacheError(
+                f"Gemini cachedContents {method} HTTP {response.status}: {body[:300]}", status=response.status
+            )
+        return json.loads(body) if body else {}
+
+
+async def _create_remote(model: str, system_prompt: str, ttl_seconds: float) -> str:
+    data = await _request(
+        "POST",
+        "cachedContents",
+        json={
+            "model": f"models/{model}",
+            "systemInstruction": {"role": "system", "parts": [{"text": system_prompt}]},
+            "ttl": f"{int(ttl_seconds)}s",
+        },
+    )
+    return data["name"]
+
+
+async def _extend_remote(name: str, ttl_seconds: float) -> None:
+    await _request("PATCH", name, params={"updateMask": "ttl"}, json={"ttl": f"{int(ttl_seconds)}s"})
+
+
+async def _delete_remote(name: str) -> None:
+    await _request("DELETE", name)
+
+
+class GeminiContextCache:
+    ENABLED: bool = GEMINI_CONTEXT_CACHE_ENABLED
+    MIN_CHARS: int = GEMINI_CONTEXT_CACHE_MIN_CHARS
+    TTL_SECONDS: float = GEMINI_CONTEXT_CACHE_TTL_SECONDS
+    REFRESH_SECONDS: float = GEMINI_CONTEXT_CACHE_REFRESH_SECONDS
+    FAILURE_COOLDOWN_SECONDS: float = GEMINI_CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS
+    MAX_ENTRIES: int = GEMINI_CONTEXT_CACHE_MAX_ENTRIES
+
+    # key -> (cachedContents name, or None after a failed creation; expires_at monotonic)
+    _cache: "OrderedDict[CacheKey, Tuple[Optional[str], float]]" = OrderedDict()
+    _inflight: Dict[CacheKey, "asyncio.Task[Optional[str]]"] = {}
+    _refreshing: set = set()
+    _stats: Dict[str, int] = {
+        "hits": 0,
+        "created": 0,
+        "coalesced": 0,
+        "refreshed": 0,
+        "create_errors": 0,
+        "refresh_errors": 0,
+        "skipped_small": 0,
+        "evicted": 0,
+        "invalidated": 0,
+    }
+
+    @staticmethod
+    def _key(model: str, system_prompt: str) -> CacheKey:
+        return model, hashlib.sha256(system_prompt.encode()).hexdigest()
+
+    @classmethod
+    async def get(cls, model: str, system_prompt: str) -> Optional[str]:
+        """`cachedContents/...` name holding `system_prompt` for `model`, or None to send it inline."""
+        if not cls.ENABLED or not GOOGLE_GEMINI_API_KEY:
+            return None
+        if len(system_prompt) < cls.MIN_CHARS:
+            cls._stats["skipped_small"] += 1
+            return None
+
+        key = cls._key(model, system_prompt)
+        cached = cls._cache.get(key)
+        if cached:
+            name, expires_at = cached
+            remaining = expires_at - time.monotonic()
+            if remaining > 0:
+                cls._cache.move_to_end(key)
+                if name is None:
+                    return None
+                cls._stats["hits"] += 1
+                if remaining < cls.REFRESH_SECONDS:
+                    cls._refresh_in_background(key, name)
+                return name
+            cls._cache.pop(key, None)
+
+        return await cls._create(key, model, system_prompt)
+
+    @classmethod
+    async def _create(cls, key: CacheKey, model: str, system_prompt: str) -> Optional[str]:
+        task = cls._inflight.get(key)
+        if task is not None:
+            cls._stats["coalesced"] += 1
+        else:
+            # Task propia para que cancelar un request no cancele la creación que otros esperan.
+            task = asyncio.create_task(cls._create_or_cooldown(key, model, system_prompt))
+            cls._inflight[key] = task
+            task.add_done_callback(lambda t: cls._inflight.pop(key, None) if cls._inflight.get(key) is t else None)
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _create_or_cooldown(cls, key: CacheKey, model: str, system_prompt: str) -> Optional[str]:
+        try:
+            name = await _create_remote(model, system_prompt, cls.TTL_SECONDS)
+        except Exception as e:
+            cls._stats["create_errors"] += 1
+            logger.warning(
+                f"[GEMINI_CONTEXT_CACHE] create failed model={model} chars={len(system_prompt)}, "
+                f"sending inline for {cls.FAILURE_COOLDOWN_SECONDS:.0f}s: {type(e).__name__}: {e}"
+            )
+            cls._store(key, None, cls.FAILURE_COOLDOWN_SECONDS)
+            return None
+        cls._stats["created"] += 1
+        logger.info(f"[GEMINI_CONTEXT_CACHE] created {name} model={model} chars={len(system_prompt)}")
+        # Se da por vencida un poco antes que en Gemini para no referenciar un recurso ya borrado.
+        cls._store(key, name, cls.TTL_SECONDS - cls.REFRESH_SECONDS / 2)
+        return name
+
+    @classmethod
+    def _refresh_in_background(cls, key: CacheKey, name: str) -> None:
+        if name in cls._refreshing:
+            return
+        cls._refreshing.add(name)
+
+        async def _refresh():
+            try:
+                await _extend_remote(name, cls.TTL_SECONDS)
+                if cls._cache.get(key, (None,))[0] == name:
+                    cls._cache[key] = (name, time.monotonic() + cls.TTL_SECONDS - cls.REFRESH_SECONDS / 2)
+                cls._stats["refreshed"] += 1
+            except Exception as e:
+                cls._stats["refresh_errors"] += 1
+                logger.warning(f"[GEMINI_CONTEXT_CACHE] TTL refresh failed for {name}: {type(e).__name__}: {e}")
+                if cls._cache.get(key, (None,))[0] == name:
+                    cls._cache.pop(key, None)
+            finally:
+                cls._refreshing.discard(name)
+
+        asyncio.create_task(_refresh())
+
+    @classmethod
+    def _store(cls, key: CacheKey, name: Optional[str], ttl_seconds: float) -> None:
+        cls._cache[key] = (name, time.monotonic() + ttl_seconds)
+        cls._cache.move_to_end(key)
+        while len(cls._cache) > cls.MAX_ENTRIES:
+            _, (evicted, _) = cls._cache.popitem(last=False)
+            cls._stats["evicted"] += 1
+            cls._delete_in_background(evicted)
+
+    @staticmethod
+    def _delete_in_background(name: Optional[str]) -> None:
+        if name is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        async def _delete():
+            try:
+                await _delete_remote(name)
+            except Exception as e:
+                logger.debug(f"[GEMINI_CONTEXT_CACHE] delete of {name} failed: {e}")
+
+        loop.create_task(_delete())
+
+    @classmethod
+    def invalidate(cls, model: Optional[str] = None, system_prompt: Optional[str] = None) -> int:
+        """Drop the entry of (model, system_prompt), every entry of `model`, or everything. Returns how many.
+
+        Called by the text callers when Gemini no longer recognizes a cached name.
+        """
+        if model is not None and system_prompt is not None:
+            keys = [cls._key(model, system_prompt)]
+        else:
+            keys = [key for key in cls._cache if model is None or key[0] == model]
+        removed = 0
+        for key in keys:
+            entry = cls._cache.pop(key, None)
+            if entry is not None:
+                removed += 1
+                cls._delete_in_background(entry[0])
+        cls._stats["invalidated"] += removed
+        return removed
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
+        cls._inflight.clear()
+        cls._refreshing.clear()
+        for key in cls._stats:
+            cls._stats[key] = 0
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            **cls._stats,
+            "enabled": cls.ENABLED,
+            "entries": sum(1 for name, _ in cls._cache.values() if name is not None),
+            "cooling_down": sum(1 for name, _ in cls._cache.values() if name is None),
+            "inflight": len(cls._inflight),
+            "min_chars": cls.MIN_CHARS,
+        }
+
+
+async def with_system_prompt(payload: Dict[str, Any], model: str, system_prompt: str) -> Dict[str, Any]:
+    """Set the system prompt of a `generateContent` payload: a cached reference when
+    available, inline `systemInstruction` otherwise. Returns the payload."""
+    name = await GeminiContextCache.get(model, system_prompt)
+    if name:
+        payload.pop("systemInstruction", None)
+        payload["cachedContent"] = name
+    else:
+        inline_system_prompt(payload, system_prompt)
+    return payload
+
+
+def inline_system_prompt(payload: Dict[str, Any], system_prompt: str) -> Dict[str, Any]:
+    payload.pop("cachedContent", None)
+    payload["systemInstruction"] = {"role": "system", "parts": [{"text": system_prompt}]}
+    return payload
+
+
+def is_stale_cache_error(status: Optional[int], body: Optional[str]) -> bool:
+    """True if a `generateContent` error means the referenced cachedContent is gone."""
+    return status in (400, 403, 404) and "cachedcontent" in (body or "").lower().replace(" ", "")
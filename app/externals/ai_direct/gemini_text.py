@@ -13,7 +13,6 @@ Designed to be provider-agnostic at the call site: the caller passes provider na
 added in this module (`anthropic_text.py`, `openai_text.py`) with the same shape.
 """
 
-import asyncio
 import json
 import logging
 from typing import Any, Dict, Optional, Tuple
@@ -21,33 +20,44 @@ from typing import Any, Dict, Optional, Tuple
 import aiohttp
 
 from app.configurations.config import GOOGLE_GEMINI_API_KEY
+from app.externals.ai_direct.gemini_context_cache import (
+    GeminiContextCache,
+    inline_system_prompt,
+    is_stale_cache_error,
+    with_system_prompt,
+)
+from app.externals.http_clients import close_aiohttp_session, get_aiohttp_session
+from app.helpers.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from app.helpers.retry import RetryPolicy, before_retry
 
 logger = logging.getLogger(__name__)
 
-# Shared session for Gemini API calls (reuses TCP connections, mismo patrón
-# que image_client._gemini_session).
-_gemini_text_session: Optional[aiohttp.ClientSession] = None
+# Shared session for Gemini API calls (reuses TCP connections). Vive en el
+# registry de app.externals.http_clients, así el lifespan la cierra y aparece
+# en las métricas de pools.
+_SESSION_NAME = "gemini_text"
 
 
 async def _get_session() -> aiohttp.ClientSession:
-    global _gemini_text_session
-    if _gemini_text_session is None or _gemini_text_session.closed:
-        _gemini_text_session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=600),
-            connector=aiohttp.TCPConnector(limit=10),
-        )
-    return _gemini_text_session
+    return get_aiohttp_session(_SESSION_NAME, total_timeout=600, limit=10)
 
 
 async def close_session() -> None:
     """Cierra la sesión compartida. Útil para scripts standalone (en el server
-    FastAPI no hace falta porque la sesión persiste durante toda la vida del
-    proceso). En producción se puede llamar desde un shutdown handler si se
-    quiere ser estricto con el cleanup."""
-    global _gemini_text_session
-    if _gemini_text_session is not None and not _gemini_text_session.closed:
-        await _gemini_text_session.close()
-        _gemini_text_session = None
+    FastAPI la cierra `close_http_clients()` en el shutdown del lifespan)."""
+    await close_aiohttp_session(_SESSION_NAME)
+
+
+# Structured: 3 attempts, backoff corto con jitter (~300ms, ~900ms). Mucho más
+# eficiente que los 5 intentos × 5s del image_client viejo, que rescataban menos
+# del 5% según la telemetría real (prompt_logs).
+STRUCTURED_RETRY_POLICY = RetryPolicy(
+    max_attempts=3, base_delay=0.3, multiplier=3, max_delay=2.7, min_attempt_seconds=5
+)
+# Freeform (HTML): 5 attempts, 2-3 right away, then backoff from 5s.
+FREEFORM_RETRY_POLICY = RetryPolicy.after_attempts(
+    max_attempts=5, delay_after=3, delay_seconds=5, min_attempt_seconds=5
+)
 
 
 class GeminiTextError(Exception):
@@ -59,6 +69,16 @@ class GeminiTextError(Exception):
         self.raw = raw
 
 
+def _check_circuit(model: str, last_error: Optional[Exception]) -> CircuitBreaker:
+    """Breaker compartido de (gemini, model). Si está abierto no gastamos los reintentos:
+    fallamos ya con 503 para que el caller vaya a su fallback o devuelva el error."""
+    breaker = CircuitBreakerRegistry.get("gemini", model)
+    if not breaker.allow():
+        detail = f" Last error: {last_error}" if last_error else ""
+        raise GeminiTextError(f"Gemini circuit open for model={model}.{detail}", status=503)
+    return breaker
+
+
 async def call_gemini_structured(
     *,
     model: str,
@@ -115,27 +135,29 @@ async def call_gemini_structured(
         generation_config["thinkingConfig"] = {"thinkingLevel": thinking_level}
 
     payload: Dict[str, Any] = {
-        "systemInstruction": {"role": "system", "parts": [{"text": system_prompt}]},
         "contents": [{"role": "user", "parts": [{"text": user_message}]}],
         "generationConfig": generation_config,
     }
+    # Los system prompts grandes (director de video, análisis de funnel) van como
+    # cachedContent en vez de reenviarse completos en cada llamada.
+    await with_system_prompt(payload, model, system_prompt)
 
     headers = {"Content-Type": "application/json"}
 
-    # Retry policy: 3 attempts, jitter exponencial corto (300ms, 900ms, 2.7s).
-    # Mucho más eficiente que los 5 intentos × 5s del image_client viejo, que
-    # rescataban menos del 5% según la telemetría real (prompt_logs).
-    max_attempts = 3
+    max_attempts = STRUCTURED_RETRY_POLICY.max_attempts
     last_error: Optional[Exception] = None
     last_status: Optional[int] = None
     last_body: Optional[str] = None
 
-    for attempt in range(1, max_attempts + 1):
+    attempt = 1
+    inline_retry = False
+    while attempt <= max_attempts:
+        if attempt > 1 and not inline_retry and not await before_retry(STRUCTURED_RETRY_POLICY, attempt, last_error):
+            logger.warning("[GEMINI_TEXT] no time left for attempt %d/%d", attempt, max_attempts)
+            break
+        inline_retry = False
+        breaker = _check_circuit(model, last_error)
         try:
-            if attempt > 1:
-                delay = 0.3 * (3 ** (attempt - 2))
-                await asyncio.sleep(delay)
-
             session = await _get_session()
             async with session.post(url, headers=headers, json=payload) as response:
                 last_status = response.status
@@ -207,18 +229,30 @@ async def call_gemini_structured(
                     )
 
                 logger.info(
-                    "[GEMINI_TEXT] OK model=%s attempt=%d/%d finish=%s tokens_in=%s tokens_out=%s",
+                    "[GEMINI_TEXT] OK model=%s attempt=%d/%d finish=%s tokens_in=%s tokens_out=%s tokens_cached=%s",
                     model,
                     attempt,
                     max_attempts,
                     finish_reason,
                     data.get("usageMetadata", {}).get("promptTokenCount"),
                     data.get("usageMetadata", {}).get("candidatesTokenCount"),
+                    data.get("usageMetadata", {}).get("cachedContentTokenCount"),
                 )
+                breaker.record_success()
                 return parsed, data
 
         except GeminiTextError as e:
+            if "cachedContent" in payload and is_stale_cache_error(e.status, e.raw):
+                # El cachedContent ya no existe en Gemini: es estado nuestro, no una falla
+                # del modelo. Reintentar ya con el prompt inline, sin contar el intento.
+                logger.info("[GEMINI_TEXT] cachedContent expired, retrying inline (status=%s)", e.status)
+                breaker.release()
+                GeminiContextCache.invalidate(model, system_prompt)
+                inline_system_prompt(payload, system_prompt)
+                inline_retry = True
+                continue
             last_error = e
+            breaker.record_failure(e)
             logger.warning(
                 "[GEMINI_TEXT] attempt %d/%d failed (status=%s): %s",
                 attempt,
@@ -231,12 +265,14 @@ async def call_gemini_structured(
                 raise
         except Exception as e:
             last_error = e
+            breaker.record_failure(e)
             logger.warning(
                 "[GEMINI_TEXT] attempt %d/%d unexpected error: %s",
                 attempt,
                 max_attempts,
                 str(e)[:300],
             )
+        attempt += 1
 
     # Después de todos los intentos.
     raise GeminiTextError(
@@ -312,24 +348,27 @@ async def call_gemini_freeform(
         generation_config["thinkingConfig"] = {"thinkingLevel": thinking_level}
 
     payload: Dict[str, Any] = {
-        "systemInstruction": {"role": "system", "parts": [{"text": system_prompt}]},
         "contents": contents,
         "generationConfig": generation_config,
     }
+    await with_system_prompt(payload, model, system_prompt)
 
     headers = {"Content-Type": "application/json"}
 
-    max_attempts = 5
-    delay_after = 3
+    max_attempts = FREEFORM_RETRY_POLICY.max_attempts
     last_error: Optional[Exception] = None
     last_status: Optional[int] = None
     last_body: Optional[str] = None
 
-    for attempt in range(1, max_attempts + 1):
+    attempt = 1
+    inline_retry = False
+    while attempt <= max_attempts:
+        if attempt > 1 and not inline_retry and not await before_retry(FREEFORM_RETRY_POLICY, attempt, last_error):
+            logger.warning("[GEMINI_FREEFORM] no time left for attempt %d/%d", attempt, max_attempts)
+            break
+        inline_retry = False
+        breaker = _check_circuit(model, last_error)
         try:
-            if attempt > delay_after:
-                await asyncio.sleep(5)
-
             session = await _get_session()
             async with session.post(url, headers=headers, json=payload) as response:
                 last_status = response.status
@@ -369,17 +408,29 @@ async def call_gemini_freeform(
 
                 result = "\n".join(text_parts)
                 logger.info(
-                    "[GEMINI_FREEFORM] OK model=%s attempt=%d/%d tokens_in=%s tokens_out=%s",
+                    "[GEMINI_FREEFORM] OK model=%s attempt=%d/%d tokens_in=%s tokens_out=%s tokens_cached=%s",
                     model,
                     attempt,
                     max_attempts,
                     data.get("usageMetadata", {}).get("promptTokenCount"),
                     data.get("usageMetadata", {}).get("candidatesTokenCount"),
+                    data.get("usageMetadata", {}).get("cachedContentTokenCount"),
                 )
+                breaker.record_success()
                 return result
 
         except GeminiTextError as e:
+            if "cachedContent" in payload and is_stale_cache_error(e.status, e.raw):
+                # El cachedContent ya no existe en Gemini: es estado nuestro, no una falla
+                # del modelo. Reintentar ya con el prompt inline, sin contar el intento.
+                logger.info("[GEMINI_FREEFORM] cachedContent expired, retrying inline (status=%s)", e.status)
+                breaker.release()
+                GeminiContextCache.invalidate(model, system_prompt)
+                inline_system_prompt(payload, system_prompt)
+                inline_retry = True
+                continue
             last_error = e
+            breaker.record_failure(e)
             logger.warning(
                 "[GEMINI_FREEFORM] attempt %d/%d failed (status=%s): %s",
                 attempt,
@@ -391,12 +442,14 @@ async def call_gemini_freeform(
                 raise
         except Exception as e:
             last_error = e
+            breaker.record_failure(e)
             logger.warning(
                 "[GEMINI_FREEFORM] attempt %d/%d unexpected: %s",
                 attempt,
                 max_attempts,
                 str(e)[:300],
             )
+        attempt += 1
 
     raise GeminiTextError(
         f"Gemini freeform call failed after {max_attempts} attempts. Last error: {last_error}",
@@ -15,14 +15,24 @@ Docs:
   https://ai.google.dev/gemini-api/docs/interactions
 """
 
+import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from app.configurations.config import GOOGLE_GEMINI_API_KEY
+from app.configurations.config import GEMINI_STREAM_MAX_THREADS, GOOGLE_GEMINI_API_KEY
 
 logger = logging.getLogger(__name__)
 
+# The SDK's stream iterator is synchronous (blocking httpx SSE reads). Each
+# stream runs on one of these threads so a 30-90s generation never blocks the
+# event loop. Dedicated pool so long streams don't starve `asyncio.to_thread`.
+_stream_executor = ThreadPoolExecutor(max_workers=GEMINI_STREAM_MAX_THREADS, thread_name_prefix="gemini-stream")
+_STREAM_END = object()
+
 
 class GeminiTextV2Error(Exception):
     """Raised when the v2 Gemini call fails after retries."""
@@ -40,7 +50,60 @@ def _get_client():
     return genai.Client()
 
 
-async def call_gemini_freeform_v2(
+async def _aiter_interaction(client, interaction_kwargs: Dict[str, Any]) -> AsyncIterator[Any]:
+    """Run ``client.interactions.create(stream=True)`` on a worker thread and
+    yield its chunks on the event loop as they arrive.
+
+    If the consumer stops early (error, cancellation) the worker is told to
+    stop and closes the stream at the next chunk.
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    stop = threading.Event()
+
+    def _put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed (shutdown mid-stream): nobody is listening.
+            stop.set()
+
+    def _pump() -> None:
+        stream = None
+        try:
+            stream = client.interactions.create(**interaction_kwargs)
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                _put(chunk)
+        except BaseException as e:  # forwarded and re-raised on the loop side
+            _put(e)
+        finally:
+            close = getattr(stream, "close", None)
+            if stop.is_set() and callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+            _put(_STREAM_END)
+
+    worker = loop.run_in_executor(_stream_executor, _pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        if not worker.done():
+            # Don't wait for the thread: it exits on its own at the next chunk.
+            worker.add_done_callback(lambda f: f.exception())
+
+
+async def stream_gemini_freeform_v2(
     *,
     model: str,
     system_prompt: str,
@@ -50,30 +113,14 @@ async def call_gemini_freeform_v2(
     max_output_tokens: int = 32768,
     thinking_level: Optional[str] = None,
     previous_interaction_id: Optional[str] = None,
-) -> Dict[str, Any]:
-    """Free-form text generation via Interactions API with streaming.
+) -> AsyncIterator[Dict[str, Any]]:
+    """Same call as :func:`call_gemini_freeform_v2` but yields as it goes.
 
-    Args:
-        model: Gemini model id (e.g. ``"gemini-3.1-pro-preview"``).
-        system_prompt: System instruction.
-        user_message: The current user turn.
-        conversation_history: Optional list of prior turns (ignored if
-            ``previous_interaction_id`` is provided — server keeps state then).
-            Each item: ``{"role": "user"|"model", "text": "..."}``.
-        temperature: Sampling temperature.
-        max_output_tokens: Output cap.
-        thinking_level: Lowercase string: ``"low"``, ``"medium"``, ``"high"``.
-            For ``gemini-3.1-pro-preview`` only ``"low"`` and ``"high"`` apply
-            (``"high"`` is the default and burns many thought tokens; use
-            ``"low"`` for HTML generation to keep latency down).
-        previous_interaction_id: If set, server resumes the conversation —
-            do NOT also pass ``conversation_history``.
-
-    Returns:
-        ``{"text": str, "interaction_id": str, "usage": dict}``.
+    Yields ``{"type": "delta", "text": str}`` for every text delta and, last,
+    ``{"type": "complete", "interaction_id": str, "usage": dict, "status": str}``.
 
     Raises:
-        GeminiTextV2Error: on failure.
+        GeminiTextV2Error: on failure (including an ``error`` stream event).
     """
     client = _get_client()
 
@@ -115,56 +162,113 @@ async def call_gemini_freeform_v2(
     else:
         interaction_kwargs["input"] = user_message
 
+    interaction_id: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    last_status: Optional[str] = None
     try:
-        stream = client.interactions.create(**interaction_kwargs)
-
-        accumulated_text = ""
-        interaction_id: Optional[str] = None
-        usage: Optional[Dict[str, Any]] = None
-        last_status: Optional[str] = None
-
-        # The SDK's stream iterator is synchronous (yields from httpx SSE).
-        # We iterate it directly — for FastAPI async handlers this is OK for
-        # the current load but can be pushed to a thread if needed later.
-        for chunk in stream:
-            ev = getattr(chunk, "event_type", None)
-            if ev == "content.delta":
-                delta = getattr(chunk, "delta", None)
-                if delta is None:
-                    continue
-                delta_type = getattr(delta, "type", None)
-                if delta_type == "text":
-                    accumulated_text += getattr(delta, "text", "")
-            elif ev == "interaction.complete":
-                final = getattr(chunk, "interaction", None)
-                if final is not None:
-                    interaction_id = getattr(final, "id", None)
-                    usage_obj = getattr(final, "usage", None)
-                    if usage_obj is not None:
-                        # Convert to plain dict for logging.
-                        usage = {
-                            "total_tokens": getattr(usage_obj, "total_tokens", None),
-                            "total_input_tokens": getattr(usage_obj, "total_input_tokens", None),
-                            "total_output_tokens": getattr(usage_obj, "total_output_tokens", None),
-                            "total_thought_tokens": getattr(usage_obj, "total_thought_tokens", None),
-                        }
-                    last_status = getattr(final, "status", None)
-            elif ev == "error":
-                err = getattr(chunk, "error", None)
-                raise GeminiTextV2Error(f"Gemini stream error: {getattr(err, 'message', str(err))}")
-
-        if not accumulated_text:
-            raise GeminiTextV2Error(f"Empty response from Gemini. status={last_status} id={interaction_id}")
-
-        return {
-            "text": accumulated_text,
-            "interaction_id": interaction_id,
-            "usage": usage or {},
-            "status": last_status,
-        }
+        async with aclosing(_aiter_interaction(client, interaction_kwargs)) as chunks:
+            async for chunk in chunks:
+                ev = getattr(chunk, "event_type", None)
+                if ev == "content.delta":
+                    delta = getattr(chunk, "delta", None)
+                    if delta is None:
+                        continue
+                    delta_type = getattr(delta, "type", None)
+                    if delta_type == "text":
+                        text = getattr(delta, "text", "")
+                        if text:
+                            yield {"type": "delta", "text": text}
+                elif ev == "interaction.complete":
+                    final = getattr(chunk, "interaction", None)
+                    if final is not None:
+                        interaction_id = getattr(final, "id", None)
+                        usage_obj = getattr(final, "usage", None)
+                        if usage_obj is not None:
+                            # Convert to plain dict for logging.
+                            usage = {
+                                "total_tokens": getattr(usage_obj, "total_tokens", None),
+                                "total_input_tokens": getattr(usage_obj, "total_input_tokens", None),
+                                "total_output_tokens": getattr(usage_obj, "total_output_tokens", None),
+                                "total_thought_tokens": getattr(usage_obj, "total_thought_tokens", None),
+                            }
+                        last_status = getattr(final, "status", None)
+                elif ev == "error":
+                    err = getattr(chunk, "error", None)
+                    raise GeminiTextV2Error(f"Gemini stream error: {getattr(err, 'message', str(err))}")
 
     except GeminiTextV2Error:
         raise
     except Exception as e:
         logger.exception("Gemini v2 freeform call failed")
         raise GeminiTextV2Error(f"{type(e).__name__}: {e}") from e
+
+    yield {"type": "complete", "interaction_id": interaction_id, "usage": usage or {}, "status": last_status}
+
+
+async def call_gemini_freeform_v2(
+    *,
+    model: str,
+    system_prompt: str,
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    temperature: float = 0.7,
+    max_output_tokens: int = 32768,
+    thinking_level: Optional[str] = None,
+    previous_interaction_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Free-form text generation via Interactions API with streaming.
+
+    Args:
+        model: Gemini model id (e.g. ``"gemini-3.1-pro-preview"``).
+        system_prompt: System instruction.
+        user_message: The current user turn.
+        conversation_history: Optional list of prior turns (ignored if
+            ``previous_interaction_id`` is provided — server keeps state then).
+            Each item: ``{"role": "user"|"model", "text": "..."}``.
+        temperature: Sampling temperature.
+        max_output_tokens: Output cap.
+        thinking_level: Lowercase string: ``"low"``, ``"medium"``, ``"high"``.
+            For ``gemini-3.1-pro-preview`` only ``"low"`` and ``"high"`` apply
+            (``"high"`` is the default and burns many thought tokens; use
+            ``"low"`` for HTML generation to keep latency down).
+        previous_interaction_id: If set, server resumes the conversation —
+            do NOT also pass ``conversation_history``.
+
+    Returns:
+        ``{"text": str, "interaction_id": str, "usage": dict}``.
+
+    Raises:
+        GeminiTextV2Error: on failure.
+    """
+    parts: List[str] = []
+    final: Dict[str, Any] = {}
+    async with aclosing(
+        stream_gemini_freeform_v2(
+            model=model,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            thinking_level=thinking_level,
+            previous_interaction_id=previous_interaction_id,
+        )
+    ) as events:
+        async for event in events:
+            if event["type"] == "delta":
+                parts.append(event["text"])
+            else:
+                final = event
+
+    accumulated_text = "".join(parts)
+    if not accumulated_text:
+        raise GeminiTextV2Error(
+            f"Empty response from Gemini. status={final.get('status')} id={final.get('interaction_id')}"
+        )
+
+    return {
+        "text": accumulated_text,
+        "interaction_id": final.get("interaction_id"),
+        "usage": final.get("usage") or {},
+        "status": final.get("status"),
+    }
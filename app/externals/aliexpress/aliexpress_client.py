@@ -1,8 +1,7 @@
-import httpx
-
 from app.configurations.config import RAPIDAPI_HOST, RAPIDAPI_KEY
 from app.externals.aliexpress.requests.aliexpress_search_request import AliexpressSearchRequest
 from app.externals.aliexpress.responses.aliexpress_search_response import AliexpressSearchResponse
+from app.externals.http_clients import get_http_client
 
 
 async def search_products(data: AliexpressSearchRequest) -> AliexpressSearchResponse:
@@ -13,11 +12,11 @@ async def search_products(data: AliexpressSearchRequest) -> AliexpressSearchResp
 
     params = {"q": data.q, "page": str(data.page), "sort": data.sort}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params, headers=headers)
-        response.raise_for_status()
+    client = get_http_client("rapidapi")
+    response = await client.get(url, params=params, headers=headers)
+    response.raise_for_status()
 
-        return AliexpressSearchResponse(**response.json())
+    return AliexpressSearchResponse(**response.json())
 
 
 async def get_item_detail(item_id: str):
@@ -32,8 +31,8 @@ async def get_item_detail(item_id: str):
 
     params = {"itemId": item_id}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params, headers=headers)
-        response.raise_for_status()
+    client = get_http_client("rapidapi")
+    response = await client.get(url, params=params, headers=headers)
+    response.raise_for_status()
 
-        return response.json()
+    return response.json()
@@ -1,10 +1,9 @@
 from typing import Any, Dict
 
-import httpx
-
 from app.configurations.config import RAPIDAPI_KEY
 from app.externals.amazon.requests.amazon_search_request import AmazonSearchRequest
 from app.externals.amazon.responses.amazon_search_response import AmazonSearchResponse
+from app.externals.http_clients import get_http_client
 
 
 async def search_products(request: AmazonSearchRequest) -> AmazonSearchResponse:
@@ -20,16 +19,14 @@ async def search_products(request: AmazonSearchRequest) -> AmazonSearchResponse:
         "deals_and_discounts": "NONE",
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://real-time-amazon-data.p.rapidapi.com/search", headers=headers, params=params
-        )
+    client = get_http_client("rapidapi")
+    response = await client.get("https://real-time-amazon-data.p.rapidapi.com/search", headers=headers, params=params)
 
-        if response.status_code != 200:
-            raise Exception(f"Error en la llamada a Amazon API: {response.status_code}")
+    if response.status_code != 200:
+        raise Exception(f"Error en la llamada a Amazon API: {response.status_code}")
 
-        raw_response = response.json()
-        return AmazonSearchResponse(raw_response)
+    raw_response = response.json()
+    return AmazonSearchResponse(raw_response)
 
 
 async def get_product_details(asin: str, country: str = "US") -> Dict[str, Any]:
@@ -37,12 +34,12 @@ async def get_product_details(asin: str, country: str = "US") -> Dict[str, Any]:
 
     params = {"asin": asin, "country": country}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://real-time-amazon-data.p.rapidapi.com/product-details", headers=headers, params=params, timeout=30.0
-        )
+    client = get_http_client("rapidapi")
+    response = await client.get(
+        "https://real-time-amazon-data.p.rapidapi.com/product-details", headers=headers, params=params, timeout=30.0
+    )
 
-        if response.status_code != 200:
-            raise Exception(f"Error with call Amazon RapidApi: {response.status_code}")
+    if response.status_code != 200:
+        raise Exception(f"Error with call Amazon RapidApi: {response.status_code}")
 
-        return response.json()
+    return response.json()
@@ -2,9 +2,8 @@ import asyncio
 import logging
 from typing import Dict, Optional
 
-import httpx
-
 from app.configurations.config import API_KEY
+from app.externals.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +18,15 @@ async def post_callback(
 
     for attempt in range(1, max_retries + 1):
         try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers={"x-api-key": key, "Content-Type": "application/json"},
-                )
-                response.raise_for_status()
-                logger.info(f"Callback POST successful to {url} (attempt {attempt})")
-                return
+            client = get_http_client("callback")
+            response = await client.post(
+                url,
+                json=payload,
+                headers={"x-api-key": key, "Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+            logger.info(f"Callback POST successful to {url} (attempt {attempt})")
+            return
         except Exception as e:
             logger.warning(f"Callback POST attempt {attempt}/{max_retries} failed: {type(e).__name__}: {e}")
             if attempt < max_retries:
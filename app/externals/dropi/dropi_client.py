@@ -5,6 +5,7 @@ from typing import Any, Dict
 import httpx
 
 from app.configurations.config import get_dropi_api_key, get_dropi_cookie, get_dropi_host
+from app.externals.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -82,23 +83,23 @@ async def get_product_details(product_id: str, country: str = "co") -> Dict[str,
 
     _log_dropi_request("GET", url, headers)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            return _parse_json_response(response)
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
-                e.response.status_code,
-                str(e.request.url),
-                {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
-                dict(e.response.headers),
-                e.response.text[:500],
-            )
-            raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
-        except httpx.RequestError as e:
-            raise Exception(f"API request failed: {str(e)}")
+    client = get_http_client("dropi")
+    try:
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        return _parse_json_response(response)
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
+            e.response.status_code,
+            str(e.request.url),
+            {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
+            dict(e.response.headers),
+            e.response.text[:500],
+        )
+        raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
+    except httpx.RequestError as e:
+        raise Exception(f"API request failed: {str(e)}")
 
 
 async def get_departments(country: str = "co") -> Dict[str, Any]:
@@ -108,23 +109,23 @@ async def get_departments(country: str = "co") -> Dict[str, Any]:
     dropi_host = get_dropi_host(country)
     url = f"{dropi_host}/integrations/department"
     _log_dropi_request("GET", url, headers)
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            return _parse_json_response(response)
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
-                e.response.status_code,
-                str(e.request.url),
-                {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
-                dict(e.response.headers),
-                e.response.text[:500],
-            )
-            raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
-        except httpx.RequestError as e:
-            raise Exception(f"API request failed: {str(e)}")
+    client = get_http_client("dropi")
+    try:
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        return _parse_json_response(response)
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
+            e.response.status_code,
+            str(e.request.url),
+            {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
+            dict(e.response.headers),
+            e.response.text[:500],
+        )
+        raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
+    except httpx.RequestError as e:
+        raise Exception(f"API request failed: {str(e)}")
 
 
 async def get_cities_by_department(department_id: int, rate_type: str, country: str = "co") -> Dict[str, Any]:
@@ -135,27 +136,27 @@ async def get_cities_by_department(department_id: int, rate_type: str, country:
     dropi_host = get_dropi_host(country)
     url = f"{dropi_host}/integrations/trajectory/bycity"
     _log_dropi_request("POST", url, headers, payload)
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return _parse_json_response(response)
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
-                e.response.status_code,
-                str(e.request.url),
-                {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
-                dict(e.response.headers),
-                e.response.text[:500],
-            )
-            raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
-        except httpx.RequestError as e:
-            logger.error(
-                "Dropi API request error for department_id=%s country=%s: %s (%s)",
-                department_id,
-                country_normalized,
-                str(e),
-                type(e).__name__,
-            )
-            raise Exception(f"API request failed: {type(e).__name__}: {str(e)}")
+    client = get_http_client("dropi")
+    try:
+        response = await client.post(url, headers=headers, json=payload, timeout=60.0)
+        response.raise_for_status()
+        return _parse_json_response(response)
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            "Dropi API error: status=%s url=%s request_headers=%s response_headers=%s body=%s",
+            e.response.status_code,
+            str(e.request.url),
+            {k: _mask(v) if k.lower() in ("cookie", "dropi-integration-key") else v for k, v in headers.items()},
+            dict(e.response.headers),
+            e.response.text[:500],
+        )
+        raise Exception(f"API request failed with status {e.response.status_code}: {e.response.text}")
+    except httpx.RequestError as e:
+        logger.error(
+            "Dropi API request error for department_id=%s country=%s: %s (%s)",
+            department_id,
+            country_normalized,
+            str(e),
+            type(e).__name__,
+        )
+        raise Exception(f"API request failed: {type(e).__name__}: {str(e)}")
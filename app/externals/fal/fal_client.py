@@ -1,9 +1,8 @@
 import urllib.parse
 from typing import Any, Dict, Optional
 
-import httpx
-
 from app.configurations.config import FAL_AI_API_KEY
+from app.externals.http_clients import get_http_client
 
 
 class FalClient:
@@ -26,10 +25,10 @@ class FalClient:
             "Content-Type": "application/json",
         }
 
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client("fal")
+        response = await client.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
 
     async def tts_multilingual_v2(self, text: str, fal_webhook: Optional[str] = None, **kwargs) -> Dict[str, Any]:
         payload = {"text": text}
@@ -0,0 +1,227 @@
+"""Process-wide registry of pooled HTTP clients, one per upstream.
+
+Most clients in ``app/externals`` used to open a fresh ``httpx.AsyncClient``
+on every call, so each request to agent-config, the S3 upload lambda, Dropi,
+RapidAPI, FAL, the callback receivers or the auth service paid a full
+TCP + TLS handshake. This module hands out one long-lived client per upstream
+so keep-alive connections are reused across requests.
+
+Lifecycle mirrors ``app.db.audit_logger``: ``init_http_clients()`` and
+``close_http_clients()`` are wired into ``main.lifespan``. Clients are also
+created lazily on first use (same pattern as ``image_client._get_gemini_session``)
+so standalone scripts and tests that never run the lifespan keep working.
+
+Behavior:
+- HTTP/2 is negotiated when the ``h2`` package is installed and
+  ``HTTP2_ENABLED`` is not turned off; otherwise clients speak HTTP/1.1.
+- Pool sizes and keep-alive expiry come from ``HTTP_POOL_*`` env vars.
+- Per-host counters (requests, errors, in-flight, latency to response headers)
+  are kept for every client and exposed via ``get_pool_metrics()``.
+"""
+
+import importlib.util
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+import aiohttp
+import httpx
+
+from app.configurations.config import (
+    HTTP2_ENABLED,
+    HTTP_POOL_KEEPALIVE_EXPIRY,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Default timeout per upstream. Individual calls can still override it with
+# `timeout=` on the request (httpx supports per-request timeouts).
+UPSTREAM_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    "agent_config": httpx.Timeout(timeout=60.0, connect=30.0),
+    "s3_upload": httpx.Timeout(timeout=180.0, connect=60.0),
+    "dropi": httpx.Timeout(timeout=5.0),
+    "rapidapi": httpx.Timeout(timeout=5.0),
+    "fal": httpx.Timeout(timeout=60.0),
+    "callback": httpx.Timeout(timeout=30.0),
+    "auth": httpx.Timeout(timeout=3.0),
+    # Agent tools (BaseRequestor); each call also passes the tool's own timeout.
+    "tools": httpx.Timeout(timeout=15.0),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(timeout=60.0)
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+_host_stats: Dict[str, Dict[str, Any]] = defaultdict(
+    lambda: {"requests": 0, "errors": 0, "in_flight": 0, "total_ms": 0.0, "max_ms": 0.0}
+)
+
+
+def _record_start(host: str) -> float:
+    _host_stats[host]["in_flight"] += 1
+    return time.monotonic()
+
+
+def _record_end(host: str, t_start: float, failed: bool) -> None:
+    stats = _host_stats[host]
+    elapsed_ms = (time.monotonic() - t_start) * 1000
+    stats["in_flight"] -= 1
+    stats["requests"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    if failed:
+        stats["errors"] += 1
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport to keep per-host request counters."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        t_start = _record_start(host)
+        failed = True
+        try:
+            response = await self._transport.handle_async_request(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            _record_end(host, t_start, failed)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    )
+    http2 = HTTP2_ENABLED and _HTTP2_AVAILABLE
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    return httpx.AsyncClient(
+        timeout=UPSTREAM_TIMEOUTS.get(name, DEFAULT_TIMEOUT),
+        transport=_MeteredTransport(transport),
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Return the shared httpx client for `name`, creating it on first use.
+
+    Callers must NOT use the returned client as a context manager — closing
+    it would drop the pool for every other request.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def _on_aiohttp_request_start(session, ctx, params) -> None:
+    ctx.host = params.url.host
+    ctx.t_start = _record_start(ctx.host)
+
+
+async def _on_aiohttp_request_end(session, ctx, params) -> None:
+    _record_end(ctx.host, ctx.t_start, failed=params.response.status >= 500)
+
+
+async def _on_aiohttp_request_exception(session, ctx, params) -> None:
+    _record_end(ctx.host, ctx.t_start, failed=True)
+
+
+def _build_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_aiohttp_request_start)
+    trace_config.on_request_end.append(_on_aiohttp_request_end)
+    trace_config.on_request_exception.append(_on_aiohttp_request_exception)
+    return trace_config
+
+
+def get_aiohttp_session(name: str, total_timeout: float = 120, limit: int = 20) -> aiohttp.ClientSession:
+    """Return the shared aiohttp session for `name`, creating it on first use.
+
+    Used by the direct Gemini callers, which need aiohttp for large payloads.
+    `total_timeout` and `limit` only apply when the session is (re)created.
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=total_timeout),
+            connector=aiohttp.TCPConnector(limit=limit, keepalive_timeout=HTTP_POOL_KEEPALIVE_EXPIRY),
+            trace_configs=[_build_trace_config()],
+        )
+        _sessions[name] = session
+    return session
+
+
+async def close_aiohttp_session(name: str) -> None:
+    """Close a single shared aiohttp session (standalone scripts)."""
+    session = _sessions.pop(name, None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def init_http_clients() -> None:
+    """Eagerly create the httpx clients so the first request doesn't pay setup."""
+    for name in UPSTREAM_TIMEOUTS:
+        get_http_client(name)
+    logger.info(
+        "[HTTP] %d pooled clients ready (http2=%s max_connections=%d keepalive=%d)",
+        len(_clients),
+        HTTP2_ENABLED and _HTTP2_AVAILABLE,
+        HTTP_POOL_MAX_CONNECTIONS,
+        HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+async def close_http_clients() -> None:
+    """Close every pooled client and session. Safe to call more than once."""
+    for name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("[HTTP] failed to close client %s: %s", name, e)
+    _clients.clear()
+
+    for name, session in list(_sessions.items()):
+        try:
+            if not session.closed:
+                await session.close()
+        except Exception as e:
+            logger.warning("[HTTP] failed to close session %s: %s", name, e)
+    _sessions.clear()
+
+
+def get_pool_metrics(host: Optional[str] = None) -> Dict[str, Any]:
+    """Snapshot of per-host counters plus the pool configuration."""
+    hosts = {}
+    for name, stats in _host_stats.items():
+        if host and name != host:
+            continue
+        requests = stats["requests"]
+        hosts[name] = {
+            **stats,
+            "total_ms": round(stats["total_ms"], 1),
+            "max_ms": round(stats["max_ms"], 1),
+            "avg_ms": round(stats["total_ms"] / requests, 1) if requests else 0.0,
+        }
+    return {
+        "http2": HTTP2_ENABLED and _HTTP2_AVAILABLE,
+        "limits": {
+            "max_connections": HTTP_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": HTTP_POOL_KEEPALIVE_EXPIRY,
+        },
+        "clients": sorted(name for name, c in _clients.items() if not c.is_closed),
+        "sessions": sorted(name for name, s in _sessions.items() if not s.closed),
+        "hosts": hosts,
+    }
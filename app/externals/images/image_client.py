@@ -1,5 +1,6 @@
 import asyncio
 import base64
+import json
 import mimetypes
 import os
 from typing import Optional
@@ -9,19 +10,38 @@ import httpx
 
 from app.configurations import config
 from app.configurations.config import GOOGLE_GEMINI_API_KEY, OPENAI_API_KEY, REPLICATE_API_KEY
+from app.externals.http_clients import get_aiohttp_session
+from app.externals.images.reference_image_cache import ReferenceImageCache
+from app.helpers.retry import ProviderHTTPError, parse_retry_after
 
-# Shared session for Gemini API calls (reuses TCP connections)
-_gemini_session: Optional[aiohttp.ClientSession] = None
+GEMINI_IMAGE_DEFAULT_MODEL = "gemini-3-pro-image-preview"
+SECTION_IMAGE_DEFAULT_MODEL = "gemini-3.1-flash-image-preview"
+OPENAI_IMAGE_DEFAULT_MODEL = "gpt-image-1"
 
 
+def resolve_image_model(provider: Optional[str], model_ia: Optional[str] = None, default: Optional[str] = None) -> str:
+    """Model the image clients actually call for `model_ia`. Callers key their circuit breakers and
+    limiters on it, not on the agent's configured model.
+
+    Gemini: `model_ia` only if it's an image model. This preserves backward compat: existing agents
+    with text model names (e.g. "gemini-2.5-pro") keep using `default`.
+    """
+    if (provider or "").lower() == "openai":
+        return model_ia or OPENAI_IMAGE_DEFAULT_MODEL
+    if model_ia and "image" in model_ia.lower():
+        return model_ia
+    return default or GEMINI_IMAGE_DEFAULT_MODEL
+
+
+def section_image_model(model_ia: Optional[str] = None) -> str:
+    """Model called by google_image_with_text (default: SECTION_IMAGE_MODEL)."""
+    return resolve_image_model("gemini", model_ia, os.environ.get("SECTION_IMAGE_MODEL", SECTION_IMAGE_DEFAULT_MODEL))
+
+
+# Shared session for Gemini API calls (reuses TCP connections, owned by the
+# pooled registry so it is closed on shutdown)
 async def _get_gemini_session() -> aiohttp.ClientSession:
-    global _gemini_session
-    if _gemini_session is None or _gemini_session.closed:
-        _gemini_session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=120),
-            connector=aiohttp.TCPConnector(limit=20),
-        )
-    return _gemini_session
+    return get_aiohttp_session("gemini_image", total_timeout=120, limit=20)
 
 
 async def generate_image_variation(
@@ -74,36 +94,35 @@ async def generate_image_variation(
                 raise Exception(f"Error {response.status}: {await response.text()}")
 
 
+async def _read_json(response: aiohttp.ClientResponse) -> dict:
+    """Like response.json() without caching the raw body on the response.
+
+    Image responses carry a multi-MB base64 string; response.json() keeps the
+    body bytes, the decoded text and the parsed dict alive together. Reading the
+    stream directly leaves only the parsed dict once this returns.
+    """
+    return json.loads(await response.content.read())
+
+
 def _build_image_part(image_base64: str, is_model_25: bool) -> dict:
     if is_model_25:
         return {"inlineData": {"mimeType": "image/jpeg", "data": image_base64}}
     return {"inline_data": {"mime_type": "image/jpeg", "data": image_base64}}
 
 
-async def _fetch_and_encode_images(
-    image_urls: list[str], is_model_25: bool, session: Optional[aiohttp.ClientSession] = None
-) -> list[dict]:
-    async def _fetch_one(fetch_session: aiohttp.ClientSession, image_url: str) -> Optional[dict]:
+async def _fetch_and_encode_images(image_urls: list[str], is_model_25: bool) -> list[dict]:
+    async def _fetch_one(image_url: str) -> Optional[dict]:
         try:
-            async with fetch_session.get(image_url) as img_response:
-                if img_response.status == 200:
-                    image_bytes = await img_response.read()
-                    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-                    del image_bytes  # Free raw bytes; only base64 string needed
-                    return _build_image_part(image_base64, is_model_25)
+            image_base64 = await ReferenceImageCache.get_base64(image_url)
+            if image_base64 is not None:
+                return _build_image_part(image_base64, is_model_25)
         except Exception as e:
             print(f"Error al procesar imagen de {image_url}: {type(e).__name__}: {str(e) or repr(e)}")
         return None
 
-    if session:
-        # Use shared session, download in parallel
-        results = await asyncio.gather(*[_fetch_one(session, url) for url in image_urls])
-        return [r for r in results if r is not None]
-    else:
-        # Legacy: create new session (keeps google_image() unchanged)
-        async with aiohttp.ClientSession() as fetch_session:
-            results = await asyncio.gather(*[_fetch_one(fetch_session, url) for url in image_urls])
-            return [r for r in results if r is not None]
+    # Download in parallel; repeated URLs (variations, retries, sub-images) come from the cache.
+    results = await asyncio.gather(*[_fetch_one(url) for url in image_urls])
+    return [r for r in results if r is not None]
 
 
 def _build_generation_config(is_model_25: bool, aspect_ratio: str, image_size: str) -> dict:
@@ -119,13 +138,7 @@ async def google_image(
     if extra_params is None:
         extra_params = {}
 
-    # Use configured model if it's an image model, otherwise default
-    # This preserves backward compat: existing agents with text model names
-    # (e.g. "gemini-2.5-pro") will keep using the current default
-    if model_ia and "image" in model_ia.lower():
-        model_name = model_ia
-    else:
-        model_name = "gemini-3-pro-image-preview"
+    model_name = resolve_image_model("gemini", model_ia)
 
     is_model_25 = "2.5" in model_name
     aspect_ratio = extra_params.get("aspect_ratio", "1:1")
@@ -149,7 +162,7 @@ async def google_image(
         session = await _get_gemini_session()
         async with session.post(url, headers=headers, json=payload) as response:
             if response.status == 200:
-                data = await response.json()
+                data = await _read_json(response)
                 parts = data["candidates"][0]["content"]["parts"]
 
                 for part in parts:
@@ -175,11 +188,7 @@ async def google_image_with_text(
     if extra_params is None:
         extra_params = {}
 
-    default_model = os.environ.get("SECTION_IMAGE_MODEL", "gemini-3.1-flash-image-preview")
-    if model_ia and "image" in model_ia.lower():
-        model_name = model_ia
-    else:
-        model_name = default_model
+    model_name = section_image_model(model_ia)
 
     is_model_25 = "2.5" in model_name
     is_flash = "flash" in model_name
@@ -190,8 +199,7 @@ async def google_image_with_text(
     parts = [{"text": prompt}]
 
     if image_urls:
-        session = await _get_gemini_session()
-        image_parts = await _fetch_and_encode_images(image_urls, is_model_25, session=session)
+        image_parts = await _fetch_and_encode_images(image_urls, is_model_25)
         parts.extend(image_parts)
 
     gen_config = _build_generation_config(is_model_25, aspect_ratio, image_size)
@@ -210,13 +218,21 @@ async def google_image_with_text(
         async with session.post(url, headers=headers, json=payload) as response:
             if response.status == 429:
                 error_text = await response.text()
-                raise Exception(f"Gemini rate limit (429): {error_text[:300]}")
+                raise ProviderHTTPError(
+                    f"Gemini rate limit (429): {error_text[:300]}",
+                    status=429,
+                    retry_after=parse_retry_after(response.headers, error_text),
+                )
 
             if response.status != 200:
                 error_text = await response.text()
-                raise Exception(f"Gemini HTTP {response.status}: {error_text[:300]}")
+                raise ProviderHTTPError(
+                    f"Gemini HTTP {response.status}: {error_text[:300]}",
+                    status=response.status,
+                    retry_after=parse_retry_after(response.headers, error_text),
+                )
 
-            data = await response.json()
+            data = await _read_json(response)
             candidates = data.get("candidates", [])
 
             if not candidates:
@@ -278,14 +294,14 @@ async def openai_image_edit(
 
     data.add_field("size", size)
     data.add_field("prompt", prompt)
-    data.add_field("model", model_ia or "gpt-image-1")
+    data.add_field("model", resolve_image_model("openai", model_ia))
     data.add_field("n", "1")
 
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post(url, headers=headers, data=data) as response:
                 if response.status == 200:
-                    result = await response.json()
+                    result = await _read_json(response)
                     if "data" in result and len(result["data"]) > 0 and "b64_json" in result["data"][0]:
                         b64_image = result["data"][0]["b64_json"]
                         image_bytes = base64.b64decode(b64_image)
@@ -0,0 +1,270 @@
+"""
+Process-local cache of reference images sent inline to Gemini.
+
+`image_client._fetch_and_encode_images` downloads and base64-encodes the same
+product photos for every variation, every sub-image and every retry
+(`SubImageService` fans one `ref_urls` list out to N parallel jobs, each with
+up to 5 attempts). This cache sits in front of that download:
+
+- Memory tier: LRU keyed by URL holding the already base64-encoded body,
+  bounded by total size (`MAX_BYTES`). Entries are content-addressed by the
+  sha256 of the image, so two URLs serving the same file share one string.
+- Fresh for `TTL_SECONDS`; after that the entry is revalidated with
+  `If-None-Match` when the origin sent an ETag (304 keeps the cached body).
+- Single-flight: concurrent misses for the same URL share one download.
+- Optional disk tier (`DISK_DIR`): blobs stored by sha256 plus a small index
+  per URL, so a restarted process revalidates instead of re-downloading.
+  Bounded by `DISK_MAX_BYTES`: after each new blob the least recently used
+  blobs (and the URL indexes pointing at them) are removed.
+- Failed downloads are never cached.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.configurations.config import (
+    IMAGE_REF_CACHE_DIR,
+    IMAGE_REF_CACHE_DISK_MAX_BYTES,
+    IMAGE_REF_CACHE_MAX_BYTES,
+    IMAGE_REF_CACHE_TTL_SECONDS,
+)
+from app.externals.http_clients import get_aiohttp_session
+
+logger = logging.getLogger(__name__)
+
+
+class CachedImage(NamedTuple):
+    image_base64: str
+    digest: str
+    etag: Optional[str]
+    fetched_at: float
+
+
+class ReferenceImageCache:
+    TTL_SECONDS: float = IMAGE_REF_CACHE_TTL_SECONDS
+    MAX_BYTES: int = IMAGE_REF_CACHE_MAX_BYTES
+    DISK_DIR: Optional[str] = IMAGE_REF_CACHE_DIR or None
+    DISK_MAX_BYTES: int = IMAGE_REF_CACHE_DISK_MAX_BYTES
+
+    _cache: "OrderedDict[str, CachedImage]" = OrderedDict()
+    # digest -> (base64 string, number of URLs pointing at it)
+    _blobs: Dict[str, list] = {}
+    _bytes: int = 0
+    _inflight: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+    _stats: Dict[str, int] = {
+        "hits": 0,
+        "disk_hits": 0,
+        "revalidated": 0,
+        "misses": 0,
+        "coalesced": 0,
+        "disk_evictions": 0,
+    }
+
+    @classmethod
+    async def get_base64(cls, url: str) -> Optional[str]:
+        """Base64 body of `url`, or None if it can't be downloaded (same contract as before)."""
+        entry = cls._cache.get(url)
+        if entry is not None and time.time() - entry.fetched_at < cls.TTL_SECONDS:
+            cls._stats["hits"] += 1
+            cls._cache.move_to_end(url)
+            return entry.image_base64
+
+        task = cls._inflight.get(url)
+        if task is not None:
+            cls._stats["coalesced"] += 1
+        else:
+            task = asyncio.create_task(cls._load(url, entry))
+            cls._inflight[url] = task
+            task.add_done_callback(lambda t: cls._inflight.pop(url, None) if cls._inflight.get(url) is t else None)
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _load(cls, url: str, entry: Optional[CachedImage]) -> Optional[str]:
+        if entry is None and cls.DISK_DIR:
+            entry = await asyncio.to_thread(cls._read_disk, url)
+            if entry is not None and time.time() - entry.fetched_at < cls.TTL_SECONDS:
+                cls._stats["disk_hits"] += 1
+                cls._store(url, entry)
+                return entry.image_base64
+
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        session = get_aiohttp_session("image_fetch", total_timeout=60, limit=20)
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                cls._stats["revalidated"] += 1
+                entry = entry._replace(fetched_at=time.time())
+                cls._store(url, entry)
+                if cls.DISK_DIR:
+                    await asyncio.to_thread(cls._write_index, url, entry)
+                return entry.image_base64
+            if response.status != 200:
+                logger.warning(f"Reference image {url} returned HTTP {response.status}")
+                return None
+            image_bytes = await response.read()
+            etag = response.headers.get("ETag")
+
+        cls._stats["misses"] += 1
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        blob = cls._blobs.get(digest)
+        image_base64 = blob[0] if blob else base64.b64encode(image_bytes).decode("utf-8")
+        entry = CachedImage(image_base64, digest, etag, time.time())
+        cls._store(url, entry)
+        if cls.DISK_DIR:
+            await asyncio.to_thread(cls._write_disk, url, entry, image_bytes)
+        return image_base64
+
+    @classmethod
+    def _store(cls, url: str, entry: CachedImage) -> None:
+        size = len(entry.image_base64)
+        if size > cls.MAX_BYTES:
+            return
+        cls._drop(url)
+        blob = cls._blobs.get(entry.digest)
+        if blob is None:
+            cls._blobs[entry.digest] = [entry.image_base64, 1]
+            cls._bytes += size
+        else:
+            blob[1] += 1
+            entry = entry._replace(image_base64=blob[0])
+        cls._cache[url] = entry
+        while cls._bytes > cls.MAX_BYTES and cls._cache:
+            cls._drop(next(iter(cls._cache)))
+
+    @classmethod
+    def _drop(cls, url: str) -> None:
+        entry = cls._cache.pop(url, None)
+        if entry is None:
+            return
+        blob = cls._blobs[entry.digest]
+        blob[1] -= 1
+        if blob[1] == 0:
+            del cls._blobs[entry.digest]
+            cls._bytes -= len(entry.image_base64)
+
+    # -- disk tier (runs in a worker thread) ---------------------------------
+
+    @classmethod
+    def _index_path(cls, url: str) -> str:
+        return os.path.join(cls.DISK_DIR, "urls", hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    @classmethod
+    def _blob_path(cls, digest: str) -> str:
+        return os.path.join(cls.DISK_DIR, "blobs", digest)
+
+    @classmethod
+    def _read_disk(cls, url: str) -> Optional[CachedImage]:
+        try:
+            with open(cls._index_path(url)) as f:
+                index = json.load(f)
+            blob_path = cls._blob_path(index["digest"])
+            with open(blob_path, "rb") as f:
+                image_bytes = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        if hashlib.sha256(image_bytes).hexdigest() != index["digest"]:
+            return None
+        try:
+            # mtime marks recent use for the disk LRU (atime is often off: noatime mounts).
+            os.utime(blob_path)
+        except OSError:
+            pass
+        return CachedImage(
+            base64.b64encode(image_bytes).decode("utf-8"), index["digest"], index.get("etag"), index["fetched_at"]
+        )
+
+    @classmethod
+    def _write_disk(cls, url: str, entry: CachedImage, image_bytes: bytes) -> None:
+        blob_path = cls._blob_path(entry.digest)
+        try:
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(image_bytes)
+                os.replace(tmp_path, blob_path)
+                cls._write_index(url, entry)
+                cls._prune_disk()
+            else:
+                os.utime(blob_path)
+                cls._write_index(url, entry)
+        except OSError as e:
+            logger.warning(f"Reference image disk cache write failed: {e}")
+
+    @classmethod
+    def _prune_disk(cls) -> None:
+        """Remove least recently used blobs until the disk tier fits in DISK_MAX_BYTES."""
+        blobs_dir = os.path.join(cls.DISK_DIR, "blobs")
+        blobs = []
+        total = 0
+        with os.scandir(blobs_dir) as it:
+            for item in it:
+                if item.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                blobs.append((max(st.st_atime, st.st_mtime), item.name, st.st_size))
+                total += st.st_size
+        if total <= cls.DISK_MAX_BYTES:
+            return
+
+        evicted = set()
+        for _, digest, size in sorted(blobs):
+            if total <= cls.DISK_MAX_BYTES:
+                break
+            try:
+                os.remove(cls._blob_path(digest))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted.add(digest)
+        cls._stats["disk_evictions"] += len(evicted)
+
+        urls_dir = os.path.join(cls.DISK_DIR, "urls")
+        with os.scandir(urls_dir) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    with open(item.path) as f:
+                        digest = json.load(f).get("digest")
+                    if digest in evicted:
+                        os.remove(item.path)
+                except (OSError, ValueError, AttributeError):
+                    continue
+
+    @classmethod
+    def _write_index(cls, url: str, entry: CachedImage) -> None:
+        index_path = cls._index_path(url)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"url": url, "digest": entry.digest, "etag": entry.etag, "fetched_at": entry.fetched_at}, f)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning(f"Reference image disk cache write failed: {e}")
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
+        cls._blobs.clear()
+        cls._bytes = 0
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            **cls._stats,
+            "entries": len(cls._cache),
+            "blobs": len(cls._blobs),
+            "bytes": cls._bytes,
+            "inflight": len(cls._inflight),
+        }
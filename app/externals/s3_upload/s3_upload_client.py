@@ -1,31 +1,89 @@
+import base64
+import json
+from typing import AsyncIterator, Tuple
+
 import httpx
 
-from app.configurations.config import S3_UPLOAD_API
+from app.configurations.config import S3_PRESIGN_API, S3_UPLOAD_API
+from app.externals.http_clients import get_http_client
 from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
 from app.externals.s3_upload.responses.s3_upload_response import S3UploadResponse
 
+# Multiple of 3 so each chunk base64-encodes without padding and chunks concatenate.
+_BASE64_CHUNK_BYTES = 3 * 64 * 1024
+
 
 async def upload_file(request: S3UploadRequest) -> S3UploadResponse:
     headers = {"Content-Type": "application/json"}
 
-    timeout = httpx.Timeout(timeout=180.0, connect=60.0)
+    try:
+        client = get_http_client("s3_upload")
+        response = await client.post(S3_UPLOAD_API, headers=headers, json=request.dict())
+        response.raise_for_status()
+        return S3UploadResponse(**response.json())
+    except Exception as e:
+        print(f"Error al cargar archivo a S3: {str(e)}")
+        raise Exception(f"Error al cargar archivo a S3: {str(e)}")
+
+
+async def upload_bytes(data: bytes, folder: str, filename: str, content_type: str = "image/webp") -> S3UploadResponse:
+    """Upload raw bytes without materializing a base64 string or JSON body.
 
+    With ``S3_PRESIGN_API`` configured the bytes are PUT straight to S3 through a
+    presigned URL. Otherwise the JSON body expected by ``S3_UPLOAD_API`` is
+    streamed, base64-encoding the file chunk by chunk.
+    """
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(S3_UPLOAD_API, headers=headers, json=request.dict())
-            response.raise_for_status()
-            return S3UploadResponse(**response.json())
+        client = get_http_client("s3_upload")
+        if S3_PRESIGN_API:
+            return await _upload_presigned(client, data, folder, filename, content_type)
+
+        content_length, body = _json_upload_body(data, folder, filename)
+        headers = {"Content-Type": "application/json", "Content-Length": str(content_length)}
+        response = await client.post(S3_UPLOAD_API, headers=headers, content=body)
+        response.raise_for_status()
+        return S3UploadResponse(**response.json())
     except Exception as e:
         print(f"Error al cargar archivo a S3: {str(e)}")
         raise Exception(f"Error al cargar archivo a S3: {str(e)}")
 
 
+async def _upload_presigned(
+    client: httpx.AsyncClient, data: bytes, folder: str, filename: str, content_type: str
+) -> S3UploadResponse:
+    presign = await client.post(
+        S3_PRESIGN_API, json={"folder": folder, "filename": filename, "content_type": content_type}
+    )
+    presign.raise_for_status()
+    target = presign.json()
+
+    response = await client.put(target["upload_url"], content=data, headers={"Content-Type": content_type})
+    response.raise_for_status()
+    return S3UploadResponse(s3_url=target["s3_url"])
+
+
+def _json_upload_body(data: bytes, folder: str, filename: str) -> Tuple[int, AsyncIterator[bytes]]:
+    """Same JSON as ``S3UploadRequest(file=b64, ...).dict()``, produced as a stream of chunks."""
+    view = memoryview(data)
+    head = b'{"file": "'
+    tail = f'", "folder": {json.dumps(folder)}, "filename": {json.dumps(filename)}}}'.encode()
+    content_length = len(head) + 4 * ((len(view) + 2) // 3) + len(tail)
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        for start in range(0, len(view), _BASE64_CHUNK_BYTES):
+            yield base64.b64encode(view[start : start + _BASE64_CHUNK_BYTES])
+        yield tail
+
+    return content_length, body()
+
+
 async def check_file_exists_direct(s3_url: str) -> bool:
     timeout = httpx.Timeout(timeout=10.0)
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.head(s3_url)
-            return response.status_code == 200
+        client = get_http_client("s3_upload")
+        response = await client.head(s3_url, timeout=timeout)
+        return response.status_code == 200
     except Exception as e:
         return False
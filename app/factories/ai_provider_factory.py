@@ -1,13 +1,42 @@
-from app.providers.ai_provider_interface import AIProviderInterface
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.configurations.config import LLM_CLIENT_CACHE_SIZE
+from app.providers.ai_provider_interface import AIProviderInterface, BaseChatModel
 from app.providers.anthropic_provider import AnthropicProvider
 from app.providers.deepseek_provider import DeepseekProvider
 from app.providers.gemini_provider import GeminiProvider
 from app.providers.openai_provider import OpenAIProvider
 
+LLMKey = Tuple[str, str, Optional[float], Optional[int], Optional[float]]
+
 
 class AIProviderFactory:
+    """Providers are stateless, so one instance per name is shared.
+
+    `get_llm` also caches the chat model built for each (provider, model,
+    sampling params): LangChain chat models hold no per-call state and are safe
+    to share between concurrent requests, and reusing them keeps their SDK
+    client (HTTP connection pool, auth) alive instead of rebuilding it on every
+    message and fallback attempt. Bounded LRU of `MAX_CLIENTS` entries.
+    """
+
+    MAX_CLIENTS: int = LLM_CLIENT_CACHE_SIZE
+
+    _providers: Dict[str, AIProviderInterface] = {}
+    _llms: "OrderedDict[LLMKey, BaseChatModel]" = OrderedDict()
+    _stats: Dict[str, int] = {"hits": 0, "misses": 0, "evicted": 0}
+
+    @classmethod
+    def get_provider(cls, provider_name: str) -> AIProviderInterface:
+        provider = cls._providers.get(provider_name)
+        if provider is None:
+            provider = cls._create_provider(provider_name)
+            cls._providers[provider_name] = provider
+        return provider
+
     @staticmethod
-    def get_provider(provider_name: str) -> AIProviderInterface:
+    def _create_provider(provider_name: str) -> AIProviderInterface:
         if provider_name == "openai":
             return OpenAIProvider()
         elif provider_name == "claude":
@@ -18,3 +47,38 @@ class AIProviderFactory:
             return GeminiProvider()
         else:
             raise ValueError(f"El proveedor de AI '{provider_name}' no está implementado")
+
+    @classmethod
+    def get_llm(
+        cls,
+        provider_name: str,
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        top_p: Optional[float],
+    ) -> BaseChatModel:
+        key = (provider_name, model, temperature, max_tokens, top_p)
+        llm = cls._llms.get(key)
+        if llm is not None:
+            cls._stats["hits"] += 1
+            cls._llms.move_to_end(key)
+            return llm
+
+        cls._stats["misses"] += 1
+        llm = cls.get_provider(provider_name).get_llm(
+            model=model, temperature=temperature, max_tokens=max_tokens, top_p=top_p
+        )
+        cls._llms[key] = llm
+        while len(cls._llms) > cls.MAX_CLIENTS:
+            cls._llms.popitem(last=False)
+            cls._stats["evicted"] += 1
+        return llm
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._providers.clear()
+        cls._llms.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {**cls._stats, "clients": len(cls._llms), "max_clients": cls.MAX_CLIENTS}
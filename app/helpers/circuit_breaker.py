@@ -0,0 +1,223 @@
+"""
+Process-wide circuit breakers keyed by (provider, model).
+
+When a provider degrades, every caller (section images, sub-images, variation
+images, structured Gemini text, agent messages) used to burn its own 3-5
+retries with sleeps before reaching its fallback. A breaker shared by all of
+them remembers the recent outcome of calls to each (provider, model):
+
+- closed: calls go through; outcomes land in a rolling window of
+  `WINDOW_SECONDS`. With at least `MIN_CALLS` calls and an error rate of
+  `ERROR_RATE`, or `RATE_LIMIT_THRESHOLD` 429s, the breaker opens.
+- open: `allow()` is False for `OPEN_SECONDS`; callers skip straight to their
+  fallback model.
+- half_open: `HALF_OPEN_PROBES` calls are let through as probes; a success
+  closes the breaker, a failure opens it again.
+
+Client errors other than 429 (bad request, safety block) say nothing about the
+provider's health and are not counted as failures.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from app.configurations.config import (
+    CIRCUIT_ERROR_RATE,
+    CIRCUIT_HALF_OPEN_PROBES,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_RATE_LIMIT_THRESHOLD,
+    CIRCUIT_WINDOW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Image clients raise plain Exceptions like "Gemini HTTP 503: ...".
+_HTTP_STATUS_RE = re.compile(r"\bHTTP (\d{3})\b")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised (or used as last error) when a call is skipped because the breaker is open."""
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    for candidate in (error, getattr(error, "response", None)):
+        for attr in ("status", "status_code", "code"):
+            value = getattr(candidate, attr, None)
+            if isinstance(value, int):
+                return value
+    match = _HTTP_STATUS_RE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    if _status_of(error) == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource_exhausted" in text or "rate limit" in text
+
+
+def is_overload(error: BaseException) -> bool:
+    """True for errors that mean the provider is saturated (429, timeouts, 503/504)."""
+    if isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower():
+        return True
+    return is_rate_limit(error) or _status_of(error) in (503, 504)
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """False for errors caused by the request itself (4xx other than 408/429)."""
+    status = _status_of(error)
+    if status is not None and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+class CircuitBreaker:
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        # (timestamp, ok, rate_limited)
+        self._events: Deque[Tuple[float, bool, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        self._stats = {"successes": 0, "failures": 0, "rate_limited": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= CircuitBreakerRegistry.OPEN_SECONDS:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now. In half-open it reserves a probe slot."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            # A probe that never reported back (cancelled request) doesn't block forever.
+            stale = time.monotonic() - self._probe_started_at > CircuitBreakerRegistry.OPEN_SECONDS
+            if self._probes_in_flight < CircuitBreakerRegistry.HALF_OPEN_PROBES or stale:
+                self._probes_in_flight = 1 if stale else self._probes_in_flight + 1
+                self._probe_started_at = time.monotonic()
+                return True
+        self._stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self._stats["successes"] += 1
+        if self.state == HALF_OPEN:
+            logger.info(f"[CIRCUIT] {self.provider}/{self.model} closed after successful probe")
+            self._state = CLOSED
+            self._events.clear()
+            self._probes_in_flight = 0
+            return
+        self._add_event(ok=True, rate_limited=False)
+
+    def record_failure(self, error: BaseException) -> None:
+        if not is_provider_failure(error):
+            self._release_probe()
+            return
+        rate_limited = is_rate_limit(error)
+        self._stats["failures"] += 1
+        self._stats["rate_limited"] += int(rate_limited)
+        if self.state == HALF_OPEN:
+            self._open(f"probe failed: {type(error).__name__}")
+            return
+        self._add_event(ok=False, rate_limited=rate_limited)
+        self._evaluate()
+
+    def release(self) -> None:
+        """Give back the `allow()` slot of a call that ended without a provider outcome."""
+        self._release_probe()
+
+    def _release_probe(self) -> None:
+        if self._probes_in_flight:
+            self._probes_in_flight -= 1
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Await `fn(*args, **kwargs)` recording its outcome (call `allow()` first)."""
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._release_probe()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def _add_event(self, ok: bool, rate_limited: bool) -> None:
+        now = time.monotonic()
+        self._events.append((now, ok, rate_limited))
+        cutoff = now - CircuitBreakerRegistry.WINDOW_SECONDS
+        while self._events and self._events[0][0] < cutoff:
+            self._events.popleft()
+
+    def _evaluate(self) -> None:
+        calls = len(self._events)
+        failures = sum(1 for _, ok, _ in self._events if not ok)
+        rate_limited = sum(1 for *_, limited in self._events if limited)
+        if rate_limited >= CircuitBreakerRegistry.RATE_LIMIT_THRESHOLD:
+            self._open(f"{rate_limited} rate-limited calls")
+        elif calls >= CircuitBreakerRegistry.MIN_CALLS and failures / calls >= CircuitBreakerRegistry.ERROR_RATE:
+            self._open(f"error rate {failures}/{calls}")
+
+    def _open(self, reason: str) -> None:
+        logger.warning(f"[CIRCUIT] {self.provider}/{self.model} opened ({reason})")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._events.clear()
+        self._stats["opened"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = len(self._events)
+        failures = sum(1 for _, ok, _ in self._events if not ok)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(failures / calls, 3) if calls else 0.0,
+            "window_rate_limited": sum(1 for *_, limited in self._events if limited),
+            **self._stats,
+        }
+
+
+class CircuitBreakerRegistry:
+    WINDOW_SECONDS: float = CIRCUIT_WINDOW_SECONDS
+    MIN_CALLS: int = CIRCUIT_MIN_CALLS
+    ERROR_RATE: float = CIRCUIT_ERROR_RATE
+    RATE_LIMIT_THRESHOLD: int = CIRCUIT_RATE_LIMIT_THRESHOLD
+    OPEN_SECONDS: float = CIRCUIT_OPEN_SECONDS
+    HALF_OPEN_PROBES: int = CIRCUIT_HALF_OPEN_PROBES
+
+    _breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    @classmethod
+    def get(cls, provider: str, model: str) -> CircuitBreaker:
+        key = ((provider or "").lower(), model or "")
+        breaker = cls._breakers.get(key)
+        if breaker is None:
+            breaker = cls._breakers[key] = CircuitBreaker(*key)
+        return breaker
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._breakers.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {f"{provider}/{model}": breaker.snapshot() for (provider, model), breaker in cls._breakers.items()}
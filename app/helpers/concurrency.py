@@ -1,14 +1,172 @@
+"""
+Adaptive concurrency limits for image generation calls.
+
+Section images, sub-images and variations used to share one fixed
+`asyncio.Semaphore(MAX_CONCURRENT_IMAGE_REQUESTS)`. It could not tell when
+Gemini started answering 429 or timing out, so it either left quota unused or
+piled up retries against a saturated model.
+
+`AdaptiveLimiter` keeps one concurrency limit per (provider, model), AIMD style:
+- Starts at `IMAGE_LIMITER_INITIAL` (default `MAX_CONCURRENT_IMAGE_REQUESTS`)
+  and stays between `IMAGE_LIMITER_MIN` and `MAX_CONCURRENT_IMAGE_REQUESTS`.
+- Each success adds 1/limit (about +1 per round of `limit` successful calls).
+- A 429, timeout, 503 or 504 multiplies the limit by `IMAGE_LIMITER_BACKOFF`,
+  at most once per `IMAGE_LIMITER_DECREASE_INTERVAL_SECONDS`: the burst of
+  429s from one round of in-flight calls counts as one signal.
+- Other errors (bad request, safety block) don't move the limit.
+- Waiters queue in priority lanes (interactive edits, normal, bulk/async jobs)
+  and FIFO within a lane; a freed slot always goes to the most urgent lane.
+"""
+
 import asyncio
+import heapq
+import itertools
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.configurations.config import (
+    IMAGE_LIMITER_BACKOFF,
+    IMAGE_LIMITER_DECREASE_INTERVAL_SECONDS,
+    IMAGE_LIMITER_INITIAL,
+    IMAGE_LIMITER_MIN,
+)
+from app.helpers.circuit_breaker import is_overload
+
+logger = logging.getLogger(__name__)
 
 MAX_CONCURRENT_IMAGE_REQUESTS = int(os.environ.get("MAX_CONCURRENT_IMAGE_REQUESTS", "50"))
 
-_image_semaphore = None
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+_LANES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NORMAL: "normal", PRIORITY_BULK: "bulk"}
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_limit: int = MAX_CONCURRENT_IMAGE_REQUESTS,
+        min_limit: int = IMAGE_LIMITER_MIN,
+        initial: Optional[int] = IMAGE_LIMITER_INITIAL,
+    ):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(min(max(initial or self.max_limit, self.min_limit), self.max_limit))
+        self._inflight = 0
+        # heap of [priority, seq, future]
+        self._waiters: List[List[Any]] = []
+        self._seq = itertools.count()
+        self._last_decrease = float("-inf")
+        self._stats = {"acquired": 0, "queued": 0, "successes": 0, "overloads": 0, "decreases": 0}
+
+    def _has_capacity(self) -> bool:
+        return self._inflight < int(self.limit)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> None:
+        self._stats["acquired"] += 1
+        if self._has_capacity() and not self._waiters:
+            self._inflight += 1
+            return
+
+        self._stats["queued"] += 1
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # El slot ya se había asignado: devolverlo al siguiente.
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self) -> None:
+        self._inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            *_, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._inflight += 1
+            future.set_result(None)
+
+    def record_success(self) -> None:
+        self._stats["successes"] += 1
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+
+    def record_overload(self) -> None:
+        self._stats["overloads"] += 1
+        now = time.monotonic()
+        if now - self._last_decrease < IMAGE_LIMITER_DECREASE_INTERVAL_SECONDS:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * IMAGE_LIMITER_BACKOFF)
+        if int(self.limit) < int(previous):
+            self._stats["decreases"] += 1
+            logger.warning(f"[LIMITER] {self.name} concurrency {int(previous)} -> {int(self.limit)}")
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NORMAL) -> AsyncIterator[None]:
+        """Hold one slot while the provider call runs; its outcome adjusts the limit."""
+        await self.acquire(priority)
+        try:
+            yield
+        except Exception as e:
+            if is_overload(e):
+                self.record_overload()
+            raise
+        else:
+            self.record_success()
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued = {lane: 0 for lane in _LANES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                queued[_LANES.get(priority, str(priority))] += 1
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "inflight": self._inflight,
+            "queue_depth": sum(queued.values()),
+            "queued_by_lane": queued,
+            **self._stats,
+        }
+
+
+class ImageLimiterRegistry:
+    _limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+
+    @classmethod
+    def get(cls, provider: str, model: str) -> AdaptiveLimiter:
+        key = ((provider or "").lower(), model or "")
+        limiter = cls._limiters.get(key)
+        if limiter is None:
+            limiter = cls._limiters[key] = AdaptiveLimiter(f"{key[0]}/{key[1]}")
+        return limiter
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._limiters.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {limiter.name: limiter.snapshot() for limiter in cls._limiters.values()}
 
 
-def get_image_semaphore():
-    """Lazy-init semaphore (must be created inside a running event loop)."""
-    global _image_semaphore
-    if _image_semaphore is None:
-        _image_semaphore = asyncio.Semaphore(MAX_CONCURRENT_IMAGE_REQUESTS)
-    return _image_semaphore
+def get_image_limiter(provider: str, model: str) -> AdaptiveLimiter:
+    return ImageLimiterRegistry.get(provider, model)
@@ -0,0 +1,75 @@
+"""Incremental counterpart of ``SectionHtmlService._extract_html``.
+
+Gemini is asked to return bare HTML but sometimes wraps it in a markdown code
+fence or prefixes a sentence of prose. When streaming we can't run the full
+regex extraction until the end, so this extractor makes a best-effort pass
+on the fly:
+
+- Leading prose before the first ``<`` or code fence is dropped.
+- The opening fence line (```html, ```htm or bare ```) is dropped.
+- Text after the closing fence is dropped; a trailing partial fence (and the
+  whitespace before it) is held back until the next delta tells whether it
+  really closes the block.
+
+The streamed HTML is a live preview. Callers still send the authoritative
+``_extract_html(full_text)`` result when the stream completes.
+"""
+
+import re
+
+FENCE = "```"
+_TRAILING_HOLD_RE = re.compile(r"\s*`{0,2}$")
+
+
+class HtmlStreamExtractor:
+    def __init__(self):
+        self._pending = ""
+        self._mode = "detect"  # detect -> fenced | raw -> done
+
+    def feed(self, delta: str) -> str:
+        """Consume a model delta and return the HTML that is safe to emit now."""
+        if self._mode == "done" or not delta:
+            return ""
+        self._pending += delta
+
+        if self._mode == "detect":
+            self._detect()
+            if self._mode == "detect":
+                return ""
+
+        if self._mode == "raw":
+            out, self._pending = self._pending, ""
+            return out
+
+        # fenced: emit up to the closing fence, hold back a possible partial one.
+        end = self._pending.find(FENCE)
+        if end != -1:
+            out = self._pending[:end]
+            self._pending = ""
+            self._mode = "done"
+            return out.rstrip()
+        # Trailing whitespace is held too, so the newline before ``` never leaks.
+        hold = len(_TRAILING_HOLD_RE.search(self._pending).group())
+        out = self._pending[: len(self._pending) - hold]
+        self._pending = self._pending[len(out) :]
+        return out
+
+    def flush(self) -> str:
+        """Return whatever is still held back once the stream has ended."""
+        if self._mode in ("raw", "fenced"):
+            out, self._pending = self._pending, ""
+            return out
+        return ""
+
+    def _detect(self) -> None:
+        fence_at = self._pending.find(FENCE)
+        tag_at = self._pending.find("<")
+        if fence_at != -1 and (tag_at == -1 or fence_at < tag_at):
+            newline_at = self._pending.find("\n", fence_at)
+            if newline_at == -1:
+                return  # wait for the full ```html line
+            self._pending = self._pending[newline_at + 1 :].lstrip("\n")
+            self._mode = "fenced"
+        elif tag_at != -1:
+            self._pending = self._pending[tag_at:]
+            self._mode = "raw"
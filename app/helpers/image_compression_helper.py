@@ -7,8 +7,23 @@ from PIL import Image
 # Safety limit: reject images over 25 megapixels (prevents decompression bombs)
 Image.MAX_IMAGE_PIXELS = 25_000_000
 
+MIN_QUALITY = 40
+# Lado máximo del proxy sobre el que se hace la búsqueda binaria de calidad.
+PROXY_MAX_SIDE = 512
+# Margen para el error de predicción proxy -> full size.
+PREDICTION_SAFETY = 0.95
+MAX_FULL_ENCODES = 3
+# Un encode que llena al menos esta fracción del target se acepta sin seguir buscando.
+GOOD_FILL = 0.85
+# Si el proxy predice que ni MIN_QUALITY entra por este factor, redimensionar sin probar a full size.
+HOPELESS_FACTOR = 1.5
+
 
 def compress_image_to_target(original_image_bytes: bytes, target_kb: int = 120, max_width: Optional[int] = None) -> str:
+    return base64.b64encode(compress_image_to_webp(original_image_bytes, target_kb, max_width)).decode("utf-8")
+
+
+def compress_image_to_webp(original_image_bytes: bytes, target_kb: int = 120, max_width: Optional[int] = None) -> bytes:
     img = Image.open(io.BytesIO(original_image_bytes))
     img_converted = None
     try:
@@ -31,40 +46,136 @@ def compress_image_to_target(original_image_bytes: bytes, target_kb: int = 120,
 
         target_bytes = target_kb * 1024
 
-        output_buffer = io.BytesIO()
-        img_converted.save(output_buffer, format="WEBP", quality=80)
-        result_bytes = output_buffer.getvalue()
-
+        result_bytes = _encode_webp(img_converted, 80)
         if len(result_bytes) <= target_bytes:
-            return base64.b64encode(result_bytes).decode("utf-8")
+            return result_bytes
 
-        quality = _calculate_initial_quality(len(result_bytes), target_bytes)
+        return _fit_to_target(img_converted, target_bytes, len(result_bytes))
+    finally:
+        if img is not None:
+            img.close()
+        if img_converted is not None:
+            img_converted.close()
 
-        for attempt in range(2):
-            output_buffer = io.BytesIO()
-            img_converted.save(output_buffer, format="WEBP", quality=quality)
-            result_bytes = output_buffer.getvalue()
 
-            if len(result_bytes) <= target_bytes:
-                return base64.b64encode(result_bytes).decode("utf-8")
+def _encode_webp(img: Image, quality: int) -> bytes:
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format="WEBP", quality=quality)
+    return output_buffer.getvalue()
 
-            quality = max(40, quality - 10)
 
-        if len(result_bytes) > target_bytes and max(img_converted.size) > 1024:
-            img_resized = _resize_image(img_converted, target_bytes, len(result_bytes))
-            img_converted.close()
-            img_converted = img_resized
+def _make_proxy(img: Image) -> Optional[Image]:
+    """Downscaled copy for cheap size probing, or None if the image is already small."""
+    scale = PROXY_MAX_SIDE / max(img.size)
+    if scale >= 1:
+        return None
+    size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR)
+
+
+def _fit_to_target(img: Image, target_bytes: int, full_bytes_q80: int, allow_resize: bool = True) -> bytes:
+    """Find the highest WEBP quality that fits `target_bytes` with few full-size encodes.
 
-            output_buffer = io.BytesIO()
-            img_converted.save(output_buffer, format="WEBP", quality=70)
-            result_bytes = output_buffer.getvalue()
+    Full-size WEBP size is roughly proportional to the size of a downscaled proxy
+    at the same quality. The ratio is calibrated with the q=80 encode we already
+    have, the quality is binary-searched on the proxy (cheap encodes), and only
+    the chosen quality is encoded at full size. Each full-size encode adds a
+    ratio sample (interpolated between samples for other qualities) and narrows
+    the range: below it on overshoot, above it when it fits with too much room.
+    At most MAX_FULL_ENCODES are spent on the search.
 
-        return base64.b64encode(result_bytes).decode("utf-8")
+    When even MIN_QUALITY won't fit and the image is larger than 1024px, it is
+    resized and the quality search runs once more on the smaller image. If the
+    proxy already says it's hopeless, the resize is sized from the predicted
+    q=70 bytes without spending full-size encodes.
+    """
+    proxy = _make_proxy(img)
+    if proxy is None:
+        # Imagen chica: buscar directo sobre el full size, la búsqueda es exacta.
+        encoded = {}
+
+        def full_size(quality: int) -> int:
+            encoded[quality] = _encode_webp(img, quality)
+            return len(encoded[quality])
+
+        quality = _highest_fitting_quality(full_size, MIN_QUALITY, 79, target_bytes)
+        return encoded.get(quality) or _encode_webp(img, quality)
+
+    try:
+        proxy_sizes = {}
+
+        def proxy_size(quality: int) -> int:
+            if quality not in proxy_sizes:
+                proxy_sizes[quality] = len(_encode_webp(proxy, quality))
+            return proxy_sizes[quality]
+
+        # full/proxy ratio measured at each quality encoded at full size.
+        ratios = {80: full_bytes_q80 / proxy_size(80)}
+
+        def predicted_size(quality: int) -> float:
+            return proxy_size(quality) * _interpolate_ratio(ratios, quality)
+
+        can_resize = allow_resize and max(img.size) > 1024
+        if can_resize and predicted_size(MIN_QUALITY) > target_bytes * HOPELESS_FACTOR:
+            return _resize_and_fit(img, target_bytes, predicted_size(70))
+
+        best, result_bytes = None, b""
+        low, high = MIN_QUALITY, 79
+        for _ in range(MAX_FULL_ENCODES):
+            quality = _highest_fitting_quality(predicted_size, low, high, target_bytes * PREDICTION_SAFETY)
+            result_bytes = _encode_webp(img, quality)
+            ratios[quality] = len(result_bytes) / proxy_size(quality)
+            if len(result_bytes) <= target_bytes:
+                best = result_bytes
+                if len(result_bytes) >= target_bytes * GOOD_FILL:
+                    break
+                low = quality + 1
+            else:
+                high = quality - 1
+            if low > high:
+                break
+        if best is not None:
+            return best
+
+        if len(result_bytes) > target_bytes and can_resize:
+            return _resize_and_fit(img, target_bytes, len(result_bytes))
+        return result_bytes
     finally:
-        if img is not None:
-            img.close()
-        if img_converted is not None:
-            img_converted.close()
+        proxy.close()
+
+
+def _resize_and_fit(img: Image, target_bytes: int, current_bytes: float) -> bytes:
+    img_resized = _resize_image(img, target_bytes, current_bytes)
+    try:
+        result_bytes = _encode_webp(img_resized, 80)
+        if len(result_bytes) <= target_bytes:
+            return result_bytes
+        return _fit_to_target(img_resized, target_bytes, len(result_bytes), allow_resize=False)
+    finally:
+        img_resized.close()
+
+
+def _interpolate_ratio(ratios: dict, quality: int) -> float:
+    """Linear interpolation of the full/proxy size ratio between the measured qualities."""
+    below = max((q for q in ratios if q <= quality), default=None)
+    above = min((q for q in ratios if q >= quality), default=None)
+    if below is None or above is None or below == above:
+        return ratios[above if below is None else below]
+    weight = (quality - below) / (above - below)
+    return ratios[below] + (ratios[above] - ratios[below]) * weight
+
+
+def _highest_fitting_quality(size_at, low: int, high: int, budget: float) -> int:
+    """Largest quality in [low, high] with size_at(quality) <= budget, or `low` if none fits."""
+    best = low
+    while low <= high:
+        mid = (low + high) // 2
+        if size_at(mid) <= budget:
+            best = mid
+            low = mid + 1
+        else:
+            high = mid - 1
+    return best
 
 
 def _calculate_initial_quality(current_size: int, target_size: int) -> int:
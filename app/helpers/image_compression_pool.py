@@ -0,0 +1,101 @@
+"""Process pool for ``compress_image_to_webp``.
+
+PIL decode, resizes and several WEBP encodes per image keep the GIL
+busy for most of the work, so running 50 compressions on the default thread
+executor ends up using roughly one core. This module runs them on a bounded
+``ProcessPoolExecutor`` instead:
+
+- Sized from the CPU count (``IMAGE_COMPRESSION_WORKERS`` overrides it) and
+  started/stopped in ``main.lifespan``.
+- Input bytes are handed to the worker through ``multiprocessing.shared_memory``
+  rather than pickled through the executor pipe; only the (small) compressed
+  result travels back.
+- At most ``2 × workers`` jobs are submitted at once, which bounds the
+  shared-memory segments alive at any time.
+- If the pool isn't running (scripts, tests) compression runs in a thread.
+  If a worker dies the pool is replaced and that call falls back to a thread.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Optional
+
+from app.configurations.config import IMAGE_COMPRESSION_WORKERS
+from app.helpers.image_compression_helper import compress_image_to_webp
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_workers = 0
+
+
+def _compress_from_shared_memory(name: str, size: int, target_kb: int, max_width: Optional[int]) -> bytes:
+    """Runs in the worker process."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        image_bytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return compress_image_to_webp(image_bytes, target_kb=target_kb, max_width=max_width)
+
+
+def start_compression_pool(workers: Optional[int] = None) -> None:
+    global _executor, _slots, _workers
+    if _executor is not None:
+        return
+    _workers = workers or IMAGE_COMPRESSION_WORKERS or os.cpu_count() or 1
+    # spawn: forking a process that already runs threads (uvicorn, Gemini
+    # stream workers) can deadlock the child.
+    _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+    _slots = asyncio.Semaphore(_workers * 2)
+    logger.info("[COMPRESS] process pool started with %d workers", _workers)
+
+
+def shutdown_compression_pool() -> None:
+    global _executor, _slots
+    if _executor is None:
+        return
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    _slots = None
+
+
+def _restart_pool(broken: ProcessPoolExecutor) -> None:
+    """Replace `broken` unless another caller already did (or the pool was shut down)."""
+    global _executor
+    if _executor is not broken:
+        return
+    broken.shutdown(wait=False, cancel_futures=True)
+    _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def compress_image_async(image_bytes: bytes, target_kb: int = 120, max_width: Optional[int] = None) -> bytes:
+    """Async ``compress_image_to_webp``: process pool when running, thread otherwise."""
+    if _executor is None:
+        return await asyncio.to_thread(compress_image_to_webp, image_bytes, target_kb, max_width)
+
+    async with _slots:
+        shm = shared_memory.SharedMemory(create=True, size=max(len(image_bytes), 1))
+        try:
+            shm.buf[: len(image_bytes)] = image_bytes
+            executor = _executor
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor, _compress_from_shared_memory, shm.name, len(image_bytes), target_kb, max_width
+            )
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a codec). Replace the pool for the
+            # next callers and serve this one from a thread. Every call in flight
+            # on the dead pool lands here; only the first one replaces it.
+            logger.warning("[COMPRESS] process pool is broken, restarting it")
+            _restart_pool(executor)
+            return await asyncio.to_thread(compress_image_to_webp, image_bytes, target_kb, max_width)
+        finally:
+            shm.close()
+            shm.unlink()
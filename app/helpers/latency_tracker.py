@@ -0,0 +1,49 @@
+"""
+Recent LLM call latencies per (provider, model), used to pick hedging delays.
+
+A bounded window of successful call durations per key; `percentile` returns
+None until there are enough samples to trust it.
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+class LatencyTracker:
+    WINDOW = 200
+    MIN_SAMPLES = 20
+
+    _samples: Dict[Key, Deque[float]] = {}
+
+    @classmethod
+    def record(cls, provider: str, model: str, seconds: float) -> None:
+        samples = cls._samples.get((provider, model))
+        if samples is None:
+            samples = cls._samples[(provider, model)] = deque(maxlen=cls.WINDOW)
+        samples.append(seconds)
+
+    @classmethod
+    def percentile(cls, provider: str, model: str, q: float) -> Optional[float]:
+        samples = cls._samples.get((provider, model))
+        if not samples or len(samples) < cls.MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._samples.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Optional[float]]]:
+        return {
+            f"{provider}/{model}": {
+                "samples": len(samples),
+                "p50": cls.percentile(provider, model, 0.5),
+                "p95": cls.percentile(provider, model, 0.95),
+            }
+            for (provider, model), samples in cls._samples.items()
+        }
@@ -0,0 +1,143 @@
+"""
+Dedup of retried generation requests.
+
+Builder clients retry `/generate-section-image`, `/generate-sub-images` and
+`/generate-section-html` when the proxy times out, while the first request is
+still generating: the same work ran two or three times, each one several
+Gemini image/text calls.
+
+`RequestDedup.run(scope, request, fn)` fingerprints the request (sha256 of
+its JSON body, per endpoint scope) and:
+- attaches identical concurrent requests to the execution already in flight
+  (they get its result, or its exception);
+- answers an identical request with the stored result for
+  `REQUEST_DEDUP_WINDOW_SECONDS` after a success (LRU of
+  `REQUEST_DEDUP_MAX_ENTRIES`). Failures are never stored: a retry after an
+  error runs again.
+
+The execution runs in its own task, shielded from the callers: a client that
+disconnects doesn't cancel the work its retry is waiting for. That task drops
+the request deadline it inherits from the first caller (`detach_deadline`);
+each caller waits within its own deadline instead, so a retry sent with a
+longer `X-Request-Timeout` isn't cut short by the first caller's budget. Hits
+and misses go to `log_prompt` (log_type "request_dedup") and to `stats()`.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from app.configurations.config import REQUEST_DEDUP_ENABLED, REQUEST_DEDUP_MAX_ENTRIES, REQUEST_DEDUP_WINDOW_SECONDS
+from app.db.audit_logger import log_prompt
+from app.helpers.retry import DeadlineExceeded, detach_deadline, remaining
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# outcome -> counter in stats()
+_COUNTERS = {"miss": "misses", "inflight_hit": "inflight_hits", "recent_hit": "recent_hits"}
+
+
+def request_fingerprint(scope: str, request: BaseModel) -> str:
+    body = json.dumps(request.model_dump(mode="json"), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{scope}\n{body}".encode("utf-8")).hexdigest()
+
+
+class RequestDedup:
+    ENABLED = REQUEST_DEDUP_ENABLED
+    WINDOW_SECONDS = REQUEST_DEDUP_WINDOW_SECONDS
+    MAX_ENTRIES = REQUEST_DEDUP_MAX_ENTRIES
+
+    _inflight: Dict[str, asyncio.Task] = {}
+    # fingerprint -> (expires_at, result)
+    _recent: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    _stats: Dict[str, int] = {"misses": 0, "inflight_hits": 0, "recent_hits": 0}
+
+    @classmethod
+    async def run(
+        cls,
+        scope: str,
+        request: BaseModel,
+        fn: Callable[[], Awaitable[T]],
+        owner_id: Optional[str] = None,
+    ) -> T:
+        if not cls.ENABLED:
+            return await fn()
+        key = request_fingerprint(scope, request)
+
+        entry = cls._recent.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                cls._recent.move_to_end(key)
+                cls._record("recent_hit", scope, key, owner_id)
+                return entry[1]
+            del cls._recent[key]
+
+        task = cls._inflight.get(key)
+        if task is not None:
+            cls._record("inflight_hit", scope, key, owner_id)
+        else:
+            cls._record("miss", scope, key, owner_id)
+            task = cls._inflight[key] = asyncio.create_task(cls._execute(key, fn))
+        # shield: si este cliente se desconecta (o se le acaba su deadline), la ejecución sigue para los duplicados.
+        left = remaining()
+        if left is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(left, 0.0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"request deadline exceeded waiting for {scope}") from None
+
+    @classmethod
+    async def _execute(cls, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        # create_task copió el contexto del primer caller: su deadline no aplica a los demás.
+        detach_deadline()
+        try:
+            result = await fn()
+            if cls.WINDOW_SECONDS > 0:
+                cls._recent[key] = (time.monotonic() + cls.WINDOW_SECONDS, result)
+                cls._recent.move_to_end(key)
+                while len(cls._recent) > cls.MAX_ENTRIES:
+                    cls._recent.popitem(last=False)
+            return result
+        finally:
+            cls._inflight.pop(key, None)
+
+    @classmethod
+    def _record(cls, outcome: str, scope: str, key: str, owner_id: Optional[str]) -> None:
+        cls._stats[_COUNTERS[outcome]] += 1
+        if outcome != "miss":
+            logger.info(f"[DEDUP] {scope}: {outcome} ({key[:12]})")
+        asyncio.create_task(
+            log_prompt(
+                log_type="request_dedup",
+                prompt=scope,
+                owner_id=owner_id,
+                status="miss" if outcome == "miss" else "hit",
+                metadata={"outcome": outcome, "fingerprint": key[:16], **cls._stats},
+            )
+        )
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._inflight.clear()
+        cls._recent.clear()
+        for key in cls._stats:
+            cls._stats[key] = 0
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            **cls._stats,
+            "inflight": len(cls._inflight),
+            "recent": len(cls._recent),
+            "window_seconds": cls.WINDOW_SECONDS,
+            "max_entries": cls.MAX_ENTRIES,
+        }
@@ -0,0 +1,162 @@
+"""
+Retry policy and per-request deadlines shared by the generation services.
+
+Section images, sub-images, variations and the direct Gemini text calls each
+had their own loop (5 attempts with fixed 5s sleeps, or 300ms/900ms) that
+ignored the provider's `Retry-After` and how long the caller had left: an
+image request could keep sleeping and retrying after its client had already
+given up.
+
+- `request_deadline(seconds)`: sets the deadline of the current request in a
+  contextvar, so it reaches every service and helper the request awaits
+  (nested scopes keep the earliest deadline). `DeadlineMiddleware` sets it from
+  the `X-Request-Timeout` header.
+- `RetryPolicy.delay(attempt, error)`: exponential backoff with jitter; the
+  first `immediate_attempts` retries don't sleep. A `Retry-After` hint from
+  the error (header, or Gemini's `retryDelay`) is a lower bound.
+- `before_retry(policy, attempt, error)`: sleeps before the next attempt, or
+  returns False when the remaining deadline can't fit the sleep plus
+  `policy.min_attempt_seconds`, or the provider asks to wait more than
+  `policy.max_retry_after` (go to the fallback / give up right away).
+"""
+
+import asyncio
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Mapping, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# Gemini sends the hint in the error body: "retryDelay": "27s"
+_RETRY_DELAY_RE = re.compile(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"')
+
+
+class ProviderHTTPError(Exception):
+    """Non-2xx answer from a provider, with the status and its retry hint (seconds) if it sent one."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline leaves no time for another attempt."""
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]] = None, body: Optional[str] = None) -> Optional[float]:
+    """Seconds from a `Retry-After` header (delta-seconds form) or a Gemini `retryDelay` in the body."""
+    value = (headers or {}).get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass  # HTTP-date: not sent by our providers
+    match = _RETRY_DELAY_RE.search(body or "")
+    return float(match.group(1)) if match else None
+
+
+def retry_after(error: Optional[BaseException]) -> Optional[float]:
+    if error is None:
+        return None
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    hint = parse_retry_after(headers, getattr(error, "raw", None) or str(error))
+    cause = error.__cause__ or error.__context__
+    if hint is None and cause is not None:
+        # Los clientes de imágenes re-lanzan envolviendo el error HTTP original.
+        return retry_after(cause)
+    return hint
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block with a deadline `seconds` from now (None or <= 0: keep the current one)."""
+    current = _deadline.get()
+    if seconds and seconds > 0:
+        candidate = time.monotonic() + seconds
+        current = candidate if current is None else min(current, candidate)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def detach_deadline() -> None:
+    """Drop the inherited deadline. For background jobs (asyncio.create_task copies the
+    context) that keep running after the request that scheduled them has answered."""
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def has_time_for(seconds: float) -> bool:
+    left = remaining()
+    return left is None or left >= seconds
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 10.0
+    multiplier: float = 2.0
+    # Retries that start right away (a different sample often succeeds); backoff starts after them.
+    immediate_attempts: int = 0
+    # Typical duration of one attempt: no retry is started if the deadline can't fit it.
+    min_attempt_seconds: float = 0.0
+    # A provider asking to wait longer than this: better go to the fallback than sleep.
+    max_retry_after: float = 30.0
+
+    @classmethod
+    def after_attempts(
+        cls, max_attempts: int, delay_after: int, delay_seconds: float, min_attempt_seconds: float = 0.0
+    ) -> "RetryPolicy":
+        """The services' old knobs: retries up to attempt `delay_after` are immediate, later ones
+        back off from `delay_seconds` (jittered, doubling up to 2x)."""
+        return cls(
+            max_attempts=max_attempts,
+            base_delay=delay_seconds,
+            max_delay=delay_seconds * 2,
+            immediate_attempts=max(0, delay_after - 1),
+            min_attempt_seconds=min_attempt_seconds,
+        )
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Sleep before attempt number `attempt` (2..max_attempts)."""
+        step = attempt - 2 - self.immediate_attempts
+        backoff = 0.0
+        if step >= 0:
+            ceiling = min(self.max_delay, self.base_delay * self.multiplier**step)
+            backoff = random.uniform(ceiling / 2, ceiling)
+        hint = retry_after(error)
+        return max(backoff, hint) if hint is not None else backoff
+
+
+async def before_retry(policy: RetryPolicy, attempt: int, error: Optional[BaseException] = None) -> bool:
+    """Wait before attempt `attempt` (> 1). False if it wouldn't fit in the remaining deadline."""
+    hint = retry_after(error)
+    if hint is not None and hint > policy.max_retry_after:
+        return False
+    delay = policy.delay(attempt, error)
+    if not has_time_for(delay + policy.min_attempt_seconds):
+        return False
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return True
+
+
+def deadline_error(last_error: Optional[BaseException]) -> BaseException:
+    """What to raise when the deadline cuts the retries: the last real error if there was one."""
+    return last_error or DeadlineExceeded(f"request deadline exceeded ({remaining() or 0:.1f}s left)")
@@ -0,0 +1,63 @@
+"""Server-Sent Events helpers shared by the streaming endpoints.
+
+Services yield plain ``{"event": str, "data": dict}`` items; the controller
+wraps them with :func:`sse_response`, which serializes each one as an SSE
+frame and interleaves ``: ping`` comments while the model is silent (thinking
+phase) so proxies don't drop an idle connection.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+HEARTBEAT_SECONDS = 15.0
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Disables response buffering in nginx / ALB-style proxies.
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def sse_frames(
+    events: AsyncIterator[Dict[str, Any]], heartbeat_seconds: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """Serialize `events` to SSE frames, emitting a heartbeat comment when idle."""
+    iterator = events.__aiter__()
+    next_event = None
+    try:
+        while True:
+            next_event = asyncio.ensure_future(iterator.__anext__())
+            while True:
+                done, _ = await asyncio.wait({next_event}, timeout=heartbeat_seconds)
+                if done:
+                    break
+                yield ": ping\n\n"
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            yield format_sse(event["event"], event.get("data", {}))
+    finally:
+        if next_event is not None and not next_event.done():
+            # Client went away mid-generation: stop the producer before closing it.
+            next_event.cancel()
+            try:
+                await next_event
+            except BaseException:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    return StreamingResponse(sse_frames(events), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,80 @@
+"""
+Token counting for history windowing.
+
+By default tokens are estimated from the text length with a chars-per-token
+ratio per provider (cheap and good enough to size a budget). With
+`HISTORY_TOKENIZER=tiktoken` OpenAI/DeepSeek models are counted with their
+real encoding; tiktoken downloads its BPE files on first use, so the pod needs
+them pre-cached (`TIKTOKEN_CACHE_DIR`) — if the encoding can't be loaded the
+estimate is used instead.
+"""
+
+import logging
+import math
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from app.configurations.config import HISTORY_TOKENIZER
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Role, separators and message framing that every provider adds per message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Spanish text on each provider's tokenizer; Claude's vocabulary splits a bit finer.
+_CHARS_PER_TOKEN = {"claude": 3.5, "gemini": 4.0, "openai": 4.0, "deepseek": 3.8}
+_DEFAULT_CHARS_PER_TOKEN = 4.0
+
+_TIKTOKEN_PROVIDERS = ("openai", "deepseek")
+
+_TRUNCATION_MARK = " …[truncado]"
+
+
+def chars_per_token(provider: Optional[str]) -> float:
+    return _CHARS_PER_TOKEN.get(provider or "", _DEFAULT_CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=32)
+def _tiktoken_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Cached as None: no retry (and no network round trip) on every message.
+        logger.warning(f"tiktoken encoding for {model} unavailable ({e}), using estimate")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _tiktoken_count(text: str, model: str) -> int:
+    return len(_tiktoken_encoding(model).encode(text, disallowed_special=()))
+
+
+def count_tokens(text: str, provider: Optional[str] = None, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    if HISTORY_TOKENIZER == "tiktoken" and provider in _TIKTOKEN_PROVIDERS and model:
+        if _tiktoken_encoding(model) is not None:
+            return _tiktoken_count(text, model)
+    return math.ceil(len(text) / chars_per_token(provider))
+
+
+def count_message_tokens(message: Dict[str, Any], provider: Optional[str] = None, model: Optional[str] = None) -> int:
+    return count_tokens(str(message.get("content", "")), provider, model) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: Optional[str] = None) -> str:
+    """Cut `text` to roughly `max_tokens` (by the chars-per-token ratio), marking the cut."""
+    max_chars = int(max(max_tokens, 0) * chars_per_token(provider))
+    if len(text) <= max_chars:
+        return text
+    return text[: max(max_chars - len(_TRUNCATION_MARK), 0)] + _TRUNCATION_MARK
@@ -1,12 +1,28 @@
+import asyncio
 import logging
 import os
-from collections import defaultdict
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Set, Tuple
 
+from app.configurations.config import (
+    HISTORY_MAX_MESSAGES,
+    HISTORY_SUMMARY_ENABLED,
+    HISTORY_SUMMARY_MAX_TOKENS,
+    HISTORY_SUMMARY_MODEL,
+    HISTORY_SUMMARY_PROVIDER,
+    HISTORY_TOKEN_BUDGET,
+)
+from app.db.audit_logger import log_prompt
 from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
 from app.factories.ai_provider_factory import AIProviderFactory
+from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from app.helpers.latency_tracker import LatencyTracker
 from app.managers.conversation_manager_interface import ConversationManagerInterface
+from app.managers.history_store import HistoryStore, create_history_store
+from app.managers.history_window import compact_history, split_summary, summary_prompt, window_history
+from app.processors.agent_cache import agent_cache_key
 from app.processors.agent_processor import AgentProcessor
+from app.processors.conversation_processor import ConversationProcessor
 from app.processors.mcp_processor import MCPProcessor
 from app.processors.simple_processor import SimpleProcessor
 from app.requests.message_request import MessageRequest
@@ -16,18 +32,27 @@ logger = logging.getLogger(__name__)
 
 
 class ConversationManager(ConversationManagerInterface):
-    def __init__(self):
-        self.history_store: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        self.max_history_length: int = 10
+    def __init__(self, history_store: Optional[HistoryStore] = None):
+        self.history_store: HistoryStore = history_store or create_history_store()
+        self.max_history_length: int = HISTORY_MAX_MESSAGES
+        self._summarizing: Set[str] = set()
+        self._summary_tasks: Set[asyncio.Task] = set()
 
     def get_conversation_history(self, conversation_id: str) -> List[Dict[str, Any]]:
         if conversation_id:
-            return self.history_store[conversation_id]
+            return self.history_store.get_history(conversation_id)
         return []
 
-    async def process_conversation(self, request: MessageRequest, agent_config: AgentConfigResponse) -> dict[str, Any]:
+    def get_history_stats(self) -> Dict[str, Any]:
+        return self.history_store.stats()
+
+    def _build_processor(
+        self, request: MessageRequest, agent_config: AgentConfigResponse, history: list
+    ) -> Tuple[ConversationProcessor, bool, bool]:
+        """Processor for the agent over `history`, plus (is_simple, supports_interleaved_files)."""
         ai_provider = AIProviderFactory.get_provider(agent_config.provider_ai)
-        llm = ai_provider.get_llm(
+        llm = AIProviderFactory.get_llm(
+            agent_config.provider_ai,
             model=agent_config.model_ai,
             temperature=agent_config.preferences.temperature,
             max_tokens=agent_config.preferences.max_tokens,
@@ -39,52 +64,177 @@ class ConversationManager(ConversationManagerInterface):
         if extra.get("google_search") in (True, "true") and agent_config.provider_ai == "gemini":
             llm = llm.bind(tools=[{"google_search": {}}])
 
-        history = self.get_conversation_history(request.conversation_id)
         is_simple = False
 
         if agent_config.mcp_config:
-            processor = MCPProcessor(llm, agent_config.prompt, history, agent_config.mcp_config)
+            processor = MCPProcessor(
+                llm, agent_config.prompt, history, agent_config.mcp_config, cache_key=agent_cache_key(agent_config)
+            )
         else:
             tools = ToolGenerator.generate_tools(agent_config.tools or [])
             if tools:
-                processor = AgentProcessor(llm, agent_config.prompt, history, tools)
+                processor = AgentProcessor(
+                    llm, agent_config.prompt, history, tools, cache_key=agent_cache_key(agent_config)
+                )
             else:
                 processor = SimpleProcessor(llm, agent_config.prompt, history)
                 is_simple = True
 
+        return processor, is_simple, ai_provider.supports_interleaved_files()
+
+    async def process_conversation(self, request: MessageRequest, agent_config: AgentConfigResponse) -> dict[str, Any]:
+        history = (await self._windowed_history(request.conversation_id, agent_config)).messages
+        processor, is_simple, supports_interleaved_files = self._build_processor(request, agent_config, history)
+
+        fc = self._get_fallback_config(agent_config)
+        if is_simple and fc["hedge_enabled"]:
+            response_data = await self._hedged_processing(
+                processor, request, agent_config, history, supports_interleaved_files
+            )
+        else:
+            call = processor.process(request, request.files, supports_interleaved_files)
+            if not is_simple:
+                # Agent/MCP runs span several LLM and tool calls: they stay out of the model's breaker and of the
+                # latency window the hedge delay is read from.
+                response_data = await call
+            else:
+                try:
+                    response_data = await self._timed(agent_config.provider_ai, agent_config.model_ai, call)
+                except Exception:
+                    response_data = await self._fallback_processing(request, agent_config, history)
+
+        await self._remember(request, agent_config, response_data)
+        return response_data
+
+    async def stream_conversation(
+        self, request: MessageRequest, agent_config: AgentConfigResponse
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of `process_conversation`: ``delta`` events, then ``done`` with the response.
+
+        If a simple agent's primary model fails before any text was sent, the
+        usual fallback chain answers (as a single delta); once text reached the
+        client a retry would duplicate it, so errors propagate. History is
+        updated when the answer is complete.
+        """
+        history = (await self._windowed_history(request.conversation_id, agent_config)).messages
+        processor, is_simple, supports_interleaved_files = self._build_processor(request, agent_config, history)
+        provider, model = agent_config.provider_ai, agent_config.model_ai
+        breaker = CircuitBreakerRegistry.get(provider, model)
+        response_data: Dict[str, Any] = {}
+        emitted = False
+
         try:
-            response_data = await processor.process(request, request.files, ai_provider.supports_interleaved_files())
-        except Exception as e:
+            if is_simple and not breaker.allow():
+                raise CircuitOpenError(f"{provider}/{model} circuit open")
+            started = time.monotonic()
+            try:
+                async for event in processor.stream(request, request.files, supports_interleaved_files, response_data):
+                    emitted = True
+                    yield event
+            except Exception as e:
+                if is_simple:
+                    breaker.record_failure(e)
+                raise
             if is_simple:
-                response_data = await self._fallback_processing(request, agent_config, history)
-            else:
-                raise e
+                breaker.record_success()
+                LatencyTracker.record(provider, model, time.monotonic() - started)
+        except Exception as e:
+            if emitted or not is_simple:
+                raise
+            logger.warning(f"Streaming primary failed before any text, using fallback: {e}")
+            response_data = await self._fallback_processing(request, agent_config, history)
+            if response_data.get("text"):
+                yield {"event": "delta", "data": {"text": response_data["text"]}}
+
+        await self._remember(request, agent_config, response_data)
+        yield {"event": "done", "data": response_data}
 
+    async def _remember(self, request: MessageRequest, agent_config: AgentConfigResponse, response_data: dict) -> None:
         if request.conversation_id:
             ai_response_content = response_data.get("text")
             if ai_response_content is None:
                 ai_response_content = str(response_data)
 
-            self._update_conversation_history(
+            await self._update_conversation_history(
                 conversation_id=request.conversation_id,
                 user_message_content=request.query,
                 ai_response_content=ai_response_content,
             )
+            await self._schedule_summary(request.conversation_id, agent_config)
 
-        return response_data
+    def _get_history_config(self, agent_config: AgentConfigResponse) -> dict:
+        hc = {}
+        if agent_config.metadata and "history_config" in agent_config.metadata:
+            hc = agent_config.metadata["history_config"]
+
+        return {
+            "max_tokens": int(hc.get("max_tokens", HISTORY_TOKEN_BUDGET)),
+            "summarize": bool(hc.get("summarize", HISTORY_SUMMARY_ENABLED)),
+        }
+
+    async def _windowed_history(self, conversation_id: str, agent_config: AgentConfigResponse):
+        return window_history(
+            await self.history_store.aget_history(conversation_id) if conversation_id else [],
+            self._get_history_config(agent_config)["max_tokens"],
+            agent_config.provider_ai,
+            agent_config.model_ai,
+        )
+
+    async def _schedule_summary(self, conversation_id: str, agent_config: AgentConfigResponse) -> None:
+        """Compact the turns that no longer fit in the window, off the request path."""
+        if not self._get_history_config(agent_config)["summarize"] or conversation_id in self._summarizing:
+            return
+        window = await self._windowed_history(conversation_id, agent_config)
+        if not window.evicted:
+            return
+
+        self._summarizing.add(conversation_id)
+        task = asyncio.create_task(self._summarize(conversation_id, window.evicted))
+        self._summary_tasks.add(task)
+        task.add_done_callback(self._summary_tasks.discard)
+        task.add_done_callback(lambda _: self._summarizing.discard(conversation_id))
+
+    async def _summarize(self, conversation_id: str, evicted: List[Dict[str, Any]]) -> None:
+        try:
+            previous_summary, _ = split_summary(await self.history_store.aget_history(conversation_id))
+            llm = AIProviderFactory.get_llm(
+                HISTORY_SUMMARY_PROVIDER,
+                model=HISTORY_SUMMARY_MODEL,
+                temperature=0,
+                max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+                top_p=1,
+            )
+            result = await llm.ainvoke(summary_prompt(previous_summary, evicted))
+            summary = result.content if isinstance(result.content, str) else str(result.content)
+            if not summary.strip():
+                return
+
+            compacted = compact_history(
+                await self.history_store.aget_history(conversation_id), evicted, summary.strip()
+            )
+            if compacted is None:
+                logger.info(f"History of {conversation_id} changed while summarizing, summary discarded")
+                return
+            await self.history_store.aset(conversation_id, compacted)
+            logger.info(f"Summarized {len(evicted)} messages of conversation {conversation_id}")
+        except Exception as e:
+            # Best effort: without a summary the window just drops the old turns.
+            logger.warning(f"History summarization failed for {conversation_id}: {e}")
 
-    def _update_conversation_history(
+    async def _update_conversation_history(
         self, conversation_id: str, user_message_content: str, ai_response_content: str
     ) -> None:
         if not conversation_id:
             return
 
-        self.history_store[conversation_id].append({"role": "user", "content": user_message_content})
-        self.history_store[conversation_id].append({"role": "assistant", "content": ai_response_content})
-
-        current_conv_history = self.history_store[conversation_id]
-        if len(current_conv_history) > self.max_history_length:
-            self.history_store[conversation_id] = current_conv_history[-self.max_history_length :]
+        await self.history_store.aappend(
+            conversation_id,
+            [
+                {"role": "user", "content": user_message_content},
+                {"role": "assistant", "content": ai_response_content},
+            ],
+            self.max_history_length,
+        )
 
     def _get_fallback_config(self, agent_config: AgentConfigResponse) -> dict:
         fc = {}
@@ -105,25 +255,183 @@ class ConversationManager(ConversationManagerInterface):
             "secondary_fallback_model": fc.get(
                 "secondary_fallback_model", os.getenv("FALLBACK_SECONDARY_MODEL", "claude-sonnet-4-6")
             ),
+            # Hedging: if the primary hasn't answered after hedge_delay_ms (a number, or "p95"/"p90"...
+            # of its observed latency), race the primary fallback against it.
+            "hedge_enabled": bool(
+                fc.get("hedge_enabled", os.getenv("FALLBACK_HEDGE_ENABLED", "false").lower() == "true")
+            ),
+            "hedge_delay_ms": fc.get("hedge_delay_ms", os.getenv("FALLBACK_HEDGE_DELAY_MS", "p95")),
+            "hedge_default_delay_ms": float(
+                fc.get("hedge_default_delay_ms", os.getenv("FALLBACK_HEDGE_DEFAULT_DELAY_MS", "10000"))
+            ),
         }
 
+    def _hedge_delay(self, fc: dict, provider: str, model: str) -> float:
+        """Seconds to wait for the primary before firing the hedge."""
+        value = fc["hedge_delay_ms"]
+        if isinstance(value, str) and value.lower().startswith("p"):
+            try:
+                q = float(value[1:]) / 100
+            except ValueError:
+                q = 0.95
+            observed = LatencyTracker.percentile(provider, model, q)
+            return observed if observed is not None else fc["hedge_default_delay_ms"] / 1000
+        return float(value) / 1000
+
+    async def _timed(self, provider: str, model: str, call: Awaitable[dict]) -> dict[str, Any]:
+        """Await an LLM call through the (provider, model) circuit breaker, recording its latency.
+
+        With the circuit open the call is not made and CircuitOpenError is raised
+        right away, so retries burn no time and the fallback chain takes over.
+        """
+        breaker = CircuitBreakerRegistry.get(provider, model)
+        if not breaker.allow():
+            if asyncio.iscoroutine(call):
+                call.close()
+            raise CircuitOpenError(f"{provider}/{model} circuit open")
+        started = time.monotonic()
+        result = await breaker.call(lambda: call)
+        LatencyTracker.record(provider, model, time.monotonic() - started)
+        return result
+
+    def _log_fallback_path(
+        self,
+        request: MessageRequest,
+        agent_config: AgentConfigResponse,
+        path: str,
+        provider: str,
+        model: str,
+        started: float,
+        **metadata: Any,
+    ) -> None:
+        """Record in prompt_logs which path answered (primary, retry, hedge, primary/secondary fallback)."""
+        logger.info(f"Answered by {path}: {provider}/{model}")
+        asyncio.create_task(
+            log_prompt(
+                log_type="llm_fallback",
+                agent_id=request.agent_id,
+                model=model,
+                provider=provider,
+                fallback_used=path != "primary",
+                elapsed_ms=int((time.monotonic() - started) * 1000),
+                metadata={
+                    "path": path,
+                    "conversation_id": request.conversation_id,
+                    "primary": f"{agent_config.provider_ai}/{agent_config.model_ai}",
+                    **metadata,
+                },
+            )
+        )
+
     async def _try_provider(
         self, provider_name: str, model: str, agent_config: AgentConfigResponse, request: MessageRequest, history: list
     ) -> dict[str, Any]:
         provider = AIProviderFactory.get_provider(provider_name)
-        llm = provider.get_llm(
+        llm = AIProviderFactory.get_llm(
+            provider_name,
             model=model,
             temperature=agent_config.preferences.temperature,
             max_tokens=agent_config.preferences.max_tokens,
             top_p=agent_config.preferences.top_p,
         )
         processor = SimpleProcessor(llm, agent_config.prompt, history)
-        return await processor.process(request, request.files, provider.supports_interleaved_files())
+        return await self._timed(
+            provider_name, model, processor.process(request, request.files, provider.supports_interleaved_files())
+        )
+
+    async def _hedged_processing(
+        self,
+        processor: SimpleProcessor,
+        request: MessageRequest,
+        agent_config: AgentConfigResponse,
+        history: list,
+        supports_interleaved_files: bool,
+    ) -> dict[str, Any]:
+        """Primary call raced against the primary fallback once it runs past the hedge delay.
+
+        The first good answer wins and the other call is cancelled. If the
+        primary fails before the delay the fallback starts right away; if both
+        fail the secondary fallback is tried as in `_fallback_processing`.
+        """
+        fc = self._get_fallback_config(agent_config)
+        started = time.monotonic()
+        delay = self._hedge_delay(fc, agent_config.provider_ai, agent_config.model_ai)
+
+        primary = asyncio.create_task(
+            self._timed(
+                agent_config.provider_ai,
+                agent_config.model_ai,
+                processor.process(request, request.files, supports_interleaved_files),
+            )
+        )
+        paths = {primary: ("primary", agent_config.provider_ai, agent_config.model_ai)}
+        last_error = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done and primary.exception() is None:
+                return primary.result()
+            if done:
+                last_error = primary.exception()
+                logger.warning(f"Primary failed before hedge delay: {last_error}")
+
+            logger.info(
+                f"Hedging after {delay * 1000:.0f}ms: {fc['primary_fallback_provider']}/{fc['primary_fallback_model']}"
+            )
+            hedge = asyncio.create_task(
+                self._try_provider(
+                    fc["primary_fallback_provider"], fc["primary_fallback_model"], agent_config, request, history
+                )
+            )
+            paths[hedge] = ("hedge", fc["primary_fallback_provider"], fc["primary_fallback_model"])
+
+            pending = {task for task in paths if not task.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        path, provider, model = paths[task]
+                        self._log_fallback_path(
+                            request,
+                            agent_config,
+                            path,
+                            provider,
+                            model,
+                            started,
+                            hedged=True,
+                            hedge_delay_ms=int(delay * 1000),
+                        )
+                        return task.result()
+                    last_error = last_error or task.exception()
+                    logger.warning(f"Hedged {paths[task][0]} failed: {task.exception()}")
+        finally:
+            for task in paths:
+                if not task.done():
+                    task.cancel()
+
+        try:
+            logger.info(f"Secondary fallback: {fc['secondary_fallback_provider']}/{fc['secondary_fallback_model']}")
+            result = await self._try_provider(
+                fc["secondary_fallback_provider"], fc["secondary_fallback_model"], agent_config, request, history
+            )
+        except Exception as e:
+            logger.error(f"Secondary fallback also failed: {e}")
+            raise last_error or e
+        self._log_fallback_path(
+            request,
+            agent_config,
+            "secondary_fallback",
+            fc["secondary_fallback_provider"],
+            fc["secondary_fallback_model"],
+            started,
+            hedged=True,
+        )
+        return result
 
     async def _fallback_processing(
         self, request: MessageRequest, agent_config: AgentConfigResponse, history: list
     ) -> dict[str, Any]:
         fc = self._get_fallback_config(agent_config)
+        started = time.monotonic()
 
         # Retry with primary model
         max_retries = fc["max_retries"]
@@ -133,9 +441,13 @@ class ConversationManager(ConversationManagerInterface):
                 logger.info(
                     f"Retry {attempt + 1}/{max_retries} with {agent_config.provider_ai}/{agent_config.model_ai}"
                 )
-                return await self._try_provider(
+                result = await self._try_provider(
                     agent_config.provider_ai, agent_config.model_ai, agent_config, request, history
                 )
+                self._log_fallback_path(
+                    request, agent_config, "retry", agent_config.provider_ai, agent_config.model_ai, started
+                )
+                return result
             except Exception as e:
                 last_error = e
                 logger.warning(f"Retry {attempt + 1}/{max_retries} failed: {e}")
@@ -143,18 +455,36 @@ class ConversationManager(ConversationManagerInterface):
         # Primary fallback
         try:
             logger.info(f"Primary fallback: {fc['primary_fallback_provider']}/{fc['primary_fallback_model']}")
-            return await self._try_provider(
+            result = await self._try_provider(
                 fc["primary_fallback_provider"], fc["primary_fallback_model"], agent_config, request, history
             )
+            self._log_fallback_path(
+                request,
+                agent_config,
+                "primary_fallback",
+                fc["primary_fallback_provider"],
+                fc["primary_fallback_model"],
+                started,
+            )
+            return result
         except Exception as e:
             logger.warning(f"Primary fallback failed: {e}")
 
         # Secondary fallback
         try:
             logger.info(f"Secondary fallback: {fc['secondary_fallback_provider']}/{fc['secondary_fallback_model']}")
-            return await self._try_provider(
+            result = await self._try_provider(
                 fc["secondary_fallback_provider"], fc["secondary_fallback_model"], agent_config, request, history
             )
         except Exception as e:
             logger.error(f"Secondary fallback also failed: {e}")
             raise last_error or e
+        self._log_fallback_path(
+            request,
+            agent_config,
+            "secondary_fallback",
+            fc["secondary_fallback_provider"],
+            fc["secondary_fallback_model"],
+            started,
+        )
+        return result
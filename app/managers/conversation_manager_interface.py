@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict
 
 from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
 from app.requests.message_request import MessageRequest
@@ -8,3 +9,13 @@ class ConversationManagerInterface(ABC):
     @abstractmethod
     async def process_conversation(self, request: MessageRequest, agent_config: AgentConfigResponse) -> str:
         pass
+
+    @abstractmethod
+    def stream_conversation(
+        self, request: MessageRequest, agent_config: AgentConfigResponse
+    ) -> AsyncIterator[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def get_history_stats(self) -> Dict[str, Any]:
+        pass
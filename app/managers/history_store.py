@@ -0,0 +1,331 @@
+"""
+Conversation history backends for `ConversationManager`.
+
+The manager used to keep history in a `defaultdict(list)` that was never
+evicted, so every conversation_id seen by the pod stayed in RAM forever.
+Both backends here keep the manager's contract (last `max_length` messages
+per conversation) but bound what is retained:
+
+- `MemoryHistoryStore`: LRU capped by conversation count and by approximate
+  content bytes; conversations idle for longer than `ttl_seconds` expire.
+- `SqliteHistoryStore`: same limits on a local SQLite file (WAL mode), so
+  history survives restarts and is shared by every uvicorn worker on the host.
+
+`create_history_store()` picks the backend from `HISTORY_STORE_BACKEND`.
+Stores behave as a mapping of conversation_id -> messages, so callers that
+read `history_store[conversation_id]` keep working. The request path uses the
+async variants (`aget_history`, `aappend`, `aset`), which keep SQLite I/O off
+the event loop. A leading
+`{"role": "summary"}` message (written by the history summarizer) is kept when
+trimming to `max_length`.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.configurations.config import (
+    HISTORY_STORE_BACKEND,
+    HISTORY_STORE_MAX_BYTES,
+    HISTORY_STORE_MAX_ENTRIES,
+    HISTORY_STORE_SQLITE_PATH,
+    HISTORY_STORE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+
+# Per-message overhead (dict + two small strs) added to the content length.
+_MESSAGE_OVERHEAD_BYTES = 200
+
+SUMMARY_ROLE = "summary"
+
+
+def _approx_bytes(messages: List[Message]) -> int:
+    return sum(len(str(m.get("content", ""))) + _MESSAGE_OVERHEAD_BYTES for m in messages)
+
+
+def _trim(messages: List[Message], max_length: int) -> List[Message]:
+    if messages and messages[0].get("role") == SUMMARY_ROLE:
+        return messages[:1] + messages[1:][-max_length:]
+    return messages[-max_length:]
+
+
+class HistoryStore(MutableMapping):
+    @abstractmethod
+    def get_history(self, conversation_id: str) -> List[Message]:
+        """Messages of the conversation, oldest first ([] if unknown or expired)."""
+
+    @abstractmethod
+    def append(self, conversation_id: str, messages: List[Message], max_length: int) -> None:
+        """Append `messages` and keep only the last `max_length` (plus the summary, if any)."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+    async def aget_history(self, conversation_id: str) -> List[Message]:
+        """Async variants of the calls on the request path; backends with blocking I/O override them."""
+        return self.get_history(conversation_id)
+
+    async def aappend(self, conversation_id: str, messages: List[Message], max_length: int) -> None:
+        self.append(conversation_id, messages, max_length)
+
+    async def aset(self, conversation_id: str, messages: List[Message]) -> None:
+        self[conversation_id] = messages
+
+    def __getitem__(self, conversation_id: str) -> List[Message]:
+        if conversation_id not in self:
+            raise KeyError(conversation_id)
+        return self.get_history(conversation_id)
+
+
+class MemoryHistoryStore(HistoryStore):
+    def __init__(
+        self,
+        max_entries: int = HISTORY_STORE_MAX_ENTRIES,
+        max_bytes: int = HISTORY_STORE_MAX_BYTES,
+        ttl_seconds: float = HISTORY_STORE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # conversation_id -> (messages, approx bytes, last access)
+        self._entries: "OrderedDict[str, Tuple[List[Message], int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evicted_lru": 0, "expired": 0}
+
+    def get_history(self, conversation_id: str) -> List[Message]:
+        self._expire()
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            self._stats["misses"] += 1
+            return []
+        self._stats["hits"] += 1
+        messages, size, _ = entry
+        self._entries[conversation_id] = (messages, size, time.monotonic())
+        self._entries.move_to_end(conversation_id)
+        return messages
+
+    def append(self, conversation_id: str, messages: List[Message], max_length: int) -> None:
+        entry = self._entries.get(conversation_id)
+        current = entry[0] if entry is not None else []
+        self[conversation_id] = _trim(current + messages, max_length)
+
+    def __setitem__(self, conversation_id: str, messages: List[Message]) -> None:
+        self._discard(conversation_id)
+        size = _approx_bytes(messages)
+        self._entries[conversation_id] = (messages, size, time.monotonic())
+        self._bytes += size
+        self._expire()
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self._stats["evicted_lru"] += 1
+
+    def __delitem__(self, conversation_id: str) -> None:
+        if conversation_id not in self._entries:
+            raise KeyError(conversation_id)
+        self._discard(conversation_id)
+
+    def __contains__(self, conversation_id: object) -> bool:
+        self._expire()
+        return conversation_id in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        self._expire()
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._entries)
+
+    def _discard(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _expire(self) -> None:
+        # Ordered by last access, so expired conversations are always at the head.
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            oldest, (_, _, touched_at) = next(iter(self._entries.items()))
+            if touched_at >= cutoff:
+                break
+            self._discard(oldest)
+            self._stats["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            **self._stats,
+            "conversations": len(self._entries),
+            "approx_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class SqliteHistoryStore(HistoryStore):
+    """History in a local SQLite file, shared by every worker process on the host.
+
+    The mapping methods are synchronous. While another worker holds the write
+    lock they can wait up to the 5s busy timeout, so the async variants run
+    them on a dedicated thread instead of the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_STORE_SQLITE_PATH,
+        max_entries: int = HISTORY_STORE_MAX_ENTRIES,
+        ttl_seconds: float = HISTORY_STORE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "pruned": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-sqlite")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_history ("
+            " conversation_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_history_updated_at ON conversation_history (updated_at)"
+        )
+
+    async def _run_blocking(self, fn, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def aget_history(self, conversation_id: str) -> List[Message]:
+        return await self._run_blocking(self.get_history, conversation_id)
+
+    async def aappend(self, conversation_id: str, messages: List[Message], max_length: int) -> None:
+        await self._run_blocking(self.append, conversation_id, messages, max_length)
+
+    async def aset(self, conversation_id: str, messages: List[Message]) -> None:
+        await self._run_blocking(self.__setitem__, conversation_id, messages)
+
+    def _row(self, conversation_id: str) -> Optional[List[Message]]:
+        row = self._conn.execute(
+            "SELECT messages FROM conversation_history WHERE conversation_id = ? AND updated_at >= ?",
+            (conversation_id, time.time() - self.ttl_seconds),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_history(self, conversation_id: str) -> List[Message]:
+        with self._lock:
+            messages = self._row(conversation_id)
+        self._stats["hits" if messages is not None else "misses"] += 1
+        return messages or []
+
+    def append(self, conversation_id: str, messages: List[Message], max_length: int) -> None:
+        with self._lock:
+            # BEGIN IMMEDIATE: two workers appending to the same conversation don't lose a turn.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._row(conversation_id) or []
+                self._write(conversation_id, _trim(current + messages, max_length))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._maybe_prune()
+
+    def __setitem__(self, conversation_id: str, messages: List[Message]) -> None:
+        with self._lock:
+            self._write(conversation_id, messages)
+        self._maybe_prune()
+
+    def _write(self, conversation_id: str, messages: List[Message]) -> None:
+        self._conn.execute(
+            "INSERT INTO conversation_history (conversation_id, messages, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(conversation_id) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at",
+            (conversation_id, json.dumps(messages, ensure_ascii=False, default=str), time.time()),
+        )
+
+    def _maybe_prune(self) -> None:
+        self._writes += 1
+        if self._writes % 100 != 1:
+            return
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM conversation_history WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM conversation_history WHERE conversation_id IN ("
+                " SELECT conversation_id FROM conversation_history ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self._stats["pruned"] += expired + overflow
+
+    def __delitem__(self, conversation_id: str) -> None:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM conversation_history WHERE conversation_id = ?", (conversation_id,)
+            ).rowcount
+        if not deleted:
+            raise KeyError(conversation_id)
+
+    def __contains__(self, conversation_id: object) -> bool:
+        with self._lock:
+            return self._row(conversation_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT conversation_id FROM conversation_history WHERE updated_at >= ?",
+                (time.time() - self.ttl_seconds,),
+            ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM conversation_history WHERE updated_at >= ?", (time.time() - self.ttl_seconds,)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conversations, approx_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(messages)), 0) FROM conversation_history"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            **self._stats,
+            "conversations": conversations,
+            "approx_bytes": approx_bytes,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def create_history_store() -> HistoryStore:
+    if HISTORY_STORE_BACKEND == "sqlite":
+        try:
+            return SqliteHistoryStore()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite history store unavailable ({e}), falling back to memory")
+    return MemoryHistoryStore()
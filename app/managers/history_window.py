@@ -0,0 +1,112 @@
+"""
+Token-budgeted view of a conversation history.
+
+The store keeps the raw turns (up to `HISTORY_MAX_MESSAGES`); what reaches the
+LLM is the newest turns that fit in a token budget, so one pasted product page
+no longer rides along on every later turn while short chats keep more context
+than the old fixed 10 messages.
+
+Turns that fall out of the window can be compacted by a background summarizer
+(see `ConversationManager._schedule_summary`). The summary lives in the store
+as a leading `{"role": "summary"}` message and is sent to the model as a
+user/assistant pair: Anthropic requires the first message to be from the user
+and Gemini rejects system messages after the first one.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from app.helpers.token_counter import MESSAGE_OVERHEAD_TOKENS, count_message_tokens, truncate_to_tokens
+from app.managers.history_store import SUMMARY_ROLE, Message
+
+# The latest turn is always sent; if it alone exceeds the budget it is truncated, never below this.
+MIN_TRUNCATED_TOKENS = 64
+# Each evicted message is cut to this size before going into the summarization prompt.
+SUMMARY_INPUT_MAX_TOKENS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Resume la conversación entre un usuario y un asistente para que el asistente pueda continuarla. "
+    "Conserva los datos concretos (nombres, productos, URLs, cifras, decisiones y preferencias del usuario) "
+    "y omite saludos y relleno. Si hay un resumen previo, intégralo. Responde solo con el resumen, "
+    "en el idioma de la conversación."
+)
+
+
+class HistoryWindow(NamedTuple):
+    messages: List[Message]
+    evicted: List[Message]
+    tokens: int
+
+
+def split_summary(history: List[Message]) -> Tuple[Optional[str], List[Message]]:
+    if history and history[0].get("role") == SUMMARY_ROLE:
+        return history[0].get("content") or None, history[1:]
+    return None, history
+
+
+def summary_messages(summary: str) -> List[Message]:
+    return [
+        {"role": "user", "content": f"Resumen de la conversación anterior:\n{summary}"},
+        {"role": "assistant", "content": "Entendido, continúo a partir de ese contexto."},
+    ]
+
+
+def window_history(
+    history: List[Message], max_tokens: int, provider: Optional[str] = None, model: Optional[str] = None
+) -> HistoryWindow:
+    """Newest turns of `history` that fit in `max_tokens`, preceded by the summary if there is one.
+
+    `evicted` are the stored turns left out (oldest first), i.e. what the
+    summarizer should fold into the summary.
+    """
+    summary, turns = split_summary(history)
+    prefix = summary_messages(summary) if summary else []
+    used = sum(count_message_tokens(m, provider, model) for m in prefix)
+
+    kept: List[Message] = []
+    start = len(turns)
+    latest_turn_start = max(len(turns) - 2, 0)
+    for index in range(len(turns) - 1, -1, -1):
+        message = turns[index]
+        cost = count_message_tokens(message, provider, model)
+        if used + cost > max_tokens:
+            if index < latest_turn_start:
+                break
+            allowed = max(max_tokens - used - MESSAGE_OVERHEAD_TOKENS, MIN_TRUNCATED_TOKENS)
+            message = {**message, "content": truncate_to_tokens(str(message.get("content", "")), allowed, provider)}
+            cost = count_message_tokens(message, provider, model)
+        kept.append(message)
+        used += cost
+        start = index
+
+    kept.reverse()
+    # The window must open with a user message.
+    while kept and kept[0].get("role") != "user":
+        used -= count_message_tokens(kept.pop(0), provider, model)
+        start += 1
+
+    return HistoryWindow(prefix + kept, turns[:start], used)
+
+
+def summary_prompt(previous_summary: Optional[str], evicted: List[Message]) -> List[Tuple[str, str]]:
+    """(role, text) messages for the summarization call; accepted by any LangChain chat model."""
+    lines = []
+    for message in evicted:
+        speaker = "Usuario" if message.get("role") == "user" else "Asistente"
+        content = truncate_to_tokens(str(message.get("content", "")), SUMMARY_INPUT_MAX_TOKENS)
+        lines.append(f"{speaker}: {content}")
+    body = "Mensajes a incorporar:\n" + "\n".join(lines)
+    if previous_summary:
+        body = f"Resumen previo:\n{previous_summary}\n\n{body}"
+    return [("system", SUMMARY_SYSTEM_PROMPT), ("human", body)]
+
+
+def compact_history(current: List[Message], evicted: List[Message], summary: str) -> Optional[List[Message]]:
+    """`current` with the `evicted` turns replaced by `summary`.
+
+    None if the stored history no longer starts with those turns (another
+    request or the store's own trimming changed it meanwhile).
+    """
+    _, turns = split_summary(current)
+    if not evicted or turns[: len(evicted)] != evicted:
+        return None
+    return [{"role": SUMMARY_ROLE, "content": summary}] + turns[len(evicted) :]
@@ -5,6 +5,7 @@ import httpx
 from fastapi import Header, HTTPException, Request
 
 from app.configurations.config import API_KEY, AUTH_SERVICE_URL
+from app.externals.http_clients import get_http_client
 
 
 async def verify_api_key(api_key: Optional[str]) -> bool:
@@ -33,13 +34,13 @@ async def verify_user_token(authorization: Optional[str]) -> dict:
         raise HTTPException(status_code=401, detail="Authorization token not provided")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(AUTH_SERVICE_URL, headers={"Authorization": authorization}, timeout=3.0)
+        client = get_http_client("auth")
+        response = await client.get(AUTH_SERVICE_URL, headers={"Authorization": authorization}, timeout=3.0)
 
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
+        if response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Invalid token")
 
-            return response.json()
+        return response.json()
     except httpx.RequestError:
         raise HTTPException(status_code=500, detail="Error verifying token")
 
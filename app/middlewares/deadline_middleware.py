@@ -0,0 +1,29 @@
+from app.configurations.config import REQUEST_DEADLINE_DEFAULT_SECONDS
+from app.helpers.retry import request_deadline
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """Sets the request deadline (`app.helpers.retry`) from `X-Request-Timeout` (seconds),
+    or `REQUEST_DEADLINE_DEFAULT_SECONDS`, for everything the request awaits."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = REQUEST_DEADLINE_DEFAULT_SECONDS
+        for name, value in scope.get("headers") or []:
+            if name == DEADLINE_HEADER:
+                try:
+                    seconds = float(value.decode())
+                except ValueError:
+                    pass
+                break
+
+        with request_deadline(seconds):
+            await self.app(scope, receive, send)
@@ -0,0 +1,78 @@
+"""
+Compiled agents reused across messages.
+
+`AgentProcessor` used to rebuild the prompt template, the tool-calling agent
+and the `AgentExecutor` on every message. None of them hold per-conversation
+state (context, history and input are invoke-time variables), so one compiled
+agent per agent configuration can serve every request.
+
+Entries are keyed by `agent_cache_key(agent_config)`: the agent_id plus a
+fingerprint of everything that shapes the compiled agent (provider, model,
+sampling params, tools, MCP servers). Editing an agent in agent-config changes
+the fingerprint, so the next request compiles a fresh agent and the stale one
+ages out of the LRU.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.configurations.config import AGENT_CACHE_MAX_ENTRIES
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
+
+T = TypeVar("T")
+
+
+def agent_cache_key(agent_config: AgentConfigResponse) -> str:
+    fingerprint = json.dumps(
+        {
+            "provider": agent_config.provider_ai,
+            "model": agent_config.model_ai,
+            "preferences": agent_config.preferences.dict(),
+            "tools": agent_config.tools or [],
+            "mcp_config": agent_config.mcp_config,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"{agent_config.agent_id}:{hashlib.sha256(fingerprint.encode()).hexdigest()[:16]}"
+
+
+class CompiledAgentCache:
+    MAX_ENTRIES: int = AGENT_CACHE_MAX_ENTRIES
+
+    _agents: "OrderedDict[str, Any]" = OrderedDict()
+    _stats: Dict[str, int] = {"hits": 0, "misses": 0, "evicted": 0}
+
+    @classmethod
+    def get_or_build(cls, key: str, build: Callable[[], T]) -> T:
+        agent = cls._agents.get(key)
+        if agent is not None:
+            cls._stats["hits"] += 1
+            cls._agents.move_to_end(key)
+            return agent
+
+        cls._stats["misses"] += 1
+        agent = build()
+        cls._agents[key] = agent
+        while len(cls._agents) > cls.MAX_ENTRIES:
+            cls._agents.popitem(last=False)
+            cls._stats["evicted"] += 1
+        return agent
+
+    @classmethod
+    def invalidate(cls, agent_id: Optional[str] = None) -> int:
+        """Drop every compiled version of `agent_id`, or everything. Returns how many."""
+        keys = [key for key in cls._agents if agent_id is None or key.rsplit(":", 1)[0] == agent_id]
+        for key in keys:
+            del cls._agents[key]
+        return len(keys)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._agents.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {**cls._stats, "entries": len(cls._agents), "max_entries": cls.MAX_ENTRIES}
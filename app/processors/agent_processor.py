@@ -1,25 +1,32 @@
-import traceback
-from typing import Any, Dict, List, Optional
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from app.processors.conversation_processor import ConversationProcessor
+from app.processors.agent_cache import CompiledAgentCache
+from app.processors.conversation_processor import ConversationProcessor, chunk_text
 from app.requests.message_request import MessageRequest
 
+logger = logging.getLogger(__name__)
+
 
 class AgentProcessor(ConversationProcessor):
-    def __init__(self, llm: BaseChatModel, context: str, history: List[str], tools: List[Any]):
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        context: str,
+        history: List[str],
+        tools: List[Any],
+        cache_key: Optional[str] = None,
+    ):
         super().__init__(llm, context, history)
         self.tools = tools
+        # With a cache_key (agent_cache_key) the compiled executor is reused across messages.
+        self.cache_key = cache_key
 
-    async def process(
-        self,
-        request: MessageRequest,
-        files: Optional[List[Dict[str, str]]] = None,
-        supports_interleaved_files: bool = False,
-    ) -> Dict[str, Any]:
+    def _build_executor(self) -> AgentExecutor:
         prompt_template = ChatPromptTemplate.from_messages(
             [
                 ("system", "{context}"),
@@ -31,7 +38,7 @@ class AgentProcessor(ConversationProcessor):
 
         agent = create_tool_calling_agent(llm=self.llm, tools=self.tools, prompt=prompt_template)
 
-        agent_executor = AgentExecutor(
+        return AgentExecutor(
             agent=agent,
             tools=self.tools,
             verbose=False,
@@ -40,26 +47,75 @@ class AgentProcessor(ConversationProcessor):
             return_intermediate_steps=True,
         )
 
+    def _executor(self) -> AgentExecutor:
+        if self.cache_key:
+            return CompiledAgentCache.get_or_build(self.cache_key, self._build_executor)
+        return self._build_executor()
+
+    def _inputs(self, request: MessageRequest) -> Dict[str, Any]:
+        return {
+            "context": self.context or "",
+            "chat_history": self.history,
+            "input": request.query,
+            "agent_scratchpad": "",
+        }
+
+    async def process(
+        self,
+        request: MessageRequest,
+        files: Optional[List[Dict[str, str]]] = None,
+        supports_interleaved_files: bool = False,
+    ) -> Dict[str, Any]:
+        agent_executor = self._executor()
+
         try:
             config = self._get_langsmith_config(request, "agent_processor", has_tools=len(self.tools) > 0)
 
-            result = await agent_executor.ainvoke(
-                {
-                    "context": self.context or "",
-                    "chat_history": self.history,
-                    "input": request.query,
-                    "agent_scratchpad": "",
-                },
-                config=config,
-            )
+            result = await agent_executor.ainvoke(self._inputs(request), config=config)
 
             if "text" not in result and "output" in result:
                 result["text"] = result["output"]
 
             return result
         except Exception as e:
-            print(f"Error durante la ejecución del agente: {str(e)}")
-            print(f"Traceback completo:", traceback.format_exc())
+            logger.exception(f"Error durante la ejecución del agente: {e}")
             return {
                 "message": "Lo siento, no pude procesar tu solicitud correctamente. Por favor, intenta reformular tu pregunta."
             }
+
+    async def stream(
+        self,
+        request: MessageRequest,
+        files: Optional[List[Dict[str, str]]],
+        supports_interleaved_files: bool,
+        result: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the model tokens of the answer while the executor runs.
+
+        Chunks that carry tool calls belong to intermediate steps and are not
+        forwarded; with OpenAI/Gemini those steps have no text, so only the final
+        answer streams. `result["text"]` is the executor's final output.
+        """
+        agent_executor = self._executor()
+        config = self._get_langsmith_config(request, "agent_processor", has_tools=len(self.tools) > 0, streamed=True)
+        root_run_id = None
+        try:
+            async for event in agent_executor.astream_events(self._inputs(request), config=config, version="v2"):
+                if root_run_id is None:
+                    root_run_id = event["run_id"]
+                if event["event"] == "on_chat_model_stream":
+                    chunk = event["data"]["chunk"]
+                    text = chunk_text(chunk.content)
+                    if text and not getattr(chunk, "tool_call_chunks", None):
+                        yield {"event": "delta", "data": {"text": text}}
+                elif event["event"] == "on_chain_end" and event["run_id"] == root_run_id:
+                    result.update(event["data"].get("output") or {})
+
+            if "text" not in result and "output" in result:
+                result["text"] = result["output"]
+        except Exception as e:
+            logger.exception(f"Error durante la ejecución del agente: {e}")
+            result.clear()
+            result["message"] = (
+                "Lo siento, no pude procesar tu solicitud correctamente. Por favor, intenta reformular tu pregunta."
+            )
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from langchain_core.language_models import BaseChatModel
 
@@ -20,3 +20,32 @@ class ConversationProcessor:
         self, query: str, files: Optional[List[Dict[str, str]]], supports_interleaved_files: bool
     ) -> Dict[str, Any]:
         raise NotImplementedError
+
+    async def stream(
+        self,
+        request,
+        files: Optional[List[Dict[str, str]]],
+        supports_interleaved_files: bool,
+        result: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``delta`` events ({"text": chunk}) as the answer is generated and fill
+        `result` with what `process` would have returned.
+
+        Default for processors without token streaming: the whole answer as one delta.
+        """
+        result.update(await self.process(request, files, supports_interleaved_files))
+        if result.get("text"):
+            yield {"event": "delta", "data": {"text": result["text"]}}
+
+
+def chunk_text(content: Any) -> str:
+    """Text of a streamed message chunk (a str, or content blocks for Anthropic/Gemini)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, str) or (isinstance(block, dict) and block.get("type", "text") == "text")
+        )
+    return ""
@@ -0,0 +1,236 @@
+"""
+Long-lived MCP clients shared by every request of the process.
+
+`MCPProcessor` used to open a `MultiServerMCPClient` per message, which
+connects to every server in `mcp_config` (launching stdio servers as
+subprocesses) and tears it all down after the answer. The pool keeps one
+connected client per distinct `mcp_config`:
+
+- Each client lives inside its own owner task: the MCP transports use anyio
+  task groups, which must be entered and exited from the same task, so the
+  request that triggers the connection can't own it.
+- Health check: if a client hasn't been verified for `HEALTH_CHECK_SECONDS`
+  (or its last use raised), every session is pinged before handing it out;
+  a failed ping or a dead owner task means a fresh connection.
+- Idle reaping: clients unused for `IDLE_SECONDS` are closed by a background
+  task, so rarely used agents don't keep subprocesses around.
+- Compiled agents bound to a client's tools are stored on the client
+  (`PooledMCPClient.agent`) and die with it.
+
+`close_all()` is wired into `main.lifespan`.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+from app.configurations.config import (
+    MCP_POOL_CONNECT_TIMEOUT_SECONDS,
+    MCP_POOL_HEALTH_CHECK_SECONDS,
+    MCP_POOL_IDLE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_CLOSE_TIMEOUT_SECONDS = 10.0
+_PING_TIMEOUT_SECONDS = 5.0
+
+
+class PooledMCPClient:
+    def __init__(self, key: str, mcp_config: Dict[str, Any]):
+        self.key = key
+        self.mcp_config = mcp_config
+        self.client: Optional[MultiServerMCPClient] = None
+        self.tools: List[Any] = []
+        self.agents: Dict[str, Any] = {}
+        self.in_use = 0
+        self.retired = False
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+        self._stop = asyncio.Event()
+        self._ready: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, timeout: float) -> None:
+        self._ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _run(self) -> None:
+        try:
+            async with MultiServerMCPClient(self.mcp_config) as client:
+                self.client = client
+                self.tools = client.get_tools()
+                self._ready.set_result(None)
+                await self._stop.wait()
+        except Exception as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            else:
+                logger.warning(f"MCP client {self.key} closed with error: {e}")
+        finally:
+            self.client = None
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and self._task is not None and not self._task.done()
+
+    async def ping(self) -> bool:
+        try:
+            sessions = list(getattr(self.client, "sessions", {}).values())
+            await asyncio.wait_for(
+                asyncio.gather(*(session.send_ping() for session in sessions)), _PING_TIMEOUT_SECONDS
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"MCP client {self.key} failed health check: {e}")
+            return False
+
+    def agent(self, agent_key: str, build: Callable[[], Any]) -> Any:
+        """Agent compiled against this client's tools, built once per agent configuration."""
+        agent = self.agents.get(agent_key)
+        if agent is None:
+            agent = self.agents[agent_key] = build()
+        return agent
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, _CLOSE_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.warning(f"Error closing MCP client {self.key}: {e}")
+
+
+class MCPClientPool:
+    IDLE_SECONDS: float = MCP_POOL_IDLE_SECONDS
+    HEALTH_CHECK_SECONDS: float = MCP_POOL_HEALTH_CHECK_SECONDS
+    CONNECT_TIMEOUT_SECONDS: float = MCP_POOL_CONNECT_TIMEOUT_SECONDS
+
+    _clients: Dict[str, PooledMCPClient] = {}
+    _locks: Dict[str, asyncio.Lock] = {}
+    _closing: Set[asyncio.Task] = set()
+    _reaper: Optional[asyncio.Task] = None
+    _stats: Dict[str, int] = {"created": 0, "reused": 0, "health_failures": 0, "reaped": 0}
+
+    @staticmethod
+    def pool_key(mcp_config: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(mcp_config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    @classmethod
+    @asynccontextmanager
+    async def acquire(cls, mcp_config: Dict[str, Any]) -> AsyncIterator[PooledMCPClient]:
+        entry = await cls._get(mcp_config)
+        entry.in_use += 1
+        try:
+            yield entry
+        except Exception:
+            # The error may come from the LLM, not MCP: just verify the client on next use.
+            entry.last_checked = 0.0
+            raise
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.retired and entry.in_use == 0:
+                cls._close_later(entry)
+
+    @classmethod
+    async def _get(cls, mcp_config: Dict[str, Any]) -> PooledMCPClient:
+        key = cls.pool_key(mcp_config)
+        lock = cls._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = cls._clients.get(key)
+            if entry is not None and entry.alive and time.monotonic() - entry.last_checked > cls.HEALTH_CHECK_SECONDS:
+                if await entry.ping():
+                    entry.last_checked = time.monotonic()
+                else:
+                    cls._stats["health_failures"] += 1
+                    cls._retire(entry)
+                    entry = None
+            if entry is not None and not entry.alive:
+                cls._retire(entry)
+                entry = None
+
+            if entry is None:
+                entry = PooledMCPClient(key, mcp_config)
+                await entry.start(cls.CONNECT_TIMEOUT_SECONDS)
+                cls._clients[key] = entry
+                cls._stats["created"] += 1
+            else:
+                cls._stats["reused"] += 1
+
+        cls._ensure_reaper()
+        return entry
+
+    @classmethod
+    def _retire(cls, entry: PooledMCPClient) -> None:
+        """Take `entry` out of the pool; it is closed once no request is using it."""
+        if cls._clients.get(entry.key) is entry:
+            del cls._clients[entry.key]
+        entry.retired = True
+        if entry.in_use == 0:
+            cls._close_later(entry)
+
+    @classmethod
+    def _close_later(cls, entry: PooledMCPClient) -> None:
+        task = asyncio.create_task(entry.close())
+        cls._closing.add(task)
+        task.add_done_callback(cls._closing.discard)
+
+    @classmethod
+    def _ensure_reaper(cls) -> None:
+        if cls._reaper is None or cls._reaper.done():
+            cls._reaper = asyncio.create_task(cls._reap_loop())
+
+    @classmethod
+    async def _reap_loop(cls) -> None:
+        while True:
+            await asyncio.sleep(max(cls.IDLE_SECONDS / 4, 1.0))
+            await cls.reap_idle()
+
+    @classmethod
+    async def reap_idle(cls) -> int:
+        # Detach every idle client before awaiting any close: while a close
+        # runs, requests may acquire (or replace) the others.
+        now = time.monotonic()
+        idle = []
+        for entry in list(cls._clients.values()):
+            if entry.in_use == 0 and now - entry.last_used > cls.IDLE_SECONDS and cls._clients.get(entry.key) is entry:
+                del cls._clients[entry.key]
+                entry.retired = True
+                idle.append(entry)
+        cls._stats["reaped"] += len(idle)
+        await asyncio.gather(*(entry.close() for entry in idle))
+        return len(idle)
+
+    @classmethod
+    async def close_all(cls) -> None:
+        if cls._reaper is not None:
+            cls._reaper.cancel()
+            cls._reaper = None
+        entries = list(cls._clients.values())
+        cls._clients.clear()
+        cls._locks.clear()
+        await asyncio.gather(*(entry.close() for entry in entries), *cls._closing, return_exceptions=True)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            **cls._stats,
+            "clients": len(cls._clients),
+            "in_use": sum(entry.in_use for entry in cls._clients.values()),
+            "idle_seconds": cls.IDLE_SECONDS,
+        }
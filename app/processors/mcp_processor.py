@@ -3,17 +3,26 @@ import re
 from typing import Any, Dict, List, Optional
 
 from langchain_core.language_models import BaseChatModel
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 
 from app.processors.conversation_processor import ConversationProcessor
+from app.processors.mcp_client_pool import MCPClientPool
 from app.requests.message_request import MessageRequest
 
 
 class MCPProcessor(ConversationProcessor):
-    def __init__(self, llm: BaseChatModel, context: str, history: List[str], mcp_config: Dict[str, Any]):
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        context: str,
+        history: List[str],
+        mcp_config: Dict[str, Any],
+        cache_key: Optional[str] = None,
+    ):
         super().__init__(llm, context, history)
         self.mcp_config = mcp_config
+        # With a cache_key (agent_cache_key) the react agent is compiled once per pooled MCP client.
+        self.cache_key = cache_key
 
     async def process(
         self,
@@ -21,8 +30,11 @@ class MCPProcessor(ConversationProcessor):
         files: Optional[List[Dict[str, str]]] = None,
         supports_interleaved_files: bool = False,
     ) -> Dict[str, Any]:
-        async with MultiServerMCPClient(self.mcp_config) as client:
-            agent = create_react_agent(self.llm, client.get_tools())
+        async with MCPClientPool.acquire(self.mcp_config) as client:
+            if self.cache_key:
+                agent = client.agent(self.cache_key, lambda: create_react_agent(self.llm, client.tools))
+            else:
+                agent = create_react_agent(self.llm, client.tools)
 
             system_message = self.context or ""
             if request.json_parser:
@@ -1,19 +1,17 @@
 import json
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from app.processors.conversation_processor import ConversationProcessor
+from app.processors.conversation_processor import ConversationProcessor, chunk_text
 from app.requests.message_request import MessageRequest
 
 
 class SimpleProcessor(ConversationProcessor):
-    async def generate_response(
-        self, context: str, chat_history: list, query: str, prompt: ChatPromptTemplate, config: dict = None
-    ) -> Dict[str, Any]:
-        chain = (
+    def _chain(self, prompt: ChatPromptTemplate):
+        return (
             {
                 "context": lambda x: x["context"],
                 "chat_history": lambda x: x["chat_history"],
@@ -23,12 +21,8 @@ class SimpleProcessor(ConversationProcessor):
             | self.llm
         )
 
-        raw_response = await chain.ainvoke(
-            {"context": context, "chat_history": chat_history, "input": query}, config=config
-        )
-
-        content = raw_response.content
-
+    @staticmethod
+    def _result(context: str, chat_history: list, query: str, content: str) -> Dict[str, Any]:
         match = re.search(r"```json\n(.*?)\n```", content, re.DOTALL)
         if match:
             json_content = match.group(1)
@@ -38,12 +32,18 @@ class SimpleProcessor(ConversationProcessor):
 
         return {"context": context, "chat_history": chat_history, "input": query, "text": response_content}
 
-    async def process(
-        self,
-        request: MessageRequest,
-        files: Optional[List[Dict[str, str]]] = None,
-        supports_interleaved_files: bool = False,
+    async def generate_response(
+        self, context: str, chat_history: list, query: str, prompt: ChatPromptTemplate, config: dict = None
     ) -> Dict[str, Any]:
+        raw_response = await self._chain(prompt).ainvoke(
+            {"context": context, "chat_history": chat_history, "input": query}, config=config
+        )
+
+        return self._result(context, chat_history, query, raw_response.content)
+
+    def _build_prompt(
+        self, request: MessageRequest, files: Optional[List[Dict[str, str]]], supports_interleaved_files: bool
+    ) -> Tuple[ChatPromptTemplate, Dict[str, Any]]:
         messages = []
         system_message = self.context or ""
 
@@ -96,4 +96,32 @@ class SimpleProcessor(ConversationProcessor):
             has_files=files is not None and len(files) > 0,
         )
 
+        return prompt, config
+
+    async def process(
+        self,
+        request: MessageRequest,
+        files: Optional[List[Dict[str, str]]] = None,
+        supports_interleaved_files: bool = False,
+    ) -> Dict[str, Any]:
+        prompt, config = self._build_prompt(request, files, supports_interleaved_files)
         return await self.generate_response(self.context, self.history, request.query, prompt, config)
+
+    async def stream(
+        self,
+        request: MessageRequest,
+        files: Optional[List[Dict[str, str]]],
+        supports_interleaved_files: bool,
+        result: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        prompt, config = self._build_prompt(request, files, supports_interleaved_files)
+        parts = []
+        async for chunk in self._chain(prompt).astream(
+            {"context": self.context, "chat_history": self.history, "input": request.query}, config=config
+        ):
+            text = chunk_text(chunk.content)
+            if text:
+                parts.append(text)
+                yield {"event": "delta", "data": {"text": text}}
+
+        result.update(self._result(self.context, self.history, request.query, "".join(parts)))
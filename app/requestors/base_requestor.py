@@ -1,9 +1,49 @@
-from typing import Dict
+import asyncio
+from typing import Dict, Optional
 
+import httpx
 import requests
 
+from app.configurations.config import (
+    TOOL_HTTP_MAX_CONCURRENCY,
+    TOOL_HTTP_MAX_RETRIES,
+    TOOL_HTTP_RETRY_BUDGET_RATIO,
+    TOOL_HTTP_TIMEOUT_SECONDS,
+)
+from app.externals.http_clients import get_http_client
+
+# Reintentar un POST/PATCH de una API de terceros puede duplicar efectos: por defecto solo se reintentan estos.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS = {429, 502, 503, 504}
+RETRY_BACKOFF_SECONDS = 0.5
+
+
+class RetryBudget:
+    """Retries allowed as a fraction of requests (each request deposits `ratio` tokens, a retry spends one).
+
+    Keeps a failing third-party API from getting 1 + max_retries times its normal load.
+    """
+
+    def __init__(self, ratio: float = TOOL_HTTP_RETRY_BUDGET_RATIO, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def record_request(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
 
 class BaseRequestor:
+    # Per tool (config name or api): retry budget and cap on concurrent calls.
+    _budgets: Dict[str, RetryBudget] = {}
+    _semaphores: Dict[str, asyncio.Semaphore] = {}
+
     @staticmethod
     def replace_placeholders(text: str, params: dict) -> str:
         """Reemplaza los placeholders en el formato {variable} con valores reales"""
@@ -55,6 +95,7 @@ class BaseRequestor:
                 headers=request_data["headers"],
                 json=request_data.get("body"),
                 params=request_data.get("params", {}),
+                timeout=float(config.get("timeout_seconds") or TOOL_HTTP_TIMEOUT_SECONDS),
             )
 
             response.raise_for_status()
@@ -63,3 +104,56 @@ class BaseRequestor:
             return {"error": f"Error en la petición: {str(e)}"}
         except Exception as e:
             return {"error": f"Error inesperado: {str(e)}"}
+
+    @classmethod
+    async def aexecute_request(cls, config: Dict, params: Dict) -> Dict:
+        """Async version of `execute_request` on the pooled "tools" client.
+
+        Same result contract (response JSON or {"error": ...}). The tool config
+        may set `timeout_seconds` and `max_retries`; retries only happen on
+        transport errors/timeouts and 429/502/503/504, for idempotent methods
+        unless `max_retries` is set explicitly, and within the tool's retry budget.
+        """
+        try:
+            request_data = cls.prepare_request_data(config, params)
+            method = str(request_data["method"]).upper()
+            timeout = float(config.get("timeout_seconds") or TOOL_HTTP_TIMEOUT_SECONDS)
+            default_retries = TOOL_HTTP_MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+            max_retries = int(config.get("max_retries", default_retries))
+        except Exception as e:
+            return {"error": f"Error inesperado: {str(e)}"}
+
+        tool_key = config.get("name") or config["api"]
+        budget = cls._budgets.setdefault(tool_key, RetryBudget())
+        semaphore = cls._semaphores.setdefault(tool_key, asyncio.Semaphore(TOOL_HTTP_MAX_CONCURRENCY))
+        client = get_http_client("tools")
+
+        attempt = 0
+        budget.record_request()
+        async with semaphore:
+            while True:
+                error: Optional[str] = None
+                try:
+                    response = await client.request(
+                        method,
+                        request_data["url"],
+                        headers=request_data["headers"],
+                        json=request_data.get("body"),
+                        params=request_data.get("params", {}),
+                        timeout=timeout,
+                    )
+                    if response.status_code not in RETRYABLE_STATUS:
+                        response.raise_for_status()
+                        return response.json()
+                    error = f"Error en la petición: HTTP {response.status_code} en {request_data['url']}"
+                except httpx.TransportError as e:
+                    error = f"Error en la petición: {type(e).__name__}: {str(e)}"
+                except httpx.HTTPStatusError as e:
+                    return {"error": f"Error en la petición: {str(e)}"}
+                except Exception as e:
+                    return {"error": f"Error inesperado: {str(e)}"}
+
+                if attempt >= max_retries or not budget.try_spend():
+                    return {"error": error}
+                attempt += 1
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * attempt)
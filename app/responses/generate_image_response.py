@@ -11,3 +11,5 @@ class GenerateImageResponse(BaseModel):
     generated_urls: List[str]
     generated_prompt: str
     vision_analysis: Optional[VisionAnalysisResponse] = None
+    # Variations that failed when the others succeeded (partial success).
+    errors: List[str] = []
@@ -4,7 +4,7 @@ import gc
 import logging
 import time
 import uuid
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from fastapi import Depends
@@ -14,12 +14,14 @@ from app.configurations.config import (
 )
 from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
 from app.externals.google_vision.google_vision_client import analyze_image
-from app.externals.images.image_client import google_image, openai_image_edit
-from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
+from app.externals.images.image_client import google_image, openai_image_edit, resolve_image_model
 from app.externals.s3_upload.responses.s3_upload_response import S3UploadResponse
-from app.externals.s3_upload.s3_upload_client import upload_file
-from app.helpers.image_compression_helper import compress_image_to_target
+from app.externals.s3_upload.s3_upload_client import upload_bytes
+from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from app.helpers.concurrency import PRIORITY_NORMAL, get_image_limiter
+from app.helpers.image_compression_pool import compress_image_async
 from app.helpers.request_tracker import RequestTracker
+from app.helpers.retry import RetryPolicy, before_retry, deadline_error, has_time_for
 from app.requests.generate_image_request import GenerateImageRequest
 from app.requests.message_request import MessageRequest
 from app.requests.variation_image_request import VariationImageRequest
@@ -37,19 +39,13 @@ class ImageService(ImageServiceInterface):
         self.message_service = message_service
 
     async def _upload_to_s3(
-        self, image_base64: str, owner_id: str, folder_id: str, prefix_name: str
+        self, image_bytes: bytes, owner_id: str, folder_id: str, prefix_name: str
     ) -> S3UploadResponse:
         unique_id = uuid.uuid4().hex[:8]
         file_name = f"{prefix_name}_{unique_id}"
-        original_image_bytes = base64.b64decode(image_base64)
-        image_base64_compressed = compress_image_to_target(original_image_bytes, target_kb=120)
-        del original_image_bytes
+        compressed = await compress_image_async(image_bytes, target_kb=120)
 
-        return await upload_file(
-            S3UploadRequest(
-                file=image_base64_compressed, folder=f"{owner_id}/products/variations/{folder_id}", filename=file_name
-            )
-        )
+        return await upload_bytes(compressed, folder=f"{owner_id}/products/variations/{folder_id}", filename=file_name)
 
     async def _generate_single_variation(
         self,
@@ -62,32 +58,45 @@ class ImageService(ImageServiceInterface):
         provider: Optional[str] = None,
         model_ai: Optional[str] = None,
         fallback_config: Optional[dict] = None,
+        priority: int = PRIORITY_NORMAL,
     ) -> str:
         RequestTracker.code_active += 1
         t_start = time.monotonic()
         RequestTracker.log("MEM-CODE", "START")
 
         fc = fallback_config or {}
-        max_retries = fc.get("image_max_retries", 5)
-        delay_after = fc.get("image_retry_delay_after", 3)
-        delay_seconds = fc.get("image_retry_delay_seconds", 5)
+        policy = RetryPolicy.after_attempts(
+            max_attempts=fc.get("image_max_retries", 5),
+            delay_after=fc.get("image_retry_delay_after", 3),
+            delay_seconds=fc.get("image_retry_delay_seconds", 5),
+            min_attempt_seconds=10,
+        )
+        max_retries = policy.max_attempts
         fb_provider = fc.get("image_fallback_provider", "openai")
         fb_model = fc.get("image_fallback_model", "gpt-image-1")
 
+        primary_provider = "openai" if provider and provider.lower() == "openai" else "gemini"
+        # Keyed on the image model actually called: agents configured with a text model name
+        # must not share the breaker of the text agents on that model.
+        image_model = resolve_image_model(primary_provider, model_ai)
+        fb_image_model = resolve_image_model(fb_provider, fb_model)
+        breaker = CircuitBreakerRegistry.get(primary_provider, image_model)
+
         last_error = None
         try:
             for attempt in range(1, max_retries + 1):
+                if attempt > 1 and not await before_retry(policy, attempt, last_error):
+                    logger.warning(f"Image: no time left for another {primary_provider}/{image_model} attempt")
+                    break
+                if not breaker.allow():
+                    logger.warning(f"Image: {primary_provider}/{image_model} circuit open, skipping to fallback")
+                    last_error = last_error or CircuitOpenError(f"{primary_provider}/{image_model} circuit open")
+                    break
                 try:
-                    if attempt > delay_after:
-                        await asyncio.sleep(delay_seconds)
-
-                    if provider and provider.lower() == "openai":
-                        image_content = await openai_image_edit(
-                            image_urls=url_images, prompt=prompt, model_ia=model_ai, extra_params=extra_params
-                        )
-                    else:
-                        image_content = await google_image(
-                            image_urls=url_images, prompt=prompt, model_ia=model_ai, extra_params=extra_params
+                    image_fn = openai_image_edit if primary_provider == "openai" else google_image
+                    async with get_image_limiter(primary_provider, image_model).slot(priority):
+                        image_content = await breaker.call(
+                            image_fn, image_urls=url_images, prompt=prompt, model_ia=model_ai, extra_params=extra_params
                         )
 
                     RequestTracker.log(
@@ -96,41 +105,27 @@ class ImageService(ImageServiceInterface):
                         f"image_size={len(image_content)//1024}KB elapsed={time.monotonic()-t_start:.1f}s",
                     )
 
-                    content_base64 = base64.b64encode(image_content).decode("utf-8")
-                    del image_content
-                    final_upload = await self._upload_to_s3(content_base64, owner_id, folder_id, "variation")
-                    del content_base64
+                    final_upload = await self._upload_to_s3(image_content, owner_id, folder_id, "variation")
 
                     RequestTracker.log("MEM-CODE", "POST-UPLOAD")
                     return final_upload.s3_url
                 except Exception as e:
                     last_error = e
                     logger.warning(f"Image attempt {attempt}/{max_retries} failed: {e}")
-                    try:
-                        del image_content  # noqa: F821
-                    except NameError:
-                        pass
-                    try:
-                        del content_base64  # noqa: F821
-                    except NameError:
-                        pass
+                    image_content = None
 
             # Fallback to another provider
             try:
+                if not has_time_for(policy.min_attempt_seconds):
+                    raise deadline_error(last_error)
                 logger.info(f"Trying image fallback: {fb_provider}/{fb_model}")
-                if fb_provider.lower() == "openai":
-                    image_content = await openai_image_edit(
-                        image_urls=url_images, prompt=prompt, model_ia=fb_model, extra_params=extra_params
-                    )
-                else:
-                    image_content = await google_image(
-                        image_urls=url_images, prompt=prompt, model_ia=fb_model, extra_params=extra_params
+                fallback_fn = openai_image_edit if fb_provider.lower() == "openai" else google_image
+                async with get_image_limiter(fb_provider, fb_image_model).slot(priority):
+                    image_content = await CircuitBreakerRegistry.get(fb_provider, fb_image_model).call(
+                        fallback_fn, image_urls=url_images, prompt=prompt, model_ia=fb_model, extra_params=extra_params
                     )
 
-                content_base64 = base64.b64encode(image_content).decode("utf-8")
-                del image_content
-                final_upload = await self._upload_to_s3(content_base64, owner_id, folder_id, "variation")
-                del content_base64
+                final_upload = await self._upload_to_s3(image_content, owner_id, folder_id, "variation")
                 return final_upload.s3_url
             except Exception as e:
                 logger.error(f"Image fallback also failed: {e}")
@@ -142,8 +137,24 @@ class ImageService(ImageServiceInterface):
             gc.collect()
 
     async def generate_variation_images(self, request: VariationImageRequest, owner_id: str):
+        fields, variations = await self._prepare_variation_images(request, owner_id)
+        results = await asyncio.gather(*variations, return_exceptions=True)
+        return self._variations_response(fields, results)
+
+    async def stream_variation_images(
+        self, request: VariationImageRequest, owner_id: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`generate_variation_images` (SSE events, see `_stream_variations`)."""
+        async for event in self._stream_variations(self._prepare_variation_images(request, owner_id)):
+            yield event
+
+    async def _prepare_variation_images(
+        self, request: VariationImageRequest, owner_id: str
+    ) -> Tuple[Dict[str, Any], List[Awaitable[str]]]:
         folder_id = uuid.uuid4().hex[:8]
-        original_image_response = await self._upload_to_s3(request.file, owner_id, folder_id, "original")
+        original_image_response = await self._upload_to_s3(
+            base64.b64decode(request.file), owner_id, folder_id, "original"
+        )
         vision_analysis = await analyze_image(request.file)
 
         message_request = MessageRequest(
@@ -167,7 +178,7 @@ class ImageService(ImageServiceInterface):
             fallback_config = agent_config.metadata["fallback_config"]
 
         prompt = response["text"] + " Do not modify any text, letters, brand logos, brand names, or symbols."
-        tasks = [
+        variations = [
             self._generate_single_variation(
                 [original_image_response.s3_url],
                 prompt,
@@ -181,19 +192,31 @@ class ImageService(ImageServiceInterface):
             )
             for i in range(request.num_variations)
         ]
-        generated_urls = await asyncio.gather(*tasks)
-
-        return GenerateImageResponse(
-            generated_urls=generated_urls,
-            original_url=original_image_response.s3_url,
-            original_urls=[original_image_response.s3_url],
-            generated_prompt=prompt,
-            vision_analysis=vision_analysis,
-        )
+        fields = {
+            "original_url": original_image_response.s3_url,
+            "original_urls": [original_image_response.s3_url],
+            "generated_prompt": prompt,
+            "vision_analysis": vision_analysis,
+        }
+        return fields, variations
 
     async def generate_images_from(
         self, request: GenerateImageRequest, owner_id: str, fallback_config: Optional[dict] = None
     ):
+        fields, variations = await self._prepare_images_from(request, owner_id, fallback_config)
+        results = await asyncio.gather(*variations, return_exceptions=True)
+        return self._variations_response(fields, results)
+
+    async def stream_images_from(
+        self, request: GenerateImageRequest, owner_id: str, fallback_config: Optional[dict] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`generate_images_from` (SSE events, see `_stream_variations`)."""
+        async for event in self._stream_variations(self._prepare_images_from(request, owner_id, fallback_config)):
+            yield event
+
+    async def _prepare_images_from(
+        self, request: GenerateImageRequest, owner_id: str, fallback_config: Optional[dict] = None
+    ) -> Tuple[Dict[str, Any], List[Awaitable[str]]]:
         FORMAT_TO_OPENAI_SIZE = {
             "9:16": "1024x1536",
             "1:1": "1024x1024",
@@ -206,7 +229,9 @@ class ImageService(ImageServiceInterface):
         original_url = request.file_url
 
         if request.file:
-            original_image_response = await self._upload_to_s3(request.file, owner_id, folder_id, "original")
+            original_image_response = await self._upload_to_s3(
+                base64.b64decode(request.file), owner_id, folder_id, "original"
+            )
             original_url = original_image_response.s3_url
 
         if len(urls) == 0 and original_url:
@@ -218,7 +243,7 @@ class ImageService(ImageServiceInterface):
             if request.image_format in FORMAT_TO_OPENAI_SIZE:
                 extra_parameters["resolution"] = FORMAT_TO_OPENAI_SIZE[request.image_format]
 
-        tasks = [
+        variations = [
             self._generate_single_variation(
                 urls,
                 request.prompt,
@@ -232,15 +257,78 @@ class ImageService(ImageServiceInterface):
             )
             for i in range(request.num_variations)
         ]
-        generated_urls = await asyncio.gather(*tasks)
-
+        fields = {"original_urls": urls, "original_url": original_url, "generated_prompt": request.prompt}
+        return fields, variations
+
+    @staticmethod
+    def _variations_response(fields: Dict[str, Any], results: List[Any]) -> GenerateImageResponse:
+        """Partial success: the variations that worked, plus the errors of the others. Raises only
+        if every variation failed."""
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures and len(failures) == len(results):
+            raise failures[0]
+        if failures:
+            logger.warning(f"Image: {len(failures)}/{len(results)} variations failed, returning the rest")
         return GenerateImageResponse(
-            original_urls=urls,
-            generated_urls=generated_urls,
-            original_url=original_url,
-            generated_prompt=request.prompt,
+            **fields,
+            generated_urls=[result for result in results if not isinstance(result, BaseException)],
+            errors=[f"{type(error).__name__}: {str(error)[:200]}" for error in failures],
         )
 
+    async def _stream_variations(
+        self, prepare: Awaitable[Tuple[Dict[str, Any], List[Awaitable[str]]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Emits ``start`` (original urls, prompt, total), then ``image`` / ``image_error`` for each
+        variation the moment it's uploaded or has failed for good, and ``done`` with the same payload
+        the non-streaming endpoint returns (or ``error`` if nothing could be generated)."""
+        try:
+            fields, variations = await prepare
+        except Exception as e:
+            logger.error(f"Image stream failed before generating: {type(e).__name__}: {e}")
+            yield {"event": "error", "data": {"detail": str(e)}}
+            return
+
+        tasks = [asyncio.create_task(variation) for variation in variations]
+        index = {task: i for i, task in enumerate(tasks)}
+        results: List[Any] = [None] * len(tasks)
+        try:
+            yield {
+                "event": "start",
+                "data": {
+                    "original_url": fields.get("original_url"),
+                    "original_urls": fields.get("original_urls"),
+                    "generated_prompt": fields.get("generated_prompt"),
+                    "total": len(tasks),
+                },
+            }
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=index.get):
+                    i = index[task]
+                    error = task.exception()
+                    if error is not None:
+                        results[i] = error
+                        yield {
+                            "event": "image_error",
+                            "data": {"index": i, "error": f"{type(error).__name__}: {str(error)[:200]}"},
+                        }
+                    else:
+                        results[i] = task.result()
+                        yield {"event": "image", "data": {"index": i, "url": results[i]}}
+
+            try:
+                response = self._variations_response(fields, results)
+            except Exception as e:
+                yield {"event": "error", "data": {"detail": str(e)}}
+                return
+            yield {"event": "done", "data": response.model_dump()}
+        finally:
+            # Client went away: stop the variations still generating.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     async def generate_images_from_agent(self, request: GenerateImageRequest, owner_id: str):
         parameter_prompt = request.parameter_prompt or {}
         parameter_prompt["language"] = request.language
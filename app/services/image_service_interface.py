@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 from app.requests.generate_image_request import GenerateImageRequest
 from app.requests.variation_image_request import VariationImageRequest
@@ -16,5 +16,15 @@ class ImageServiceInterface(ABC):
     ):
         pass
 
+    @abstractmethod
+    def stream_variation_images(self, request: VariationImageRequest, owner_id: str) -> AsyncIterator[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def stream_images_from(
+        self, request: GenerateImageRequest, owner_id: str, fallback_config: Optional[dict] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        pass
+
     async def generate_images_from_agent(self, generate_image_request, owner_id):
         pass
@@ -0,0 +1,547 @@
+"""
+Durable queue for the async generation endpoints.
+
+`/generate-section-image/async/api-key` and `/video-studio/draft/async/api-key`
+used to answer 202 and run the work in a bare `asyncio.create_task`: a restart
+or deploy lost every job in flight (and its webhook), nothing bounded how many
+ran at once, and the caller had no status to poll.
+
+- `JobStore`: jobs and pending webhooks in a local SQLite file (WAL), shared by
+  every uvicorn worker of the host. A job is claimed with a lease
+  (`JOB_QUEUE_LEASE_SECONDS`) renewed while it runs; when the process dies the
+  lease expires and another worker (or the next startup) runs it again, up to
+  `JOB_QUEUE_MAX_ATTEMPTS` runs.
+- Idempotency: a job submitted again with the same (kind, idempotency key)
+  returns the existing job instead of enqueuing a new one.
+- `JobQueue`: `JOB_QUEUE_WORKERS` workers per process, started in `lifespan`.
+  Each kind registers a handler that returns the callback payload (never
+  raises); the job succeeds when the payload's status is "success". Leases are
+  renewed by their own task, so a slow webhook round never lets them expire.
+  Store calls run on the store's thread, off the event loop.
+- Outbox: the job's result and its webhook are written in the same transaction.
+  Delivery through `post_callback` is retried with exponential backoff up to
+  `CALLBACK_OUTBOX_MAX_ATTEMPTS`, then the row is marked dead.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from app.configurations.config import (
+    CALLBACK_OUTBOX_BACKOFF_SECONDS,
+    CALLBACK_OUTBOX_MAX_ATTEMPTS,
+    CALLBACK_OUTBOX_MAX_BACKOFF_SECONDS,
+    JOB_QUEUE_LEASE_SECONDS,
+    JOB_QUEUE_MAX_ATTEMPTS,
+    JOB_QUEUE_POLL_SECONDS,
+    JOB_QUEUE_RETENTION_SECONDS,
+    JOB_QUEUE_SQLITE_PATH,
+    JOB_QUEUE_WORKERS,
+)
+from app.db.audit_logger import log_prompt
+from app.externals.callback.callback_client import post_callback
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (job_id, payload) -> callback payload
+JobHandler = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+# (job_id, payload, error) -> error callback payload when the handler couldn't produce one
+JobFailure = Callable[[str, Dict[str, Any], str], Dict[str, Any]]
+
+_FINISHED = ("succeeded", "failed")
+
+
+def _loads(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+
+class JobStore:
+    """Jobs and their webhook outbox in a local SQLite file.
+
+    Calls are synchronous like the other SQLite stores of the service. Each one
+    is a short transaction, but it can wait up to the 5s busy timeout while
+    another worker of the host writes, so async callers go through `run`.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, idempotency_key TEXT, payload TEXT NOT NULL,"
+            " callback_url TEXT, owner_id TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT, lease_until REAL, result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency_key ON jobs (kind, idempotency_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS callback_outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, owner_id TEXT, url TEXT NOT NULL,"
+            " payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL,"
+            " last_error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_callback_outbox_due ON callback_outbox (status, next_attempt_at)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_callback_outbox_job ON callback_outbox (job_id)")
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run one of the store's calls on its thread, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            # BEGIN IMMEDIATE: dos workers del host nunca reclaman el mismo job.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        callback_url: Optional[str] = None,
+        owner_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Insert a queued job. With an idempotency key already seen for `kind`, returns that job
+        instead. Returns (job, created)."""
+        now = time.time()
+        with self._transaction() as conn:
+            if idempotency_key:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? AND idempotency_key = ?", (kind, idempotency_key)
+                ).fetchone()
+                if row:
+                    return dict(row), False
+            row = conn.execute(
+                "INSERT INTO jobs (id, kind, idempotency_key, payload, callback_url, owner_id, status,"
+                " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?) RETURNING *",
+                (
+                    job_id or str(uuid.uuid4()),
+                    kind,
+                    idempotency_key,
+                    json.dumps(payload, ensure_ascii=False, default=str),
+                    callback_url,
+                    owner_id,
+                    now,
+                    now,
+                ),
+            ).fetchone()
+        return dict(row), True
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or a running one whose lease expired (its worker died)."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?,"
+                " updated_at = ? WHERE id = ("
+                "  SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                "  ORDER BY created_at LIMIT 1"
+                ") RETURNING *",
+                (worker, now + lease_seconds, now, now),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def renew(self, worker: str, job_ids: List[str], lease_seconds: float) -> None:
+        if not job_ids:
+            return
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'running' AND id IN ({placeholders})",
+                (time.time() + lease_seconds, worker, *job_ids),
+            )
+
+    def finish(
+        self,
+        job_id: str,
+        worker: str,
+        status: str,
+        result: Dict[str, Any],
+        error: Optional[str] = None,
+    ) -> bool:
+        """Store the outcome and queue its webhook, atomically. False if the job's lease was lost
+        (another worker took it over) and the outcome was discarded."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'running' RETURNING callback_url, owner_id",
+                (status, json.dumps(result, ensure_ascii=False, default=str), error, now, job_id, worker),
+            ).fetchone()
+            if row is None:
+                return False
+            if row["callback_url"]:
+                conn.execute(
+                    "INSERT INTO callback_outbox (job_id, owner_id, url, payload, status, next_attempt_at,"
+                    " created_at, updated_at) VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)",
+                    (
+                        job_id,
+                        row["owner_id"],
+                        row["callback_url"],
+                        json.dumps(result, ensure_ascii=False, default=str),
+                        now,
+                        now,
+                        now,
+                    ),
+                )
+        return True
+
+    def release(self, worker: str) -> int:
+        """Put back in the queue the jobs this worker was running (graceful shutdown). The
+        interrupted run doesn't count as an attempt."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), worker = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE worker = ? AND status = 'running'",
+                (time.time(), worker),
+            ).rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            callback = self._conn.execute(
+                "SELECT status, attempts, last_error, updated_at FROM callback_outbox WHERE job_id = ?"
+                " ORDER BY id DESC LIMIT 1",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "result": _loads(row["result"]),
+            "error": row["error"],
+            "callback": dict(callback) if callback else None,
+        }
+
+    def claim_callbacks(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Due webhooks. Their next attempt is pushed `lease_seconds` ahead while this worker sends them."""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "UPDATE callback_outbox SET attempts = attempts + 1, next_attempt_at = ?, updated_at = ?"
+                " WHERE id IN ("
+                "  SELECT id FROM callback_outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+                "  ORDER BY next_attempt_at LIMIT ?"
+                ") RETURNING *",
+                (now + lease_seconds, now, now, limit),
+            ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    def callback_delivered(self, callback_id: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE callback_outbox SET status = 'delivered', last_error = NULL, updated_at = ? WHERE id = ?",
+                (time.time(), callback_id),
+            )
+
+    def callback_failed(self, callback_id: int, error: str, retry_at: Optional[float]) -> None:
+        """Schedule the next attempt at `retry_at`, or give up (status dead) when it's None."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE callback_outbox SET status = ?, next_attempt_at = COALESCE(?, next_attempt_at),"
+                " last_error = ?, updated_at = ? WHERE id = ?",
+                ("pending" if retry_at is not None else "dead", retry_at, error[:500], time.time(), callback_id),
+            )
+
+    def prune(self, retention_seconds: float) -> int:
+        """Delete finished jobs and settled webhooks older than `retention_seconds`."""
+        cutoff = time.time() - retention_seconds
+        with self._transaction() as conn:
+            callbacks = conn.execute(
+                "DELETE FROM callback_outbox WHERE status IN ('delivered', 'dead') AND updated_at < ?", (cutoff,)
+            ).rowcount
+            jobs = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?"
+                " AND id NOT IN (SELECT job_id FROM callback_outbox WHERE status = 'pending')",
+                (*_FINISHED, cutoff),
+            ).rowcount
+        return jobs + callbacks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            callbacks = self._conn.execute("SELECT status, COUNT(*) FROM callback_outbox GROUP BY status").fetchall()
+        return {
+            "jobs": {status: count for status, count in jobs},
+            "callbacks": {status: count for status, count in callbacks},
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+class JobQueue:
+    WORKERS = JOB_QUEUE_WORKERS
+    LEASE_SECONDS = JOB_QUEUE_LEASE_SECONDS
+    MAX_ATTEMPTS = JOB_QUEUE_MAX_ATTEMPTS
+    POLL_SECONDS = JOB_QUEUE_POLL_SECONDS
+
+    _store: Optional[JobStore] = None
+    _handlers: Dict[str, Tuple[JobHandler, JobFailure]] = {}
+    _tasks: List[asyncio.Task] = []
+    _active: Set[str] = set()
+    _wakeup: Optional[asyncio.Event] = None
+    _worker = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    _stats: Dict[str, int] = {
+        "submitted": 0,
+        "deduplicated": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "abandoned": 0,
+        "callbacks_delivered": 0,
+        "callbacks_retried": 0,
+        "callbacks_dead": 0,
+    }
+
+    @classmethod
+    def store(cls) -> JobStore:
+        if cls._store is None:
+            cls._store = JobStore()
+        return cls._store
+
+    @classmethod
+    def register(cls, kind: str, handler: JobHandler, on_failure: JobFailure) -> None:
+        """`handler` runs the job and returns its callback payload; `on_failure` builds the error
+        payload when it couldn't (it raised, or its worker kept dying until the attempts ran out)."""
+        cls._handlers[kind] = (handler, on_failure)
+
+    @classmethod
+    async def submit(
+        cls,
+        kind: str,
+        payload: Dict[str, Any],
+        callback_url: Optional[str] = None,
+        owner_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Persist a job for the workers. Returns (job, created); created is False when the
+        idempotency key matched an existing job."""
+        store = cls.store()
+        job, created = await store.run(store.enqueue, kind, payload, callback_url, owner_id, idempotency_key, job_id)
+        cls._stats["submitted" if created else "deduplicated"] += 1
+        if created and cls._wakeup is not None:
+            cls._wakeup.set()
+        return job, created
+
+    @classmethod
+    async def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        store = cls.store()
+        return await store.run(store.get, job_id)
+
+    @classmethod
+    async def start(cls) -> None:
+        """Start the workers, the lease renewal and the outbox loop. Jobs left running by a dead
+        process are picked up once their lease expires."""
+        if cls._tasks:
+            return
+        cls._wakeup = asyncio.Event()
+        cls._tasks = [asyncio.create_task(cls._work()) for _ in range(max(1, cls.WORKERS))]
+        cls._tasks.append(asyncio.create_task(cls._renew_leases()))
+        cls._tasks.append(asyncio.create_task(cls._maintain()))
+        logger.info(f"[JOBS] {cls.WORKERS} workers started ({cls._worker})")
+
+    @classmethod
+    async def stop(cls) -> None:
+        tasks, cls._tasks = cls._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            store = cls.store()
+            released = await store.run(store.release, cls._worker)
+            if released:
+                logger.info(f"[JOBS] {released} interrupted jobs back in the queue")
+        cls._active.clear()
+
+    @classmethod
+    async def _work(cls) -> None:
+        store = cls.store()
+        while True:
+            try:
+                job = await store.run(store.claim, cls._worker, cls.LEASE_SECONDS)
+            except sqlite3.Error as e:
+                logger.error(f"[JOBS] claim failed: {e}")
+                job = None
+            if job is None:
+                cls._wakeup.clear()
+                try:
+                    await asyncio.wait_for(cls._wakeup.wait(), timeout=cls.POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await cls._run(job)
+
+    @classmethod
+    async def _run(cls, job: Dict[str, Any]) -> None:
+        job_id, kind = job["id"], job["kind"]
+        payload = json.loads(job["payload"])
+        handler, on_failure = cls._handlers.get(kind, (None, None))
+        error = None
+        if handler is None:
+            error = f"no handler registered for job kind '{kind}'"
+            result = {"status": "error", "error": error}
+        elif job["attempts"] > cls.MAX_ATTEMPTS:
+            error = f"job abandoned after {cls.MAX_ATTEMPTS} interrupted attempts"
+            result = on_failure(job_id, payload, error)
+            cls._stats["abandoned"] += 1
+        else:
+            if job["attempts"] > 1:
+                logger.warning(f"[JOBS] resuming {kind} job {job_id} (attempt {job['attempts']})")
+            cls._active.add(job_id)
+            try:
+                result = await handler(job_id, payload)
+            except Exception as e:
+                logger.error(f"[JOBS] {kind} job {job_id} handler raised: {type(e).__name__}: {e}")
+                error = f"{type(e).__name__}: {e}"
+                result = on_failure(job_id, payload, error)
+            finally:
+                cls._active.discard(job_id)
+
+        status = "succeeded" if result.get("status") == "success" else "failed"
+        if status == "failed" and error is None:
+            error = str(result.get("error") or "unknown")
+        store = cls.store()
+        if not await store.run(store.finish, job_id, cls._worker, status, result, error):
+            logger.warning(f"[JOBS] {kind} job {job_id} lost its lease, result discarded")
+            return
+        cls._stats[status] += 1
+        if job["callback_url"] and cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    async def _renew_leases(cls) -> None:
+        """Keep the leases of the jobs this process is running, three times per lease."""
+        store = cls.store()
+        while True:
+            await asyncio.sleep(cls.LEASE_SECONDS / 3)
+            try:
+                await store.run(store.renew, cls._worker, list(cls._active), cls.LEASE_SECONDS)
+            except sqlite3.Error as e:
+                logger.error(f"[JOBS] lease renewal failed: {e}")
+
+    @classmethod
+    async def _maintain(cls) -> None:
+        """Deliver due webhooks and prune old rows."""
+        store = cls.store()
+        rounds = 0
+        while True:
+            try:
+                await cls.deliver_callbacks()
+                rounds += 1
+                if rounds % 1000 == 1:
+                    await store.run(store.prune, JOB_QUEUE_RETENTION_SECONDS)
+            except sqlite3.Error as e:
+                logger.error(f"[JOBS] maintenance failed: {e}")
+            await asyncio.sleep(cls.POLL_SECONDS)
+
+    @classmethod
+    async def deliver_callbacks(cls, limit: int = 20) -> None:
+        store = cls.store()
+        callbacks = await store.run(store.claim_callbacks, limit, cls.LEASE_SECONDS)
+        if callbacks:
+            await asyncio.gather(*(cls._deliver(callback) for callback in callbacks))
+
+    @classmethod
+    async def _deliver(cls, callback: Dict[str, Any]) -> None:
+        attempt = callback["attempts"]
+        metadata = {"job_id": callback["job_id"], "payload_status": callback["payload"].get("status")}
+        try:
+            # Un solo intento por vuelta: el backoff entre intentos lo maneja el outbox.
+            await post_callback(callback["url"], callback["payload"], max_retries=1)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retry_at = None
+            if attempt < CALLBACK_OUTBOX_MAX_ATTEMPTS:
+                delay = min(CALLBACK_OUTBOX_MAX_BACKOFF_SECONDS, CALLBACK_OUTBOX_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                retry_at = time.time() + delay
+            store = cls.store()
+            await store.run(store.callback_failed, callback["id"], error, retry_at)
+            cls._stats["callbacks_retried" if retry_at is not None else "callbacks_dead"] += 1
+            logger.error(f"Callback failed for job_id={callback['job_id']} (attempt {attempt}): {error}")
+            asyncio.create_task(
+                log_prompt(
+                    log_type="callback_result",
+                    prompt=f"callback to {callback['url']}",
+                    owner_id=callback["owner_id"],
+                    model="callback",
+                    provider="httpx",
+                    status="error",
+                    error_message=error,
+                    attempt_number=attempt,
+                    metadata=metadata,
+                )
+            )
+            return
+
+        store = cls.store()
+        await store.run(store.callback_delivered, callback["id"])
+        cls._stats["callbacks_delivered"] += 1
+        asyncio.create_task(
+            log_prompt(
+                log_type="callback_result",
+                prompt=f"callback to {callback['url']}",
+                owner_id=callback["owner_id"],
+                model="callback",
+                provider="httpx",
+                status="success",
+                attempt_number=attempt,
+                metadata=metadata,
+            )
+        )
+
+    @classmethod
+    def clear(cls) -> None:
+        """Forget the store and the counters (tests). Registered handlers are kept."""
+        cls._store = None
+        cls._tasks = []
+        cls._active.clear()
+        cls._wakeup = None
+        for key in cls._stats:
+            cls._stats[key] = 0
+
+    @classmethod
+    async def stats(cls) -> Dict[str, Any]:
+        store = cls.store()
+        return {
+            **cls._stats,
+            **(await store.run(store.stats)),
+            "workers": cls.WORKERS if cls._tasks else 0,
+            "active": len(cls._active),
+            "kinds": sorted(cls._handlers),
+        }
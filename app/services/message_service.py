@@ -1,6 +1,9 @@
 import asyncio
 import hashlib
 import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict
 
 from fastapi import Depends
 from json_repair import repair_json
@@ -8,8 +11,10 @@ from json_repair import repair_json
 from app.configurations.config import AGENT_RECOMMEND_PRODUCTS_ID, AGENT_RECOMMEND_SIMILAR_PRODUCTS_ID, ENVIRONMENT
 from app.configurations.copies_config import AGENT_COPIES
 from app.configurations.pdf_manual_config import PDF_MANUAL_SECTIONS, get_sections_for_language
-from app.externals.agent_config.agent_config_client import get_agent
+from app.db.audit_logger import log_prompt
+from app.externals.agent_config.agent_config_cache import get_agent
 from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
 from app.externals.amazon.amazon_client import search_products
 from app.externals.amazon.requests.amazon_search_request import AmazonSearchRequest
 from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
@@ -25,6 +30,9 @@ from app.requests.recommend_product_request import RecommendProductRequest
 from app.requests.resolve_funnel_request import ResolveFunnelRequest
 from app.responses.recommend_product_response import RecommendProductResponse
 from app.services.message_service_interface import MessageServiceInterface
+from app.services.response_cache import ResponseCache, response_cache_key, response_cache_ttl
+
+logger = logging.getLogger(__name__)
 
 
 class MessageService(MessageServiceInterface):
@@ -41,7 +49,80 @@ class MessageService(MessageServiceInterface):
 
         agent_config = await get_agent(data)
 
-        return await self.conversation_manager.process_conversation(request=request, agent_config=agent_config)
+        return await self._process(request, agent_config)
+
+    async def handle_message_stream(self, request: MessageRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`handle_message` (SSE events).
+
+        Emits ``delta`` events with the answer as the model writes it, then
+        ``done`` with the same payload `/handle-message` returns (or ``error``).
+        """
+        started = time.monotonic()
+        try:
+            agent_config = await get_agent(
+                AgentConfigRequest(
+                    agent_id=request.agent_id,
+                    query=request.query,
+                    metadata_filter=request.metadata_filter,
+                    parameter_prompt=request.parameter_prompt,
+                )
+            )
+            async for event in self.conversation_manager.stream_conversation(request, agent_config):
+                if event["event"] == "done" and request.agent_id:
+                    asyncio.create_task(
+                        log_prompt(
+                            log_type="agent_call",
+                            prompt=request.query,
+                            agent_id=request.agent_id,
+                            model=agent_config.model_ai,
+                            provider=agent_config.provider_ai,
+                            response_text=str(event["data"])[:5000] if event["data"] else None,
+                            elapsed_ms=int((time.monotonic() - started) * 1000),
+                            metadata={"streamed": True},
+                        )
+                    )
+                yield event
+        except Exception as e:
+            logger.error(f"Streaming message for agent {request.agent_id} failed: {e}")
+            asyncio.create_task(
+                log_prompt(
+                    log_type="agent_call",
+                    prompt=request.query,
+                    agent_id=request.agent_id,
+                    status="error",
+                    error_message=str(e)[:1000],
+                    elapsed_ms=int((time.monotonic() - started) * 1000),
+                    metadata={"streamed": True},
+                )
+            )
+            yield {"event": "error", "data": {"detail": str(e)}}
+
+    async def _process(self, request: MessageRequest, agent_config: AgentConfigResponse):
+        """process_conversation, served from ResponseCache when the agent opted in."""
+        ttl = response_cache_ttl(request, agent_config)
+        if ttl is None:
+            return await self.conversation_manager.process_conversation(request=request, agent_config=agent_config)
+
+        started = time.monotonic()
+        key = response_cache_key(request, agent_config)
+        response = await ResponseCache.get(key)
+        hit = response is not None
+        if not hit:
+            response = await self.conversation_manager.process_conversation(request=request, agent_config=agent_config)
+            await ResponseCache.set(key, response, ttl)
+
+        asyncio.create_task(
+            log_prompt(
+                log_type="response_cache",
+                agent_id=agent_config.agent_id,
+                model=agent_config.model_ai,
+                provider=agent_config.provider_ai,
+                status="cache_hit" if hit else "cache_miss",
+                elapsed_ms=int((time.monotonic() - started) * 1000),
+                metadata={"key": key.rsplit(":", 1)[1][:16], "ttl_seconds": ttl},
+            )
+        )
+        return response
 
     async def handle_message_with_config(self, request: MessageRequest):
         data = AgentConfigRequest(
@@ -53,9 +134,7 @@ class MessageService(MessageServiceInterface):
 
         agent_config = await get_agent(data)
 
-        message_response = await self.conversation_manager.process_conversation(
-            request=request, agent_config=agent_config
-        )
+        message_response = await self._process(request, agent_config)
         return {"message": message_response, "agent_config": agent_config}
 
     async def handle_message_json(self, request: MessageRequest):
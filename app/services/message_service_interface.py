@@ -13,6 +13,10 @@ class MessageServiceInterface(ABC):
     async def handle_message(self, request: MessageRequest):
         pass
 
+    @abstractmethod
+    def handle_message_stream(self, request: MessageRequest):
+        pass
+
     @abstractmethod
     async def handle_message_json(self, request: MessageRequest):
         pass
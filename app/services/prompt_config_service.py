@@ -13,8 +13,14 @@ Behavior:
 - On any fetch error (network, 404, invalid payload), returns a fallback
   hardcoded at import-time by the consumer. Never raises if a fallback is
   registered.
-- asyncio.Lock per class to avoid cache stampede when multiple concurrent
-  requests miss the cache simultaneously.
+- Single-flight per `agent_id`: concurrent misses for the same prompt share
+  one in-flight fetch, and a miss for one prompt never blocks another.
+- Refresh-ahead: within REFRESH_AHEAD_SECONDS of expiry the cached value is
+  served and a background refresh is started, so hot prompts never expire
+  on the request path.
+- Negative cache: a failed fetch is remembered for NEGATIVE_TTL_SECONDS and
+  the fallback is served without hitting agent-config again.
+- `warm_up()` fetches every registered fallback's prompt at startup.
 """
 
 import asyncio
@@ -30,10 +36,13 @@ logger = logging.getLogger(__name__)
 
 class PromptConfigService:
     CACHE_TTL_SECONDS: float = 60.0
+    REFRESH_AHEAD_SECONDS: float = 10.0
+    NEGATIVE_TTL_SECONDS: float = 15.0
 
     _cache: Dict[str, Tuple[str, float]] = {}
+    _negative: Dict[str, float] = {}
     _fallbacks: Dict[str, str] = {}
-    _lock = asyncio.Lock()
+    _inflight: Dict[str, "asyncio.Task[Optional[str]]"] = {}
 
     @classmethod
     def register_fallback(cls, agent_id: str, content: str) -> None:
@@ -43,33 +52,79 @@ class PromptConfigService:
     def invalidate(cls, agent_id: Optional[str] = None) -> None:
         if agent_id is None:
             cls._cache.clear()
+            cls._negative.clear()
+            cls._inflight.clear()
         else:
             cls._cache.pop(agent_id, None)
+            cls._negative.pop(agent_id, None)
+            cls._inflight.pop(agent_id, None)
 
     @classmethod
     async def get(cls, agent_id: str) -> str:
         now = time.monotonic()
         cached = cls._cache.get(agent_id)
-        if cached and now - cached[1] < cls.CACHE_TTL_SECONDS:
-            return cached[0]
-
-        async with cls._lock:
-            cached = cls._cache.get(agent_id)
-            if cached and time.monotonic() - cached[1] < cls.CACHE_TTL_SECONDS:
+        if cached:
+            age = now - cached[1]
+            if age < cls.CACHE_TTL_SECONDS:
+                if age >= cls.CACHE_TTL_SECONDS - cls.REFRESH_AHEAD_SECONDS:
+                    cls._start_fetch(agent_id)
                 return cached[0]
 
-            content = await cls._fetch(agent_id)
-            if content is None:
-                fallback = cls._fallbacks.get(agent_id)
-                if fallback is None:
-                    raise RuntimeError(
-                        f"AI prompt '{agent_id}' not available in agent-config and no fallback registered"
-                    )
-                logger.warning(f"Using fallback for AI prompt agent_id={agent_id}")
-                return fallback
+        failed_at = cls._negative.get(agent_id)
+        if failed_at is not None and now - failed_at < cls.NEGATIVE_TTL_SECONDS:
+            return cls._fallback_or_raise(agent_id)
+
+        content = await asyncio.shield(cls._start_fetch(agent_id))
+        if content is None:
+            return cls._fallback_or_raise(agent_id)
+        return content
+
+    @classmethod
+    async def warm_up(cls, timeout: Optional[float] = None) -> None:
+        """Fetch every prompt that has a registered fallback, concurrently.
+
+        On timeout the fetches keep running in the background and will fill
+        the cache when they finish.
+        """
+        tasks = [cls._start_fetch(agent_id) for agent_id in list(cls._fallbacks)]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        loaded = sum(1 for task in done if not task.cancelled() and task.result() is not None)
+        logger.info(f"AI prompts warm-up: {loaded}/{len(tasks)} loaded, {len(pending)} still pending")
+
+    @classmethod
+    def _fallback_or_raise(cls, agent_id: str) -> str:
+        fallback = cls._fallbacks.get(agent_id)
+        if fallback is None:
+            raise RuntimeError(f"AI prompt '{agent_id}' not available in agent-config and no fallback registered")
+        logger.warning(f"Using fallback for AI prompt agent_id={agent_id}")
+        return fallback
+
+    @classmethod
+    def _start_fetch(cls, agent_id: str) -> "asyncio.Task[Optional[str]]":
+        """Return the in-flight fetch for `agent_id`, starting one if needed."""
+        task = cls._inflight.get(agent_id)
+        if task is None:
+            task = asyncio.create_task(cls._fetch(agent_id))
+            cls._inflight[agent_id] = task
+            task.add_done_callback(lambda t: cls._on_fetch_done(agent_id, t))
+        return task
 
+    @classmethod
+    def _on_fetch_done(cls, agent_id: str, task: "asyncio.Task[Optional[str]]") -> None:
+        # Si hubo un invalidate() mientras el fetch estaba en vuelo, su resultado se descarta.
+        if cls._inflight.get(agent_id) is not task:
+            return
+        cls._inflight.pop(agent_id)
+        if task.cancelled():
+            return
+        content = task.result()
+        if content is None:
+            cls._negative[agent_id] = time.monotonic()
+        else:
             cls._cache[agent_id] = (content, time.monotonic())
-            return content
+            cls._negative.pop(agent_id, None)
 
     @staticmethod
     async def _fetch(agent_id: str) -> Optional[str]:
@@ -0,0 +1,304 @@
+"""
+Exact-match cache of agent responses for deterministic calls.
+
+Several flows call agents whose answer is a pure function of the input: the
+scraper extraction agent, product recommendation, the `agent_copies_pdf`
+sections, the funnel resolution steps. `MessageService` sent every one of them
+to the LLM, even for an input it answered minutes ago.
+
+Opt-in per agent: `metadata.response_cache` in agent-config (`true`, or
+`{"ttl_seconds": N}`) or the agent_id listed in `RESPONSE_CACHE_AGENT_IDS`.
+Requests with a `conversation_id` are never cached (their answer depends on
+the history).
+
+- Key: agent_id plus a sha256 of the agent version (`agent_cache_key`, and
+  `metadata.version` when agent-config sends it), the rendered prompt, the
+  query, a hash of the files and the json_parser.
+- `MemoryResponseCache`: LRU bounded by entries and bytes, per-entry TTL.
+- `SqliteResponseCache`: same contract on a local SQLite file shared by the
+  workers of the host (`RESPONSE_CACHE_BACKEND=sqlite`). Its calls run on a
+  dedicated thread (`run`), off the event loop.
+- Only successful answers are stored: a response needs a `text` and no
+  `error` or `message` fallback (`AgentProcessor` returns an apology in
+  `message` instead of raising). What is stored is the `CACHED_FIELDS`
+  projection, without per-run internals such as `intermediate_steps` or
+  `chat_history`.
+- Values are stored as JSON, so every hit returns a fresh copy; projections
+  that still aren't JSON-serializable are not cached.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.configurations.config import (
+    RESPONSE_CACHE_AGENT_IDS,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SQLITE_PATH,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
+from app.processors.agent_cache import agent_cache_key
+from app.requests.message_request import MessageRequest
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Fields of a processor response that callers read; the rest is per-run state.
+CACHED_FIELDS = ("text", "tool_result")
+
+
+def response_cache_ttl(request: MessageRequest, agent_config: AgentConfigResponse) -> Optional[float]:
+    """TTL in seconds if this request may be served from the cache, else None."""
+    if request.conversation_id:
+        return None
+    setting = (agent_config.metadata or {}).get("response_cache")
+    if isinstance(setting, dict):
+        if not setting.get("enabled", True):
+            return None
+        return float(setting.get("ttl_seconds", RESPONSE_CACHE_TTL_SECONDS))
+    if setting is True or (setting is None and agent_config.agent_id in RESPONSE_CACHE_AGENT_IDS):
+        return RESPONSE_CACHE_TTL_SECONDS
+    return None
+
+
+def response_cache_key(request: MessageRequest, agent_config: AgentConfigResponse) -> str:
+    fingerprint = json.dumps(
+        {
+            "version": [agent_cache_key(agent_config), (agent_config.metadata or {}).get("version")],
+            "prompt": agent_config.prompt,
+            "query": request.query,
+            "files": hashlib.sha256(json.dumps(request.files or [], sort_keys=True, default=str).encode()).hexdigest(),
+            "json_parser": request.json_parser,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"{agent_config.agent_id}:{hashlib.sha256(fingerprint.encode()).hexdigest()}"
+
+
+def _agent_of(key: str) -> str:
+    return key.rsplit(":", 1)[0]
+
+
+class MemoryResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (json payload, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"evicted_lru": 0, "expired": 0}
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return fn(*args)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._discard(key)
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, payload: str, ttl_seconds: float) -> None:
+        self._discard(key)
+        self._entries[key] = (payload, time.monotonic() + ttl_seconds)
+        self._bytes += len(payload)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._discard(next(iter(self._entries)))
+            self._stats["evicted_lru"] += 1
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def invalidate(self, agent_id: Optional[str] = None) -> int:
+        keys = [key for key in self._entries if agent_id is None or _agent_of(key) == agent_id]
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            **self._stats,
+            "entries": len(self._entries),
+            "approx_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class SqliteResponseCache:
+    """Responses in a local SQLite file, shared by every worker process on the host.
+
+    The methods are synchronous and can wait up to the 5s busy timeout while
+    another worker writes; `ResponseCache` calls them through `run`.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_SQLITE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"pruned": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, agent_id TEXT NOT NULL, payload TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_used_at ON response_cache (used_at)")
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run one of the cache's calls on its thread, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def set(self, key: str, payload: str, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, agent_id, payload, expires_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, _agent_of(key), payload, now + ttl_seconds, now),
+            )
+        self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        self._writes += 1
+        if self._writes % 100 != 1:
+            return
+        with self._lock:
+            expired = self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self._stats["pruned"] += expired + overflow
+
+    def invalidate(self, agent_id: Optional[str] = None) -> int:
+        with self._lock:
+            if agent_id is None:
+                return self._conn.execute("DELETE FROM response_cache").rowcount
+            return self._conn.execute("DELETE FROM response_cache WHERE agent_id = ?", (agent_id,)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, approx_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM response_cache"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            **self._stats,
+            "entries": entries,
+            "approx_bytes": approx_bytes,
+            "max_entries": self.max_entries,
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def create_response_cache():
+    if RESPONSE_CACHE_BACKEND == "sqlite":
+        try:
+            return SqliteResponseCache()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite response cache unavailable ({e}), falling back to memory")
+    return MemoryResponseCache()
+
+
+class ResponseCache:
+    _backend = None
+    _stats: Dict[str, int] = {"hits": 0, "misses": 0, "stored": 0, "not_cacheable": 0, "unserializable": 0}
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            cls._backend = create_response_cache()
+        return cls._backend
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[Any]:
+        backend = cls.backend()
+        payload = await backend.run(backend.get, key)
+        if payload is None:
+            cls._stats["misses"] += 1
+            return None
+        cls._stats["hits"] += 1
+        return json.loads(payload)
+
+    @classmethod
+    async def set(cls, key: str, value: Any, ttl_seconds: float) -> None:
+        if not cls.cacheable(value):
+            cls._stats["not_cacheable"] += 1
+            return
+        try:
+            payload = json.dumps({field: value[field] for field in CACHED_FIELDS if field in value}, ensure_ascii=False)
+        except (TypeError, ValueError):
+            cls._stats["unserializable"] += 1
+            return
+        backend = cls.backend()
+        await backend.run(backend.set, key, payload, ttl_seconds)
+        cls._stats["stored"] += 1
+
+    @staticmethod
+    def cacheable(value: Any) -> bool:
+        """A successful answer: it has a text and is not an error or the agent's apology fallback."""
+        return (
+            isinstance(value, dict)
+            and isinstance(value.get("text"), str)
+            and not value.get("error")
+            and "message" not in value
+        )
+
+    @classmethod
+    async def invalidate(cls, agent_id: Optional[str] = None) -> int:
+        """Drop cached responses of `agent_id`, or everything. Returns how many."""
+        backend = cls.backend()
+        return await backend.run(backend.invalidate, agent_id)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._backend = None
+        for key in cls._stats:
+            cls._stats[key] = 0
+
+    @classmethod
+    async def stats(cls) -> Dict[str, Any]:
+        backend = cls.backend()
+        return {**cls._stats, **(await backend.run(backend.stats))}
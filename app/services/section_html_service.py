@@ -11,14 +11,17 @@ import logging
 import os
 import re
 import time
-from typing import List, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from app.db.audit_logger import log_prompt
 from app.externals.ai_direct.gemini_text import GeminiTextError, call_gemini_freeform
 from app.externals.ai_direct.gemini_text_v2 import (
     GeminiTextV2Error,
     call_gemini_freeform_v2,
+    stream_gemini_freeform_v2,
 )
+from app.helpers.html_stream_helper import HtmlStreamExtractor
 from app.prompts.section_html_prompts import (
     PROMPT_AGENT_ID_HTML_EDIT_SYSTEM,
     PROMPT_AGENT_ID_HTML_GENERATE_SYSTEM,
@@ -212,6 +215,79 @@ class SectionHtmlService:
 
         return SectionHtmlResponse(html_content=html, model_used=model)
 
+    async def stream_generate_section_html(self, request: SectionHtmlRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`generate_section_html` (SSE events).
+
+        Emits ``delta`` events with HTML as Gemini writes it, then ``done``
+        with the same payload the non-streaming endpoint returns (or
+        ``error``). Falls back to FALLBACK_MODEL only if the primary model
+        failed before any HTML was sent.
+        """
+        t_start = time.monotonic()
+        prompt = self._build_generate_prompt(request)
+        model = DEFAULT_MODEL
+        emitted = False
+
+        try:
+            system_prompt = await PromptConfigService.get(PROMPT_AGENT_ID_HTML_GENERATE_SYSTEM)
+            result: Dict[str, Any] = {}
+            for attempt, model in enumerate((DEFAULT_MODEL, FALLBACK_MODEL)):
+                try:
+                    async for event in self._stream_html(
+                        model=model,
+                        system_prompt=system_prompt,
+                        user_message=prompt,
+                        max_output_tokens=14336,
+                        result=result,
+                    ):
+                        emitted = True
+                        yield event
+                    break
+                except Exception:
+                    # Once HTML reached the client a retry would duplicate it.
+                    if emitted or attempt == 1:
+                        raise
+                    logger.info("[SECTION_HTML] Primary failed, trying fallback model: %s", FALLBACK_MODEL)
+
+            html = self._extract_html(result["text"])
+            elapsed = int((time.monotonic() - t_start) * 1000)
+            asyncio.create_task(
+                log_prompt(
+                    log_type="section_html",
+                    prompt=prompt[:2000],
+                    owner_id=request.owner_id,
+                    model=model,
+                    provider="gemini",
+                    status="success",
+                    elapsed_ms=elapsed,
+                    metadata={
+                        "section_role": request.section_role,
+                        "html_length": len(html),
+                        "had_template": bool(request.template_html),
+                        "sdk": "v2_interactions_streaming",
+                        "streamed": True,
+                        "interaction_id": result.get("interaction_id"),
+                        "usage": result.get("usage"),
+                    },
+                )
+            )
+            yield {"event": "done", "data": SectionHtmlResponse(html_content=html, model_used=model).model_dump()}
+
+        except Exception as e:
+            elapsed = int((time.monotonic() - t_start) * 1000)
+            asyncio.create_task(
+                log_prompt(
+                    log_type="section_html",
+                    prompt=prompt[:2000],
+                    owner_id=request.owner_id,
+                    status="error",
+                    error_message=str(e)[:500],
+                    elapsed_ms=elapsed,
+                    metadata={"streamed": True},
+                )
+            )
+            yield {"event": "error", "data": {"detail": str(e)}}
+
     # ------------------------------------------------------------------
     # EDIT: current HTML + user instruction → modified HTML
     # ------------------------------------------------------------------
@@ -220,17 +296,7 @@ class SectionHtmlService:
         t_start = time.monotonic()
         prompt = self._build_edit_prompt(request)
         model = DEFAULT_MODEL
-
-        # Build conversation history in Gemini format
-        history = None
-        if request.conversation_history:
-            history = [
-                {
-                    "role": "model" if msg.role == "assistant" else msg.role,
-                    "text": msg.content,
-                }
-                for msg in request.conversation_history
-            ]
+        history = self._edit_history(request)
 
         try:
             # Resolve the system prompt from agent-config (60s TTL cache +
@@ -252,54 +318,90 @@ class SectionHtmlService:
                 max_output_tokens=32768,
                 thinking_level="low",
             )
-            raw_response = v2_result["text"]
-            v2_usage = v2_result.get("usage") or {}
-            v2_interaction_id = v2_result.get("interaction_id")
+            return await self._finish_edit(request, prompt, model, system_prompt, v2_result, t_start)
 
-            html = self._extract_html(raw_response)
+        except Exception as e:
+            self._log_edit_error(request, prompt, model, t_start, e)
+            raise
 
-            # If the AI introduced new placeholder images (or external URLs we
-            # need to replace), generate them with the image pipeline before
-            # returning. This mirrors what the CREATE flow already does.
-            html = await self._process_new_images_in_edit(
-                previous_html=request.current_html or "",
-                new_html=html,
-                request=request,
-            )
+    async def stream_edit_section_html(self, request: EditSectionHtmlRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`edit_section_html` (SSE events).
 
-            elapsed = int((time.monotonic() - t_start) * 1000)
+        Emits ``delta`` events with HTML as Gemini writes it, a ``status``
+        event while new images are generated, then ``done`` with the same
+        payload the non-streaming endpoint returns (or ``error``).
+        """
+        t_start = time.monotonic()
+        prompt = self._build_edit_prompt(request)
+        model = DEFAULT_MODEL
+        history = self._edit_history(request)
 
-            # Completeness check — catches mid-output token-limit truncation.
-            # If input starts with `<section` but output doesn't close it,
-            # the AI ran out of tokens and returned a broken HTML fragment
-            # that would corrupt the section if accepted.
-            input_html = request.current_html or ""
-            if input_html.lstrip().startswith("<section") and "</section>" not in html:
-                asyncio.create_task(
-                    log_prompt(
-                        log_type="section_html_edit",
-                        prompt=prompt,
-                        response_text=raw_response,
-                        owner_id=request.owner_id,
-                        model=model,
-                        provider="gemini",
-                        status="error",
-                        error_message="AI output truncated (no </section>)",
-                        elapsed_ms=elapsed,
-                        metadata={
-                            "instruction": request.instruction,
-                            "current_html": request.current_html,
-                            "extracted_html": html,
-                            "truncation_detected": True,
-                        },
-                    )
-                )
-                raise Exception(
-                    "La respuesta del AI quedó incompleta (demasiado larga). " "Intenta con un cambio más específico."
-                )
+        try:
+            system_prompt = await PromptConfigService.get(PROMPT_AGENT_ID_HTML_EDIT_SYSTEM)
+            v2_result = {}
+            async for event in self._stream_html(
+                model=model,
+                system_prompt=system_prompt,
+                user_message=prompt,
+                conversation_history=history,
+                max_output_tokens=32768,
+                result=v2_result,
+            ):
+                yield event
+
+            yield {"event": "status", "data": {"stage": "processing_images"}}
+            response = await self._finish_edit(request, prompt, model, system_prompt, v2_result, t_start)
+            yield {"event": "done", "data": response.model_dump()}
+
+        except Exception as e:
+            self._log_edit_error(request, prompt, model, t_start, e)
+            yield {"event": "error", "data": {"detail": str(e)}}
+
+    @staticmethod
+    def _edit_history(request: EditSectionHtmlRequest) -> Optional[List[Dict[str, str]]]:
+        """Build conversation history in Gemini format."""
+        if not request.conversation_history:
+            return None
+        return [
+            {
+                "role": "model" if msg.role == "assistant" else msg.role,
+                "text": msg.content,
+            }
+            for msg in request.conversation_history
+        ]
+
+    async def _finish_edit(
+        self,
+        request: EditSectionHtmlRequest,
+        prompt: str,
+        model: str,
+        system_prompt: str,
+        v2_result: Dict[str, Any],
+        t_start: float,
+    ) -> SectionHtmlResponse:
+        raw_response = v2_result["text"]
+        v2_usage = v2_result.get("usage") or {}
+        v2_interaction_id = v2_result.get("interaction_id")
+
+        html = self._extract_html(raw_response)
+
+        # If the AI introduced new placeholder images (or external URLs we
+        # need to replace), generate them with the image pipeline before
+        # returning. This mirrors what the CREATE flow already does.
+        html = await self._process_new_images_in_edit(
+            previous_html=request.current_html or "",
+            new_html=html,
+            request=request,
+        )
 
-            # Full audit log: everything sent to Gemini + raw reply + metadata.
-            # Lets us replay/diagnose any edit that looked wrong to the user.
+        elapsed = int((time.monotonic() - t_start) * 1000)
+
+        # Completeness check — catches mid-output token-limit truncation.
+        # If input starts with `<section` but output doesn't close it,
+        # the AI ran out of tokens and returned a broken HTML fragment
+        # that would corrupt the section if accepted.
+        input_html = request.current_html or ""
+        if input_html.lstrip().startswith("<section") and "</section>" not in html:
             asyncio.create_task(
                 log_prompt(
                     log_type="section_html_edit",
@@ -308,53 +410,78 @@ class SectionHtmlService:
                     owner_id=request.owner_id,
                     model=model,
                     provider="gemini",
-                    status="success",
+                    status="error",
+                    error_message="AI output truncated (no </section>)",
                     elapsed_ms=elapsed,
                     metadata={
                         "instruction": request.instruction,
-                        "product_name": request.product_name,
-                        "language": request.language,
-                        "system_prompt": system_prompt,
                         "current_html": request.current_html,
                         "extracted_html": html,
-                        "input_html_length": len(request.current_html or ""),
-                        "output_html_length": len(html),
-                        "raw_response_length": len(raw_response or ""),
-                        "history_turns": len(request.conversation_history or []),
-                        "conversation_history": [
-                            {"role": m.role, "content": m.content} for m in (request.conversation_history or [])
-                        ],
-                        "sdk": "v2_interactions_streaming",
-                        "interaction_id": v2_interaction_id,
-                        "usage": v2_usage,
+                        "truncation_detected": True,
                     },
                 )
             )
+            raise Exception(
+                "La respuesta del AI quedó incompleta (demasiado larga). " "Intenta con un cambio más específico."
+            )
 
-            return SectionHtmlResponse(html_content=html, model_used=model)
+        # Full audit log: everything sent to Gemini + raw reply + metadata.
+        # Lets us replay/diagnose any edit that looked wrong to the user.
+        asyncio.create_task(
+            log_prompt(
+                log_type="section_html_edit",
+                prompt=prompt,
+                response_text=raw_response,
+                owner_id=request.owner_id,
+                model=model,
+                provider="gemini",
+                status="success",
+                elapsed_ms=elapsed,
+                metadata={
+                    "instruction": request.instruction,
+                    "product_name": request.product_name,
+                    "language": request.language,
+                    "system_prompt": system_prompt,
+                    "current_html": request.current_html,
+                    "extracted_html": html,
+                    "input_html_length": len(request.current_html or ""),
+                    "output_html_length": len(html),
+                    "raw_response_length": len(raw_response or ""),
+                    "history_turns": len(request.conversation_history or []),
+                    "conversation_history": [
+                        {"role": m.role, "content": m.content} for m in (request.conversation_history or [])
+                    ],
+                    "sdk": "v2_interactions_streaming",
+                    "interaction_id": v2_interaction_id,
+                    "usage": v2_usage,
+                },
+            )
+        )
 
-        except Exception as e:
-            elapsed = int((time.monotonic() - t_start) * 1000)
-            asyncio.create_task(
-                log_prompt(
-                    log_type="section_html_edit",
-                    prompt=prompt,
-                    owner_id=request.owner_id,
-                    model=model,
-                    provider="gemini",
-                    status="error",
-                    error_message=str(e)[:1000],
-                    elapsed_ms=elapsed,
-                    metadata={
-                        "instruction": request.instruction,
-                        "current_html": request.current_html,
-                        # If we failed before resolving the system prompt, log the
-                        # agent_id instead so ops can cross-check agent-config.
-                        "system_prompt_agent_id": PROMPT_AGENT_ID_HTML_EDIT_SYSTEM,
-                    },
-                )
+        return SectionHtmlResponse(html_content=html, model_used=model)
+
+    @staticmethod
+    def _log_edit_error(request: EditSectionHtmlRequest, prompt: str, model: str, t_start: float, e: Exception) -> None:
+        elapsed = int((time.monotonic() - t_start) * 1000)
+        asyncio.create_task(
+            log_prompt(
+                log_type="section_html_edit",
+                prompt=prompt,
+                owner_id=request.owner_id,
+                model=model,
+                provider="gemini",
+                status="error",
+                error_message=str(e)[:1000],
+                elapsed_ms=elapsed,
+                metadata={
+                    "instruction": request.instruction,
+                    "current_html": request.current_html,
+                    # If we failed before resolving the system prompt, log the
+                    # agent_id instead so ops can cross-check agent-config.
+                    "system_prompt_agent_id": PROMPT_AGENT_ID_HTML_EDIT_SYSTEM,
+                },
             )
-            raise
+        )
 
     # ------------------------------------------------------------------
     # TEMPLATE STUDIO: generate/iterate template HTML via chat
@@ -424,6 +551,70 @@ class SectionHtmlService:
             )
             raise
 
+    async def stream_template_html(
+        self,
+        instruction: str,
+        conversation_history: Optional[List[dict]] = None,
+        owner_id: str = "",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of :meth:`generate_template_html` (SSE events)."""
+        t_start = time.monotonic()
+        model = FALLBACK_MODEL
+
+        history = None
+        if conversation_history:
+            history = [
+                {
+                    "role": "model" if msg.get("role") == "assistant" else msg.get("role", "user"),
+                    "text": msg.get("content", ""),
+                }
+                for msg in conversation_history
+            ]
+
+        try:
+            system_prompt = await PromptConfigService.get(PROMPT_AGENT_ID_HTML_TEMPLATE_STUDIO)
+            result: Dict[str, Any] = {}
+            async for event in self._stream_html(
+                model=model,
+                system_prompt=system_prompt,
+                user_message=instruction,
+                conversation_history=history,
+                max_output_tokens=14336,
+                result=result,
+            ):
+                yield event
+
+            html = self._extract_html(result["text"])
+            elapsed = int((time.monotonic() - t_start) * 1000)
+            asyncio.create_task(
+                log_prompt(
+                    log_type="template_studio",
+                    prompt=instruction[:1000],
+                    owner_id=owner_id,
+                    model=model,
+                    provider="gemini",
+                    status="success",
+                    elapsed_ms=elapsed,
+                    metadata={"html_length": len(html), "streamed": True},
+                )
+            )
+            yield {"event": "done", "data": SectionHtmlResponse(html_content=html, model_used=model).model_dump()}
+
+        except Exception as e:
+            elapsed = int((time.monotonic() - t_start) * 1000)
+            asyncio.create_task(
+                log_prompt(
+                    log_type="template_studio",
+                    prompt=instruction[:1000],
+                    owner_id=owner_id,
+                    status="error",
+                    error_message=str(e)[:500],
+                    elapsed_ms=elapsed,
+                    metadata={"streamed": True},
+                )
+            )
+            yield {"event": "error", "data": {"detail": str(e)}}
+
     # ------------------------------------------------------------------
     # ORCHESTRATE IMAGE PROMPTS
     # ------------------------------------------------------------------
@@ -636,6 +827,60 @@ class SectionHtmlService:
 
         return prompts[:expected_count] if prompts else []
 
+    async def _stream_html(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        max_output_tokens: int,
+        result: Dict[str, Any],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream Gemini v2 output as ``delta`` events with the HTML extracted on the fly.
+
+        Fills `result` with the same dict `call_gemini_freeform_v2` returns, so
+        the caller can run the regular post-processing on the full text.
+        """
+        extractor = HtmlStreamExtractor()
+        parts: List[str] = []
+        final: Dict[str, Any] = {}
+        async with aclosing(
+            stream_gemini_freeform_v2(
+                model=model,
+                system_prompt=system_prompt,
+                user_message=user_message,
+                conversation_history=conversation_history,
+                temperature=TEMPERATURE,
+                max_output_tokens=max_output_tokens,
+                thinking_level="low",
+            )
+        ) as events:
+            async for event in events:
+                if event["type"] != "delta":
+                    final = event
+                    continue
+                parts.append(event["text"])
+                html = extractor.feed(event["text"])
+                if html:
+                    yield {"event": "delta", "data": {"html": html}}
+
+        tail = extractor.flush()
+        if tail:
+            yield {"event": "delta", "data": {"html": tail}}
+
+        text = "".join(parts)
+        if not text:
+            raise GeminiTextV2Error(
+                f"Empty response from Gemini. status={final.get('status')} id={final.get('interaction_id')}"
+            )
+        result.update(
+            text=text,
+            interaction_id=final.get("interaction_id"),
+            usage=final.get("usage") or {},
+            status=final.get("status"),
+        )
+
     @staticmethod
     def _extract_html(raw_response: str) -> str:
         """Extract clean HTML from Gemini response.
@@ -5,24 +5,31 @@ import logging
 import re
 import time
 import uuid
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from app.db.audit_logger import log_prompt
-from app.externals.callback.callback_client import post_callback
-from app.externals.images.image_client import google_image_with_text, openai_image_edit
-from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
-from app.externals.s3_upload.s3_upload_client import upload_file
-from app.helpers.concurrency import get_image_semaphore
-from app.helpers.image_compression_helper import compress_image_to_target
+from app.externals.images.image_client import (
+    OPENAI_IMAGE_DEFAULT_MODEL,
+    google_image_with_text,
+    openai_image_edit,
+    section_image_model,
+)
+from app.externals.s3_upload.s3_upload_client import upload_bytes
+from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from app.helpers.concurrency import PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, get_image_limiter
+from app.helpers.image_compression_pool import compress_image_async
 from app.helpers.request_tracker import RequestTracker
+from app.helpers.retry import RetryPolicy, before_retry, deadline_error, has_time_for
 from app.requests.section_image_request import SectionImageRequest
 from app.responses.section_image_response import CtaButtonResponse, SectionImageResponse
+from app.services.job_queue import JobQueue
 from app.services.prompt_config_service import PromptConfigService
 
 logger = logging.getLogger(__name__)
 
 PROMPT_AGENT_ID_SYSTEM = "section_image_system"
 PROMPT_AGENT_ID_CTA_DETECTION = "section_image_cta_detection"
+SECTION_IMAGE_JOB = "section_image"
 
 FALLBACK_SYSTEM_PROMPT = """You are an expert e-commerce landing page designer specializing in high-converting sales funnels for Latin American markets.
 
@@ -82,7 +89,11 @@ PromptConfigService.register_fallback(PROMPT_AGENT_ID_SYSTEM, FALLBACK_SYSTEM_PR
 PromptConfigService.register_fallback(PROMPT_AGENT_ID_CTA_DETECTION, FALLBACK_CTA_DETECTION)
 
 
-IMAGE_MODEL = "gemini-3.1-flash-image-preview"
+# Model google_image_with_text calls (SECTION_IMAGE_MODEL): breaker, limiter and logs use this same name.
+IMAGE_MODEL = section_image_model()
+FALLBACK_IMAGE_MODEL = OPENAI_IMAGE_DEFAULT_MODEL
+# 5 attempts: retries 2-3 right away, then jittered backoff from 5s; one image takes ~15s at least.
+RETRY_POLICY = RetryPolicy.after_attempts(max_attempts=5, delay_after=3, delay_seconds=5, min_attempt_seconds=15)
 
 
 class SectionImageService:
@@ -140,22 +151,27 @@ class SectionImageService:
             "temperature": 1.0,
         }
 
-    async def generate_section_image(self, request: SectionImageRequest) -> SectionImageResponse:
-        semaphore = get_image_semaphore()
-        async with semaphore:
-            RequestTracker.custom_active += 1
-            t_start = time.monotonic()
-            RequestTracker.log("MEM", "START")
+    async def generate_section_image(
+        self, request: SectionImageRequest, priority: Optional[int] = None
+    ) -> SectionImageResponse:
+        """`priority` is the lane in the image limiters; by default edits go first."""
+        if priority is None:
+            priority = PRIORITY_INTERACTIVE if request.edit_mode else PRIORITY_NORMAL
+        RequestTracker.custom_active += 1
+        t_start = time.monotonic()
+        RequestTracker.log("MEM", "START")
 
-            try:
-                return await self._do_generate(request, t_start)
-            finally:
-                elapsed = time.monotonic() - t_start
-                RequestTracker.custom_active -= 1
-                RequestTracker.log("MEM", "END", f"elapsed={elapsed:.1f}s")
-                gc.collect()
-
-    async def _do_generate(self, request: SectionImageRequest, t_start: float) -> SectionImageResponse:
+        try:
+            return await self._do_generate(request, t_start, priority)
+        finally:
+            elapsed = time.monotonic() - t_start
+            RequestTracker.custom_active -= 1
+            RequestTracker.log("MEM", "END", f"elapsed={elapsed:.1f}s")
+            gc.collect()
+
+    async def _do_generate(
+        self, request: SectionImageRequest, t_start: float, priority: int = PRIORITY_NORMAL
+    ) -> SectionImageResponse:
         prompt = await self._build_prompt(request)
         image_urls = self._collect_image_urls(request)
         extra_params = {
@@ -163,24 +179,29 @@ class SectionImageService:
             "image_size": "2K",
         }
 
-        max_retries = 5
-        delay_after = 3
-        delay_seconds = 5
+        max_retries = RETRY_POLICY.max_attempts
         last_error = None
+        breaker = CircuitBreakerRegistry.get("gemini", IMAGE_MODEL)
 
         for attempt in range(1, max_retries + 1):
+            if attempt > 1 and not await before_retry(RETRY_POLICY, attempt, last_error):
+                logger.warning("Section image: no time left for another attempt, skipping to fallback")
+                break
+            if not breaker.allow():
+                logger.warning("Section image: gemini circuit open, skipping to fallback")
+                last_error = last_error or CircuitOpenError(f"gemini/{IMAGE_MODEL} circuit open")
+                break
             t_attempt_start = time.monotonic()
             try:
-                if attempt > delay_after:
-                    await asyncio.sleep(delay_seconds)
-
                 RequestTracker.log("MEM", f"PRE-GEMINI attempt={attempt}")
 
-                image_bytes, text_response = await google_image_with_text(
-                    image_urls=image_urls,
-                    prompt=prompt,
-                    extra_params=extra_params,
-                )
+                async with get_image_limiter("gemini", IMAGE_MODEL).slot(priority):
+                    image_bytes, text_response = await breaker.call(
+                        google_image_with_text,
+                        image_urls=image_urls,
+                        prompt=prompt,
+                        extra_params=extra_params,
+                    )
 
                 RequestTracker.log(
                     "MEM",
@@ -203,7 +224,7 @@ class SectionImageService:
                         response_text=response_text_preview,
                         response_url=s3_url,
                         owner_id=request.owner_id,
-                        model="gemini-3.1-flash-image-preview",
+                        model=IMAGE_MODEL,
                         provider="gemini",
                         brand_colors=request.brand_colors,
                         status="success",
@@ -225,7 +246,7 @@ class SectionImageService:
                     log_prompt(
                         log_type="section_image",
                         owner_id=request.owner_id,
-                        model="gemini-3.1-flash-image-preview",
+                        model=IMAGE_MODEL,
                         provider="gemini",
                         status="attempt_failed",
                         error_message=f"{type(e).__name__}: {str(e) or repr(e)}"[:1000],
@@ -241,14 +262,18 @@ class SectionImageService:
 
         # Fallback to OpenAI
         try:
-            logger.info("Trying section image fallback: openai/gpt-image-1")
+            if not has_time_for(RETRY_POLICY.min_attempt_seconds):
+                raise deadline_error(last_error)
+            logger.info(f"Trying section image fallback: openai/{FALLBACK_IMAGE_MODEL}")
             fallback_prompt = await self._build_prompt(request, include_cta_instruction=False)
-            image_bytes = await openai_image_edit(
-                image_urls=image_urls,
-                prompt=fallback_prompt,
-                model_ia="gpt-image-1",
-                extra_params=extra_params,
-            )
+            async with get_image_limiter("openai", FALLBACK_IMAGE_MODEL).slot(priority):
+                image_bytes = await CircuitBreakerRegistry.get("openai", FALLBACK_IMAGE_MODEL).call(
+                    openai_image_edit,
+                    image_urls=image_urls,
+                    prompt=fallback_prompt,
+                    model_ia=FALLBACK_IMAGE_MODEL,
+                    extra_params=extra_params,
+                )
             s3_url = await self._compress_and_upload(image_bytes, request)
             del image_bytes
             asyncio.create_task(
@@ -257,7 +282,7 @@ class SectionImageService:
                     prompt=fallback_prompt,
                     response_url=s3_url,
                     owner_id=request.owner_id,
-                    model="gpt-image-1",
+                    model=FALLBACK_IMAGE_MODEL,
                     provider="openai",
                     status="fallback",
                     fallback_used=True,
@@ -380,73 +405,44 @@ These colors MUST be used to determine the overall tone of the image — accents
         return buttons
 
     async def _compress_and_upload(self, image_bytes: bytes, request: SectionImageRequest) -> str:
-        loop = asyncio.get_event_loop()
-        compressed_b64 = await loop.run_in_executor(
-            None, lambda: compress_image_to_target(image_bytes, target_kb=request.target_kb, max_width=1080)
-        )
+        compressed = await compress_image_async(image_bytes, target_kb=request.target_kb, max_width=1080)
         unique_id = uuid.uuid4().hex[:8]
         folder = f"creatives/sections/{request.owner_id}"
         file_name = f"section_{unique_id}"
 
-        result = await upload_file(
-            S3UploadRequest(
-                file=compressed_b64,
-                folder=folder,
-                filename=file_name,
-            )
-        )
+        result = await upload_bytes(compressed, folder=folder, filename=file_name)
         return result.s3_url
 
-    async def generate_and_callback(
-        self,
-        request: SectionImageRequest,
-        request_id: str,
-        callback_url: str,
-        callback_metadata: Optional[Dict[str, str]] = None,
-    ) -> None:
+    async def callback_payload(self, request: SectionImageRequest, request_id: str) -> Dict[str, Any]:
+        """Generate the image for an async job and return its webhook payload (success or error). Never raises."""
         try:
-            response = await self.generate_section_image(request)
-            payload = {
+            response = await self.generate_section_image(request, priority=PRIORITY_BULK)
+            return {
                 "status": "success",
                 "request_id": request_id,
                 "s3_url": response.s3_url,
                 "cta_buttons": [btn.model_dump() for btn in response.cta_buttons],
-                "metadata": callback_metadata or {},
+                "metadata": request.callback_metadata or {},
             }
         except Exception as e:
             logger.error(f"Async section image generation failed (request_id={request_id}): {type(e).__name__}: {e}")
-            payload = {
-                "status": "error",
-                "request_id": request_id,
-                "error": str(e) or "unknown",
-                "error_type": type(e).__name__,
-                "metadata": callback_metadata or {},
-            }
+            return section_image_error_payload(request_id, request.model_dump(), str(e) or "unknown", type(e).__name__)
 
-        try:
-            await post_callback(callback_url, payload)
-            asyncio.create_task(
-                log_prompt(
-                    log_type="callback_result",
-                    prompt=f"callback to {callback_url}",
-                    owner_id=request.owner_id,
-                    model="callback",
-                    provider="httpx",
-                    status="success",
-                    metadata={"request_id": request_id, "payload_status": payload.get("status")},
-                )
-            )
-        except Exception as e:
-            logger.error(f"Callback failed for request_id={request_id}: {type(e).__name__}: {e}")
-            asyncio.create_task(
-                log_prompt(
-                    log_type="callback_result",
-                    prompt=f"callback to {callback_url}",
-                    owner_id=request.owner_id,
-                    model="callback",
-                    provider="httpx",
-                    status="error",
-                    error_message=f"{type(e).__name__}: {e}",
-                    metadata={"request_id": request_id},
-                )
-            )
+
+def section_image_error_payload(
+    request_id: str, payload: Dict[str, Any], error: str, error_type: str = "JobFailed"
+) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "request_id": request_id,
+        "error": error,
+        "error_type": error_type,
+        "metadata": payload.get("callback_metadata") or {},
+    }
+
+
+async def _run_section_image_job(job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await SectionImageService().callback_payload(SectionImageRequest(**payload), request_id=job_id)
+
+
+JobQueue.register(SECTION_IMAGE_JOB, _run_section_image_job, on_failure=section_image_error_payload)
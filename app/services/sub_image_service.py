@@ -3,7 +3,7 @@
 Follows the same patterns as ``section_image_service.py``:
 - Direct Gemini API calls (no LangChain)
 - Retry with backoff + OpenAI fallback
-- Semaphore for concurrency control
+- Adaptive per-model concurrency limit (``helpers/concurrency``)
 - S3 upload with compression
 - Audit logging
 
@@ -24,24 +24,32 @@ import uuid
 from typing import Optional
 
 from app.db.audit_logger import log_prompt
-from app.externals.images.image_client import google_image_with_text, openai_image_edit
-from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
-from app.externals.s3_upload.s3_upload_client import upload_file
-from app.helpers.concurrency import get_image_semaphore
-from app.helpers.image_compression_helper import compress_image_to_target
+from app.externals.images.image_client import google_image_with_text, openai_image_edit, section_image_model
+from app.externals.s3_upload.s3_upload_client import upload_bytes
+from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from app.helpers.concurrency import PRIORITY_NORMAL, get_image_limiter
+from app.helpers.image_compression_pool import compress_image_async
 from app.helpers.request_tracker import RequestTracker
+from app.helpers.retry import RetryPolicy, before_retry, deadline_error, has_time_for
 from app.requests.sub_image_request import GenerateSubImagesRequest, SubImageItem
 from app.responses.sub_image_response import GenerateSubImagesResponse
 
 logger = logging.getLogger(__name__)
 
 # Constants for transparency (read by preview endpoints)
-SUB_IMAGE_MODEL = os.environ.get("SUB_IMAGE_MODEL", "gemini-3.1-flash-image-preview")
+# Resolved like google_image_with_text does, so the breaker, limiter and logs name the model actually called.
+SUB_IMAGE_MODEL = section_image_model(os.environ.get("SUB_IMAGE_MODEL"))
 SUB_IMAGE_FALLBACK_MODEL = os.environ.get("SUB_IMAGE_FALLBACK_MODEL", "gpt-image-1")
 SUB_IMAGE_FALLBACK_PROVIDER = "openai"
 SUB_IMAGE_MAX_RETRIES = 5
 SUB_IMAGE_DELAY_AFTER_ATTEMPT = 3
 SUB_IMAGE_RETRY_DELAY_SECONDS = 5
+SUB_IMAGE_RETRY_POLICY = RetryPolicy.after_attempts(
+    max_attempts=SUB_IMAGE_MAX_RETRIES,
+    delay_after=SUB_IMAGE_DELAY_AFTER_ATTEMPT,
+    delay_seconds=SUB_IMAGE_RETRY_DELAY_SECONDS,
+    min_attempt_seconds=10,
+)
 
 SUB_IMAGE_PROMPT_TEMPLATE = """You are generating a specific image element for an e-commerce landing page section.
 
@@ -71,7 +79,6 @@ class SubImageService:
     async def generate_sub_images(self, request: GenerateSubImagesRequest) -> GenerateSubImagesResponse:
         """Generate all requested images in parallel with concurrency control."""
         t_start = time.monotonic()
-        semaphore = get_image_semaphore()
 
         # Collect product image URLs for reference
         ref_urls = []
@@ -80,8 +87,8 @@ class SubImageService:
         elif request.product_image_url:
             ref_urls = [request.product_image_url]
 
-        # Generate all images in parallel (max 5 concurrent)
-        tasks = [self._generate_one(item, request, ref_urls, semaphore) for item in request.images]
+        # Generate all images in parallel (bounded by the per-model image limiters)
+        tasks = [self._generate_one(item, request, ref_urls) for item in request.images]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         # Build response
@@ -100,7 +107,7 @@ class SubImageService:
                 log_type="sub_images",
                 prompt=f"{len(request.images)} images requested",
                 owner_id=request.owner_id,
-                model="gemini-3.1-flash-image-preview",
+                model=SUB_IMAGE_MODEL,
                 provider="gemini",
                 status="success" if not errors else "partial",
                 elapsed_ms=elapsed,
@@ -119,78 +126,45 @@ class SubImageService:
         item: SubImageItem,
         request: GenerateSubImagesRequest,
         ref_urls: list[str],
-        semaphore: asyncio.Semaphore,
+        priority: int = PRIORITY_NORMAL,
     ) -> str:
         """Generate a single sub-image with retry, fallback, and concurrency control."""
-        async with semaphore:
-            RequestTracker.custom_active += 1
-            t_start = time.monotonic()
-
-            try:
-                prompt = self._build_prompt(item, request)
-                extra_params = {
-                    "aspect_ratio": item.aspect_ratio,
-                    "image_size": "1K",
-                }
-
-                # Retry with backoff (same pattern as section_image_service)
-                max_retries = SUB_IMAGE_MAX_RETRIES
-                delay_after = SUB_IMAGE_DELAY_AFTER_ATTEMPT
-                last_error = None
-
-                for attempt in range(1, max_retries + 1):
-                    image_bytes = None
-                    try:
-                        if attempt > delay_after:
-                            await asyncio.sleep(SUB_IMAGE_RETRY_DELAY_SECONDS)
+        RequestTracker.custom_active += 1
+        t_start = time.monotonic()
 
-                        image_bytes, _ = await google_image_with_text(
+        try:
+            prompt = self._build_prompt(item, request)
+            extra_params = {
+                "aspect_ratio": item.aspect_ratio,
+                "image_size": "1K",
+            }
+
+            # Retry with backoff (same pattern as section_image_service)
+            max_retries = SUB_IMAGE_RETRY_POLICY.max_attempts
+            last_error = None
+            breaker = CircuitBreakerRegistry.get("gemini", SUB_IMAGE_MODEL)
+
+            for attempt in range(1, max_retries + 1):
+                if attempt > 1 and not await before_retry(SUB_IMAGE_RETRY_POLICY, attempt, last_error):
+                    logger.warning(f"Sub-image {item.id}: no time left for another attempt, skipping to fallback")
+                    break
+                if not breaker.allow():
+                    logger.warning(f"Sub-image {item.id}: gemini circuit open, skipping to fallback")
+                    last_error = last_error or CircuitOpenError(f"gemini/{SUB_IMAGE_MODEL} circuit open")
+                    break
+                image_bytes = None
+                try:
+                    async with get_image_limiter("gemini", SUB_IMAGE_MODEL).slot(priority):
+                        image_bytes, _ = await breaker.call(
+                            google_image_with_text,
                             image_urls=ref_urls,
                             prompt=prompt,
+                            model_ia=SUB_IMAGE_MODEL,
                             extra_params=extra_params,
                         )
 
-                        s3_url = await self._compress_and_upload(image_bytes, request.owner_id)
-                        image_bytes = None  # release reference early (GC will collect)
-
-                        asyncio.create_task(
-                            log_prompt(
-                                log_type="sub_image",
-                                prompt=prompt[:500],
-                                response_url=s3_url,
-                                owner_id=request.owner_id,
-                                model="gemini-3.1-flash-image-preview",
-                                provider="gemini",
-                                status="success",
-                                attempt_number=attempt,
-                                elapsed_ms=int((time.monotonic() - t_start) * 1000),
-                                metadata={"image_id": item.id},
-                            )
-                        )
-                        return s3_url
-
-                    except Exception as e:
-                        last_error = e
-                        logger.warning(
-                            f"Sub-image {item.id} attempt {attempt}/{max_retries} failed: "
-                            f"{type(e).__name__}: {str(e)[:200]}"
-                        )
-                        # release bytes reference if allocation succeeded mid-try
-                        image_bytes = None
-
-                # Fallback to OpenAI
-                try:
-                    logger.info(
-                        f"Sub-image {item.id} fallback: {SUB_IMAGE_FALLBACK_PROVIDER}/{SUB_IMAGE_FALLBACK_MODEL}"
-                    )
-                    image_bytes = await openai_image_edit(
-                        image_urls=ref_urls,
-                        prompt=prompt,
-                        model_ia=SUB_IMAGE_FALLBACK_MODEL,
-                        extra_params=extra_params,
-                    )
                     s3_url = await self._compress_and_upload(image_bytes, request.owner_id)
-                    del image_bytes
+                    image_bytes = None  # release reference early (GC will collect)
 
                     asyncio.create_task(
                         log_prompt(
@@ -198,9 +172,10 @@ class SubImageService:
                             prompt=prompt[:500],
                             response_url=s3_url,
                             owner_id=request.owner_id,
-                            model="gpt-image-1",
-                            provider="openai",
-                            status="fallback",
+                            model=SUB_IMAGE_MODEL,
+                            provider="gemini",
+                            status="success",
+                            attempt_number=attempt,
                             elapsed_ms=int((time.monotonic() - t_start) * 1000),
                             metadata={"image_id": item.id},
                         )
@@ -208,12 +183,53 @@ class SubImageService:
                     return s3_url
 
                 except Exception as e:
-                    logger.error(f"Sub-image {item.id} fallback also failed: {e}")
-                    raise last_error  # type: ignore[misc]
+                    last_error = e
+                    logger.warning(
+                        f"Sub-image {item.id} attempt {attempt}/{max_retries} failed: "
+                        f"{type(e).__name__}: {str(e)[:200]}"
+                    )
+                    # release bytes reference if allocation succeeded mid-try
+                    image_bytes = None
 
-            finally:
-                RequestTracker.custom_active -= 1
-                gc.collect()
+            # Fallback to OpenAI
+            try:
+                if not has_time_for(SUB_IMAGE_RETRY_POLICY.min_attempt_seconds):
+                    raise deadline_error(last_error)
+                logger.info(f"Sub-image {item.id} fallback: {SUB_IMAGE_FALLBACK_PROVIDER}/{SUB_IMAGE_FALLBACK_MODEL}")
+                fallback_breaker = CircuitBreakerRegistry.get(SUB_IMAGE_FALLBACK_PROVIDER, SUB_IMAGE_FALLBACK_MODEL)
+                async with get_image_limiter(SUB_IMAGE_FALLBACK_PROVIDER, SUB_IMAGE_FALLBACK_MODEL).slot(priority):
+                    image_bytes = await fallback_breaker.call(
+                        openai_image_edit,
+                        image_urls=ref_urls,
+                        prompt=prompt,
+                        model_ia=SUB_IMAGE_FALLBACK_MODEL,
+                        extra_params=extra_params,
+                    )
+                s3_url = await self._compress_and_upload(image_bytes, request.owner_id)
+                del image_bytes
+
+                asyncio.create_task(
+                    log_prompt(
+                        log_type="sub_image",
+                        prompt=prompt[:500],
+                        response_url=s3_url,
+                        owner_id=request.owner_id,
+                        model=SUB_IMAGE_FALLBACK_MODEL,
+                        provider="openai",
+                        status="fallback",
+                        elapsed_ms=int((time.monotonic() - t_start) * 1000),
+                        metadata={"image_id": item.id},
+                    )
+                )
+                return s3_url
+
+            except Exception as e:
+                logger.error(f"Sub-image {item.id} fallback also failed: {e}")
+                raise last_error  # type: ignore[misc]
+
+        finally:
+            RequestTracker.custom_active -= 1
+            gc.collect()
 
     def _build_prompt(self, item: SubImageItem, request: GenerateSubImagesRequest) -> str:
         angle_block = ""
@@ -239,19 +255,10 @@ class SubImageService:
         )
 
     async def _compress_and_upload(self, image_bytes: bytes, owner_id: str) -> str:
-        loop = asyncio.get_event_loop()
-        compressed_b64 = await loop.run_in_executor(
-            None, lambda: compress_image_to_target(image_bytes, target_kb=120, max_width=800)
-        )
+        compressed = await compress_image_async(image_bytes, target_kb=120, max_width=800)
         unique_id = uuid.uuid4().hex[:8]
         folder = f"creatives/sections/{owner_id}"
         file_name = f"sub_{unique_id}"
 
-        result = await upload_file(
-            S3UploadRequest(
-                file=compressed_b64,
-                folder=folder,
-                filename=file_name,
-            )
-        )
+        result = await upload_bytes(compressed, folder=folder, filename=file_name)
         return result.s3_url
@@ -53,17 +53,21 @@ import time
 from typing import Any, Dict, List, Optional
 
 from app.db.audit_logger import log_prompt
-from app.externals.agent_config.agent_config_client import get_agent
+from app.externals.agent_config.agent_config_cache import get_agent
 from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
 from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
 from app.externals.ai_direct.gemini_text import GeminiTextError, call_gemini_structured
 from app.externals.callback.callback_client import post_callback
+from app.helpers.retry import detach_deadline
 from app.requests.video_studio_draft_request import VideoStudioDraftRequest
 from app.responses.video_studio_draft_response import VideoStudioDraftReadyPayload
+from app.services.job_queue import JobQueue
 from app.services.video_studio_service_interface import VideoStudioServiceInterface
 
 logger = logging.getLogger(__name__)
 
+VIDEO_STUDIO_DRAFT_JOB = "video_studio_draft"
+
 
 class VideoStudioError(Exception):
     """Raised when the Director Creative pipeline fails after retries."""
@@ -325,8 +329,8 @@ class VideoStudioService(VideoStudioServiceInterface):
             last_payload=parsed,
         )
 
-    async def run_and_callback(self, request: VideoStudioDraftRequest) -> None:
-        """Run the director and post the result to callback_url. Never raises."""
+    async def callback_payload(self, request: VideoStudioDraftRequest) -> Dict[str, Any]:
+        """Run the director and return the webhook payload (success or error). Never raises."""
         try:
             payload = await self.run_director(request)
             cb_payload = {
@@ -364,6 +368,13 @@ class VideoStudioService(VideoStudioServiceInterface):
                 "error_step": "unknown",
                 "metadata": request.callback_metadata or {},
             }
+        return cb_payload
+
+    async def run_and_callback(self, request: VideoStudioDraftRequest) -> None:
+        """Run the director and post the result to callback_url. Never raises."""
+        # Corre en background después del 202: el deadline del request HTTP ya no aplica.
+        detach_deadline()
+        cb_payload = await self.callback_payload(request)
 
         if not request.callback_url:
             logger.info(
@@ -880,3 +891,20 @@ class VideoStudioService(VideoStudioServiceInterface):
                 logger.warning("[VIDEO_STUDIO] unknown validator '%s' — skipping", name)
 
         return errors
+
+
+def video_studio_error_payload(job_id: str, payload: Dict[str, Any], error: str) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "reference_id": payload.get("reference_id"),
+        "error": error,
+        "error_step": "job",
+        "metadata": payload.get("callback_metadata") or {},
+    }
+
+
+async def _run_video_studio_draft_job(job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await VideoStudioService().callback_payload(VideoStudioDraftRequest(**payload))
+
+
+JobQueue.register(VIDEO_STUDIO_DRAFT_JOB, _run_video_studio_draft_job, on_failure=video_studio_error_payload)
@@ -17,6 +17,20 @@ class ToolGenerator:
 
         return tool_function
 
+    @classmethod
+    def create_tool_coroutine(cls, tool_config: dict):
+        """Versión async de la herramienta: cliente HTTP compartido, timeout y reintentos por herramienta.
+
+        AgentExecutor ejecuta con asyncio.gather las llamadas que el modelo emite en un mismo paso,
+        así que varias herramientas corren en paralelo sin bloquear el event loop.
+        """
+        config = tool_config["config"]
+
+        async def tool_coroutine(**kwargs):
+            return {"tool_result": await BaseRequestor.aexecute_request(config, kwargs)}
+
+        return tool_coroutine
+
     @classmethod
     def generate_tools(cls, tools: Optional[List[dict]]) -> List[StructuredTool]:
         """Genera una lista de herramientas estructuradas a partir de configuraciones"""
@@ -38,6 +52,7 @@ class ToolGenerator:
                 name=tool_config["tool_name"],
                 description=tool_config["description"],
                 func=cls.create_tool_function(tool_config),
+                coroutine=cls.create_tool_coroutine(tool_config),
                 args_schema=args_schema,
             )
 
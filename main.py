@@ -4,16 +4,23 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.configurations.config import PROMPT_WARMUP_TIMEOUT_SECONDS
 from app.controllers.handle_controller import router
 from app.db.audit_logger import init_pool, close_pool
+from app.externals.http_clients import init_http_clients, close_http_clients
+from app.helpers.image_compression_pool import start_compression_pool, shutdown_compression_pool
 from app.managers.conversation_manager import ConversationManager
 from app.managers.conversation_manager_interface import ConversationManagerInterface
+from app.middlewares.deadline_middleware import DeadlineMiddleware
+from app.processors.mcp_client_pool import MCPClientPool
 from app.services.image_service import ImageService
 from app.services.image_service_interface import ImageServiceInterface
+from app.services.job_queue import JobQueue
 from app.services.message_service import MessageService
 from app.services.message_service_interface import MessageServiceInterface
 from app.services.product_scraping_service import ProductScrapingService
 from app.services.product_scraping_service_interface import ProductScrapingServiceInterface
+from app.services.prompt_config_service import PromptConfigService
 from app.services.video_service import VideoService
 from app.services.video_service_interface import VideoServiceInterface
 from app.services.audio_service import AudioService
@@ -25,7 +32,21 @@ from app.services.funnel_analysis_service_interface import FunnelAnalysisService
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_pool()
+    await init_http_clients()
+    start_compression_pool()
+    # Los servicios se importan lazy en los endpoints; importar acá los módulos
+    # que registran fallbacks para que el warm-up los incluya.
+    from app.prompts import section_html_prompts  # noqa: F401
+    from app.services import section_image_service, video_studio_service  # noqa: F401
+
+    await PromptConfigService.warm_up(timeout=PROMPT_WARMUP_TIMEOUT_SECONDS)
+    # Después de importar los servicios: registran sus handlers de jobs al importarse.
+    await JobQueue.start()
     yield
+    await JobQueue.stop()
+    await MCPClientPool.close_all()
+    shutdown_compression_pool()
+    await close_http_clients()
     await close_pool()
 
 
@@ -47,6 +68,8 @@ if os.getenv("ENVIRONMENT", "dev") != "prod":
         allow_headers=["*"],
     )
 
+app.add_middleware(DeadlineMiddleware)
+
 app.include_router(router)
 
 conversation_manager_singleton = ConversationManager()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Compare the previous compress_image_to_target strategy with the current one.
+
+For every image in the corpus both strategies compress to the same target and
+we record: full-size WEBP encodes, proxy encodes, wall time and how close the
+output lands to `target_kb` (closer from below = better quality for the budget).
+
+The previous strategy (q=80, one guessed quality, two 10-point retries, resize
+fallback) is reproduced here verbatim so the comparison keeps working after
+the helper changes.
+
+Usage:
+    cd conversation-engine
+    source venv/bin/activate
+    python scripts/benchmark-image-compression.py --corpus ~/generated-images --target-kb 120 --max-width 1080
+
+Without --corpus a small synthetic corpus (gradients, shapes, grain) is used, which
+is only useful as a smoke test: run it on real generated images (the S3
+`generated/` prefix) for meaningful numbers.
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image  # noqa: E402
+
+from app.helpers import image_compression_helper  # noqa: E402
+from app.helpers.image_compression_helper import (  # noqa: E402
+    PROXY_MAX_SIDE,
+    _calculate_initial_quality,
+    _resize_image,
+    compress_image_to_target,
+)
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+class EncodeCounter:
+    def __init__(self):
+        self.full = 0
+        self.proxy = 0
+        self._full_side = 0
+
+    def reset(self, full_side: int):
+        self.full = 0
+        self.proxy = 0
+        self._full_side = full_side
+
+    def encode(self, img, quality):
+        # El resize de fallback cuenta como full; sólo el proxy queda por debajo de PROXY_MAX_SIDE.
+        if max(img.size) > PROXY_MAX_SIDE or max(img.size) == self._full_side:
+            self.full += 1
+        else:
+            self.proxy += 1
+        buffer = io.BytesIO()
+        img.save(buffer, format="WEBP", quality=quality)
+        return buffer.getvalue()
+
+
+def legacy_compress(counter: EncodeCounter, img: Image.Image, target_bytes: int) -> bytes:
+    result_bytes = counter.encode(img, 80)
+    if len(result_bytes) <= target_bytes:
+        return result_bytes
+    quality = _calculate_initial_quality(len(result_bytes), target_bytes)
+    for _ in range(2):
+        result_bytes = counter.encode(img, quality)
+        if len(result_bytes) <= target_bytes:
+            return result_bytes
+        quality = max(40, quality - 10)
+    if max(img.size) > 1024:
+        img = _resize_image(img, target_bytes, len(result_bytes))
+        result_bytes = counter.encode(img, 70)
+    return result_bytes
+
+
+def working_image(image_bytes: bytes, max_width) -> Image.Image:
+    """Same normalization compress_image_to_target does before encoding."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img = img.convert("RGBA" if img.mode in ("RGBA", "P") else "RGB")
+    if max_width and img.width > max_width:
+        img = img.resize((max_width, int(img.height * max_width / img.width)), Image.Resampling.LANCZOS)
+    return img
+
+
+def synthetic_corpus():
+    """Gradients, flat shapes and mild grain: closer to generated product shots than pure noise."""
+    import random
+
+    from PIL import ImageDraw, ImageFilter
+
+    rng = random.Random(7)
+    for width, height in [(1080, 1920), (1536, 1024), (1024, 1024), (2048, 2048), (800, 600), (1920, 1080)]:
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(height)
+            w, h = rng.randrange(40, width // 3), rng.randrange(40, height // 3)
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            (draw.ellipse if rng.random() < 0.5 else draw.rectangle)((x, y, x + w, y + h), fill=color)
+        img = img.filter(ImageFilter.GaussianBlur(1))
+        grain = Image.effect_noise((width, height), 60).convert("RGB")
+        img = Image.blend(img, grain, 0.15)
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        yield f"synthetic-{width}x{height}", buffer.getvalue()
+
+
+def file_corpus(path: Path):
+    for file in sorted(path.rglob("*")):
+        if file.suffix.lower() in IMAGE_SUFFIXES:
+            yield file.name, file.read_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="Directory with images (png/jpg/webp)")
+    parser.add_argument("--target-kb", type=int, default=120)
+    parser.add_argument("--max-width", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = file_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    target_bytes = args.target_kb * 1024
+    counter = EncodeCounter()
+    rows = {"legacy": [], "current": []}
+
+    for name, image_bytes in corpus:
+        t0 = time.perf_counter()
+        img = working_image(image_bytes, args.max_width)
+        counter.reset(max(img.size))
+        legacy_bytes = legacy_compress(counter, img, target_bytes)
+        rows["legacy"].append((name, counter.full, counter.proxy, time.perf_counter() - t0, len(legacy_bytes)))
+
+        counter.reset(max(img.size))
+        with patch.object(image_compression_helper, "_encode_webp", counter.encode):
+            t0 = time.perf_counter()
+            current_b64 = compress_image_to_target(image_bytes, target_kb=args.target_kb, max_width=args.max_width)
+            elapsed = time.perf_counter() - t0
+        current_size = len(current_b64) * 3 // 4 - current_b64[-2:].count("=")
+        rows["current"].append((name, counter.full, counter.proxy, elapsed, current_size))
+
+    print(f"{'image':<32} {'strategy':<8} {'full':>4} {'proxy':>5} {'ms':>8} {'kb':>8} {'of target':>9}")
+    for legacy, current in zip(rows["legacy"], rows["current"]):
+        for label, (name, full, proxy, seconds, size) in (("legacy", legacy), ("current", current)):
+            print(
+                f"{name[:32]:<32} {label:<8} {full:>4} {proxy:>5} {seconds * 1000:>8.1f} "
+                f"{size / 1024:>8.1f} {size / target_bytes:>8.0%}"
+            )
+
+    print()
+    for label, data in rows.items():
+        if not data:
+            continue
+        fits = [size / target_bytes for *_, size in data if size <= target_bytes]
+        print(
+            f"{label:<8} images={len(data)} "
+            f"full_encodes_avg={statistics.mean(r[1] for r in data):.2f} "
+            f"proxy_encodes_avg={statistics.mean(r[2] for r in data):.2f} "
+            f"ms_avg={statistics.mean(r[3] for r in data) * 1000:.1f} "
+            f"over_target={sum(1 for *_, size in data if size > target_bytes)} "
+            f"fill_of_target_avg={statistics.mean(fits) if fits else 0:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Per-request cost of getting a chat model: building it every time vs AIProviderFactory.get_llm.
+
+ConversationManager used to call `provider.get_llm(...)` on every message and
+again on each fallback attempt, constructing a new LangChain chat model (and
+its SDK client, HTTP pool and auth state) each time. This measures that
+construction against the cached path. No request is sent to any provider;
+dummy API keys are set when missing.
+
+Usage:
+    cd conversation-engine
+    source venv/bin/activate
+    python scripts/benchmark-llm-clients.py --iterations 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_GEMINI_API_KEY"):
+    os.environ.setdefault(key, "benchmark-dummy-key")
+
+from app.factories.ai_provider_factory import AIProviderFactory  # noqa: E402
+
+MODELS = {
+    "openai": "gpt-4o-mini",
+    "claude": "claude-sonnet-4-6",
+    "gemini": "gemini-flash-latest",
+}
+PARAMS = {"temperature": 0.7, "max_tokens": 1000, "top_p": 1.0}
+
+
+def measure(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.mean(samples), statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--providers", nargs="+", default=list(MODELS), choices=list(MODELS))
+    args = parser.parse_args()
+
+    print(f"{'provider':<8} {'path':<10} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+    for provider_name in args.providers:
+        model = MODELS[provider_name]
+        AIProviderFactory.clear()
+
+        def uncached():
+            AIProviderFactory._create_provider(provider_name).get_llm(model=model, **PARAMS)
+
+        def cached():
+            AIProviderFactory.get_llm(provider_name, model, **PARAMS)
+
+        try:
+            rows = (("uncached", measure(uncached, args.iterations)), ("cached", measure(cached, args.iterations)))
+        except Exception as e:
+            print(f"{provider_name:<8} skipped: {e}")
+            continue
+        for label, (mean, p50, worst) in rows:
+            print(f"{provider_name:<8} {label:<10} {mean:>9.3f} {p50:>9.3f} {worst:>9.3f}")
+
+    print()
+    print(f"factory cache: {AIProviderFactory.stats()}")
+
+
+if __name__ == "__main__":
+    main()
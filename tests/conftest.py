@@ -254,3 +254,38 @@ def mock_env_vars(monkeypatch):
     for key, value in env_vars.items():
         monkeypatch.setenv(key, value)
     return env_vars
+
+
+# ============================================================================
+# Estado global del proceso
+# ============================================================================
+
+
+@pytest.fixture(autouse=True)
+def _reset_circuit_breakers():
+    """Los circuit breakers son globales: un test con muchos fallos no debe abrir el circuito del siguiente."""
+    from app.helpers.circuit_breaker import CircuitBreakerRegistry
+
+    CircuitBreakerRegistry.clear()
+    yield
+    CircuitBreakerRegistry.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_image_limiters():
+    """Los limitadores de imágenes son globales: un 429 de un test no debe bajar el límite del siguiente."""
+    from app.helpers.concurrency import ImageLimiterRegistry
+
+    ImageLimiterRegistry.clear()
+    yield
+    ImageLimiterRegistry.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_request_dedup():
+    """El dedup de requests es global: un resultado guardado por un test no debe servirse en el siguiente."""
+    from app.helpers.request_dedup import RequestDedup
+
+    RequestDedup.clear()
+    yield
+    RequestDedup.clear()
@@ -305,3 +305,33 @@ class TestAuthenticatedEndpoints:
 
         # Debería fallar por falta de API key
         assert response.status_code in [401, 500]
+
+
+class TestSectionHtmlStreamEndpoints:
+    """Tests para los endpoints SSE de section HTML."""
+
+    @pytest.mark.integration
+    def test_generate_section_html_stream_returns_sse(self):
+        """El endpoint streaming responde text/event-stream con delta y done."""
+        test_app = FastAPI()
+        test_app.include_router(router)
+        client = TestClient(test_app)
+
+        async def fake_stream(self, section_request):
+            yield {"event": "delta", "data": {"html": "<section>"}}
+            yield {"event": "done", "data": {"html_content": "<section></section>", "model_used": "m"}}
+
+        with (
+            patch("app.middlewares.auth_middleware.API_KEY", "valid-api-key"),
+            patch("app.services.section_html_service.SectionHtmlService.stream_generate_section_html", new=fake_stream),
+        ):
+            response = client.post(
+                "/api/ms/conversational-engine/generate-section-html/stream/api-key",
+                json={"product_name": "Producto", "owner_id": "o"},
+                headers={"x-api-key": "valid-api-key"},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "event: delta" in response.text
+        assert response.text.rstrip().split("\n")[-2] == "event: done"
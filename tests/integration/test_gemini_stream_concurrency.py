@@ -0,0 +1,70 @@
+"""
+Test de integración: una generación larga con gemini_text_v2 no bloquea el
+event loop — otros requests se atienden mientras el stream está en vuelo.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.externals.ai_direct.gemini_text_v2 import call_gemini_freeform_v2
+
+CHUNKS = 10
+CHUNK_DELAY_SECONDS = 0.05
+
+
+def _slow_stream(**_kwargs):
+    """Imita el iterador síncrono del SDK: cada chunk bloquea el thread."""
+    for i in range(CHUNKS):
+        time.sleep(CHUNK_DELAY_SECONDS)
+        yield SimpleNamespace(event_type="content.delta", delta=SimpleNamespace(type="text", text=f"<p>{i}</p>"))
+
+
+@pytest.fixture
+def app():
+    test_app = FastAPI()
+
+    @test_app.post("/generate")
+    async def generate():
+        result = await call_gemini_freeform_v2(model="gemini-test", system_prompt="s", user_message="u")
+        return {"text": result["text"], "finished_at": time.monotonic()}
+
+    @test_app.get("/health")
+    async def health():
+        return {"status": "OK", "served_at": time.monotonic()}
+
+    return test_app
+
+
+@pytest.mark.integration
+async def test_health_is_served_while_generation_streams(app):
+    client = MagicMock()
+    client.interactions.create = MagicMock(side_effect=_slow_stream)
+
+    with patch("app.externals.ai_direct.gemini_text_v2._get_client", return_value=client):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            generation = asyncio.create_task(http.post("/generate"))
+            await asyncio.sleep(CHUNK_DELAY_SECONDS)
+
+            health_latencies = []
+            for _ in range(3):
+                t0 = time.monotonic()
+                response = await http.get("/health")
+                health_latencies.append(time.monotonic() - t0)
+                assert response.status_code == 200
+                served_at = response.json()["served_at"]
+
+            assert not generation.done()
+            generated = await generation
+
+    assert generated.status_code == 200
+    assert generated.json()["text"] == "".join(f"<p>{i}</p>" for i in range(CHUNKS))
+    # Con el stream en el event loop, /health esperaría ~0.5s a que termine la generación.
+    assert served_at < generated.json()["finished_at"]
+    assert max(health_latencies) < CHUNKS * CHUNK_DELAY_SECONDS / 2
@@ -0,0 +1,179 @@
+"""
+Tests para el writer batcheado de prompt_logs.
+Verifica encolado, flush por tamaño/tiempo, drop-oldest, reintento fila por
+fila o re-encolado cuando falla un batch y flush en close_pool.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db import audit_logger
+
+
+@pytest.fixture
+def mock_pool():
+    conn = MagicMock()
+    conn.executemany = AsyncMock()
+    conn.execute = AsyncMock()
+
+    acquire_ctx = MagicMock()
+    acquire_ctx.__aenter__ = AsyncMock(return_value=conn)
+    acquire_ctx.__aexit__ = AsyncMock(return_value=False)
+
+    pool = MagicMock()
+    pool.acquire = MagicMock(return_value=acquire_ctx)
+    pool.close = AsyncMock()
+    pool.conn = conn
+    return pool
+
+
+@pytest.fixture(autouse=True)
+async def _isolate_state(mock_pool):
+    audit_logger._buffer.clear()
+    for key in audit_logger._stats:
+        audit_logger._stats[key] = 0
+    with patch.object(audit_logger, "_pool", mock_pool):
+        yield
+        if audit_logger._flusher_task is not None:
+            audit_logger._flusher_task.cancel()
+            audit_logger._flusher_task = None
+    audit_logger._buffer.clear()
+
+
+def _written_rows(pool):
+    return [row for call in pool.conn.executemany.await_args_list for row in call.args[1]]
+
+
+class TestLogPrompt:
+
+    @pytest.mark.unit
+    async def test_noop_without_pool(self):
+        """Sin pool configurado no encola nada."""
+        with patch.object(audit_logger, "_pool", None):
+            await audit_logger.log_prompt("section_image", prompt="p")
+        assert audit_logger.get_audit_stats()["queued"] == 0
+
+    @pytest.mark.unit
+    async def test_enqueues_row_without_writing(self, mock_pool):
+        """log_prompt solo encola; no toca la DB en el request path."""
+        await audit_logger.log_prompt("section_image", prompt="p", metadata={"a": 1})
+
+        assert audit_logger.get_audit_stats()["queued"] == 1
+        mock_pool.conn.executemany.assert_not_awaited()
+        row = audit_logger._buffer[0]
+        assert row[1] == "section_image"
+        assert row[-1] == '{"a": 1}'
+
+    @pytest.mark.unit
+    async def test_flushes_when_batch_size_reached(self, mock_pool):
+        """Al llegar a BATCH_SIZE filas se escribe un batch sin esperar el intervalo."""
+        with patch.object(audit_logger, "BATCH_SIZE", 3), patch.object(audit_logger, "FLUSH_INTERVAL_SECONDS", 60):
+            for i in range(3):
+                await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+            await asyncio.sleep(0.01)
+
+        assert mock_pool.conn.executemany.await_count == 1
+        assert [row[7] for row in _written_rows(mock_pool)] == ["p0", "p1", "p2"]
+        assert audit_logger.get_audit_stats()["written"] == 3
+
+    @pytest.mark.unit
+    async def test_flushes_on_interval(self, mock_pool):
+        """Filas por debajo del batch se escriben al vencer el intervalo."""
+        with patch.object(audit_logger, "FLUSH_INTERVAL_SECONDS", 0.01):
+            await audit_logger.log_prompt("section_html", prompt="p")
+            await asyncio.sleep(0.05)
+
+        assert len(_written_rows(mock_pool)) == 1
+
+    @pytest.mark.unit
+    async def test_drops_oldest_when_queue_full(self, mock_pool):
+        """Con la cola llena se descarta la fila más vieja y se cuenta."""
+        with patch.object(audit_logger, "MAX_QUEUE_SIZE", 2), patch.object(audit_logger, "BATCH_SIZE", 100):
+            for i in range(3):
+                await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+
+        assert [row[7] for row in audit_logger._buffer] == ["p1", "p2"]
+        assert audit_logger.get_audit_stats()["dropped"] == 1
+
+    @pytest.mark.unit
+    async def test_failed_batch_is_counted_and_not_raised(self, mock_pool):
+        """Un error de la DB no se propaga; las filas que fallan también de a una se cuentan como fallidas."""
+        mock_pool.conn.executemany.side_effect = Exception("db down")
+        mock_pool.conn.execute.side_effect = Exception("db down")
+        await audit_logger.log_prompt("section_html", prompt="p")
+
+        await audit_logger._flush_pending()
+
+        stats = audit_logger.get_audit_stats()
+        assert stats["failed"] == 1
+        assert stats["queued"] == 0
+
+    @pytest.mark.unit
+    async def test_bad_row_does_not_drop_the_batch(self, mock_pool):
+        """Si el batch falla por una fila, el resto se escribe de a una y solo la mala cuenta como fallida."""
+        mock_pool.conn.executemany.side_effect = Exception("invalid input syntax")
+        mock_pool.conn.execute.side_effect = [None, Exception("invalid input syntax"), None]
+        for i in range(3):
+            await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+
+        await audit_logger._flush_pending()
+
+        assert [call.args[8] for call in mock_pool.conn.execute.await_args_list] == ["p0", "p1", "p2"]
+        stats = audit_logger.get_audit_stats()
+        assert stats["written"] == 2
+        assert stats["failed"] == 1
+        assert stats["queued"] == 0
+
+    @pytest.mark.unit
+    async def test_connection_error_requeues_rows(self, mock_pool):
+        """Con la DB inalcanzable las filas vuelven a la cola, en orden, y se escriben en el próximo flush."""
+        await audit_logger.log_prompt("section_html", prompt="old")
+        mock_pool.conn.executemany.side_effect = ConnectionRefusedError("connection refused")
+        for i in range(2):
+            await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+
+        await audit_logger._flush_pending()
+
+        assert [row[7] for row in audit_logger._buffer] == ["old", "p0", "p1"]
+        stats = audit_logger.get_audit_stats()
+        assert stats["failed"] == 0
+        assert stats["requeued"] == 3
+        mock_pool.conn.execute.assert_not_awaited()
+
+        mock_pool.conn.executemany.side_effect = None
+        await audit_logger._flush_pending()
+
+        assert [row[7] for row in mock_pool.conn.executemany.await_args.args[1]] == ["old", "p0", "p1"]
+        assert audit_logger.get_audit_stats()["queued"] == 0
+
+    @pytest.mark.unit
+    async def test_connection_lost_midway_requeues_unwritten_rows(self, mock_pool):
+        """Si la conexión se corta durante el reintento fila por fila, solo vuelven a la cola las no escritas."""
+        mock_pool.conn.executemany.side_effect = Exception("invalid input syntax")
+        mock_pool.conn.execute.side_effect = [None, ConnectionResetError("reset"), None]
+        for i in range(3):
+            await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+
+        await audit_logger._flush_pending()
+
+        assert [row[7] for row in audit_logger._buffer] == ["p1", "p2"]
+        stats = audit_logger.get_audit_stats()
+        assert stats["written"] == 1
+        assert stats["failed"] == 0
+
+
+class TestClosePool:
+
+    @pytest.mark.unit
+    async def test_close_flushes_pending_rows(self, mock_pool):
+        """close_pool escribe lo encolado antes de cerrar el pool."""
+        with patch.object(audit_logger, "FLUSH_INTERVAL_SECONDS", 60):
+            for i in range(5):
+                await audit_logger.log_prompt("section_html", prompt=f"p{i}")
+            await audit_logger.close_pool()
+
+        assert len(_written_rows(mock_pool)) == 5
+        mock_pool.close.assert_awaited_once()
+        assert audit_logger._flusher_task is None
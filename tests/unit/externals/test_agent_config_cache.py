@@ -0,0 +1,206 @@
+"""
+Tests para AgentConfigCache.
+Verifica TTL, stale-while-revalidate, single-flight, LRU e invalidación.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.externals.agent_config.agent_config_cache import AgentConfigCache, get_agent
+from app.externals.agent_config.requests.agent_config_request import AgentConfigRequest
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse
+
+CLIENT_GET_AGENT = "app.externals.agent_config.agent_config_cache.agent_config_client.get_agent"
+
+
+@pytest.fixture(autouse=True)
+def _isolate_state():
+    AgentConfigCache.invalidate()
+    AgentConfigCache._inflight.clear()
+    yield
+    AgentConfigCache.invalidate()
+    AgentConfigCache._inflight.clear()
+
+
+@pytest.fixture
+def agent_config(sample_agent_config_data):
+    return AgentConfigResponse(**sample_agent_config_data)
+
+
+def _request(agent_id="test-agent", query="hola", parameter_prompt=None, metadata_filter=None):
+    return AgentConfigRequest(
+        agent_id=agent_id,
+        query=query,
+        parameter_prompt=parameter_prompt or {},
+        metadata_filter=metadata_filter or [],
+    )
+
+
+def _age_entries(seconds: float) -> None:
+    for key, (value, fetched_at) in list(AgentConfigCache._cache.items()):
+        AgentConfigCache._cache[key] = (value, fetched_at - seconds)
+
+
+class TestAgentConfigCache:
+
+    @pytest.mark.unit
+    async def test_caches_by_agent_ignoring_query(self, agent_config):
+        """Dos requests al mismo agente con distinto query hacen un solo fetch."""
+        mock = AsyncMock(return_value=agent_config)
+        with patch(CLIENT_GET_AGENT, new=mock):
+            first = await get_agent(_request(query="uno"))
+            second = await get_agent(_request(query="dos"))
+
+        assert first == second == agent_config
+        assert first is not second
+        assert mock.await_count == 1
+
+    @pytest.mark.unit
+    async def test_parameter_prompt_is_part_of_key(self, agent_config):
+        """Distinto parameter_prompt o metadata_filter debe ser otra entrada."""
+        mock = AsyncMock(return_value=agent_config)
+        with patch(CLIENT_GET_AGENT, new=mock):
+            await get_agent(_request(parameter_prompt={"lang": "es"}))
+            await get_agent(_request(parameter_prompt={"lang": "en"}))
+            await get_agent(_request(parameter_prompt={"lang": "es"}))
+            await get_agent(_request(metadata_filter=[{"key": "k", "value": "v"}]))
+
+        assert mock.await_count == 3
+
+    @pytest.mark.unit
+    async def test_without_agent_id_bypasses_cache(self, agent_config):
+        """Búsqueda por query (sin agent_id) no se cachea."""
+        mock = AsyncMock(return_value=agent_config)
+        with patch(CLIENT_GET_AGENT, new=mock):
+            await get_agent(_request(agent_id=None))
+            await get_agent(_request(agent_id=None))
+
+        assert mock.await_count == 2
+        assert AgentConfigCache.stats()["entries"] == 0
+
+    @pytest.mark.unit
+    async def test_stale_entry_served_and_refreshed_in_background(self, agent_config):
+        """Entre TTL y STALE se devuelve el valor viejo y se refresca en background."""
+        updated = agent_config.model_copy(update={"prompt": "nuevo prompt"})
+        mock = AsyncMock(side_effect=[agent_config, updated])
+        with patch(CLIENT_GET_AGENT, new=mock):
+            await get_agent(_request())
+            _age_entries(AgentConfigCache.TTL_SECONDS + 1)
+
+            stale = await get_agent(_request())
+            await asyncio.sleep(0)
+            await asyncio.gather(*AgentConfigCache._inflight.values())
+            fresh = await get_agent(_request())
+
+        assert stale.prompt == agent_config.prompt
+        assert fresh.prompt == "nuevo prompt"
+        assert mock.await_count == 2
+        assert AgentConfigCache.stats()["stale_hits"] == 1
+
+    @pytest.mark.unit
+    async def test_expired_entry_waits_for_fetch(self, agent_config):
+        """Pasado STALE_SECONDS el caller espera un fetch nuevo."""
+        updated = agent_config.model_copy(update={"prompt": "nuevo prompt"})
+        mock = AsyncMock(side_effect=[agent_config, updated])
+        with patch(CLIENT_GET_AGENT, new=mock):
+            await get_agent(_request())
+            _age_entries(AgentConfigCache.STALE_SECONDS + 1)
+            result = await get_agent(_request())
+
+        assert result.prompt == "nuevo prompt"
+
+    @pytest.mark.unit
+    async def test_concurrent_misses_share_one_fetch(self, agent_config):
+        """Single-flight: N misses concurrentes hacen un solo fetch."""
+
+        async def slow_fetch(_data):
+            await asyncio.sleep(0.01)
+            return agent_config
+
+        mock = AsyncMock(side_effect=slow_fetch)
+        with patch(CLIENT_GET_AGENT, new=mock):
+            results = await asyncio.gather(*[get_agent(_request()) for _ in range(10)])
+
+        assert all(r == agent_config for r in results)
+        assert mock.await_count == 1
+        assert AgentConfigCache.stats()["coalesced"] == 9
+
+    @pytest.mark.unit
+    async def test_errors_are_not_cached(self, agent_config):
+        """Un fetch fallido se propaga y no queda en cache."""
+        mock = AsyncMock(side_effect=[RuntimeError("down"), agent_config])
+        with patch(CLIENT_GET_AGENT, new=mock):
+            with pytest.raises(RuntimeError):
+                await get_agent(_request())
+            assert await get_agent(_request()) == agent_config
+
+        assert mock.await_count == 2
+
+    @pytest.mark.unit
+    async def test_lru_eviction(self, agent_config):
+        """El cache no crece más allá de MAX_ENTRIES."""
+        mock = AsyncMock(return_value=agent_config)
+        with patch(CLIENT_GET_AGENT, new=mock), patch.object(AgentConfigCache, "MAX_ENTRIES", 2):
+            await get_agent(_request(agent_id="a"))
+            await get_agent(_request(agent_id="b"))
+            await get_agent(_request(agent_id="a"))
+            await get_agent(_request(agent_id="c"))
+
+            assert [key[0] for key in AgentConfigCache._cache] == ["a", "c"]
+
+    @pytest.mark.unit
+    async def test_invalidate_by_agent_id(self, agent_config):
+        """invalidate(agent_id) borra todas las variantes de ese agente."""
+        mock = AsyncMock(return_value=agent_config)
+        with patch(CLIENT_GET_AGENT, new=mock):
+            await get_agent(_request(agent_id="a", parameter_prompt={"x": 1}))
+            await get_agent(_request(agent_id="a", parameter_prompt={"x": 2}))
+            await get_agent(_request(agent_id="b"))
+
+            assert AgentConfigCache.invalidate("a") == 2
+            assert [key[0] for key in AgentConfigCache._cache] == ["b"]
+
+            await get_agent(_request(agent_id="a", parameter_prompt={"x": 1}))
+
+        assert mock.await_count == 4
+
+    @pytest.mark.unit
+    async def test_invalidate_during_fetch_does_not_store(self, agent_config):
+        """Un invalidate mientras hay un fetch en vuelo gana sobre ese resultado."""
+        release = asyncio.Event()
+
+        async def slow_fetch(_data):
+            await release.wait()
+            return agent_config
+
+        with patch(CLIENT_GET_AGENT, new=AsyncMock(side_effect=slow_fetch)):
+            pending = asyncio.create_task(get_agent(_request()))
+            await asyncio.sleep(0)
+            AgentConfigCache.invalidate()
+            release.set()
+            assert await pending == agent_config
+
+        assert AgentConfigCache.stats()["entries"] == 0
+
+
+class TestInvalidateEndpoint:
+
+    @pytest.mark.unit
+    async def test_endpoint_invalidates_agent_and_prompt_caches(self):
+        """El endpoint limpia AgentConfigCache y PromptConfigService."""
+        from app.controllers.handle_controller import invalidate_agent_config_cache
+
+        request = MagicMock()
+        request.headers = {"x-api-key": "valid-api-key"}
+
+        with (
+            patch("app.middlewares.auth_middleware.API_KEY", "valid-api-key"),
+            patch("app.services.prompt_config_service.PromptConfigService.invalidate") as prompt_invalidate,
+        ):
+            result = await invalidate_agent_config_cache(request, agent_id="a")
+
+        prompt_invalidate.assert_called_once_with("a")
+        assert result["agent_id"] == "a"
+        assert result["invalidated"] == 0
@@ -26,10 +26,8 @@ class TestCallbackClient:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
 
-        with patch("app.externals.callback.callback_client.httpx.AsyncClient", return_value=mock_client):
+        with patch("app.externals.callback.callback_client.get_http_client", return_value=mock_client):
             await post_callback("https://example.com/webhook", payload, api_key="test-key")
 
         mock_client.post.assert_called_once_with(
@@ -43,10 +41,8 @@ class TestCallbackClient:
         """Debe reintentar hasta max_retries veces y lanzar RuntimeError."""
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(side_effect=httpx.HTTPError("Connection error"))
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
 
-        with patch("app.externals.callback.callback_client.httpx.AsyncClient", return_value=mock_client):
+        with patch("app.externals.callback.callback_client.get_http_client", return_value=mock_client):
             with patch("app.externals.callback.callback_client.asyncio.sleep", new_callable=AsyncMock):
                 with pytest.raises(RuntimeError, match="Callback POST failed after 3 attempts"):
                     await post_callback("https://example.com/webhook", payload, max_retries=3, api_key="test-key")
@@ -61,10 +57,8 @@ class TestCallbackClient:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(side_effect=[httpx.HTTPError("fail"), mock_response])
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
 
-        with patch("app.externals.callback.callback_client.httpx.AsyncClient", return_value=mock_client):
+        with patch("app.externals.callback.callback_client.get_http_client", return_value=mock_client):
             with patch("app.externals.callback.callback_client.asyncio.sleep", new_callable=AsyncMock):
                 await post_callback("https://example.com/webhook", payload, max_retries=3, api_key="test-key")
 
@@ -78,10 +72,8 @@ class TestCallbackClient:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=False)
 
-        with patch("app.externals.callback.callback_client.httpx.AsyncClient", return_value=mock_client):
+        with patch("app.externals.callback.callback_client.get_http_client", return_value=mock_client):
             with patch("app.externals.callback.callback_client.API_KEY", "config-api-key"):
                 await post_callback("https://example.com/webhook", payload)
 
@@ -44,14 +44,12 @@ class TestFalClient:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.externals.fal.fal_client.httpx.AsyncClient")
-    async def test_post_success(self, mock_client_class, client, mock_httpx_response):
+    @patch("app.externals.fal.fal_client.get_http_client")
+    async def test_post_success(self, mock_get_client, client, mock_httpx_response):
         """Debe realizar POST correctamente."""
         mock_client = MagicMock()
         mock_client.post = AsyncMock(return_value=mock_httpx_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock()
-        mock_client_class.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         result = await client._post("test/path", {"key": "value"})
 
@@ -60,14 +58,12 @@ class TestFalClient:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.externals.fal.fal_client.httpx.AsyncClient")
-    async def test_post_with_webhook(self, mock_client_class, client, mock_httpx_response):
+    @patch("app.externals.fal.fal_client.get_http_client")
+    async def test_post_with_webhook(self, mock_get_client, client, mock_httpx_response):
         """Debe incluir webhook en URL."""
         mock_client = MagicMock()
         mock_client.post = AsyncMock(return_value=mock_httpx_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock()
-        mock_client_class.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         await client._post("test/path", {"key": "value"}, fal_webhook="https://callback.example.com")
 
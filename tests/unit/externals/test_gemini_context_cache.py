@@ -0,0 +1,185 @@
+"""
+Tests para gemini_context_cache.
+Verifica el umbral de tamaño, el single-flight, el cooldown tras un fallo de
+creación, la extensión del TTL en background, el armado del payload y el
+reintento inline cuando Gemini ya no tiene el cachedContent.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.externals.ai_direct import gemini_context_cache, gemini_text
+from app.externals.ai_direct.gemini_context_cache import (
+    GeminiContextCache,
+    is_stale_cache_error,
+    with_system_prompt,
+)
+from app.helpers.circuit_breaker import CircuitBreakerRegistry
+
+BIG_PROMPT = "x" * 20000
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    GeminiContextCache.clear()
+    with (
+        patch.object(gemini_context_cache, "GOOGLE_GEMINI_API_KEY", "test-key"),
+        patch.object(GeminiContextCache, "ENABLED", True),
+        patch.object(GeminiContextCache, "MIN_CHARS", 16000),
+    ):
+        yield
+    GeminiContextCache.clear()
+
+
+class TestGeminiContextCache:
+
+    @pytest.mark.unit
+    async def test_small_prompts_are_sent_inline(self):
+        """Un prompt bajo el umbral no crea cachedContents."""
+        with patch.object(gemini_context_cache, "_create_remote", new_callable=AsyncMock) as create:
+            assert await GeminiContextCache.get("gemini-2.5-pro", "corto") is None
+
+        create.assert_not_called()
+        assert GeminiContextCache.stats()["skipped_small"] == 1
+
+    @pytest.mark.unit
+    async def test_created_once_and_reused(self):
+        """Llamadas concurrentes con el mismo prompt comparten una sola creación."""
+
+        async def create(model, system_prompt, ttl_seconds):
+            await asyncio.sleep(0.01)
+            return "cachedContents/abc"
+
+        with patch.object(gemini_context_cache, "_create_remote", side_effect=create) as mock_create:
+            names = await asyncio.gather(*(GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT) for _ in range(5)))
+            again = await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT)
+
+        assert set(names) == {"cachedContents/abc"} and again == "cachedContents/abc"
+        assert mock_create.call_count == 1
+        stats = GeminiContextCache.stats()
+        assert stats["coalesced"] == 4 and stats["hits"] == 1
+
+    @pytest.mark.unit
+    async def test_key_is_model_and_content(self):
+        """Otro modelo u otro contenido crean su propio cachedContents."""
+        create = AsyncMock(side_effect=["cachedContents/a", "cachedContents/b", "cachedContents/c"])
+        with patch.object(gemini_context_cache, "_create_remote", create):
+            await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT)
+            await GeminiContextCache.get("gemini-2.5-flash", BIG_PROMPT)
+            await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT + "y")
+
+        assert create.call_count == 3
+
+    @pytest.mark.unit
+    async def test_failed_creation_cools_down(self):
+        """Si Gemini rechaza la creación se manda inline sin reintentar hasta que pase el cooldown."""
+        create = AsyncMock(side_effect=gemini_context_cache.GeminiContextCacheError("too small", status=400))
+        with patch.object(gemini_context_cache, "_create_remote", create):
+            assert await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT) is None
+            assert await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT) is None
+
+        assert create.call_count == 1
+        assert GeminiContextCache.stats()["cooling_down"] == 1
+
+    @pytest.mark.unit
+    async def test_ttl_is_extended_before_expiry(self):
+        """Cerca del vencimiento se sirve el mismo nombre y se extiende el TTL en background."""
+        with patch.object(gemini_context_cache, "_create_remote", AsyncMock(return_value="cachedContents/abc")):
+            with patch("app.externals.ai_direct.gemini_context_cache.time.monotonic", return_value=0.0):
+                await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT)
+
+            near_expiry = GeminiContextCache.TTL_SECONDS - GeminiContextCache.REFRESH_SECONDS
+            with patch.object(gemini_context_cache, "_extend_remote", new_callable=AsyncMock) as extend:
+                with patch("app.externals.ai_direct.gemini_context_cache.time.monotonic", return_value=near_expiry):
+                    assert await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT) == "cachedContents/abc"
+                await asyncio.sleep(0)
+
+        extend.assert_awaited_once_with("cachedContents/abc", GeminiContextCache.TTL_SECONDS)
+        assert GeminiContextCache.stats()["refreshed"] == 1
+
+    @pytest.mark.unit
+    async def test_invalidate_deletes_remote(self):
+        with patch.object(gemini_context_cache, "_create_remote", AsyncMock(return_value="cachedContents/abc")):
+            await GeminiContextCache.get("gemini-2.5-pro", BIG_PROMPT)
+
+        with patch.object(gemini_context_cache, "_delete_remote", new_callable=AsyncMock) as delete:
+            assert GeminiContextCache.invalidate("gemini-2.5-pro", BIG_PROMPT) == 1
+            await asyncio.sleep(0)
+
+        delete.assert_awaited_once_with("cachedContents/abc")
+
+
+class TestPayload:
+
+    @pytest.mark.unit
+    async def test_with_system_prompt(self):
+        """Con cache el payload lleva cachedContent y no systemInstruction; sin cache, inline."""
+        with patch.object(gemini_context_cache, "_create_remote", AsyncMock(return_value="cachedContents/abc")):
+            cached = await with_system_prompt({"contents": []}, "gemini-2.5-pro", BIG_PROMPT)
+        inline = await with_system_prompt({"contents": []}, "gemini-2.5-pro", "corto")
+
+        assert cached == {"contents": [], "cachedContent": "cachedContents/abc"}
+        assert inline["systemInstruction"]["parts"][0]["text"] == "corto"
+        assert "cachedContent" not in inline
+
+    @pytest.mark.unit
+    def test_is_stale_cache_error(self):
+        assert is_stale_cache_error(403, '{"message": "CachedContent not found (or permission denied)"}')
+        assert not is_stale_cache_error(400, '{"message": "SAFETY"}')
+        assert not is_stale_cache_error(500, "cachedContent")
+
+
+class _Response:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    async def text(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class TestStaleCacheRetry:
+
+    @pytest.mark.unit
+    async def test_stale_cached_content_retries_inline_without_counting_a_failure(self):
+        """Un cachedContent vencido no abre el breaker, no consume intento ni espera backoff."""
+        ok_body = json.dumps({"candidates": [{"content": {"parts": [{"text": '{"ok": true}'}]}}]})
+        payloads = []
+
+        def post(url, headers, json):
+            payloads.append(dict(json))
+            if len(payloads) == 1:
+                return _Response(403, '{"message": "CachedContent not found (or permission denied)"}')
+            return _Response(200, ok_body)
+
+        session = MagicMock()
+        session.post.side_effect = post
+        CircuitBreakerRegistry.clear()
+        with (
+            patch.object(gemini_context_cache, "_create_remote", AsyncMock(return_value="cachedContents/abc")),
+            patch.object(gemini_text, "GOOGLE_GEMINI_API_KEY", "test-key"),
+            patch.object(gemini_text, "_get_session", AsyncMock(return_value=session)),
+            patch.object(gemini_text, "before_retry", AsyncMock(return_value=True)) as backoff,
+        ):
+            parsed, _ = await gemini_text.call_gemini_structured(
+                model="gemini-2.5-pro", system_prompt=BIG_PROMPT, user_message="hola", response_schema={}
+            )
+
+        breaker = CircuitBreakerRegistry.get("gemini", "gemini-2.5-pro")
+        assert parsed == {"ok": True}
+        assert payloads[0]["cachedContent"] == "cachedContents/abc"
+        assert "cachedContent" not in payloads[1]
+        assert payloads[1]["systemInstruction"]["parts"][0]["text"] == BIG_PROMPT
+        backoff.assert_not_awaited()
+        snapshot = breaker.snapshot()
+        assert snapshot["failures"] == 0 and snapshot["successes"] == 1 and snapshot["window_calls"] == 1
+        CircuitBreakerRegistry.clear()
@@ -0,0 +1,95 @@
+"""
+Tests para gemini_text_v2.
+Verifica que el stream síncrono del SDK se consume desde un thread y que
+los chunks, errores y el cierre temprano llegan bien al event loop.
+"""
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.externals.ai_direct.gemini_text_v2 import GeminiTextV2Error, _aiter_interaction, call_gemini_freeform_v2
+
+
+def _text_chunk(text):
+    return SimpleNamespace(event_type="content.delta", delta=SimpleNamespace(type="text", text=text))
+
+
+def _complete_chunk():
+    usage = SimpleNamespace(total_tokens=10, total_input_tokens=4, total_output_tokens=6, total_thought_tokens=0)
+    return SimpleNamespace(
+        event_type="interaction.complete",
+        interaction=SimpleNamespace(id="int-1", usage=usage, status="completed"),
+    )
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.closed = False
+        self.thread_names = []
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self.thread_names.append(threading.current_thread().name)
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def _client_for(stream):
+    client = MagicMock()
+    client.interactions.create = MagicMock(return_value=stream)
+    return client
+
+
+class TestAiterInteraction:
+
+    @pytest.mark.unit
+    async def test_yields_chunks_from_worker_thread(self):
+        """Los chunks se leen en un thread del pool y llegan en orden."""
+        stream = _FakeStream([_text_chunk("a"), _text_chunk("b")])
+
+        chunks = [c async for c in _aiter_interaction(_client_for(stream), {"stream": True})]
+
+        assert [c.delta.text for c in chunks] == ["a", "b"]
+        assert all(name.startswith("gemini-stream") for name in stream.thread_names)
+
+    @pytest.mark.unit
+    async def test_forwards_stream_exception(self):
+        """Un error del SDK dentro del thread se re-lanza en el loop."""
+        stream = _FakeStream([_text_chunk("a"), ConnectionError("reset")])
+
+        with pytest.raises(ConnectionError):
+            async for _ in _aiter_interaction(_client_for(stream), {}):
+                pass
+
+
+class TestCallGeminiFreeformV2:
+
+    @pytest.mark.unit
+    async def test_accumulates_text_and_usage(self):
+        """Debe concatenar los deltas y devolver id y usage."""
+        stream = _FakeStream([_text_chunk("<div>"), _text_chunk("</div>"), _complete_chunk()])
+
+        with patch("app.externals.ai_direct.gemini_text_v2._get_client", return_value=_client_for(stream)):
+            result = await call_gemini_freeform_v2(model="m", system_prompt="s", user_message="u")
+
+        assert result["text"] == "<div></div>"
+        assert result["interaction_id"] == "int-1"
+        assert result["usage"]["total_tokens"] == 10
+
+    @pytest.mark.unit
+    async def test_error_event_stops_stream(self):
+        """Un evento de error corta el stream y se propaga como GeminiTextV2Error."""
+        error = SimpleNamespace(event_type="error", error=SimpleNamespace(message="quota"))
+        stream = _FakeStream([_text_chunk("a"), error] + [_text_chunk("x")] * 50)
+
+        with patch("app.externals.ai_direct.gemini_text_v2._get_client", return_value=_client_for(stream)):
+            with pytest.raises(GeminiTextV2Error, match="quota"):
+                await call_gemini_freeform_v2(model="m", system_prompt="s", user_message="u")
@@ -0,0 +1,100 @@
+"""
+Tests para el registry de clientes HTTP compartidos.
+Verifica reutilización del pool, cierre y métricas por host.
+"""
+
+import httpx
+import pytest
+
+from app.externals import http_clients
+from app.externals.http_clients import (
+    _MeteredTransport,
+    close_http_clients,
+    get_aiohttp_session,
+    get_http_client,
+    get_pool_metrics,
+    init_http_clients,
+)
+
+
+@pytest.fixture(autouse=True)
+async def reset_registry():
+    await close_http_clients()
+    http_clients._host_stats.clear()
+    yield
+    await close_http_clients()
+    http_clients._host_stats.clear()
+
+
+class TestHttpClients:
+    """Tests para get_http_client / close_http_clients."""
+
+    @pytest.mark.unit
+    async def test_same_client_is_reused(self):
+        """Debe devolver la misma instancia para el mismo upstream."""
+        assert get_http_client("dropi") is get_http_client("dropi")
+        assert get_http_client("dropi") is not get_http_client("fal")
+
+    @pytest.mark.unit
+    async def test_upstream_timeout_applied(self):
+        """Debe aplicar el timeout configurado para cada upstream."""
+        assert get_http_client("auth").timeout.read == 3.0
+        assert get_http_client("unknown").timeout.read == 60.0
+
+    @pytest.mark.unit
+    async def test_new_client_after_close(self):
+        """Debe recrear el cliente si el anterior fue cerrado."""
+        first = get_http_client("callback")
+        await close_http_clients()
+
+        assert first.is_closed
+        assert get_http_client("callback") is not first
+
+    @pytest.mark.unit
+    async def test_init_creates_all_upstreams(self):
+        """init_http_clients debe dejar listos todos los upstreams conocidos."""
+        await init_http_clients()
+
+        assert get_pool_metrics()["clients"] == sorted(http_clients.UPSTREAM_TIMEOUTS)
+
+    @pytest.mark.unit
+    async def test_close_clears_sessions(self):
+        """close_http_clients también cierra las sesiones aiohttp."""
+        session = get_aiohttp_session("gemini_image")
+        assert get_aiohttp_session("gemini_image") is session
+
+        await close_http_clients()
+
+        assert session.closed
+        assert get_pool_metrics()["sessions"] == []
+
+
+class TestPoolMetrics:
+    """Tests para las métricas por host del transporte instrumentado."""
+
+    @staticmethod
+    def _client(status_code: int) -> httpx.AsyncClient:
+        transport = httpx.MockTransport(lambda request: httpx.Response(status_code, json={}))
+        return httpx.AsyncClient(transport=_MeteredTransport(transport))
+
+    @pytest.mark.unit
+    async def test_counts_requests_per_host(self):
+        """Debe contar requests exitosos por host."""
+        async with self._client(200) as client:
+            await client.get("https://api.example.com/a")
+            await client.get("https://api.example.com/b")
+
+        stats = get_pool_metrics()["hosts"]["api.example.com"]
+        assert stats["requests"] == 2
+        assert stats["errors"] == 0
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.unit
+    async def test_counts_server_errors(self):
+        """Debe contar respuestas 5xx como errores."""
+        async with self._client(503) as client:
+            await client.get("https://down.example.com/")
+
+        stats = get_pool_metrics(host="down.example.com")["hosts"]
+        assert list(stats) == ["down.example.com"]
+        assert stats["down.example.com"]["errors"] == 1
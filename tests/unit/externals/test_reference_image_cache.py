@@ -0,0 +1,203 @@
+"""
+Tests para ReferenceImageCache.
+Verifica single-flight, TTL con revalidación por ETag, deduplicación por
+contenido, el límite de bytes del LRU y el tier en disco con su tope de bytes.
+"""
+
+import asyncio
+import base64
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.externals.images.reference_image_cache import ReferenceImageCache
+
+
+class _FakeResponse:
+    def __init__(self, status, body=b"", etag=None):
+        self.status = status
+        self._body = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    async def read(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeSession:
+    """Sirve `files[url]` = (body, etag); responde 304 si el If-None-Match coincide."""
+
+    def __init__(self, files, delay=0.0):
+        self.files = files
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, headers=None):
+        self.calls.append((url, headers or {}))
+        session = self
+
+        class _Ctx:
+            async def __aenter__(self):
+                await asyncio.sleep(session.delay)
+                if url not in session.files:
+                    return _FakeResponse(404)
+                body, etag = session.files[url]
+                if etag and (headers or {}).get("If-None-Match") == etag:
+                    return _FakeResponse(304)
+                return _FakeResponse(200, body, etag)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Ctx()
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    ReferenceImageCache.clear()
+    ReferenceImageCache._inflight.clear()
+    for key in ReferenceImageCache._stats:
+        ReferenceImageCache._stats[key] = 0
+    yield
+    ReferenceImageCache.clear()
+
+
+def _use(session):
+    return patch("app.externals.images.reference_image_cache.get_aiohttp_session", return_value=session)
+
+
+class TestReferenceImageCache:
+
+    @pytest.mark.unit
+    async def test_concurrent_requests_download_once(self):
+        """N jobs pidiendo la misma URL a la vez comparten una sola descarga."""
+        session = _FakeSession({"https://img/a.jpg": (b"product-photo", None)}, delay=0.01)
+
+        with _use(session):
+            results = await asyncio.gather(*[ReferenceImageCache.get_base64("https://img/a.jpg") for _ in range(8)])
+
+        assert len(session.calls) == 1
+        assert set(results) == {base64.b64encode(b"product-photo").decode()}
+        assert ReferenceImageCache.stats()["coalesced"] == 7
+
+    @pytest.mark.unit
+    async def test_fresh_entry_is_served_from_memory(self):
+        """Dentro del TTL no vuelve a descargar."""
+        session = _FakeSession({"https://img/a.jpg": (b"photo", None)})
+
+        with _use(session):
+            await ReferenceImageCache.get_base64("https://img/a.jpg")
+            await ReferenceImageCache.get_base64("https://img/a.jpg")
+
+        assert len(session.calls) == 1
+        assert ReferenceImageCache.stats()["hits"] == 1
+
+    @pytest.mark.unit
+    async def test_expired_entry_revalidates_with_etag(self):
+        """Vencido el TTL manda If-None-Match y un 304 conserva el valor cacheado."""
+        session = _FakeSession({"https://img/a.jpg": (b"photo", '"v1"')})
+
+        with _use(session), patch.object(ReferenceImageCache, "TTL_SECONDS", 0):
+            first = await ReferenceImageCache.get_base64("https://img/a.jpg")
+            second = await ReferenceImageCache.get_base64("https://img/a.jpg")
+
+        assert session.calls[1][1] == {"If-None-Match": '"v1"'}
+        assert first == second
+        assert ReferenceImageCache.stats()["revalidated"] == 1
+
+    @pytest.mark.unit
+    async def test_same_content_is_stored_once(self):
+        """Dos URLs con el mismo archivo comparten el string base64."""
+        session = _FakeSession({"https://a/x.jpg": (b"same-bytes", None), "https://b/y.jpg": (b"same-bytes", None)})
+
+        with _use(session):
+            a = await ReferenceImageCache.get_base64("https://a/x.jpg")
+            b = await ReferenceImageCache.get_base64("https://b/y.jpg")
+
+        assert a is b
+        stats = ReferenceImageCache.stats()
+        assert (stats["entries"], stats["blobs"], stats["bytes"]) == (2, 1, len(a))
+
+    @pytest.mark.unit
+    async def test_evicts_least_recently_used_over_byte_budget(self):
+        """Al pasar MAX_BYTES se descarta la URL menos usada."""
+        files = {f"https://img/{i}.jpg": (bytes([i]) * 30, None) for i in range(3)}
+        session = _FakeSession(files)
+
+        with _use(session), patch.object(ReferenceImageCache, "MAX_BYTES", 90):
+            for i in range(3):
+                await ReferenceImageCache.get_base64(f"https://img/{i}.jpg")
+
+        assert list(ReferenceImageCache._cache) == ["https://img/1.jpg", "https://img/2.jpg"]
+        assert ReferenceImageCache.stats()["bytes"] == 80
+
+    @pytest.mark.unit
+    async def test_failed_download_is_not_cached(self):
+        """Un 404 devuelve None y el siguiente intento vuelve a descargar."""
+        session = _FakeSession({})
+
+        with _use(session):
+            assert await ReferenceImageCache.get_base64("https://img/missing.jpg") is None
+            assert await ReferenceImageCache.get_base64("https://img/missing.jpg") is None
+
+        assert len(session.calls) == 2
+        assert ReferenceImageCache.stats()["entries"] == 0
+
+    @pytest.mark.unit
+    async def test_disk_tier_survives_memory_clear(self, tmp_path):
+        """Con DISK_DIR, tras limpiar memoria (reinicio) se sirve desde disco sin descargar."""
+        session = _FakeSession({"https://img/a.jpg": (b"photo-on-disk", None)})
+
+        with _use(session), patch.object(ReferenceImageCache, "DISK_DIR", str(tmp_path)):
+            first = await ReferenceImageCache.get_base64("https://img/a.jpg")
+            ReferenceImageCache.clear()
+            second = await ReferenceImageCache.get_base64("https://img/a.jpg")
+
+        assert len(session.calls) == 1
+        assert first == second
+        assert ReferenceImageCache.stats()["disk_hits"] == 1
+
+    @pytest.mark.unit
+    async def test_disk_tier_evicts_least_recently_used_over_byte_cap(self, tmp_path):
+        """Al pasar DISK_MAX_BYTES se borra el blob menos usado y su índice; leer desde disco cuenta como uso."""
+        files = {f"https://img/{name}.jpg": (name.encode() * 10, None) for name in "abc"}
+        session = _FakeSession(files)
+
+        with (
+            _use(session),
+            patch.object(ReferenceImageCache, "DISK_DIR", str(tmp_path)),
+            patch.object(ReferenceImageCache, "DISK_MAX_BYTES", 25),
+        ):
+            await ReferenceImageCache.get_base64("https://img/a.jpg")
+            await ReferenceImageCache.get_base64("https://img/b.jpg")
+            now = time.time()
+            for name, age in (("a", 100), ("b", 50)):
+                digest = ReferenceImageCache._cache[f"https://img/{name}.jpg"].digest
+                os.utime(ReferenceImageCache._blob_path(digest), (now - age, now - age))
+
+            ReferenceImageCache.clear()
+            await ReferenceImageCache.get_base64("https://img/a.jpg")  # desde disco: a pasa a ser reciente
+            await ReferenceImageCache.get_base64("https://img/c.jpg")
+
+            assert len(os.listdir(tmp_path / "blobs")) == 2
+            assert len(os.listdir(tmp_path / "urls")) == 2
+            assert ReferenceImageCache._read_disk("https://img/b.jpg") is None
+            assert ReferenceImageCache._read_disk("https://img/a.jpg") is not None
+
+            ReferenceImageCache.clear()
+            await ReferenceImageCache.get_base64("https://img/b.jpg")
+
+        assert [url for url, _ in session.calls] == [
+            "https://img/a.jpg",
+            "https://img/b.jpg",
+            "https://img/c.jpg",
+            "https://img/b.jpg",
+        ]
+        assert ReferenceImageCache.stats()["disk_evictions"] == 2
@@ -0,0 +1,89 @@
+"""
+Tests para s3_upload_client.
+Verifica que upload_bytes produce el mismo JSON que upload_file sin armar el
+base64 completo en memoria, y el camino con URL prefirmada.
+"""
+
+import base64
+import json
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.externals.s3_upload import s3_upload_client
+from app.externals.s3_upload.requests.s3_upload_request import S3UploadRequest
+from app.externals.s3_upload.s3_upload_client import upload_bytes
+
+
+def _client_recording(requests, responses):
+    async def handler(request):
+        requests.append((request, await request.aread()))
+        return responses.pop(0)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestUploadBytes:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("size", [0, 1, 2, 3, 3 * 64 * 1024, 3 * 64 * 1024 + 1, 500_000])
+    async def test_streamed_body_matches_legacy_json(self, size):
+        """El body streameado es el mismo JSON que S3UploadRequest con el archivo en base64."""
+        data = os.urandom(size)
+        requests = []
+        client = _client_recording(requests, [httpx.Response(200, json={"s3_url": "https://s3/x.webp"})])
+
+        with (
+            patch.object(s3_upload_client, "S3_PRESIGN_API", None),
+            patch.object(s3_upload_client, "S3_UPLOAD_API", "https://upload.test/files"),
+            patch.object(s3_upload_client, "get_http_client", return_value=client),
+        ):
+            result = await upload_bytes(data, folder="owner/products", filename='img "1"')
+
+        request, body = requests[0]
+        expected = S3UploadRequest(file=base64.b64encode(data).decode(), folder="owner/products", filename='img "1"')
+        assert json.loads(body) == expected.dict()
+        assert int(request.headers["Content-Length"]) == len(body)
+        assert "transfer-encoding" not in request.headers
+        assert result.s3_url == "https://s3/x.webp"
+
+    @pytest.mark.unit
+    async def test_presigned_put_sends_raw_bytes(self):
+        """Con S3_PRESIGN_API pide la URL y hace PUT de los bytes crudos."""
+        data = b"\x00webp-bytes"
+        requests = []
+        client = _client_recording(
+            requests,
+            [
+                httpx.Response(200, json={"upload_url": "https://bucket.s3/put?sig=1", "s3_url": "https://cdn/x.webp"}),
+                httpx.Response(200),
+            ],
+        )
+
+        with (
+            patch.object(s3_upload_client, "S3_PRESIGN_API", "https://upload.test/presign"),
+            patch.object(s3_upload_client, "get_http_client", return_value=client),
+        ):
+            result = await upload_bytes(data, folder="f", filename="n")
+
+        (presign, presign_body), (put, put_body) = requests
+        assert json.loads(presign_body) == {"folder": "f", "filename": "n", "content_type": "image/webp"}
+        assert put.method == "PUT"
+        assert put_body == data
+        assert put.headers["Content-Type"] == "image/webp"
+        assert result.s3_url == "https://cdn/x.webp"
+
+    @pytest.mark.unit
+    async def test_error_is_wrapped(self):
+        """Un error HTTP se re-lanza con el mismo mensaje que upload_file."""
+        client = _client_recording([], [httpx.Response(500)])
+
+        with (
+            patch.object(s3_upload_client, "S3_PRESIGN_API", None),
+            patch.object(s3_upload_client, "S3_UPLOAD_API", "https://upload.test/files"),
+            patch.object(s3_upload_client, "get_http_client", return_value=client),
+        ):
+            with pytest.raises(Exception, match="Error al cargar archivo a S3"):
+                await upload_bytes(b"x", folder="f", filename="n")
@@ -1,8 +1,10 @@
 """
 Tests para AIProviderFactory.
-Verifica la correcta instanciación de proveedores de IA.
+Verifica la correcta instanciación de proveedores de IA y la caché de clientes LLM.
 """
 
+from unittest.mock import MagicMock, patch
+
 import pytest
 
 from app.factories.ai_provider_factory import AIProviderFactory
@@ -94,3 +96,62 @@ class TestAIProviderFactory:
 
         assert isinstance(provider, expected_class)
         assert isinstance(provider, AIProviderInterface)
+
+
+class TestLLMClientCache:
+    """Tests para la caché de modelos de AIProviderFactory.get_llm."""
+
+    @pytest.fixture(autouse=True)
+    def clean_cache(self):
+        AIProviderFactory.clear()
+        yield
+        AIProviderFactory.clear()
+
+    @pytest.mark.unit
+    def test_provider_instance_is_shared(self):
+        """get_provider reutiliza la misma instancia por nombre."""
+        assert AIProviderFactory.get_provider("gemini") is AIProviderFactory.get_provider("gemini")
+
+    @pytest.mark.unit
+    def test_same_params_reuse_client(self):
+        """Mismo proveedor, modelo y parámetros: se construye el cliente una sola vez."""
+        with patch.object(OpenAIProvider, "get_llm", side_effect=lambda **kw: MagicMock()) as mock_get_llm:
+            first = AIProviderFactory.get_llm("openai", "gpt-4o", 0.7, 1000, 1.0)
+            second = AIProviderFactory.get_llm("openai", "gpt-4o", 0.7, 1000, 1.0)
+
+        assert first is second
+        mock_get_llm.assert_called_once_with(model="gpt-4o", temperature=0.7, max_tokens=1000, top_p=1.0)
+        assert AIProviderFactory.stats()["hits"] >= 1
+
+    @pytest.mark.unit
+    def test_different_params_build_new_client(self):
+        """Cambiar modelo o parámetros de muestreo crea otro cliente."""
+        with patch.object(GeminiProvider, "get_llm", side_effect=lambda **kw: MagicMock()):
+            base = AIProviderFactory.get_llm("gemini", "gemini-flash-latest", 0.7, 1000, 1.0)
+            other_temperature = AIProviderFactory.get_llm("gemini", "gemini-flash-latest", 0.2, 1000, 1.0)
+            other_model = AIProviderFactory.get_llm("gemini", "gemini-pro-latest", 0.7, 1000, 1.0)
+
+        assert len({id(base), id(other_temperature), id(other_model)}) == 3
+
+    @pytest.mark.unit
+    def test_cache_is_bounded_lru(self):
+        """Se desaloja el cliente menos usado al superar MAX_CLIENTS."""
+        with (
+            patch.object(AIProviderFactory, "MAX_CLIENTS", 2),
+            patch.object(AnthropicProvider, "get_llm", side_effect=lambda **kw: MagicMock()) as mock_get_llm,
+        ):
+            a = AIProviderFactory.get_llm("claude", "a", 0.7, 1000, 1.0)
+            AIProviderFactory.get_llm("claude", "b", 0.7, 1000, 1.0)
+            assert AIProviderFactory.get_llm("claude", "a", 0.7, 1000, 1.0) is a
+            AIProviderFactory.get_llm("claude", "c", 0.7, 1000, 1.0)  # desaloja "b"
+            AIProviderFactory.get_llm("claude", "b", 0.7, 1000, 1.0)
+
+            assert mock_get_llm.call_count == 4
+            assert AIProviderFactory.stats()["clients"] == 2
+
+    @pytest.mark.unit
+    def test_invalid_provider_is_not_cached(self):
+        """Un proveedor inválido sigue lanzando ValueError."""
+        with pytest.raises(ValueError):
+            AIProviderFactory.get_llm("invalid_provider", "x", 0.7, 1000, 1.0)
+        assert AIProviderFactory.stats()["clients"] == 0
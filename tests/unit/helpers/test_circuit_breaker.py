@@ -0,0 +1,235 @@
+"""
+Tests para los circuit breakers por (proveedor, modelo).
+Verifica apertura por tasa de error y por 429s, half-open con probes,
+y que el servicio de imágenes de sección salte directo al fallback.
+"""
+
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.helpers import circuit_breaker
+from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, is_provider_failure, is_rate_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreakerRegistry.get("gemini", "flash")
+
+
+def fail_n(breaker, n, error=None):
+    for _ in range(n):
+        breaker.record_failure(error or Exception("Gemini HTTP 503: unavailable"))
+
+
+class TestErrorClassification:
+
+    @pytest.mark.unit
+    def test_rate_limit_detection(self):
+        """429 por atributo status o por mensaje."""
+        assert is_rate_limit(SimpleNamespace(status=429))
+        assert is_rate_limit(Exception("Gemini rate limit (429): quota"))
+        assert is_rate_limit(Exception("RESOURCE_EXHAUSTED"))
+        assert not is_rate_limit(Exception("Gemini HTTP 503: unavailable"))
+
+    @pytest.mark.unit
+    def test_client_errors_are_not_provider_failures(self):
+        """Un 400 (request inválido, safety) no dice nada de la salud del proveedor."""
+        assert not is_provider_failure(Exception("Gemini HTTP 400: invalid argument"))
+        assert not is_provider_failure(SimpleNamespace(status_code=403))
+        assert is_provider_failure(Exception("Gemini HTTP 503: unavailable"))
+        assert is_provider_failure(Exception("Gemini rate limit (429)"))
+        assert is_provider_failure(TimeoutError())
+
+
+class TestCircuitBreaker:
+
+    @pytest.mark.unit
+    def test_opens_on_error_rate(self, breaker):
+        """Con MIN_CALLS llamadas y ERROR_RATE de fallos se abre."""
+        for _ in range(5):
+            breaker.record_success()
+        fail_n(breaker, 4)
+        assert breaker.state == "closed"
+
+        fail_n(breaker, 1)
+        assert breaker.state == "open"
+        assert breaker.allow() is False
+
+    @pytest.mark.unit
+    def test_needs_min_calls(self, breaker):
+        """Pocas llamadas fallidas no abren el circuito."""
+        fail_n(breaker, CircuitBreakerRegistry.MIN_CALLS - 1)
+        assert breaker.state == "closed"
+        assert breaker.allow() is True
+
+    @pytest.mark.unit
+    def test_opens_on_rate_limits(self, breaker):
+        """RATE_LIMIT_THRESHOLD 429s abren aunque no haya MIN_CALLS."""
+        fail_n(breaker, CircuitBreakerRegistry.RATE_LIMIT_THRESHOLD, Exception("Gemini rate limit (429): quota"))
+        assert breaker.state == "open"
+
+    @pytest.mark.unit
+    def test_client_errors_not_counted(self, breaker):
+        """Los 400 no cuentan como fallos."""
+        fail_n(breaker, 20, Exception("Gemini HTTP 400: bad request"))
+        assert breaker.state == "closed"
+        assert breaker.snapshot()["failures"] == 0
+
+    @pytest.mark.unit
+    def test_old_events_leave_window(self, breaker, clock):
+        """Los fallos fuera de WINDOW_SECONDS no cuentan."""
+        fail_n(breaker, CircuitBreakerRegistry.MIN_CALLS - 1)
+        clock.now += CircuitBreakerRegistry.WINDOW_SECONDS + 1
+        fail_n(breaker, 1)
+        assert breaker.state == "closed"
+
+    @pytest.mark.unit
+    def test_half_open_probe_success_closes(self, breaker, clock):
+        """Pasado OPEN_SECONDS deja pasar un probe; si sale bien se cierra."""
+        fail_n(breaker, CircuitBreakerRegistry.MIN_CALLS)
+        clock.now += CircuitBreakerRegistry.OPEN_SECONDS
+
+        assert breaker.state == "half_open"
+        assert breaker.allow() is True
+        assert breaker.allow() is False  # solo un probe en vuelo
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow() is True
+
+    @pytest.mark.unit
+    def test_half_open_probe_failure_reopens(self, breaker, clock):
+        """Si el probe falla vuelve a abrirse por otro OPEN_SECONDS."""
+        fail_n(breaker, CircuitBreakerRegistry.MIN_CALLS)
+        clock.now += CircuitBreakerRegistry.OPEN_SECONDS
+        assert breaker.allow() is True
+
+        fail_n(breaker, 1)
+        assert breaker.state == "open"
+        assert breaker.snapshot()["opened"] == 2
+
+    @pytest.mark.unit
+    async def test_call_records_outcome(self, breaker):
+        """call() registra éxito y fallo y propaga la excepción."""
+        assert await breaker.call(AsyncMock(return_value="ok")) == "ok"
+        with pytest.raises(RuntimeError):
+            await breaker.call(AsyncMock(side_effect=RuntimeError("down")))
+
+        snapshot = breaker.snapshot()
+        assert snapshot["successes"] == 1
+        assert snapshot["failures"] == 1
+        assert snapshot["window_calls"] == 2
+
+    @pytest.mark.unit
+    def test_registry_shares_breakers(self, clock):
+        """Mismo (proveedor, modelo) comparte breaker; stats los lista a todos."""
+        assert CircuitBreakerRegistry.get("Gemini", "flash") is CircuitBreakerRegistry.get("gemini", "flash")
+        CircuitBreakerRegistry.get("openai", "gpt-image-1")
+
+        stats = CircuitBreakerRegistry.stats()
+        assert set(stats) == {"gemini/flash", "openai/gpt-image-1"}
+        assert stats["gemini/flash"]["state"] == "closed"
+
+
+@pytest.fixture
+def section_request():
+    from app.requests.section_image_request import SectionImageRequest
+
+    return SectionImageRequest(
+        product_name="Producto",
+        product_description="Descripción",
+        language="es",
+        product_image_url="https://example.com/p.jpg",
+        template_image_url="https://example.com/t.webp",
+        image_format="9:16",
+        owner_id="owner",
+    )
+
+
+@pytest.fixture
+def section_service(monkeypatch):
+    from app.services.section_image_service import SectionImageService
+
+    monkeypatch.setattr("app.services.section_image_service.log_prompt", AsyncMock())
+    monkeypatch.setattr(SectionImageService, "_build_prompt", AsyncMock(return_value="prompt"))
+    monkeypatch.setattr(SectionImageService, "_compress_and_upload", AsyncMock(return_value="https://s3/x.webp"))
+    fail_n(CircuitBreakerRegistry.get("gemini", "gemini-3.1-flash-image-preview"), CircuitBreakerRegistry.MIN_CALLS)
+    return SectionImageService()
+
+
+class TestSectionImageCircuit:
+
+    @pytest.mark.unit
+    async def test_open_circuit_goes_straight_to_fallback(self, section_service, section_request):
+        """Con el circuito de Gemini abierto no se gastan los reintentos: va directo a OpenAI."""
+        with patch("app.services.section_image_service.google_image_with_text", new=AsyncMock()) as gemini:
+            with patch("app.services.section_image_service.openai_image_edit", new=AsyncMock(return_value=b"img")):
+                response = await section_service._do_generate(section_request, time.monotonic())
+
+        assert response.s3_url == "https://s3/x.webp"
+        gemini.assert_not_called()
+        assert CircuitBreakerRegistry.stats()["openai/gpt-image-1"]["successes"] == 1
+
+    @pytest.mark.unit
+    async def test_open_circuit_and_failed_fallback_raises_circuit_error(self, section_service, section_request):
+        """Si además falla el fallback se propaga CircuitOpenError."""
+        with patch(
+            "app.services.section_image_service.openai_image_edit", new=AsyncMock(side_effect=Exception("down"))
+        ):
+            with pytest.raises(CircuitOpenError):
+                await section_service._do_generate(section_request, time.monotonic())
+
+
+class TestImageModelKeys:
+
+    @pytest.mark.unit
+    def test_resolve_image_model(self):
+        """El nombre del breaker es el modelo de imagen que realmente se llama."""
+        from app.externals.images.image_client import resolve_image_model
+
+        assert resolve_image_model("gemini", "gemini-2.5-flash") == "gemini-3-pro-image-preview"
+        assert resolve_image_model("gemini", "gemini-2.5-flash-image") == "gemini-2.5-flash-image"
+        assert resolve_image_model("gemini", None, default="custom-image") == "custom-image"
+        assert resolve_image_model("openai", None) == "gpt-image-1"
+
+    @pytest.mark.unit
+    async def test_image_failures_do_not_open_the_text_model_breaker(self, monkeypatch):
+        """Un agente de variaciones configurado con un modelo de texto no abre el breaker de ese modelo."""
+        from app.services.image_service import ImageService
+
+        monkeypatch.setattr("app.services.image_service.google_image", AsyncMock(side_effect=Exception("HTTP 503")))
+        monkeypatch.setattr("app.services.image_service.openai_image_edit", AsyncMock(side_effect=Exception("down")))
+        monkeypatch.setattr(CircuitBreakerRegistry, "MIN_CALLS", 2)
+
+        with pytest.raises(Exception):
+            await ImageService(message_service=MagicMock())._generate_single_variation(
+                ["https://example.com/p.jpg"],
+                "prompt",
+                "owner",
+                "folder",
+                provider="gemini",
+                model_ai="gemini-2.5-flash",
+                fallback_config={"image_max_retries": 2, "image_retry_delay_after": 3},
+            )
+
+        stats = CircuitBreakerRegistry.stats()
+        assert "gemini/gemini-2.5-flash" not in stats
+        assert stats["gemini/gemini-3-pro-image-preview"]["state"] == "open"
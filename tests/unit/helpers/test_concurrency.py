@@ -2,22 +2,33 @@ import asyncio
 
 import pytest
 
-from app.helpers.concurrency import MAX_CONCURRENT_IMAGE_REQUESTS, get_image_semaphore
+from app.helpers.concurrency import (
+    MAX_CONCURRENT_IMAGE_REQUESTS,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    AdaptiveLimiter,
+    get_image_limiter,
+)
+
+
+class RateLimited(Exception):
+    status = 429
 
 
 class TestConcurrency:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    async def test_semaphore_limits_concurrency(self):
-        """Semaphore should limit concurrent access."""
-        sem = get_image_semaphore()
+    async def test_limiter_limits_concurrency(self):
+        """The limiter should cap concurrent calls at the current limit."""
+        limiter = get_image_limiter("gemini", "gemini-3.1-flash-image-preview")
         active = 0
         max_active = 0
 
         async def worker():
             nonlocal active, max_active
-            async with sem:
+            async with limiter.slot():
                 active += 1
                 max_active = max(max_active, active)
                 await asyncio.sleep(0.01)
@@ -28,16 +39,106 @@ class TestConcurrency:
 
         assert max_active <= MAX_CONCURRENT_IMAGE_REQUESTS
         assert active == 0
+        assert limiter.snapshot()["inflight"] == 0
 
     @pytest.mark.unit
-    @pytest.mark.asyncio
-    async def test_semaphore_singleton(self):
-        """get_image_semaphore should return the same instance."""
-        sem1 = get_image_semaphore()
-        sem2 = get_image_semaphore()
-        assert sem1 is sem2
+    def test_limiter_per_provider_and_model(self):
+        """get_image_limiter should return one shared instance per (provider, model)."""
+        assert get_image_limiter("Gemini", "m1") is get_image_limiter("gemini", "m1")
+        assert get_image_limiter("gemini", "m1") is not get_image_limiter("gemini", "m2")
 
     @pytest.mark.unit
     def test_default_limit(self):
         """Default limit should be 50."""
         assert MAX_CONCURRENT_IMAGE_REQUESTS == 50
+        assert get_image_limiter("gemini", "m1").snapshot()["limit"] == 50
+
+
+class TestAdaptiveLimiter:
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_multiplicative_decrease_on_429(self):
+        """Un 429 divide el límite; la ráfaga de 429 de la misma ronda cuenta una sola vez."""
+        limiter = AdaptiveLimiter("gemini/m", max_limit=20, min_limit=2)
+
+        for _ in range(3):
+            with pytest.raises(RateLimited):
+                async with limiter.slot():
+                    raise RateLimited("HTTP 429")
+
+        snapshot = limiter.snapshot()
+        assert snapshot["limit"] == 10
+        assert snapshot["overloads"] == 3 and snapshot["decreases"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_timeout_shrinks_and_client_errors_do_not(self):
+        limiter = AdaptiveLimiter("gemini/m", max_limit=8, min_limit=2)
+
+        with pytest.raises(ValueError):
+            async with limiter.slot():
+                raise ValueError("HTTP 400: safety")
+        assert limiter.snapshot()["limit"] == 8
+
+        with pytest.raises(asyncio.TimeoutError):
+            async with limiter.slot():
+                raise asyncio.TimeoutError()
+        assert limiter.snapshot()["limit"] == 4
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_additive_increase_up_to_max(self):
+        """Cada ronda de `limit` éxitos suma ~1 al límite, sin pasar el máximo."""
+        limiter = AdaptiveLimiter("gemini/m", max_limit=6, min_limit=2, initial=2)
+
+        for _ in range(6):
+            async with limiter.slot():
+                pass
+        assert limiter.snapshot()["limit"] == 4
+
+        for _ in range(50):
+            async with limiter.slot():
+                pass
+        assert limiter.snapshot()["limit"] == 6
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_priority_lanes(self):
+        """Con el límite lleno, el slot liberado va a la edición interactiva antes que al job bulk."""
+        limiter = AdaptiveLimiter("gemini/m", max_limit=1, min_limit=1)
+        order = []
+
+        async def worker(name, priority):
+            async with limiter.slot(priority):
+                order.append(name)
+
+        await limiter.acquire()
+        tasks = [
+            asyncio.create_task(worker("bulk", PRIORITY_BULK)),
+            asyncio.create_task(worker("normal", PRIORITY_NORMAL)),
+            asyncio.create_task(worker("interactive", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert limiter.snapshot()["queued_by_lane"] == {"interactive": 1, "normal": 1, "bulk": 1}
+
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ["interactive", "normal", "bulk"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        limiter = AdaptiveLimiter("gemini/m", max_limit=1, min_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire(PRIORITY_BULK))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+        snapshot = limiter.snapshot()
+        assert snapshot["queue_depth"] == 0 and snapshot["inflight"] == 0
@@ -0,0 +1,49 @@
+"""Tests para HtmlStreamExtractor (extracción incremental de HTML)."""
+
+import pytest
+
+from app.helpers.html_stream_helper import HtmlStreamExtractor
+
+
+def _feed_all(deltas):
+    extractor = HtmlStreamExtractor()
+    out = "".join(extractor.feed(d) for d in deltas)
+    return out + extractor.flush()
+
+
+class TestHtmlStreamExtractor:
+
+    @pytest.mark.unit
+    def test_raw_html_passes_through(self):
+        """HTML sin fence se emite tal cual, delta por delta."""
+        extractor = HtmlStreamExtractor()
+        assert extractor.feed("<section>") == "<section>"
+        assert extractor.feed("<p>hola</p></section>") == "<p>hola</p></section>"
+
+    @pytest.mark.unit
+    def test_drops_leading_prose(self):
+        """El texto previo al primer tag se descarta."""
+        assert _feed_all(["Aquí está tu sección:\n", "<div>x</div>"]) == "<div>x</div>"
+
+    @pytest.mark.unit
+    def test_strips_code_fence_split_across_deltas(self):
+        """El fence de apertura y cierre se quitan aunque lleguen partidos."""
+        deltas = ["``", "`ht", "ml\n<sec", "tion>ok</section>\n`", "``\nEspero que te sirva"]
+        assert _feed_all(deltas) == "<section>ok</section>"
+
+    @pytest.mark.unit
+    def test_holds_back_partial_closing_fence(self):
+        """Backticks al final se retienen hasta saber si cierran el bloque."""
+        extractor = HtmlStreamExtractor()
+        extractor.feed("```html\n")
+        assert extractor.feed("<code>a`") == "<code>a"
+        assert extractor.feed("b</code>") == "`b</code>"
+
+    @pytest.mark.unit
+    def test_matches_full_extraction(self):
+        """El resultado incremental coincide con _extract_html sobre el texto completo."""
+        from app.services.section_html_service import SectionHtmlService
+
+        raw = "```html\n<section class='hero'>\n  <h1>Hola</h1>\n</section>\n```"
+        deltas = [raw[i : i + 7] for i in range(0, len(raw), 7)]
+        assert _feed_all(deltas) == SectionHtmlService._extract_html(raw)
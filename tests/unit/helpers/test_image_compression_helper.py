@@ -5,11 +5,20 @@ Verifica la compresión de imágenes a un tamaño objetivo.
 
 import base64
 import io
+import random
+from unittest.mock import patch
 
 import pytest
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFilter
 
-from app.helpers.image_compression_helper import _calculate_initial_quality, _resize_image, compress_image_to_target
+from app.helpers import image_compression_helper
+from app.helpers.image_compression_helper import (
+    MAX_FULL_ENCODES,
+    _calculate_initial_quality,
+    _highest_fitting_quality,
+    _resize_image,
+    compress_image_to_target,
+)
 
 
 class TestCompressImageToTarget:
@@ -178,3 +187,63 @@ class TestResizeImage:
 
         assert resized.width < large_image.width
         assert resized.height < large_image.height
+
+
+def _detailed_png(width, height, seed=3):
+    """Gradiente + elipses + grano determinístico: no entra a q=80 pero sí bajando calidad."""
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(20, width // 4), rng.randrange(20, height // 4)
+        draw.ellipse((x, y, x + w, y + h), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    grain = Image.frombytes("L", (width, height), rng.randbytes(width * height)).convert("RGB")
+    img = Image.blend(img.filter(ImageFilter.GaussianBlur(1)), grain, 0.06)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestQualitySearch:
+    """Tests para la búsqueda de calidad sobre el proxy."""
+
+    @pytest.mark.unit
+    def test_highest_fitting_quality(self):
+        """Debe devolver la mayor calidad cuyo tamaño entra en el presupuesto."""
+        assert _highest_fitting_quality(lambda q: q * 100, 40, 79, 6000) == 60
+        assert _highest_fitting_quality(lambda q: q * 100, 40, 79, 100) == 40
+
+    @pytest.mark.unit
+    def test_large_image_hits_target_with_few_full_encodes(self):
+        """Con proxy: a lo sumo q=80 + MAX_FULL_ENCODES encodes a tamaño completo, y el resultado entra."""
+        image_bytes = _detailed_png(1200, 900)
+        full_qualities = []
+        encode = image_compression_helper._encode_webp
+
+        def counting_encode(img, quality):
+            if img.size == (1200, 900):
+                full_qualities.append(quality)
+            return encode(img, quality)
+
+        with patch.object(image_compression_helper, "_encode_webp", counting_encode):
+            result = compress_image_to_target(image_bytes, target_kb=50)
+
+        result_bytes = base64.b64decode(result)
+        assert Image.open(io.BytesIO(result_bytes)).size == (1200, 900)
+        assert len(result_bytes) <= 50 * 1024
+        assert 1 < len(full_qualities) <= 1 + MAX_FULL_ENCODES
+
+    @pytest.mark.unit
+    def test_small_image_uses_highest_fitting_quality(self):
+        """Sin proxy la búsqueda es exacta: q+1 ya no entraría en el target."""
+        image_bytes = _detailed_png(400, 300)
+        target_kb = 8
+
+        result = base64.b64decode(compress_image_to_target(image_bytes, target_kb=target_kb))
+
+        assert len(result) <= target_kb * 1024
+        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        sizes = {q: len(image_compression_helper._encode_webp(img, q)) for q in range(40, 80)}
+        chosen = max(q for q, size in sizes.items() if size == len(result))
+        assert chosen == 79 or sizes[chosen + 1] > target_kb * 1024
@@ -0,0 +1,106 @@
+"""
+Tests para image_compression_pool.
+Verifica que la compresión en el pool de procesos da el mismo resultado que
+la función síncrona, que hay fallback a thread sin pool o con el pool roto y
+que el pool roto se reemplaza una sola vez.
+"""
+
+import asyncio
+import io
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.helpers import image_compression_pool
+from app.helpers.image_compression_helper import compress_image_to_webp
+from app.helpers.image_compression_pool import (
+    compress_image_async,
+    shutdown_compression_pool,
+    start_compression_pool,
+)
+
+
+@pytest.fixture
+def image_bytes():
+    img = Image.new("RGB", (400, 300), color=(30, 120, 200))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def _no_pool_leak():
+    yield
+    shutdown_compression_pool()
+
+
+class TestCompressImageAsync:
+
+    @pytest.mark.unit
+    async def test_without_pool_runs_in_thread(self, image_bytes):
+        """Sin pool iniciado debe devolver lo mismo que la función síncrona."""
+        result = await compress_image_async(image_bytes, target_kb=50, max_width=200)
+
+        assert result == compress_image_to_webp(image_bytes, target_kb=50, max_width=200)
+
+    @pytest.mark.unit
+    async def test_pool_matches_sync_result(self, image_bytes):
+        """Con el pool activo el resultado es idéntico."""
+        start_compression_pool(workers=1)
+
+        result = await compress_image_async(image_bytes, target_kb=50, max_width=200)
+
+        assert result == compress_image_to_webp(image_bytes, target_kb=50, max_width=200)
+
+    @pytest.mark.unit
+    async def test_broken_pool_falls_back_and_restarts(self, image_bytes):
+        """Si un worker muere, la llamada se resuelve en un thread y el pool se reemplaza."""
+        start_compression_pool(workers=1)
+        broken = image_compression_pool._executor
+
+        with patch.object(broken, "submit", side_effect=BrokenProcessPool("worker died")):
+            result = await compress_image_async(image_bytes, target_kb=50)
+
+        assert result == compress_image_to_webp(image_bytes, target_kb=50)
+        assert image_compression_pool._executor is not None
+        assert image_compression_pool._executor is not broken
+
+    @pytest.mark.unit
+    async def test_concurrent_broken_calls_restart_the_pool_once(self, image_bytes):
+        """Dos llamadas en vuelo sobre el pool roto: sólo la primera lo reemplaza y el pool nuevo sigue sano."""
+        start_compression_pool(workers=1)
+        broken = image_compression_pool._executor
+        pending = []
+
+        def submit(*args, **kwargs):
+            future = Future()
+            pending.append(future)
+            return future
+
+        with (
+            patch.object(broken, "submit", side_effect=submit),
+            patch.object(image_compression_pool, "ProcessPoolExecutor", wraps=ProcessPoolExecutor) as new_pool,
+        ):
+            calls = asyncio.gather(*(compress_image_async(image_bytes, target_kb=50) for _ in range(2)))
+            while len(pending) < 2:
+                await asyncio.sleep(0)
+            for future in pending:
+                future.set_exception(BrokenProcessPool("worker died"))
+            results = await calls
+
+        assert results == [compress_image_to_webp(image_bytes, target_kb=50)] * 2
+        assert new_pool.call_count == 1
+        replacement = image_compression_pool._executor
+        assert replacement is not broken
+        assert await compress_image_async(image_bytes, target_kb=50) == results[0]
+
+    @pytest.mark.unit
+    def test_shutdown_is_idempotent(self):
+        """Apagar el pool sin haberlo iniciado no falla."""
+        shutdown_compression_pool()
+        shutdown_compression_pool()
+
+        assert image_compression_pool._executor is None
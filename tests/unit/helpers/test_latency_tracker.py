@@ -0,0 +1,57 @@
+"""
+Tests para LatencyTracker.
+Verifica la ventana acotada por (proveedor, modelo) y los percentiles.
+"""
+
+import pytest
+
+from app.helpers.latency_tracker import LatencyTracker
+
+
+@pytest.fixture(autouse=True)
+def clean_tracker():
+    LatencyTracker.clear()
+    yield
+    LatencyTracker.clear()
+
+
+class TestLatencyTracker:
+
+    @pytest.mark.unit
+    def test_percentile_needs_min_samples(self):
+        """Sin suficientes muestras no hay percentil."""
+        for _ in range(LatencyTracker.MIN_SAMPLES - 1):
+            LatencyTracker.record("gemini", "flash", 1.0)
+
+        assert LatencyTracker.percentile("gemini", "flash", 0.95) is None
+        assert LatencyTracker.percentile("claude", "sonnet", 0.95) is None
+
+    @pytest.mark.unit
+    def test_percentiles(self):
+        """p50 y p95 sobre las muestras registradas."""
+        for i in range(1, 101):
+            LatencyTracker.record("gemini", "flash", float(i))
+
+        assert LatencyTracker.percentile("gemini", "flash", 0.5) == 50.0
+        assert LatencyTracker.percentile("gemini", "flash", 0.95) == 95.0
+        assert LatencyTracker.stats()["gemini/flash"]["samples"] == 100
+
+    @pytest.mark.unit
+    def test_window_keeps_recent_samples(self):
+        """Sólo cuentan las últimas WINDOW muestras."""
+        for _ in range(LatencyTracker.WINDOW):
+            LatencyTracker.record("gemini", "flash", 100.0)
+        for _ in range(LatencyTracker.WINDOW):
+            LatencyTracker.record("gemini", "flash", 1.0)
+
+        assert LatencyTracker.percentile("gemini", "flash", 0.95) == 1.0
+
+    @pytest.mark.unit
+    def test_keys_are_independent(self):
+        """Cada (proveedor, modelo) tiene su propia ventana."""
+        for _ in range(LatencyTracker.MIN_SAMPLES):
+            LatencyTracker.record("gemini", "flash", 1.0)
+            LatencyTracker.record("gemini", "pro", 9.0)
+
+        assert LatencyTracker.percentile("gemini", "flash", 0.95) == 1.0
+        assert LatencyTracker.percentile("gemini", "pro", 0.95) == 9.0
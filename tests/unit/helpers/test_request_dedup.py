@@ -0,0 +1,135 @@
+"""
+Tests para request_dedup.
+Verifica que los duplicados concurrentes se sumen a la ejecución en curso,
+que un duplicado reciente reciba el resultado guardado, que los errores no
+se guarden y que cada caller espere con su propio deadline.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from app.helpers import request_dedup
+from app.helpers.request_dedup import RequestDedup, request_fingerprint
+from app.helpers.retry import DeadlineExceeded, remaining, request_deadline
+
+
+class _Body(BaseModel):
+    owner_id: str = "owner-1"
+    prompt: str = "hero"
+    images: list = []
+
+
+@pytest.fixture(autouse=True)
+def log_prompt():
+    with patch.object(request_dedup, "log_prompt", new_callable=AsyncMock) as mock:
+        yield mock
+
+
+class TestRequestDedup:
+
+    @pytest.mark.unit
+    def test_fingerprint_depends_on_scope_and_body(self):
+        """La huella es estable para el mismo body y cambia con el scope o cualquier campo."""
+        assert request_fingerprint("a", _Body()) == request_fingerprint("a", _Body())
+        assert request_fingerprint("a", _Body()) != request_fingerprint("b", _Body())
+        assert request_fingerprint("a", _Body()) != request_fingerprint("a", _Body(prompt="faq"))
+
+    @pytest.mark.unit
+    async def test_concurrent_duplicates_share_one_execution(self, log_prompt):
+        """Tres requests idénticos en vuelo ejecutan la generación una sola vez."""
+        release = asyncio.Event()
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"s3_url": "https://s3/1.png"}
+
+        tasks = [asyncio.create_task(RequestDedup.run("section_image", _Body(), generate)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert results == [{"s3_url": "https://s3/1.png"}] * 3
+        assert RequestDedup.stats()["misses"] == 1
+        assert RequestDedup.stats()["inflight_hits"] == 2
+        await asyncio.sleep(0)
+        statuses = [call.kwargs["status"] for call in log_prompt.call_args_list]
+        assert statuses.count("hit") == 2 and statuses.count("miss") == 1
+
+    @pytest.mark.unit
+    async def test_recent_result_is_reused_within_window(self):
+        """Un duplicado después del éxito recibe el resultado guardado mientras dure la ventana."""
+        generate = AsyncMock(return_value="html")
+
+        assert await RequestDedup.run("section_html", _Body(), generate) == "html"
+        assert await RequestDedup.run("section_html", _Body(), generate) == "html"
+        assert generate.await_count == 1
+        assert RequestDedup.stats()["recent_hits"] == 1
+
+        with patch.object(RequestDedup, "WINDOW_SECONDS", 0):
+            RequestDedup.clear()
+            await RequestDedup.run("section_html", _Body(), generate)
+            await RequestDedup.run("section_html", _Body(), generate)
+        assert generate.await_count == 3
+
+    @pytest.mark.unit
+    async def test_failures_propagate_and_are_not_stored(self):
+        """El error llega a todos los adjuntos y el siguiente reintento vuelve a ejecutar."""
+        generate = AsyncMock(side_effect=[RuntimeError("429"), "ok"])
+
+        with pytest.raises(RuntimeError):
+            await RequestDedup.run("sub_images", _Body(), generate)
+
+        assert await RequestDedup.run("sub_images", _Body(), generate) == "ok"
+        assert generate.await_count == 2
+
+    @pytest.mark.unit
+    async def test_disconnected_caller_does_not_cancel_shared_execution(self):
+        """Si el primer cliente se cae, el reintento sigue esperando la misma ejecución."""
+        release = asyncio.Event()
+        generate_calls = 0
+
+        async def generate():
+            nonlocal generate_calls
+            generate_calls += 1
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(RequestDedup.run("section_image", _Body(), generate))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(RequestDedup.run("section_image", _Body(), generate))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await retry == "done"
+        assert generate_calls == 1
+
+    @pytest.mark.unit
+    async def test_each_caller_waits_within_its_own_deadline(self):
+        """La ejecución compartida no hereda el deadline del primer caller; el reintento con más tiempo recibe el resultado."""
+        seen_deadline = []
+
+        async def generate():
+            seen_deadline.append(remaining())
+            await asyncio.sleep(0.1)
+            return "done"
+
+        async def call(seconds):
+            with request_deadline(seconds):
+                return await RequestDedup.run("section_image", _Body(), generate)
+
+        first = asyncio.create_task(call(0.02))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(call(5))
+
+        with pytest.raises(DeadlineExceeded):
+            await first
+        assert await retry == "done"
+        assert seen_deadline == [None]
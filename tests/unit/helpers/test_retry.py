@@ -0,0 +1,116 @@
+"""
+Tests para app.helpers.retry.
+Verifica el backoff con jitter, el respeto de Retry-After, el deadline por
+request en contextvars y el middleware que lo toma del header.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.helpers import retry
+from app.helpers.retry import (
+    ProviderHTTPError,
+    RetryPolicy,
+    before_retry,
+    detach_deadline,
+    parse_retry_after,
+    remaining,
+    request_deadline,
+    retry_after,
+)
+from app.middlewares.deadline_middleware import DeadlineMiddleware
+
+
+class TestRetryPolicy:
+
+    @pytest.mark.unit
+    def test_immediate_attempts_then_jittered_backoff(self):
+        """Con los knobs viejos (5, 3, 5s): reintentos 2-3 inmediatos, después backoff desde 5s."""
+        policy = RetryPolicy.after_attempts(max_attempts=5, delay_after=3, delay_seconds=5)
+
+        assert policy.delay(2) == 0 and policy.delay(3) == 0
+        assert 2.5 <= policy.delay(4) <= 5
+        assert 5 <= policy.delay(5) <= 10
+
+    @pytest.mark.unit
+    def test_retry_after_is_a_lower_bound(self):
+        policy = RetryPolicy(base_delay=0.3)
+        assert policy.delay(2, ProviderHTTPError("HTTP 429", status=429, retry_after=7)) == 7
+
+    @pytest.mark.unit
+    def test_retry_after_sources(self):
+        """Header Retry-After, retryDelay de Gemini en el body, o el error original encadenado."""
+        assert parse_retry_after({"Retry-After": "12"}) == 12
+        assert parse_retry_after(None, '{"@type": "RetryInfo", "retryDelay": "27s"}') == 27
+        assert parse_retry_after({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}) is None
+
+        try:
+            try:
+                raise ProviderHTTPError("Gemini rate limit (429)", status=429, retry_after=3)
+            except ProviderHTTPError as e:
+                raise Exception(f"Error al generar imagen: {e}")
+        except Exception as wrapped:
+            assert retry_after(wrapped) == 3
+
+
+class TestDeadline:
+
+    @pytest.mark.unit
+    def test_nested_scopes_keep_the_earliest(self):
+        assert remaining() is None
+        with request_deadline(10):
+            with request_deadline(60):
+                assert remaining() <= 10
+            with request_deadline(None):
+                assert remaining() is not None
+        assert remaining() is None
+
+    @pytest.mark.unit
+    async def test_background_task_can_detach(self):
+        """create_task copia el contexto; un job en background puede soltar el deadline del request."""
+
+        async def job():
+            detach_deadline()
+            return remaining()
+
+        with request_deadline(5):
+            assert await asyncio.create_task(job()) is None
+            assert remaining() is not None
+
+    @pytest.mark.unit
+    async def test_before_retry_stops_when_budget_is_short(self):
+        """Sin tiempo para la espera más un intento, no se duerme y se corta."""
+        policy = RetryPolicy(base_delay=2, min_attempt_seconds=5)
+        with patch.object(retry.asyncio, "sleep", new_callable=AsyncMock) as sleep:
+            with request_deadline(4):
+                assert await before_retry(policy, 2) is False
+            with request_deadline(60):
+                assert await before_retry(policy, 2) is True
+
+        sleep.assert_awaited_once()
+
+    @pytest.mark.unit
+    async def test_before_retry_skips_long_retry_after(self):
+        """Si el provider pide esperar más que max_retry_after conviene ir directo al fallback."""
+        policy = RetryPolicy(max_retry_after=30)
+        error = ProviderHTTPError("HTTP 429", status=429, retry_after=120)
+        assert await before_retry(policy, 2, error) is False
+
+
+class TestDeadlineMiddleware:
+
+    @pytest.mark.unit
+    async def test_header_sets_the_deadline(self):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["remaining"] = remaining()
+
+        middleware = DeadlineMiddleware(app)
+        await middleware({"type": "http", "headers": [(b"x-request-timeout", b"20")]}, None, None)
+        assert 0 < seen["remaining"] <= 20
+
+        await middleware({"type": "http", "headers": [(b"x-request-timeout", b"abc")]}, None, None)
+        assert seen["remaining"] is None
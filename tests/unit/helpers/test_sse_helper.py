@@ -0,0 +1,37 @@
+"""Tests para el serializador SSE compartido por los endpoints streaming."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.helpers.sse_helper import format_sse, sse_frames
+
+
+async def _events(*items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+class TestSseHelper:
+
+    @pytest.mark.unit
+    def test_format_sse(self):
+        frame = format_sse("delta", {"html": "<p>ñ</p>"})
+        assert frame == 'event: delta\ndata: {"html": "<p>ñ</p>"}\n\n'
+
+    @pytest.mark.unit
+    async def test_frames_each_event(self):
+        frames = [f async for f in sse_frames(_events({"event": "delta", "data": {"html": "a"}}, {"event": "done"}))]
+        assert frames[0].startswith("event: delta\n")
+        assert json.loads(frames[1].split("data: ")[1]) == {}
+
+    @pytest.mark.unit
+    async def test_emits_heartbeat_while_idle(self):
+        frames = [
+            f async for f in sse_frames(_events({"event": "done", "data": {}}, delay=0.05), heartbeat_seconds=0.01)
+        ]
+        assert frames[0] == ": ping\n\n"
+        assert frames[-1].startswith("event: done\n")
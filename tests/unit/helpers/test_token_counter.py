@@ -0,0 +1,79 @@
+"""
+Tests para token_counter.
+Verifica la estimación por proveedor, el uso opcional de tiktoken y el truncado.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.helpers import token_counter
+from app.helpers.token_counter import (
+    MESSAGE_OVERHEAD_TOKENS,
+    count_message_tokens,
+    count_tokens,
+    truncate_to_tokens,
+)
+
+
+class TestCountTokens:
+
+    @pytest.mark.unit
+    def test_estimate_by_provider(self):
+        """Estima por caracteres, con ratio más fino para Claude."""
+        text = "a" * 700
+
+        assert count_tokens(text, "gemini") == 175
+        assert count_tokens(text, "claude") == 200
+        assert count_tokens(text) == 175
+
+    @pytest.mark.unit
+    def test_empty_text(self):
+        """Texto vacío no cuenta tokens."""
+        assert count_tokens("", "openai", "gpt-4o") == 0
+
+    @pytest.mark.unit
+    def test_message_includes_overhead(self):
+        """Cada mensaje suma el overhead de rol y separadores."""
+        assert count_message_tokens({"role": "user", "content": "abcd"}, "openai") == 1 + MESSAGE_OVERHEAD_TOKENS
+
+    @pytest.mark.unit
+    def test_tiktoken_for_openai_models(self):
+        """Con HISTORY_TOKENIZER=tiktoken usa el encoding del modelo OpenAI."""
+        encoding = MagicMock()
+        encoding.encode.return_value = [1, 2, 3]
+        with (
+            patch.object(token_counter, "HISTORY_TOKENIZER", "tiktoken"),
+            patch.object(token_counter, "_tiktoken_encoding", return_value=encoding),
+        ):
+            token_counter._tiktoken_count.cache_clear()
+            assert count_tokens("hola mundo", "openai", "gpt-4o") == 3
+            # Claude/Gemini no tienen tokenizer local: siempre estimación.
+            assert count_tokens("hola mundo", "claude", "claude-sonnet-4-6") == 3
+        token_counter._tiktoken_count.cache_clear()
+
+    @pytest.mark.unit
+    def test_tiktoken_unavailable_falls_back_to_estimate(self):
+        """Si el encoding no carga (sin red ni caché) se usa la estimación."""
+        with (
+            patch.object(token_counter, "HISTORY_TOKENIZER", "tiktoken"),
+            patch.object(token_counter, "_tiktoken_encoding", return_value=None),
+        ):
+            assert count_tokens("a" * 40, "openai", "gpt-4o") == 10
+
+
+class TestTruncateToTokens:
+
+    @pytest.mark.unit
+    def test_short_text_unchanged(self):
+        """No toca textos que ya caben."""
+        assert truncate_to_tokens("hola", 10) == "hola"
+
+    @pytest.mark.unit
+    def test_long_text_is_cut_and_marked(self):
+        """Corta al presupuesto y marca el corte."""
+        result = truncate_to_tokens("x" * 1000, 10, "gemini")
+
+        assert result.startswith("x" * 20)
+        assert result.endswith("[truncado]")
+        assert count_tokens(result, "gemini") <= 10
@@ -3,10 +3,12 @@ Tests para ConversationManager.
 Verifica la gestión del historial de conversaciones y procesamiento.
 """
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from app.configurations.config import HISTORY_MAX_MESSAGES
 from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse, AgentPreferences
 from app.managers.conversation_manager import ConversationManager
 from app.managers.conversation_manager_interface import ConversationManagerInterface
@@ -72,7 +74,7 @@ class TestConversationManager:
     def test_initialization(self, manager):
         """Debe inicializarse con historial vacío."""
         assert manager.history_store == {}
-        assert manager.max_history_length == 10
+        assert manager.max_history_length == HISTORY_MAX_MESSAGES
 
     # ========================================================================
     # Tests para get_conversation_history
@@ -108,9 +110,9 @@ class TestConversationManager:
     # ========================================================================
 
     @pytest.mark.unit
-    def test_update_conversation_history(self, manager):
+    async def test_update_conversation_history(self, manager):
         """Debe actualizar historial correctamente."""
-        manager._update_conversation_history(
+        await manager._update_conversation_history(
             conversation_id="conv-123", user_message_content="Hello", ai_response_content="Hi there!"
         )
 
@@ -120,27 +122,27 @@ class TestConversationManager:
         assert history[1] == {"role": "assistant", "content": "Hi there!"}
 
     @pytest.mark.unit
-    def test_update_conversation_history_appends(self, manager):
+    async def test_update_conversation_history_appends(self, manager):
         """Debe agregar mensajes al historial existente."""
         manager.history_store["conv-123"] = [
             {"role": "user", "content": "First"},
             {"role": "assistant", "content": "Response"},
         ]
 
-        manager._update_conversation_history(
+        await manager._update_conversation_history(
             conversation_id="conv-123", user_message_content="Second", ai_response_content="Another response"
         )
 
         assert len(manager.history_store["conv-123"]) == 4
 
     @pytest.mark.unit
-    def test_update_conversation_history_truncates(self, manager):
+    async def test_update_conversation_history_truncates(self, manager):
         """Debe truncar historial cuando excede max_history_length."""
         manager.max_history_length = 4
 
         # Agregar más mensajes que el límite
         for i in range(5):
-            manager._update_conversation_history(
+            await manager._update_conversation_history(
                 conversation_id="conv-123", user_message_content=f"Message {i}", ai_response_content=f"Response {i}"
             )
 
@@ -148,9 +150,11 @@ class TestConversationManager:
         assert len(history) == 4  # Truncado al máximo
 
     @pytest.mark.unit
-    def test_update_conversation_history_empty_id_does_nothing(self, manager):
+    async def test_update_conversation_history_empty_id_does_nothing(self, manager):
         """No debe actualizar si conversation_id está vacío."""
-        manager._update_conversation_history(conversation_id="", user_message_content="Hello", ai_response_content="Hi")
+        await manager._update_conversation_history(
+            conversation_id="", user_message_content="Hello", ai_response_content="Hi"
+        )
 
         assert "" not in manager.history_store
 
@@ -285,6 +289,242 @@ class TestConversationManager:
 
         assert result["text"] == "Fallback response"
 
+    # ========================================================================
+    # Tests para hedging
+    # ========================================================================
+
+    @staticmethod
+    def _slow_processor(delay, result=None, error=None):
+        async def process(*args, **kwargs):
+            await asyncio.sleep(delay)
+            if error:
+                raise error
+            return result
+
+        processor = MagicMock()
+        processor.process = process
+        return processor
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hedge_wins_when_primary_hangs(self, manager, agent_config):
+        """Pasado hedge_delay_ms se lanza el fallback y gana la primera respuesta; el primario se cancela."""
+        agent_config.metadata = {"fallback_config": {"hedge_enabled": True, "hedge_delay_ms": 20}}
+        manager._try_provider = AsyncMock(return_value={"text": "hedge"})
+        processor = self._slow_processor(5, {"text": "primary"})
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        with patch("app.managers.conversation_manager.log_prompt", new_callable=AsyncMock) as mock_log:
+            result = await asyncio.wait_for(
+                manager._hedged_processing(processor, request, agent_config, [], True), timeout=2
+            )
+            await asyncio.sleep(0)
+
+        assert result == {"text": "hedge"}
+        assert manager._try_provider.call_args[0][:2] == ("gemini", "gemini-flash-latest")
+        assert mock_log.call_args.kwargs["metadata"]["path"] == "hedge"
+        assert mock_log.call_args.kwargs["fallback_used"] is True
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fast_primary_does_not_hedge(self, manager, agent_config):
+        """Si el primario responde antes del umbral no se llama al fallback."""
+        agent_config.metadata = {"fallback_config": {"hedge_enabled": True, "hedge_delay_ms": 500}}
+        manager._try_provider = AsyncMock(return_value={"text": "hedge"})
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        result = await manager._hedged_processing(
+            self._slow_processor(0, {"text": "primary"}), request, agent_config, [], True
+        )
+
+        assert result == {"text": "primary"}
+        manager._try_provider.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_primary_error_starts_hedge_immediately(self, manager, agent_config):
+        """Si el primario falla antes del umbral el fallback arranca sin esperar."""
+        agent_config.metadata = {"fallback_config": {"hedge_enabled": True, "hedge_delay_ms": 60_000}}
+        manager._try_provider = AsyncMock(return_value={"text": "hedge"})
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        result = await asyncio.wait_for(
+            manager._hedged_processing(
+                self._slow_processor(0, error=Exception("Primary failed")), request, agent_config, [], True
+            ),
+            timeout=2,
+        )
+
+        assert result == {"text": "hedge"}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_both_fail_uses_secondary(self, manager, agent_config):
+        """Si primario y hedge fallan se intenta el fallback secundario."""
+        agent_config.metadata = {"fallback_config": {"hedge_enabled": True, "hedge_delay_ms": 10}}
+        manager._try_provider = AsyncMock(side_effect=[Exception("hedge failed"), {"text": "secondary"}])
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        result = await manager._hedged_processing(
+            self._slow_processor(0.05, error=Exception("Primary failed")), request, agent_config, [], True
+        )
+
+        assert result == {"text": "secondary"}
+        assert manager._try_provider.call_args[0][:2] == ("claude", "claude-sonnet-4-6")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_primary_retries(self, manager, agent_config):
+        """Con el circuito del primario abierto no se lo llama: los reintentos fallan al instante y responde el fallback."""
+        from app.helpers.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+
+        breaker = CircuitBreakerRegistry.get("openai", "gpt-4")
+        for _ in range(CircuitBreakerRegistry.MIN_CALLS):
+            breaker.record_failure(Exception("HTTP 503"))
+
+        primary = AsyncMock(return_value={"text": "primary"})
+        with pytest.raises(CircuitOpenError):
+            await manager._timed("openai", "gpt-4", primary())
+        primary.assert_not_awaited()  # la corrutina se cierra sin ejecutarse
+
+        async def try_provider(provider_name, model, *args):
+            return await manager._timed(provider_name, model, AsyncMock(return_value={"text": provider_name})())
+
+        manager._try_provider = try_provider
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+        with patch("app.managers.conversation_manager.log_prompt", new_callable=AsyncMock) as mock_log:
+            result = await manager._fallback_processing(request, agent_config, [])
+            await asyncio.sleep(0)
+
+        assert result == {"text": "gemini"}
+        assert mock_log.call_args.kwargs["metadata"]["path"] == "primary_fallback"
+        assert CircuitBreakerRegistry.stats()["openai/gpt-4"]["rejected"] >= 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.managers.conversation_manager.AIProviderFactory")
+    @patch("app.managers.conversation_manager.MCPProcessor")
+    async def test_mcp_errors_do_not_open_model_circuit(
+        self, mock_mcp_processor, mock_factory, manager, agent_config_with_mcp
+    ):
+        """Los errores de MCP (conexión, tools, timeouts) no cuentan en el breaker del modelo."""
+        from app.helpers.circuit_breaker import CircuitBreakerRegistry
+
+        mock_factory.get_provider.return_value = MagicMock()
+        mock_processor_instance = MagicMock()
+        mock_processor_instance.process = AsyncMock(side_effect=ConnectionError("MCP server down"))
+        mock_mcp_processor.return_value = mock_processor_instance
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="MCP query")
+
+        for _ in range(CircuitBreakerRegistry.MIN_CALLS + 1):
+            with pytest.raises(ConnectionError):
+                await manager.process_conversation(request, agent_config_with_mcp)
+
+        breaker = CircuitBreakerRegistry.get("openai", "gpt-4")
+        assert breaker.state == "closed"
+        assert breaker.snapshot()["window_calls"] == 0
+
+    # ========================================================================
+    # Tests para stream_conversation
+    # ========================================================================
+
+    @staticmethod
+    def _streaming_processor(chunks, error=None):
+        async def stream(request, files, supports_interleaved_files, result):
+            for chunk in chunks:
+                yield {"event": "delta", "data": {"text": chunk}}
+            if error:
+                raise error
+            result["text"] = "".join(chunks)
+
+        processor = MagicMock()
+        processor.stream = stream
+        return processor
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_conversation_updates_history_at_the_end(self, manager, agent_config):
+        """Emite los deltas, luego done con la respuesta, y recién ahí guarda el turno en el historial."""
+        manager._build_processor = MagicMock(return_value=(self._streaming_processor(["Ho", "la"]), True, True))
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        events = [event async for event in manager.stream_conversation(request, agent_config)]
+
+        assert [e["event"] for e in events] == ["delta", "delta", "done"]
+        assert events[-1]["data"]["text"] == "Hola"
+        assert manager.history_store["conv-123"][-1] == {"role": "assistant", "content": "Hola"}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_conversation_falls_back_before_first_token(self, manager, agent_config):
+        """Si el primario falla antes de emitir texto responde la cadena de fallback en un solo delta."""
+        processor = self._streaming_processor([], error=Exception("Primary failed"))
+        manager._build_processor = MagicMock(return_value=(processor, True, True))
+        manager._fallback_processing = AsyncMock(return_value={"text": "fallback"})
+        request = MessageRequest(agent_id="test-agent", conversation_id="", query="Hello")
+
+        events = [event async for event in manager.stream_conversation(request, agent_config)]
+
+        assert events == [
+            {"event": "delta", "data": {"text": "fallback"}},
+            {"event": "done", "data": {"text": "fallback"}},
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_conversation_no_retry_after_tokens(self, manager, agent_config):
+        """Si ya se enviaron tokens el error se propaga (un reintento duplicaría texto)."""
+        processor = self._streaming_processor(["Ho"], error=Exception("cut"))
+        manager._build_processor = MagicMock(return_value=(processor, True, True))
+        manager._fallback_processing = AsyncMock()
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        with pytest.raises(Exception, match="cut"):
+            async for _ in manager.stream_conversation(request, agent_config):
+                pass
+
+        manager._fallback_processing.assert_not_called()
+        assert "conv-123" not in manager.history_store
+
+    @pytest.mark.unit
+    def test_hedge_delay_from_observed_percentile(self, manager, agent_config):
+        """hedge_delay_ms='p95' usa la latencia observada, o el default sin muestras suficientes."""
+        from app.helpers.latency_tracker import LatencyTracker
+
+        LatencyTracker.clear()
+        fc = manager._get_fallback_config(agent_config)
+        assert fc["hedge_delay_ms"] == "p95"
+        assert manager._hedge_delay(fc, "openai", "gpt-4") == fc["hedge_default_delay_ms"] / 1000
+
+        for i in range(1, 101):
+            LatencyTracker.record("openai", "gpt-4", i / 100)
+        assert manager._hedge_delay(fc, "openai", "gpt-4") == pytest.approx(0.95)
+        LatencyTracker.clear()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.managers.conversation_manager.AIProviderFactory")
+    @patch("app.managers.conversation_manager.MCPProcessor")
+    async def test_agent_runs_not_recorded_in_latency_window(
+        self, mock_mcp_processor, mock_factory, manager, agent_config_with_mcp
+    ):
+        """Las corridas de agente/MCP (varias llamadas + tools) no entran en la latencia que usa el hedge."""
+        from app.helpers.latency_tracker import LatencyTracker
+
+        LatencyTracker.clear()
+        mock_factory.get_provider.return_value = MagicMock()
+        mock_processor_instance = MagicMock()
+        mock_processor_instance.process = AsyncMock(return_value={"text": "MCP response"})
+        mock_mcp_processor.return_value = mock_processor_instance
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="MCP query")
+
+        await manager.process_conversation(request, agent_config_with_mcp)
+
+        assert LatencyTracker.stats() == {}
+        await manager._timed("openai", "gpt-4", AsyncMock(return_value={"text": "ok"})())
+        assert list(LatencyTracker.stats()) == ["openai/gpt-4"]
+        LatencyTracker.clear()
+
     @pytest.mark.unit
     @pytest.mark.asyncio
     @patch("app.managers.conversation_manager.AIProviderFactory")
@@ -311,3 +551,53 @@ class TestConversationManager:
             await manager.process_conversation(request, agent_config_with_tools)
 
         assert "Agent failed" in str(exc_info.value)
+
+    # ========================================================================
+    # Tests para ventana por tokens y resumen
+    # ========================================================================
+
+    @pytest.mark.unit
+    async def test_windowed_history_uses_agent_budget(self, manager, agent_config):
+        """metadata.history_config.max_tokens limita el historial enviado al LLM."""
+        for i in range(10):
+            await manager._update_conversation_history("conv-123", "q" * 400, "a" * 400)
+        agent_config.metadata = {"history_config": {"max_tokens": 450}}
+
+        window = await manager._windowed_history("conv-123", agent_config)
+
+        assert len(window.messages) == 4
+        assert len(window.evicted) == 16
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.managers.conversation_manager.AIProviderFactory")
+    async def test_summary_compacts_evicted_turns(self, mock_factory, manager, agent_config):
+        """El resumen en segundo plano reemplaza los turnos desalojados."""
+        summary_llm = MagicMock()
+        summary_llm.ainvoke = AsyncMock(return_value=MagicMock(content="El usuario pidió X."))
+        mock_factory.get_llm.return_value = summary_llm
+        for i in range(10):
+            await manager._update_conversation_history("conv-123", f"q{i}" * 200, f"a{i}" * 200)
+        agent_config.metadata = {"history_config": {"max_tokens": 450, "summarize": True}}
+
+        await manager._schedule_summary("conv-123", agent_config)
+        await asyncio.gather(*manager._summary_tasks)
+
+        history = manager.get_conversation_history("conv-123")
+        assert history[0] == {"role": "summary", "content": "El usuario pidió X."}
+        assert len(history) == 5
+        window = await manager._windowed_history("conv-123", agent_config)
+        assert "El usuario pidió X." in window.messages[0]["content"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.managers.conversation_manager.AIProviderFactory")
+    async def test_summary_disabled_by_default(self, mock_factory, manager, agent_config):
+        """Sin summarize no se programa ninguna tarea."""
+        for i in range(10):
+            await manager._update_conversation_history("conv-123", "q" * 4000, "a" * 4000)
+
+        await manager._schedule_summary("conv-123", agent_config)
+
+        assert not manager._summary_tasks
+        mock_factory.get_provider.assert_not_called()
@@ -0,0 +1,169 @@
+"""
+Tests para history_store.
+Verifica el LRU+TTL en memoria (límite por conversaciones y por bytes), el
+backend SQLite compartido entre instancias y que ambos se comportan como un
+mapping conversation_id -> mensajes.
+"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.managers.history_store import MemoryHistoryStore, SqliteHistoryStore
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]
+
+
+class TestMemoryHistoryStore:
+
+    @pytest.mark.unit
+    def test_append_keeps_last_messages(self):
+        """Debe agregar el turno y truncar a max_length."""
+        store = MemoryHistoryStore()
+
+        for i in range(5):
+            store.append("conv-1", _turn(i), max_length=4)
+
+        assert [m["content"] for m in store.get_history("conv-1")] == ["q3", "a3", "q4", "a4"]
+
+    @pytest.mark.unit
+    def test_append_keeps_leading_summary(self):
+        """El resumen al inicio no cuenta para max_length ni se pierde al truncar."""
+        store = MemoryHistoryStore()
+        store["conv-1"] = [{"role": "summary", "content": "resumen"}]
+
+        for i in range(3):
+            store.append("conv-1", _turn(i), max_length=2)
+
+        assert [m["content"] for m in store.get_history("conv-1")] == ["resumen", "q2", "a2"]
+
+    @pytest.mark.unit
+    def test_unknown_conversation_is_empty_and_not_created(self):
+        """Una conversación inexistente devuelve [] sin crear la entrada."""
+        store = MemoryHistoryStore()
+
+        assert store.get_history("nope") == []
+        assert "nope" not in store
+        assert store == {}
+
+    @pytest.mark.unit
+    def test_evicts_least_recently_used_by_count(self):
+        """Al superar max_entries se descarta la conversación usada hace más tiempo."""
+        store = MemoryHistoryStore(max_entries=2)
+        store.append("a", _turn(0), 10)
+        store.append("b", _turn(0), 10)
+        store.get_history("a")
+
+        store.append("c", _turn(0), 10)
+
+        assert sorted(store) == ["a", "c"]
+        assert store.stats()["evicted_lru"] == 1
+
+    @pytest.mark.unit
+    def test_evicts_by_bytes(self):
+        """El límite de bytes también fuerza eviction."""
+        big = [{"role": "user", "content": "x" * 1000}]
+        store = MemoryHistoryStore(max_bytes=2500)
+
+        for conversation_id in ("a", "b", "c"):
+            store.append(conversation_id, big, 10)
+
+        assert sorted(store) == ["b", "c"]
+        assert store.stats()["approx_bytes"] <= 2500
+
+    @pytest.mark.unit
+    def test_idle_conversations_expire(self):
+        """Conversaciones sin uso por más de ttl_seconds expiran."""
+        store = MemoryHistoryStore(ttl_seconds=60)
+        with patch("app.managers.history_store.time.monotonic", return_value=1000.0):
+            store.append("old", _turn(0), 10)
+        with patch("app.managers.history_store.time.monotonic", return_value=1030.0):
+            store.append("recent", _turn(0), 10)
+
+        with patch("app.managers.history_store.time.monotonic", return_value=1070.0):
+            assert store.get_history("old") == []
+            assert len(store.get_history("recent")) == 2
+
+        assert store.stats()["expired"] == 1
+
+    @pytest.mark.unit
+    def test_mapping_access(self):
+        """Se puede leer y escribir como dict, igual que el defaultdict anterior."""
+        store = MemoryHistoryStore()
+        store["conv"] = _turn(1)
+
+        assert store["conv"][0]["content"] == "q1"
+        with pytest.raises(KeyError):
+            store["missing"]
+
+
+class TestSqliteHistoryStore:
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "history.sqlite3")
+
+    @pytest.mark.unit
+    def test_history_is_shared_and_survives_restart(self, path):
+        """Otra instancia sobre el mismo archivo (otro worker o reinicio) ve el historial."""
+        writer = SqliteHistoryStore(path)
+        writer.append("conv-1", _turn(0), 10)
+        writer.append("conv-1", _turn(1), 10)
+        writer.close()
+
+        reader = SqliteHistoryStore(path)
+
+        assert [m["content"] for m in reader.get_history("conv-1")] == ["q0", "a0", "q1", "a1"]
+        assert reader.stats()["conversations"] == 1
+
+    @pytest.mark.unit
+    def test_truncates_and_expires(self, path):
+        """Trunca a max_length y no devuelve conversaciones vencidas."""
+        store = SqliteHistoryStore(path, ttl_seconds=60)
+        with patch("app.managers.history_store.time.time", return_value=1000.0):
+            for i in range(3):
+                store.append("conv-1", _turn(i), max_length=2)
+            assert [m["content"] for m in store.get_history("conv-1")] == ["q2", "a2"]
+
+        with patch("app.managers.history_store.time.time", return_value=1100.0):
+            assert store.get_history("conv-1") == []
+            assert "conv-1" not in store
+
+    @pytest.mark.unit
+    def test_prunes_over_max_entries(self, path):
+        """La poda periódica deja sólo las max_entries conversaciones más recientes."""
+        store = SqliteHistoryStore(path, max_entries=2)
+        for i in range(3):
+            with patch("app.managers.history_store.time.time", return_value=1000.0 + i):
+                store.append(f"conv-{i}", _turn(i), 10)
+
+        store._writes = 100  # fuerza la próxima poda
+        with patch("app.managers.history_store.time.time", return_value=1003.0):
+            store.append("conv-2", _turn(9), 10)
+            assert sorted(store) == ["conv-1", "conv-2"]
+
+    @pytest.mark.unit
+    async def test_async_calls_run_off_the_event_loop(self, path):
+        """aappend/aget_history/aset corren en el hilo del store, no en el del event loop."""
+        store = SqliteHistoryStore(path)
+        threads = []
+        original_row = store._row
+
+        def row(conversation_id):
+            threads.append(threading.current_thread().name)
+            return original_row(conversation_id)
+
+        store._row = row
+        await store.aappend("conv-1", _turn(0), 10)
+        await store.aset("conv-2", _turn(1))
+        history = await store.aget_history("conv-1")
+        stored = await store.aget_history("conv-2")
+        store.close()
+
+        assert [m["content"] for m in history] == ["q0", "a0"]
+        assert [m["content"] for m in stored] == ["q1", "a1"]
+        assert threads and all(name.startswith("history-sqlite") for name in threads)
+        assert threading.main_thread().name not in threads
@@ -0,0 +1,142 @@
+"""
+Tests para history_window.
+Verifica la ventana por presupuesto de tokens, el resumen como par
+user/assistant, el prompt de resumen y la compactación del historial.
+"""
+
+import pytest
+
+from app.helpers.token_counter import count_message_tokens
+from app.managers.history_window import (
+    SUMMARY_INPUT_MAX_TOKENS,
+    compact_history,
+    summary_prompt,
+    window_history,
+)
+
+
+def _turn(i, size=40):
+    return [
+        {"role": "user", "content": f"q{i}".ljust(size, ".")},
+        {"role": "assistant", "content": f"a{i}".ljust(size, ".")},
+    ]
+
+
+def _history(n, size=40):
+    return [m for i in range(n) for m in _turn(i, size)]
+
+
+class TestWindowHistory:
+
+    @pytest.mark.unit
+    def test_short_history_fits_entirely(self):
+        """Si todo cabe, se envía todo y no hay desalojados."""
+        history = _history(3)
+
+        window = window_history(history, 6000, "gemini")
+
+        assert window.messages == history
+        assert window.evicted == []
+        assert window.tokens == sum(count_message_tokens(m, "gemini") for m in history)
+
+    @pytest.mark.unit
+    def test_keeps_newest_turns_within_budget(self):
+        """Se queda con los turnos más recientes que caben; el resto queda desalojado."""
+        history = _history(10)  # 14 tokens por mensaje en gemini
+        window = window_history(history, 14 * 4 + 5, "gemini")
+
+        assert [m["content"][:2] for m in window.messages] == ["q8", "a8", "q9", "a9"]
+        assert window.evicted == history[:16]
+        assert window.tokens <= 14 * 4 + 5
+
+    @pytest.mark.unit
+    def test_window_starts_with_user_message(self):
+        """Si sólo cabe la respuesta de un turno viejo, se descarta para empezar por el usuario."""
+        history = _history(3)
+
+        window = window_history(history, 14 * 3, "gemini")
+
+        assert window.messages[0]["role"] == "user"
+        assert window.messages == history[-2:]
+        assert window.evicted == history[:-2]
+
+    @pytest.mark.unit
+    def test_oversized_latest_turn_is_truncated(self):
+        """Un turno enorme (página pegada) se trunca en vez de desbordar el presupuesto."""
+        history = _history(2) + [
+            {"role": "user", "content": "x" * 100_000},
+            {"role": "assistant", "content": "ok"},
+        ]
+
+        window = window_history(history, 1000, "gemini")
+
+        assert [m["role"] for m in window.messages] == ["user", "assistant"]
+        assert window.messages[0]["content"].endswith("[truncado]")
+        assert window.messages[1]["content"] == "ok"
+        assert window.tokens <= 1000
+        assert window.evicted == _history(2)
+        # El historial guardado no se modifica.
+        assert len(history[-2]["content"]) == 100_000
+
+    @pytest.mark.unit
+    def test_summary_sent_as_user_assistant_pair(self):
+        """El resumen guardado se envía como par user/assistant al inicio."""
+        history = [{"role": "summary", "content": "el usuario vende zapatillas"}] + _history(2)
+
+        window = window_history(history, 6000, "claude")
+
+        assert [m["role"] for m in window.messages] == ["user", "assistant", "user", "assistant", "user", "assistant"]
+        assert "el usuario vende zapatillas" in window.messages[0]["content"]
+        assert window.messages[2:] == _history(2)
+        assert window.evicted == []
+
+    @pytest.mark.unit
+    def test_budget_depends_on_provider(self):
+        """El mismo historial ocupa más tokens estimados en Claude que en Gemini."""
+        history = _history(4, size=350)
+
+        gemini = window_history(history, 400, "gemini")
+        claude = window_history(history, 400, "claude")
+
+        assert len(claude.messages) < len(gemini.messages)
+
+
+class TestSummaryPrompt:
+
+    @pytest.mark.unit
+    def test_includes_previous_summary_and_messages(self):
+        """El prompt integra el resumen previo y los mensajes desalojados."""
+        prompt = summary_prompt("resumen viejo", _turn(0))
+
+        assert prompt[0][0] == "system"
+        role, body = prompt[1]
+        assert role == "human"
+        assert "resumen viejo" in body
+        assert "Usuario: q0" in body
+        assert "Asistente: a0" in body
+
+    @pytest.mark.unit
+    def test_long_messages_are_truncated(self):
+        """Cada mensaje desalojado se recorta antes de resumirlo."""
+        _, body = summary_prompt(None, [{"role": "user", "content": "x" * 100_000}])[1]
+
+        assert len(body) < SUMMARY_INPUT_MAX_TOKENS * 5
+        assert "Resumen previo" not in body
+
+
+class TestCompactHistory:
+
+    @pytest.mark.unit
+    def test_replaces_evicted_turns_with_summary(self):
+        """Reemplaza los turnos resumidos por el mensaje de resumen."""
+        history = [{"role": "summary", "content": "viejo"}] + _history(3)
+
+        compacted = compact_history(history, _history(2), "nuevo")
+
+        assert compacted == [{"role": "summary", "content": "nuevo"}] + _history(3)[4:]
+
+    @pytest.mark.unit
+    def test_discards_when_history_changed(self):
+        """Si el historial ya no empieza por los turnos resumidos, no compacta."""
+        assert compact_history(_history(3)[2:], _history(2), "nuevo") is None
+        assert compact_history(_history(3), [], "nuevo") is None
@@ -134,8 +134,8 @@ class TestVerifyUserToken:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.middlewares.auth_middleware.httpx.AsyncClient")
-    async def test_verify_token_success(self, mock_client_class):
+    @patch("app.middlewares.auth_middleware.get_http_client")
+    async def test_verify_token_success(self, mock_get_client):
         """Debe retornar datos del usuario para token válido."""
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -143,9 +143,7 @@ class TestVerifyUserToken:
 
         mock_client = MagicMock()
         mock_client.get = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock()
-        mock_client_class.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         with patch("app.middlewares.auth_middleware.AUTH_SERVICE_URL", "http://auth.example.com"):
             result = await verify_user_token("Bearer valid-token")
@@ -161,12 +159,10 @@ class TestVerifyUserToken:
         mock_response = MagicMock()
         mock_response.status_code = 401
 
-        with patch("app.middlewares.auth_middleware.httpx.AsyncClient") as mock_client_class:
+        with patch("app.middlewares.auth_middleware.get_http_client") as mock_get_client:
             mock_client = MagicMock()
             mock_client.get = AsyncMock(return_value=mock_response)
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=None)
-            mock_client_class.return_value = mock_client
+            mock_get_client.return_value = mock_client
 
             with patch("app.middlewares.auth_middleware.AUTH_SERVICE_URL", "http://auth.example.com"):
                 with pytest.raises(HTTPException) as exc_info:
@@ -180,12 +176,10 @@ class TestVerifyUserToken:
         """Debe lanzar 500 si hay error de red."""
         import httpx
 
-        with patch("app.middlewares.auth_middleware.httpx.AsyncClient") as mock_client_class:
+        with patch("app.middlewares.auth_middleware.get_http_client") as mock_get_client:
             mock_client = MagicMock()
             mock_client.get = AsyncMock(side_effect=httpx.RequestError("Network error", request=MagicMock()))
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=None)
-            mock_client_class.return_value = mock_client
+            mock_get_client.return_value = mock_client
 
             with patch("app.middlewares.auth_middleware.AUTH_SERVICE_URL", "http://auth.example.com"):
                 with pytest.raises(HTTPException) as exc_info:
@@ -0,0 +1,98 @@
+"""
+Tests para agent_cache.
+Verifica la clave por agente + versión de configuración y el LRU de agentes compilados.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.externals.agent_config.responses.agent_config_response import AgentConfigResponse, AgentPreferences
+from app.processors.agent_cache import CompiledAgentCache, agent_cache_key
+
+
+def _agent_config(**overrides):
+    data = dict(
+        id=1,
+        agent_id="test-agent",
+        description="Test agent",
+        prompt="You are a helpful assistant.",
+        provider_ai="openai",
+        model_ai="gpt-4o",
+        preferences=AgentPreferences(temperature=0.7, max_tokens=1000, top_p=1.0),
+        tools=[{"tool_name": "search", "description": "Search"}],
+    )
+    data.update(overrides)
+    return AgentConfigResponse(**data)
+
+
+class TestAgentCacheKey:
+
+    @pytest.mark.unit
+    def test_same_config_same_key(self):
+        """La misma configuración produce la misma clave."""
+        assert agent_cache_key(_agent_config()) == agent_cache_key(_agent_config())
+        assert agent_cache_key(_agent_config()).startswith("test-agent:")
+
+    @pytest.mark.unit
+    def test_prompt_does_not_change_key(self):
+        """El prompt se pasa al invocar, no forma parte del agente compilado."""
+        assert agent_cache_key(_agent_config()) == agent_cache_key(_agent_config(prompt="Otro prompt"))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "overrides",
+        [
+            {"model_ai": "gpt-4o-mini"},
+            {"provider_ai": "claude"},
+            {"preferences": AgentPreferences(temperature=0.1, max_tokens=1000, top_p=1.0)},
+            {"tools": [{"tool_name": "other", "description": "Other"}]},
+            {"mcp_config": {"server": {"url": "http://localhost:8080"}}},
+        ],
+    )
+    def test_config_changes_change_key(self, overrides):
+        """Editar modelo, parámetros, herramientas o MCP genera una versión nueva."""
+        assert agent_cache_key(_agent_config()) != agent_cache_key(_agent_config(**overrides))
+
+
+class TestCompiledAgentCache:
+
+    @pytest.fixture(autouse=True)
+    def clean_cache(self):
+        CompiledAgentCache.clear()
+        yield
+        CompiledAgentCache.clear()
+
+    @pytest.mark.unit
+    def test_builds_once_per_key(self):
+        """El agente se compila una vez y se reutiliza."""
+        build = MagicMock(side_effect=lambda: object())
+
+        first = CompiledAgentCache.get_or_build("agent:v1", build)
+        second = CompiledAgentCache.get_or_build("agent:v1", build)
+
+        assert first is second
+        build.assert_called_once()
+
+    @pytest.mark.unit
+    def test_bounded_lru(self):
+        """Al superar MAX_ENTRIES se desaloja el menos usado."""
+        with patch.object(CompiledAgentCache, "MAX_ENTRIES", 2):
+            CompiledAgentCache.get_or_build("a:1", object)
+            CompiledAgentCache.get_or_build("b:1", object)
+            CompiledAgentCache.get_or_build("a:1", object)
+            CompiledAgentCache.get_or_build("c:1", object)
+
+            assert CompiledAgentCache.stats()["entries"] == 2
+            assert "b:1" not in CompiledAgentCache._agents
+
+    @pytest.mark.unit
+    def test_invalidate_by_agent_id(self):
+        """invalidate(agent_id) borra todas las versiones de ese agente, y sin id todo."""
+        CompiledAgentCache.get_or_build("agent-a:v1", object)
+        CompiledAgentCache.get_or_build("agent-a:v2", object)
+        CompiledAgentCache.get_or_build("agent-b:v1", object)
+
+        assert CompiledAgentCache.invalidate("agent-a") == 2
+        assert list(CompiledAgentCache._agents) == ["agent-b:v1"]
+        assert CompiledAgentCache.invalidate() == 1
@@ -142,6 +142,29 @@ class TestAgentProcessor:
         assert executor_call_kwargs["max_iterations"] == 3
         assert executor_call_kwargs["return_intermediate_steps"] is True
 
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.processors.agent_processor.create_tool_calling_agent")
+    @patch("app.processors.agent_processor.AgentExecutor")
+    async def test_process_reuses_cached_executor(self, mock_executor_class, mock_create_agent, mock_llm, mock_tools):
+        """Con cache_key el AgentExecutor se compila una sola vez entre mensajes."""
+        from app.processors.agent_cache import CompiledAgentCache
+
+        CompiledAgentCache.clear()
+        mock_executor = MagicMock()
+        mock_executor.ainvoke = AsyncMock(return_value={"output": "Response"})
+        mock_executor_class.return_value = mock_executor
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Query")
+
+        for history in ([], [{"role": "user", "content": "hola"}]):
+            processor = AgentProcessor(llm=mock_llm, context="ctx", history=history, tools=mock_tools, cache_key="k:1")
+            await processor.process(request)
+
+        mock_create_agent.assert_called_once()
+        mock_executor_class.assert_called_once()
+        assert mock_executor.ainvoke.call_args[0][0]["chat_history"] == [{"role": "user", "content": "hola"}]
+        CompiledAgentCache.clear()
+
     # ========================================================================
     # Tests para manejo de errores
     # ========================================================================
@@ -165,6 +188,61 @@ class TestAgentProcessor:
         assert "message" in result
         assert "reformular" in result["message"].lower() or "procesar" in result["message"].lower()
 
+    # ========================================================================
+    # Tests para stream
+    # ========================================================================
+
+    @staticmethod
+    def _events(*events):
+        async def astream_events(*args, **kwargs):
+            for event in events:
+                yield event
+
+        return astream_events
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_forwards_answer_tokens(self, processor):
+        """stream reenvía los tokens de texto, no los de tool calls, y toma el output final del executor."""
+        from langchain_core.messages import AIMessageChunk
+
+        tool_chunk = AIMessageChunk(content="", tool_call_chunks=[{"name": "search_tool", "args": "{}", "index": 0}])
+        executor = MagicMock()
+        executor.astream_events = self._events(
+            {"event": "on_chain_start", "run_id": "root", "data": {}},
+            {"event": "on_chat_model_stream", "run_id": "llm-1", "data": {"chunk": tool_chunk}},
+            {"event": "on_chain_end", "run_id": "step", "data": {"output": {"ignored": True}}},
+            {"event": "on_chat_model_stream", "run_id": "llm-2", "data": {"chunk": AIMessageChunk(content="Hola ")}},
+            {"event": "on_chat_model_stream", "run_id": "llm-2", "data": {"chunk": AIMessageChunk(content="mundo")}},
+            {"event": "on_chain_end", "run_id": "root", "data": {"output": {"output": "Hola mundo"}}},
+        )
+        processor._executor = MagicMock(return_value=executor)
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Query")
+        result = {}
+
+        deltas = [event["data"]["text"] async for event in processor.stream(request, [], False, result)]
+
+        assert deltas == ["Hola ", "mundo"]
+        assert result == {"output": "Hola mundo", "text": "Hola mundo"}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_handles_execution_error(self, processor):
+        """Un error del executor deja en result el mismo mensaje que process."""
+
+        async def failing(*args, **kwargs):
+            raise Exception("Agent execution failed")
+            yield
+
+        executor = MagicMock()
+        executor.astream_events = failing
+        processor._executor = MagicMock(return_value=executor)
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Query")
+        result = {}
+
+        assert [event async for event in processor.stream(request, [], False, result)] == []
+        assert "reformular" in result["message"].lower()
+
     # ========================================================================
     # Tests para _get_langsmith_config
     # ========================================================================
@@ -0,0 +1,160 @@
+"""
+Tests para MCPClientPool.
+Verifica la reutilización del cliente MCP entre requests, el health check con
+ping, la reconexión de clientes caídos y el cierre por inactividad.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.processors.mcp_client_pool import MCPClientPool
+
+MCP_CONFIG = {"catalog": {"url": "http://localhost:8080/sse", "transport": "sse"}}
+
+
+class FakeMCPClient:
+    instances = []
+
+    def __init__(self, connections):
+        self.connections = connections
+        self.session = MagicMock()
+        self.session.send_ping = AsyncMock()
+        self.sessions = {"catalog": self.session}
+        self.entered_task = None
+        self.exited_task = None
+        FakeMCPClient.instances.append(self)
+
+    async def __aenter__(self):
+        self.entered_task = asyncio.current_task()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.exited_task = asyncio.current_task()
+
+    def get_tools(self):
+        return [MagicMock(name="search_products")]
+
+
+@pytest.fixture(autouse=True)
+async def fake_client():
+    FakeMCPClient.instances = []
+    with patch("app.processors.mcp_client_pool.MultiServerMCPClient", FakeMCPClient):
+        yield
+        await MCPClientPool.close_all()
+
+
+class TestMCPClientPool:
+
+    @pytest.mark.unit
+    async def test_reuses_client_between_requests(self):
+        """Dos requests con la misma configuración comparten un solo cliente."""
+        async with MCPClientPool.acquire(MCP_CONFIG) as first:
+            tools = first.tools
+        async with MCPClientPool.acquire(dict(MCP_CONFIG)) as second:
+            assert second is first
+            assert second.tools is tools
+
+        assert len(FakeMCPClient.instances) == 1
+        assert MCPClientPool.stats()["reused"] >= 1
+
+    @pytest.mark.unit
+    async def test_compiled_agent_lives_on_client(self):
+        """El agente compilado se guarda en el cliente y se construye una vez."""
+        build = MagicMock(side_effect=lambda: object())
+        async with MCPClientPool.acquire(MCP_CONFIG) as client:
+            agent = client.agent("agent:v1", build)
+        async with MCPClientPool.acquire(MCP_CONFIG) as client:
+            assert client.agent("agent:v1", build) is agent
+
+        build.assert_called_once()
+
+    @pytest.mark.unit
+    async def test_client_entered_and_exited_in_owner_task(self):
+        """El contexto MCP se abre y se cierra en la misma tarea dueña, no en la del request."""
+        async with MCPClientPool.acquire(MCP_CONFIG):
+            pass
+        await MCPClientPool.close_all()
+
+        fake = FakeMCPClient.instances[0]
+        assert fake.entered_task is fake.exited_task
+        assert fake.entered_task is not asyncio.current_task()
+
+    @pytest.mark.unit
+    async def test_failed_ping_reconnects(self):
+        """Si el ping falla en el health check se abre un cliente nuevo."""
+        with patch.object(MCPClientPool, "HEALTH_CHECK_SECONDS", 0):
+            async with MCPClientPool.acquire(MCP_CONFIG):
+                pass
+            FakeMCPClient.instances[0].session.send_ping.side_effect = ConnectionError("server gone")
+
+            async with MCPClientPool.acquire(MCP_CONFIG) as client:
+                assert client.client is FakeMCPClient.instances[1]
+
+        assert MCPClientPool.stats()["health_failures"] == 1
+
+    @pytest.mark.unit
+    async def test_idle_clients_are_reaped(self):
+        """Los clientes sin uso por más de IDLE_SECONDS se cierran."""
+        async with MCPClientPool.acquire(MCP_CONFIG):
+            pass
+
+        with patch.object(MCPClientPool, "IDLE_SECONDS", 0):
+            assert await MCPClientPool.reap_idle() == 1
+
+        assert MCPClientPool.stats()["clients"] == 0
+        assert FakeMCPClient.instances[0].exited_task is not None
+
+    @pytest.mark.unit
+    async def test_client_in_use_is_not_reaped(self):
+        """Un cliente en uso no se cierra aunque supere el tiempo de inactividad."""
+        async with MCPClientPool.acquire(MCP_CONFIG):
+            with patch.object(MCPClientPool, "IDLE_SECONDS", 0):
+                assert await MCPClientPool.reap_idle() == 0
+
+    @pytest.mark.unit
+    async def test_reaper_never_closes_a_client_acquired_during_a_slow_close(self):
+        """Mientras el reaper espera un cierre lento, un request sobre otro cliente ocioso obtiene uno nuevo
+        que queda en el pool y abierto."""
+        other_config = {"files": {"command": "mcp-files", "transport": "stdio"}}
+        release = asyncio.Event()
+
+        class SlowExitClient(FakeMCPClient):
+            async def __aexit__(self, *exc):
+                if self.connections == MCP_CONFIG:
+                    await release.wait()
+                await super().__aexit__(*exc)
+
+        with patch("app.processors.mcp_client_pool.MultiServerMCPClient", SlowExitClient):
+            for config in (MCP_CONFIG, other_config):
+                async with MCPClientPool.acquire(config):
+                    pass
+            idle_other = MCPClientPool._clients[MCPClientPool.pool_key(other_config)]
+
+            with patch.object(MCPClientPool, "IDLE_SECONDS", 0):
+                reaper = asyncio.create_task(MCPClientPool.reap_idle())
+                await asyncio.sleep(0.01)
+            async with MCPClientPool.acquire(other_config) as entry:
+                assert entry is not idle_other
+                release.set()
+                assert await reaper == 2
+                assert entry.alive
+
+        assert MCPClientPool._clients[MCPClientPool.pool_key(other_config)] is entry
+        assert idle_other.retired and not idle_other.alive
+
+    @pytest.mark.unit
+    async def test_connection_error_is_raised(self):
+        """Si no se puede conectar, el error llega al request y no queda nada en el pool."""
+
+        class BrokenClient(FakeMCPClient):
+            async def __aenter__(self):
+                raise ConnectionError("refused")
+
+        with patch("app.processors.mcp_client_pool.MultiServerMCPClient", BrokenClient):
+            with pytest.raises(ConnectionError):
+                async with MCPClientPool.acquire(MCP_CONFIG):
+                    pass
+
+        assert MCPClientPool.stats()["clients"] == 0
@@ -165,6 +165,39 @@ class TestSimpleProcessor:
         assert processor.history == []
         assert processor.llm is mock_llm
 
+    # ========================================================================
+    # Tests para stream
+    # ========================================================================
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_emits_deltas_and_fills_result(self):
+        """stream debe emitir los tokens como deltas y dejar en result lo mismo que process."""
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        from langchain_core.messages import AIMessage
+
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content='```json\n{"a": 1}\n```')]))
+        processor = SimpleProcessor(llm=llm, context="Context", history=[])
+        request = MessageRequest(agent_id="test-agent", conversation_id="", query="Hola")
+        result = {}
+
+        deltas = [event async for event in processor.stream(request, [], False, result)]
+
+        assert len(deltas) > 1
+        assert all(event["event"] == "delta" for event in deltas)
+        assert "".join(event["data"]["text"] for event in deltas) == '```json\n{"a": 1}\n```'
+        assert result["text"] == '{"a": 1}'
+        assert result["input"] == "Hola"
+
+    @pytest.mark.unit
+    def test_chunk_text_content_blocks(self):
+        """Los chunks con content blocks (Anthropic/Gemini) se reducen a su texto."""
+        from app.processors.conversation_processor import chunk_text
+
+        assert chunk_text("hola") == "hola"
+        assert chunk_text([{"type": "text", "text": "ho"}, {"type": "tool_use", "id": "x"}, "la"]) == "hola"
+        assert chunk_text(None) == ""
+
     # ========================================================================
     # Tests para _get_langsmith_config
     # ========================================================================
@@ -0,0 +1,158 @@
+"""
+Tests para BaseRequestor.aexecute_request.
+Verifica el cliente async compartido, el timeout por herramienta, los
+reintentos (sólo métodos idempotentes) y el presupuesto de reintentos.
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.requestors import base_requestor
+from app.requestors.base_requestor import BaseRequestor, RetryBudget
+
+
+def _config(**overrides):
+    config = {
+        "name": "search_products",
+        "api": "https://api.example.com/products/{sku}",
+        "method": "GET",
+        "headers": [{"key": "Authorization", "value": "Bearer {token}"}],
+        "body": None,
+        "query_params": {"q": "{query}"},
+    }
+    config.update(overrides)
+    return config
+
+
+def _client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    BaseRequestor._budgets.clear()
+    BaseRequestor._semaphores.clear()
+    with patch.object(base_requestor, "RETRY_BACKOFF_SECONDS", 0):
+        yield
+
+
+class TestAExecuteRequest:
+
+    @pytest.mark.unit
+    async def test_replaces_placeholders_and_returns_json(self):
+        """Arma la petición con los parámetros y devuelve el JSON."""
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            return httpx.Response(200, json={"products": [1, 2]})
+
+        with patch.object(base_requestor, "get_http_client", return_value=_client(handler)):
+            result = await BaseRequestor.aexecute_request(_config(), {"sku": "A1", "token": "t", "query": "zapatos"})
+
+        assert result == {"products": [1, 2]}
+        assert seen[0].url.path == "/products/A1"
+        assert seen[0].url.params["q"] == "zapatos"
+        assert seen[0].headers["Authorization"] == "Bearer t"
+
+    @pytest.mark.unit
+    async def test_timeout_is_reported_as_error(self):
+        """Una API lenta corta en timeout_seconds y devuelve error en vez de colgar."""
+
+        async def handler(request):
+            assert request.extensions["timeout"]["read"] == 0.5
+            raise httpx.ReadTimeout("slow", request=request)
+
+        with patch.object(base_requestor, "get_http_client", return_value=_client(handler)):
+            result = await BaseRequestor.aexecute_request(_config(timeout_seconds=0.5, max_retries=0), {})
+
+        assert "ReadTimeout" in result["error"]
+
+    @pytest.mark.unit
+    async def test_retries_idempotent_on_retryable_status(self):
+        """GET con 503 se reintenta y devuelve la respuesta buena."""
+        responses = [httpx.Response(503), httpx.Response(200, json={"ok": True})]
+
+        with patch.object(base_requestor, "get_http_client", return_value=_client(lambda request: responses.pop(0))):
+            result = await BaseRequestor.aexecute_request(_config(), {})
+
+        assert result == {"ok": True}
+
+    @pytest.mark.unit
+    async def test_post_is_not_retried_by_default(self):
+        """POST no se reintenta salvo que la herramienta configure max_retries."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        with patch.object(base_requestor, "get_http_client", return_value=_client(handler)):
+            result = await BaseRequestor.aexecute_request(_config(method="POST", body={"q": "{query}"}), {"query": "x"})
+
+        assert len(calls) == 1
+        assert "503" in result["error"]
+
+    @pytest.mark.unit
+    async def test_client_error_is_not_retried(self):
+        """Un 404 se devuelve como error sin reintentar."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404)
+
+        with patch.object(base_requestor, "get_http_client", return_value=_client(handler)):
+            result = await BaseRequestor.aexecute_request(_config(max_retries=3), {})
+
+        assert len(calls) == 1
+        assert "error" in result
+
+    @pytest.mark.unit
+    async def test_retry_budget_limits_retries(self):
+        """Con el presupuesto agotado no se reintenta aunque max_retries lo permita."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        BaseRequestor._budgets["search_products"] = RetryBudget(ratio=0.0, max_tokens=1.0)
+        with patch.object(base_requestor, "get_http_client", return_value=_client(handler)):
+            await BaseRequestor.aexecute_request(_config(max_retries=5), {})
+            await BaseRequestor.aexecute_request(_config(max_retries=5), {})
+
+        # Primera llamada: 1 + 1 reintento (gasta el único token); segunda: sin reintentos.
+        assert len(calls) == 3
+
+    @pytest.mark.unit
+    async def test_concurrent_calls_are_capped_per_tool(self):
+        """No hay más de TOOL_HTTP_MAX_CONCURRENCY llamadas simultáneas a la misma herramienta."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={})
+
+        with (
+            patch.object(base_requestor, "TOOL_HTTP_MAX_CONCURRENCY", 2),
+            patch.object(base_requestor, "get_http_client", return_value=_client(handler)),
+        ):
+            await asyncio.gather(*(BaseRequestor.aexecute_request(_config(), {}) for _ in range(6)))
+
+        assert peak == 2
+
+    @pytest.mark.unit
+    async def test_bad_config_returns_error(self):
+        """Una configuración inválida devuelve error en vez de lanzar."""
+        result = await BaseRequestor.aexecute_request({"method": "GET"}, {})
+
+        assert "Error inesperado" in result["error"]
@@ -3,6 +3,7 @@ Tests para ImageService.
 Verifica la generación y procesamiento de imágenes.
 """
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -46,20 +47,21 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
-    async def test_upload_to_s3(self, mock_compress, mock_upload, service, sample_base64_image):
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
+    async def test_upload_to_s3(self, mock_compress, mock_upload, service):
         """Debe subir imagen comprimida a S3."""
-        mock_compress.return_value = sample_base64_image
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/image.webp")
 
         result = await service._upload_to_s3(
-            image_base64=sample_base64_image, owner_id="user-123", folder_id="folder-456", prefix_name="test"
+            image_bytes=b"raw_image", owner_id="user-123", folder_id="folder-456", prefix_name="test"
         )
 
         assert result.s3_url == "https://s3.example.com/image.webp"
-        mock_compress.assert_called_once()
-        mock_upload.assert_called_once()
+        mock_compress.assert_called_once_with(b"raw_image", target_kb=120)
+        assert mock_upload.call_args.args[0] == b"compressed_webp"
+        assert mock_upload.call_args.kwargs["folder"] == "user-123/products/variations/folder-456"
 
     # ========================================================================
     # Tests para _generate_single_variation
@@ -67,13 +69,13 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
     @patch("app.services.image_service.google_image")
     async def test_generate_single_variation_google(self, mock_google, mock_compress, mock_upload, service):
         """Debe generar variación usando Google por defecto."""
         mock_google.return_value = b"fake_image_bytes"
-        mock_compress.return_value = "base64_compressed"
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/variation.webp")
 
         result = await service._generate_single_variation(
@@ -88,13 +90,13 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
     @patch("app.services.image_service.openai_image_edit")
     async def test_generate_single_variation_openai(self, mock_openai, mock_compress, mock_upload, service):
         """Debe generar variación usando OpenAI cuando se especifica."""
         mock_openai.return_value = b"fake_image_bytes"
-        mock_compress.return_value = "base64_compressed"
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/variation.webp")
 
         result = await service._generate_single_variation(
@@ -114,8 +116,8 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
     @patch("app.services.image_service.analyze_image")
     @patch("app.services.image_service.google_image")
     async def test_generate_variation_images(
@@ -129,7 +131,7 @@ class TestImageService:
             logo_description="TestLogo", label_description="Product, Electronics"
         )
         mock_google.return_value = b"fake_image_bytes"
-        mock_compress.return_value = sample_base64_image
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/image.webp")
 
         # Update mock to return proper agent_config
@@ -156,13 +158,13 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
     @patch("app.services.image_service.google_image")
     async def test_generate_images_from(self, mock_google, mock_compress, mock_upload, service, sample_base64_image):
         """Debe generar imágenes desde prompt y archivo."""
         mock_google.return_value = b"fake_image_bytes"
-        mock_compress.return_value = sample_base64_image
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/image.webp")
 
         request = GenerateImageRequest(
@@ -180,15 +182,15 @@ class TestImageService:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    @patch("app.services.image_service.upload_file")
-    @patch("app.services.image_service.compress_image_to_target")
+    @patch("app.services.image_service.upload_bytes")
+    @patch("app.services.image_service.compress_image_async")
     @patch("app.services.image_service.google_image")
     async def test_generate_images_from_url(
         self, mock_google, mock_compress, mock_upload, service, sample_base64_image
     ):
         """Debe generar imágenes desde URL."""
         mock_google.return_value = b"fake_image_bytes"
-        mock_compress.return_value = sample_base64_image
+        mock_compress.return_value = b"compressed_webp"
         mock_upload.return_value = MagicMock(s3_url="https://s3.example.com/image.webp")
 
         request = GenerateImageRequest(
@@ -222,3 +224,71 @@ class TestImageService:
 
         assert result is not None
         mock_generate.assert_called_once()
+
+    # ========================================================================
+    # Tests para éxito parcial y streaming de variaciones
+    # ========================================================================
+
+    @pytest.mark.unit
+    @patch.object(ImageService, "_generate_single_variation")
+    async def test_generate_images_from_partial_success(self, mock_variation, service):
+        """Una variación que falla ya no tumba a las demás: vuelven las URLs y el error."""
+        mock_variation.side_effect = ["https://s3/1.webp", RuntimeError("429"), "https://s3/3.webp"]
+        request = GenerateImageRequest(file_url="https://example.com/original.jpg", prompt="p", num_variations=3)
+
+        result = await service.generate_images_from(request, owner_id="user-123")
+
+        assert result.generated_urls == ["https://s3/1.webp", "https://s3/3.webp"]
+        assert result.errors == ["RuntimeError: 429"]
+
+    @pytest.mark.unit
+    @patch.object(ImageService, "_generate_single_variation")
+    async def test_generate_images_from_all_failed_raises(self, mock_variation, service):
+        """Si fallan todas las variaciones se propaga el error como antes."""
+        mock_variation.side_effect = RuntimeError("down")
+        request = GenerateImageRequest(file_url="https://example.com/original.jpg", prompt="p", num_variations=2)
+
+        with pytest.raises(RuntimeError):
+            await service.generate_images_from(request, owner_id="user-123")
+
+    @pytest.mark.unit
+    async def test_stream_images_from_emits_each_variation_as_it_finishes(self, service):
+        """El stream emite cada URL apenas se sube, sin esperar a la variación más lenta."""
+        slow = asyncio.Event()
+        outcomes = iter(["fast", "slow", "fail"])
+
+        async def fake_variation(*args, **kwargs):
+            outcome = next(outcomes)
+            if outcome == "slow":
+                await slow.wait()
+                return "https://s3/slow.webp"
+            if outcome == "fail":
+                raise RuntimeError("safety block")
+            return "https://s3/fast.webp"
+
+        request = GenerateImageRequest(file_url="https://example.com/original.jpg", prompt="p", num_variations=3)
+        events = []
+        with patch.object(ImageService, "_generate_single_variation", side_effect=fake_variation):
+            async for event in service.stream_images_from(request, owner_id="user-123"):
+                events.append(event)
+                if event["event"] == "image_error":
+                    # La lenta sigue en curso cuando ya se entregaron las otras dos.
+                    slow.set()
+
+        assert [e["event"] for e in events] == ["start", "image", "image_error", "image", "done"]
+        assert events[0]["data"]["total"] == 3
+        assert events[1]["data"] == {"index": 0, "url": "https://s3/fast.webp"}
+        assert events[3]["data"] == {"index": 1, "url": "https://s3/slow.webp"}
+        assert events[-1]["data"]["generated_urls"] == ["https://s3/fast.webp", "https://s3/slow.webp"]
+        assert events[-1]["data"]["errors"] == ["RuntimeError: safety block"]
+
+    @pytest.mark.unit
+    @patch.object(ImageService, "_generate_single_variation")
+    async def test_stream_images_from_all_failed_ends_with_error(self, mock_variation, service):
+        """Si ninguna variación sale, el stream termina con un evento error."""
+        mock_variation.side_effect = RuntimeError("down")
+        request = GenerateImageRequest(file_url="https://example.com/original.jpg", prompt="p", num_variations=2)
+
+        events = [event async for event in service.stream_images_from(request, owner_id="user-123")]
+
+        assert [e["event"] for e in events] == ["start", "image_error", "image_error", "error"]
@@ -0,0 +1,217 @@
+"""
+Tests para job_queue.
+Verifica la cola SQLite de los endpoints async: idempotencia, leases que
+expiran (resume tras un restart) y su renovación, el tope de intentos, el
+outbox de webhooks con backoff y los workers de punta a punta.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import job_queue
+from app.services.job_queue import JobQueue, JobStore
+
+KIND = "test_job"
+
+
+def _failure(job_id, payload, error):
+    return {"status": "error", "job_id": job_id, "error": error}
+
+
+@pytest.fixture
+def store(tmp_path):
+    JobQueue.clear()
+    JobQueue._store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield JobQueue._store
+    JobQueue._handlers.pop(KIND, None)
+    JobQueue._store.close()
+    JobQueue.clear()
+
+
+class TestJobStore:
+
+    @pytest.mark.unit
+    async def test_idempotency_key_returns_existing_job(self, store):
+        """El mismo Idempotency-Key para el mismo kind no encola otro job."""
+        first, created = await JobQueue.submit(KIND, {"n": 1}, idempotency_key="key-1")
+        again, created_again = await JobQueue.submit(KIND, {"n": 2}, idempotency_key="key-1")
+        other, _ = await JobQueue.submit(KIND, {"n": 3}, idempotency_key="key-2")
+
+        assert created and not created_again
+        assert again["id"] == first["id"]
+        assert other["id"] != first["id"]
+        assert store.stats()["jobs"] == {"queued": 2}
+        assert (await JobQueue.stats())["deduplicated"] == 1
+
+    @pytest.mark.unit
+    async def test_finish_stores_result_and_queues_callback(self, store):
+        """El resultado y su webhook se guardan juntos; GET muestra ambos."""
+        job, _ = await JobQueue.submit(KIND, {"n": 1}, callback_url="https://example.com/hook", owner_id="owner-1")
+        claimed = store.claim("worker-a", lease_seconds=60)
+        assert claimed["id"] == job["id"] and claimed["attempts"] == 1
+
+        assert store.finish(job["id"], "worker-a", "succeeded", {"status": "success", "url": "x"})
+
+        status = await JobQueue.get(job["id"])
+        assert status["status"] == "succeeded"
+        assert status["result"] == {"status": "success", "url": "x"}
+        assert status["callback"]["status"] == "pending"
+        assert await JobQueue.get("missing") is None
+
+    @pytest.mark.unit
+    async def test_expired_lease_is_resumed_by_another_worker(self, store):
+        """Si el worker muere, al vencer el lease otro worker retoma el job; el viejo ya no puede cerrarlo."""
+        job, _ = await JobQueue.submit(KIND, {"n": 1})
+        store.claim("worker-a", lease_seconds=-1)
+
+        resumed = store.claim("worker-b", lease_seconds=60)
+
+        assert resumed["id"] == job["id"]
+        assert resumed["attempts"] == 2
+        assert store.claim("worker-c", lease_seconds=60) is None
+        assert not store.finish(job["id"], "worker-a", "succeeded", {"status": "success"})
+        assert store.finish(job["id"], "worker-b", "succeeded", {"status": "success"})
+
+    @pytest.mark.unit
+    async def test_release_requeues_without_counting_the_attempt(self, store):
+        """En un shutdown ordenado los jobs en curso vuelven a la cola sin gastar un intento."""
+        await JobQueue.submit(KIND, {"n": 1})
+        store.claim("worker-a", lease_seconds=60)
+
+        assert store.release("worker-a") == 1
+
+        again = store.claim("worker-b", lease_seconds=60)
+        assert again["attempts"] == 1
+
+
+class TestJobQueueRun:
+
+    @pytest.mark.unit
+    async def test_handler_payload_decides_status(self, store):
+        """El job queda succeeded/failed según el status del payload que devuelve el handler."""
+        handler = AsyncMock(side_effect=[{"status": "success"}, {"status": "error", "error": "boom"}])
+        JobQueue.register(KIND, handler, on_failure=_failure)
+        ok, _ = await JobQueue.submit(KIND, {"n": 1})
+        bad, _ = await JobQueue.submit(KIND, {"n": 2})
+
+        await JobQueue._run(store.claim(JobQueue._worker, 60))
+        await JobQueue._run(store.claim(JobQueue._worker, 60))
+
+        handler.assert_any_await(ok["id"], {"n": 1})
+        assert (await JobQueue.get(ok["id"]))["status"] == "succeeded"
+        failed = await JobQueue.get(bad["id"])
+        assert failed["status"] == "failed" and failed["error"] == "boom"
+
+    @pytest.mark.unit
+    async def test_gives_up_after_max_attempts(self, store):
+        """Un job cuyo worker muere en cada intento termina failed con el payload de on_failure, sin correr."""
+        handler = AsyncMock()
+        JobQueue.register(KIND, handler, on_failure=_failure)
+        job, _ = await JobQueue.submit(KIND, {"n": 1}, callback_url="https://example.com/hook")
+        for _ in range(JobQueue.MAX_ATTEMPTS):
+            store.claim("dead-worker", lease_seconds=-1)
+
+        await JobQueue._run(store.claim(JobQueue._worker, 60))
+
+        handler.assert_not_awaited()
+        status = await JobQueue.get(job["id"])
+        assert status["status"] == "failed"
+        assert status["result"]["job_id"] == job["id"]
+        assert status["callback"]["status"] == "pending"
+        assert (await JobQueue.stats())["abandoned"] == 1
+
+    @pytest.mark.unit
+    async def test_workers_run_queued_jobs(self, store):
+        """Con los workers arrancados, un job encolado se ejecuta sin intervención."""
+        JobQueue.register(KIND, AsyncMock(return_value={"status": "success"}), on_failure=_failure)
+        with patch.object(JobQueue, "WORKERS", 2):
+            await JobQueue.start()
+            try:
+                job, _ = await JobQueue.submit(KIND, {"n": 1})
+                for _ in range(100):
+                    if (await JobQueue.get(job["id"]))["status"] == "succeeded":
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await JobQueue.stop()
+
+        assert (await JobQueue.get(job["id"]))["status"] == "succeeded"
+
+    @pytest.mark.unit
+    async def test_lease_renewed_while_webhooks_hang(self, store):
+        """La renovación del lease corre aparte: un webhook colgado no deja vencer el job en curso."""
+        release = asyncio.Event()
+
+        async def handler(job_id, payload):
+            await release.wait()
+            return {"status": "success"}
+
+        async def hanging_delivery(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        JobQueue.register(KIND, handler, on_failure=_failure)
+        with (
+            patch.object(JobQueue, "WORKERS", 1),
+            patch.object(JobQueue, "LEASE_SECONDS", 0.3),
+            patch.object(JobQueue, "deliver_callbacks", hanging_delivery),
+        ):
+            job, _ = await JobQueue.submit(KIND, {"n": 1})
+            await JobQueue.start()
+            try:
+                await asyncio.sleep(0.6)
+                assert (await JobQueue.get(job["id"]))["status"] == "running"
+                assert store.claim("other-worker", lease_seconds=60) is None
+            finally:
+                release.set()
+                await asyncio.sleep(0.05)
+                await JobQueue.stop()
+
+        assert (await JobQueue.get(job["id"]))["status"] == "succeeded"
+
+
+class TestCallbackOutbox:
+
+    @pytest.fixture
+    async def finished_job(self, store):
+        job, _ = await JobQueue.submit(KIND, {"n": 1}, callback_url="https://example.com/hook")
+        store.claim(JobQueue._worker, 60)
+        store.finish(job["id"], JobQueue._worker, "succeeded", {"status": "success"})
+        return job
+
+    @pytest.mark.unit
+    async def test_failed_delivery_is_retried_with_backoff(self, store, finished_job):
+        """Un webhook que falla queda pendiente con backoff; el siguiente intento lo entrega."""
+        post = AsyncMock(side_effect=[RuntimeError("503"), None])
+        with patch.object(job_queue, "post_callback", post):
+            await JobQueue.deliver_callbacks()
+            callback = (await JobQueue.get(finished_job["id"]))["callback"]
+            assert callback["status"] == "pending" and callback["attempts"] == 1
+            assert "503" in callback["last_error"]
+
+            # Todavía en backoff: no se reintenta.
+            await JobQueue.deliver_callbacks()
+            assert post.await_count == 1
+
+            store._conn.execute("UPDATE callback_outbox SET next_attempt_at = ?", (time.time() - 1,))
+            await JobQueue.deliver_callbacks()
+
+        post.assert_awaited_with("https://example.com/hook", {"status": "success"}, max_retries=1)
+        assert (await JobQueue.get(finished_job["id"]))["callback"]["status"] == "delivered"
+        assert (await JobQueue.stats())["callbacks_delivered"] == 1
+
+    @pytest.mark.unit
+    async def test_gives_up_after_max_attempts(self, store, finished_job):
+        """Tras CALLBACK_OUTBOX_MAX_ATTEMPTS fallos el webhook queda dead."""
+        with (
+            patch.object(job_queue, "CALLBACK_OUTBOX_MAX_ATTEMPTS", 2),
+            patch.object(job_queue, "post_callback", AsyncMock(side_effect=RuntimeError("down"))),
+        ):
+            await JobQueue.deliver_callbacks()
+            store._conn.execute("UPDATE callback_outbox SET next_attempt_at = ?", (time.time() - 1,))
+            await JobQueue.deliver_callbacks()
+
+        assert (await JobQueue.get(finished_job["id"]))["callback"]["status"] == "dead"
+        assert (await JobQueue.stats())["callbacks_dead"] == 1
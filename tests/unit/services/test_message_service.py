@@ -73,6 +73,41 @@ class TestMessageService:
         call_args = mock_get_agent.call_args
         assert call_args is not None
 
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.services.message_service.log_prompt", new_callable=AsyncMock)
+    @patch("app.services.message_service.get_agent")
+    async def test_handle_message_stream(self, mock_get_agent, mock_log, service, mock_agent_config):
+        """Debe reenviar los eventos del manager y registrar el agent_call al terminar."""
+        mock_get_agent.return_value = mock_agent_config
+
+        async def stream_conversation(request, agent_config):
+            yield {"event": "delta", "data": {"text": "Hola"}}
+            yield {"event": "done", "data": {"text": "Hola"}}
+
+        service.conversation_manager.stream_conversation = stream_conversation
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        events = [event async for event in service.handle_message_stream(request)]
+
+        assert [e["event"] for e in events] == ["delta", "done"]
+        assert mock_log.call_args.kwargs["log_type"] == "agent_call"
+        assert mock_log.call_args.kwargs["metadata"] == {"streamed": True}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @patch("app.services.message_service.log_prompt", new_callable=AsyncMock)
+    @patch("app.services.message_service.get_agent")
+    async def test_handle_message_stream_error_event(self, mock_get_agent, mock_log, service):
+        """Un error se entrega como evento error en vez de cortar el stream."""
+        mock_get_agent.side_effect = Exception("agent-config down")
+        request = MessageRequest(agent_id="test-agent", conversation_id="conv-123", query="Hello")
+
+        events = [event async for event in service.handle_message_stream(request)]
+
+        assert events == [{"event": "error", "data": {"detail": "agent-config down"}}]
+        assert mock_log.call_args.kwargs["status"] == "error"
+
     # ========================================================================
     # Tests para handle_message_with_config
     # ========================================================================
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -84,6 +86,99 @@ class TestGet:
                 await PromptConfigService.get("missing_agent")
 
 
+class TestSingleFlight:
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        async def slow_fetch(_agent_id):
+            await asyncio.sleep(0.01)
+            return "remote"
+
+        mock = AsyncMock(side_effect=slow_fetch)
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=mock):
+            results = await asyncio.gather(*[PromptConfigService.get("demo_agent") for _ in range(5)])
+        assert results == ["remote"] * 5
+        assert mock.await_count == 1
+
+    async def test_miss_for_one_prompt_does_not_block_another(self):
+        release = asyncio.Event()
+
+        async def fetch(agent_id):
+            if agent_id == "slow":
+                await release.wait()
+            return f"{agent_id} content"
+
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=AsyncMock(side_effect=fetch)):
+            slow = asyncio.create_task(PromptConfigService.get("slow"))
+            await asyncio.sleep(0)
+            fast = await asyncio.wait_for(PromptConfigService.get("fast"), timeout=1)
+            assert not slow.done()
+            release.set()
+            assert await slow == "slow content"
+        assert fast == "fast content"
+
+
+class TestRefreshAhead:
+
+    async def test_near_expiry_serves_cached_and_refreshes_in_background(self):
+        mock = AsyncMock(side_effect=["first", "second"])
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=mock):
+            assert await PromptConfigService.get("demo_agent") == "first"
+            age = PromptConfigService.CACHE_TTL_SECONDS - PromptConfigService.REFRESH_AHEAD_SECONDS / 2
+            PromptConfigService._cache["demo_agent"] = ("first", time.monotonic() - age)
+
+            assert await PromptConfigService.get("demo_agent") == "first"
+            await asyncio.gather(*PromptConfigService._inflight.values())
+            assert await PromptConfigService.get("demo_agent") == "second"
+        assert mock.await_count == 2
+
+
+class TestNegativeCache:
+
+    async def test_failed_fetch_is_not_retried_within_negative_ttl(self):
+        PromptConfigService.register_fallback("demo_agent", "fallback")
+        mock = AsyncMock(return_value=None)
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=mock):
+            assert await PromptConfigService.get("demo_agent") == "fallback"
+            assert await PromptConfigService.get("demo_agent") == "fallback"
+        assert mock.await_count == 1
+
+    async def test_retries_after_negative_ttl(self):
+        PromptConfigService.register_fallback("demo_agent", "fallback")
+        mock = AsyncMock(side_effect=[None, "remote"])
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=mock):
+            assert await PromptConfigService.get("demo_agent") == "fallback"
+            PromptConfigService._negative["demo_agent"] -= PromptConfigService.NEGATIVE_TTL_SECONDS + 1
+            assert await PromptConfigService.get("demo_agent") == "remote"
+
+
+class TestWarmUp:
+
+    async def test_fetches_every_registered_fallback(self):
+        PromptConfigService.register_fallback("a", "x")
+        PromptConfigService.register_fallback("b", "y")
+        mock = AsyncMock(side_effect=lambda agent_id: f"remote {agent_id}")
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=mock):
+            await PromptConfigService.warm_up()
+            assert await PromptConfigService.get("a") == "remote a"
+            assert await PromptConfigService.get("b") == "remote b"
+        assert mock.await_count == 2
+
+    async def test_timeout_leaves_fetch_running(self):
+        PromptConfigService.register_fallback("slow", "x")
+        release = asyncio.Event()
+
+        async def fetch(_agent_id):
+            await release.wait()
+            return "remote"
+
+        with patch("app.services.prompt_config_service.PromptConfigService._fetch", new=AsyncMock(side_effect=fetch)):
+            await PromptConfigService.warm_up(timeout=0.01)
+            assert "slow" in PromptConfigService._inflight
+            release.set()
+            await asyncio.gather(*PromptConfigService._inflight.values())
+        assert PromptConfigService._cache["slow"][0] == "remote"
+
+
 class TestFetch:
 
     async def test_returns_prompt_from_agent_config_response(self):
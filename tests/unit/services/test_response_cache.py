@@ -0,0 +1,239 @@
+"""
+Tests para response_cache.
+Verifica el opt-in por agente, la clave exacta, el LRU+TTL en memoria, el
+backend SQLite compartido, que sólo se guarden respuestas exitosas (sin los
+internos de la corrida) y que MessageService sirva los hits sin llamar al LLM.
+"""
+
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.requests.message_request import MessageRequest
+from app.services import response_cache
+from app.services.message_service import MessageService
+from app.services.response_cache import (
+    MemoryResponseCache,
+    ResponseCache,
+    SqliteResponseCache,
+    response_cache_key,
+    response_cache_ttl,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    ResponseCache.clear()
+    yield
+    ResponseCache.clear()
+
+
+@pytest.fixture
+def cached_agent(mock_agent_config):
+    mock_agent_config.metadata = {"response_cache": {"ttl_seconds": 120}}
+    return mock_agent_config
+
+
+def _request(**overrides):
+    return MessageRequest(**{"agent_id": "test-agent", "conversation_id": "", "query": "Hello", **overrides})
+
+
+class TestPolicyAndKey:
+
+    @pytest.mark.unit
+    def test_opt_in_per_agent(self, mock_agent_config):
+        """Sin opt-in no se cachea; con metadata.response_cache o RESPONSE_CACHE_AGENT_IDS sí."""
+        assert response_cache_ttl(_request(), mock_agent_config) is None
+
+        mock_agent_config.metadata = {"response_cache": True}
+        assert response_cache_ttl(_request(), mock_agent_config) == response_cache.RESPONSE_CACHE_TTL_SECONDS
+
+        mock_agent_config.metadata = {"response_cache": {"ttl_seconds": 30}}
+        assert response_cache_ttl(_request(), mock_agent_config) == 30
+
+        mock_agent_config.metadata = None
+        with patch.object(response_cache, "RESPONSE_CACHE_AGENT_IDS", frozenset({"test-agent"})):
+            assert response_cache_ttl(_request(), mock_agent_config) is not None
+
+    @pytest.mark.unit
+    def test_conversations_are_never_cached(self, cached_agent):
+        """Con conversation_id la respuesta depende del historial: no se cachea."""
+        assert response_cache_ttl(_request(conversation_id="conv-1"), cached_agent) is None
+
+    @pytest.mark.unit
+    def test_key_covers_every_input(self, cached_agent):
+        """Cambiar query, archivos, json_parser, prompt o modelo cambia la clave."""
+        base = response_cache_key(_request(), cached_agent)
+        assert base == response_cache_key(_request(), cached_agent)
+        assert base.startswith("test-agent:")
+
+        variants = [
+            response_cache_key(_request(query="Hola"), cached_agent),
+            response_cache_key(_request(files=[{"type": "image", "url": "https://x/a.png"}]), cached_agent),
+            response_cache_key(_request(json_parser={"code": "string"}), cached_agent),
+            response_cache_key(_request(), cached_agent.model_copy(update={"prompt": "Otro prompt"})),
+            response_cache_key(_request(), cached_agent.model_copy(update={"model_ai": "gpt-4o"})),
+        ]
+        assert len({base, *variants}) == len(variants) + 1
+
+
+class TestMemoryResponseCache:
+
+    @pytest.mark.unit
+    def test_ttl(self):
+        """Una entrada vencida no se sirve."""
+        cache = MemoryResponseCache()
+        with patch("app.services.response_cache.time.monotonic", return_value=100.0):
+            cache.set("a:1", '{"text": "x"}', ttl_seconds=10)
+            assert cache.get("a:1") == '{"text": "x"}'
+        with patch("app.services.response_cache.time.monotonic", return_value=111.0):
+            assert cache.get("a:1") is None
+        assert cache.stats()["expired"] == 1
+
+    @pytest.mark.unit
+    def test_lru_by_entries_and_bytes(self):
+        """Se desaloja la menos usada al pasar max_entries o max_bytes."""
+        cache = MemoryResponseCache(max_entries=2, max_bytes=1000)
+        cache.set("a:1", "1", 60)
+        cache.set("a:2", "2", 60)
+        cache.get("a:1")
+        cache.set("a:3", "3", 60)
+        assert cache.get("a:2") is None
+        assert cache.get("a:1") == "1"
+
+        cache.set("a:big", "x" * 1000, 60)
+        assert cache.stats()["approx_bytes"] <= 1000
+        assert cache.get("a:1") is None
+
+    @pytest.mark.unit
+    def test_invalidate_by_agent(self):
+        cache = MemoryResponseCache()
+        cache.set("agent-a:1", "1", 60)
+        cache.set("agent-b:1", "1", 60)
+
+        assert cache.invalidate("agent-a") == 1
+        assert cache.get("agent-b:1") == "1"
+
+
+class TestSqliteResponseCache:
+
+    @pytest.mark.unit
+    def test_shared_between_instances(self, tmp_path):
+        """Dos instancias (workers) sobre el mismo archivo comparten respuestas."""
+        path = str(tmp_path / "responses.sqlite3")
+        writer, reader = SqliteResponseCache(path), SqliteResponseCache(path)
+
+        writer.set("agent-a:1", '{"text": "x"}', 60)
+        assert reader.get("agent-a:1") == '{"text": "x"}'
+
+        writer.set("agent-a:2", "{}", -1)
+        assert reader.get("agent-a:2") is None
+
+        assert reader.invalidate("agent-a") == 2
+        assert writer.get("agent-a:1") is None
+        writer.close()
+        reader.close()
+
+    @pytest.mark.unit
+    async def test_response_cache_runs_sqlite_off_the_event_loop(self, tmp_path):
+        """ResponseCache.get/set sobre SQLite corren en el hilo del backend, no en el del event loop."""
+        backend = SqliteResponseCache(str(tmp_path / "responses.sqlite3"))
+        threads = []
+        original_get = backend.get
+
+        def get(key):
+            threads.append(threading.current_thread().name)
+            return original_get(key)
+
+        backend.get = get
+        with patch.object(ResponseCache, "_backend", backend):
+            await ResponseCache.set("agent-a:1", {"text": "x"}, 60)
+            assert await ResponseCache.get("agent-a:1") == {"text": "x"}
+            assert (await ResponseCache.stats())["entries"] == 1
+            assert await ResponseCache.invalidate("agent-a") == 1
+        backend.close()
+
+        assert threads and all(name.startswith("response-cache") for name in threads)
+
+
+class TestMessageServiceCache:
+
+    @pytest.mark.unit
+    @patch("app.services.message_service.get_agent")
+    async def test_second_call_is_served_from_cache(self, mock_get_agent, cached_agent):
+        """El segundo request idéntico no llama al LLM y queda registrado como cache_hit."""
+        mock_get_agent.return_value = cached_agent
+        manager = MagicMock()
+        manager.process_conversation = AsyncMock(return_value={"text": "respuesta"})
+        service = MessageService(conversation_manager=manager)
+
+        with patch("app.services.message_service.log_prompt", new_callable=AsyncMock) as mock_log:
+            first = await service.handle_message(_request())
+            first["text"] = "mutada por el caller"
+            second = await service.handle_message(_request())
+
+        assert second == {"text": "respuesta"}
+        manager.process_conversation.assert_awaited_once()
+        assert [c.kwargs["status"] for c in mock_log.call_args_list] == ["cache_miss", "cache_hit"]
+        assert mock_log.call_args.kwargs["log_type"] == "response_cache"
+        assert (await ResponseCache.stats())["hits"] == 1
+
+    @pytest.mark.unit
+    @patch("app.services.message_service.get_agent")
+    async def test_not_opted_in_always_calls_llm(self, mock_get_agent, mock_agent_config):
+        mock_get_agent.return_value = mock_agent_config
+        manager = MagicMock()
+        manager.process_conversation = AsyncMock(return_value={"text": "respuesta"})
+        service = MessageService(conversation_manager=manager)
+
+        await service.handle_message(_request())
+        await service.handle_message(_request())
+
+        assert manager.process_conversation.await_count == 2
+        assert (await ResponseCache.stats())["misses"] == 0
+
+    @pytest.mark.unit
+    @patch("app.services.message_service.get_agent")
+    async def test_failed_agent_run_is_not_cached(self, mock_get_agent, cached_agent):
+        """La disculpa de AgentProcessor (message, sin text) no se guarda: el siguiente request vuelve al LLM."""
+        mock_get_agent.return_value = cached_agent
+        manager = MagicMock()
+        manager.process_conversation = AsyncMock(
+            side_effect=[{"message": "Lo siento, no pude procesar tu solicitud."}, {"text": "respuesta"}]
+        )
+        service = MessageService(conversation_manager=manager)
+
+        with patch("app.services.message_service.log_prompt", new_callable=AsyncMock):
+            first = await service.handle_message(_request())
+            second = await service.handle_message(_request())
+
+        assert "message" in first
+        assert second == {"text": "respuesta"}
+        assert manager.process_conversation.await_count == 2
+        assert (await ResponseCache.stats())["not_cacheable"] == 1
+
+    @pytest.mark.unit
+    @patch("app.services.message_service.get_agent")
+    async def test_agent_run_cached_without_intermediate_steps(self, mock_get_agent, cached_agent):
+        """Una corrida con tools se cachea aunque intermediate_steps no sea serializable; se guarda text/tool_result."""
+        mock_get_agent.return_value = cached_agent
+        manager = MagicMock()
+        manager.process_conversation = AsyncMock(
+            return_value={
+                "text": "respuesta",
+                "output": "respuesta",
+                "tool_result": {"name": "search", "message": {"ok": True}},
+                "intermediate_steps": [(object(), "observation")],
+                "chat_history": [],
+            }
+        )
+        service = MessageService(conversation_manager=manager)
+
+        with patch("app.services.message_service.log_prompt", new_callable=AsyncMock):
+            await service.handle_message(_request())
+            cached = await service.handle_message(_request())
+
+        manager.process_conversation.assert_awaited_once()
+        assert cached == {"text": "respuesta", "tool_result": {"name": "search", "message": {"ok": True}}}
+        assert (await ResponseCache.stats())["unserializable"] == 0
@@ -0,0 +1,131 @@
+"""
+Tests para los métodos streaming de SectionHtmlService.
+Mockean stream_gemini_freeform_v2 — no consumen créditos.
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.externals.ai_direct.gemini_text_v2 import GeminiTextV2Error
+from app.requests.edit_section_html_request import EditSectionHtmlRequest
+from app.requests.section_html_request import SectionHtmlRequest
+from app.services.prompt_config_service import PromptConfigService
+from app.services.section_html_service import SectionHtmlService
+
+STREAM = "app.services.section_html_service.stream_gemini_freeform_v2"
+
+
+@pytest.fixture(autouse=True)
+def _prompt_fallbacks(monkeypatch):
+    PromptConfigService.invalidate()
+    monkeypatch.setattr(
+        "app.services.prompt_config_service.PromptConfigService._fetch",
+        AsyncMock(return_value=None),
+    )
+    yield
+    PromptConfigService.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def _no_audit_log(monkeypatch):
+    monkeypatch.setattr("app.services.section_html_service.log_prompt", AsyncMock())
+
+
+def _fake_stream(*texts, fail_after=None):
+    async def _gen(**_kwargs):
+        for i, text in enumerate(texts):
+            if fail_after is not None and i == fail_after:
+                raise GeminiTextV2Error("stream cut")
+            yield {"type": "delta", "text": text}
+        yield {"type": "complete", "interaction_id": "int-1", "usage": {"total_tokens": 5}, "status": "completed"}
+
+    return _gen
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+@pytest.fixture
+def section_request():
+    return SectionHtmlRequest(product_name="Producto", owner_id="owner-1")
+
+
+class TestStreamGenerateSectionHtml:
+
+    @pytest.mark.unit
+    async def test_streams_deltas_then_done(self, section_request):
+        """Emite deltas con el HTML sin fences y un done con el HTML completo."""
+        with patch(STREAM, new=_fake_stream("```html\n<section>", "<h1>Hola</h1>", "</section>\n```")):
+            events = await _collect(SectionHtmlService().stream_generate_section_html(section_request))
+
+        deltas = "".join(e["data"]["html"] for e in events if e["event"] == "delta")
+        assert deltas == "<section><h1>Hola</h1></section>"
+        assert events[-1]["event"] == "done"
+        assert events[-1]["data"]["html_content"] == "<section><h1>Hola</h1></section>"
+
+    @pytest.mark.unit
+    async def test_falls_back_when_primary_fails_before_output(self, section_request):
+        """Si el modelo primario falla antes de emitir nada, reintenta con el fallback."""
+        calls = []
+
+        def _stream(**kwargs):
+            calls.append(kwargs["model"])
+            if len(calls) == 1:
+                return _fake_stream("<div>", fail_after=0)(**kwargs)
+            return _fake_stream("<div>ok</div>")(**kwargs)
+
+        with patch(STREAM, new=_stream):
+            events = await _collect(SectionHtmlService().stream_generate_section_html(section_request))
+
+        assert len(calls) == 2
+        assert events[-1]["event"] == "done"
+
+    @pytest.mark.unit
+    async def test_error_after_partial_output_is_not_retried(self, section_request):
+        """Con HTML ya enviado, un corte termina en evento error (sin duplicar)."""
+        with patch(STREAM, new=_fake_stream("<div>", "<p>", fail_after=1)):
+            events = await _collect(SectionHtmlService().stream_generate_section_html(section_request))
+
+        assert [e["event"] for e in events] == ["delta", "error"]
+        assert "stream cut" in events[-1]["data"]["detail"]
+
+
+class TestStreamEditSectionHtml:
+
+    @pytest.mark.unit
+    async def test_streams_and_runs_image_pipeline(self):
+        """El edit streaming emite status y done tras el pipeline de imágenes."""
+        request = EditSectionHtmlRequest(
+            current_html="<section>old</section>", instruction="cambia", product_name="P", owner_id="o"
+        )
+        service = SectionHtmlService()
+        with (
+            patch(STREAM, new=_fake_stream("<section>", "new</section>")),
+            patch.object(
+                service, "_process_new_images_in_edit", new=AsyncMock(side_effect=lambda **kw: kw["new_html"])
+            ),
+        ):
+            events = await _collect(service.stream_edit_section_html(request))
+
+        assert [e["event"] for e in events] == ["delta", "delta", "status", "done"]
+        assert events[-1]["data"]["html_content"] == "<section>new</section>"
+
+    @pytest.mark.unit
+    async def test_truncated_output_ends_in_error(self):
+        """Sin </section> en la salida se emite error, igual que el endpoint no-streaming."""
+        request = EditSectionHtmlRequest(
+            current_html="<section>old</section>", instruction="cambia", product_name="P", owner_id="o"
+        )
+        service = SectionHtmlService()
+        with (
+            patch(STREAM, new=_fake_stream("<section>", "cortado")),
+            patch.object(
+                service, "_process_new_images_in_edit", new=AsyncMock(side_effect=lambda **kw: kw["new_html"])
+            ),
+        ):
+            events = await _collect(service.stream_edit_section_html(request))
+
+        assert events[-1]["event"] == "error"
+        assert "incompleta" in events[-1]["data"]["detail"]
@@ -318,3 +318,30 @@ class TestBackwardCompatibility:
         assert k["model"] == "gpt-image-1"
         assert k["provider"] == "openai"
         assert k["response_url"] == "https://s3/fake.webp"
+
+
+# ------------------------------------------------------------------------------
+# DEADLINE — retries stop when the request has no time left
+# ------------------------------------------------------------------------------
+
+
+class TestDeadline:
+
+    @pytest.mark.asyncio
+    async def test_short_deadline_skips_retries_and_fallback(self, service, base_request, mock_log_prompt, mock_upload):
+        """Con menos tiempo que un intento no se reintenta ni se llama al fallback: sale el error real."""
+        from app.helpers.retry import request_deadline
+
+        gemini = AsyncMock(side_effect=Exception("Gemini HTTP 503: overloaded"))
+        fallback = AsyncMock()
+        with (
+            patch("app.services.section_image_service.google_image_with_text", new=gemini),
+            patch("app.services.section_image_service.openai_image_edit", new=fallback),
+        ):
+            with request_deadline(5):
+                with pytest.raises(Exception, match="503"):
+                    await service._do_generate(base_request, time.monotonic())
+
+        assert gemini.await_count == 1
+        fallback.assert_not_called()
+        assert mock_log_prompt.call_args.kwargs["status"] == "error"
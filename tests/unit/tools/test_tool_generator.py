@@ -3,7 +3,7 @@ Tests para ToolGenerator.
 Verifica la generación dinámica de herramientas LangChain.
 """
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from langchain_core.tools import StructuredTool
@@ -196,3 +196,28 @@ class TestToolGenerator:
 
         assert isinstance(result, dict)
         assert "tool_result" in result
+
+    # ========================================================================
+    # Tests para la versión async
+    # ========================================================================
+
+    @pytest.mark.unit
+    def test_generated_tool_has_coroutine(self, sample_tool_config):
+        """La herramienta expone una corrutina nativa para AgentExecutor."""
+        tools = ToolGenerator.generate_tools([sample_tool_config])
+
+        assert tools[0].coroutine is not None
+
+    @pytest.mark.unit
+    @patch("app.tools.tool_generator.BaseRequestor.aexecute_request", new_callable=AsyncMock)
+    async def test_tool_ainvoke_uses_async_request(self, mock_aexecute, sample_tool_config):
+        """ainvoke usa el requestor async y no el bloqueante."""
+        mock_aexecute.return_value = {"products": ["a"]}
+
+        tools = ToolGenerator.generate_tools([sample_tool_config])
+        with patch("app.tools.tool_generator.BaseRequestor.execute_request") as mock_execute:
+            result = await tools[0].ainvoke({"query": "laptop", "category": "computers"})
+
+        assert result == {"tool_result": {"products": ["a"]}}
+        mock_execute.assert_not_called()
+        assert mock_aexecute.call_args[0][1] == {"query": "laptop", "category": "computers"}